@@ -6,16 +6,23 @@ __version__ = _version(__name__)
 
 from .core.config import Config
 from .core.git import GitUtils
-from .core.generation import CommitMessageGenerator, format_message
+from .core.generation import (
+    AsyncCommitMessageGenerator,
+    CommitMessageGenerator,
+    format_message,
+)
 from .api.openrouter import OpenRouterClient
+from .api.async_openrouter import AsyncOpenRouterClient
 from .exceptions import AcmsgError, ApiError, GitError, ConfigError
 
 __all__ = [
     "Config",
     "GitUtils",
     "CommitMessageGenerator",
+    "AsyncCommitMessageGenerator",
     "format_message",
     "OpenRouterClient",
+    "AsyncOpenRouterClient",
     "AcmsgError",
     "ApiError",
     "GitError",
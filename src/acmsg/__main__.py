@@ -5,7 +5,7 @@ import importlib.metadata
 import sys
 
 from .cli.parsers import create_parser
-from .cli.commands import handle_commit, handle_config
+from .cli.commands import handle_commit, handle_config, handle_models, handle_stats
 
 
 def main() -> int:
@@ -30,6 +30,14 @@ def main() -> int:
         handle_commit(args)
         return 0
 
+    if args.command == "models":
+        handle_models(args)
+        return 0
+
+    if args.command == "stats":
+        handle_stats(args)
+        return 0
+
     if args.command == "config":
         if not args.config_subcommand:
             # Get the config subparser and print its help
@@ -1,5 +1,6 @@
 """Package for API integration with OpenRouter."""
 
 from .openrouter import OpenRouterClient
+from .async_openrouter import AsyncOpenRouterClient
 
-__all__ = ["OpenRouterClient"]
+__all__ = ["OpenRouterClient", "AsyncOpenRouterClient"]
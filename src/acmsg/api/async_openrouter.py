@@ -0,0 +1,432 @@
+"""Asynchronous OpenRouter API client."""
+
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None  # type: ignore[assignment]
+
+from ..constants import (
+    API_ENDPOINT,
+    ASYNC_MAX_CONCURRENCY,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_MODEL_CACHE_TTL,
+    DEFAULT_READ_TIMEOUT,
+)
+from ..exceptions import AcmsgError, ApiError, ContextLengthError
+from .budget import TokenBudget
+from .circuit import CircuitBreaker
+from .deadline import Deadline
+from .limits import ContextLimits
+from .openrouter import BaseOpenRouterClient, ModelChain
+from .retry import RetryPolicy, describe_attempts, parse_retry_after
+from .session import get_shared_session
+from .streaming import aiter_sse_data
+from .tokenizer import TokenCalibration
+
+
+class AsyncOpenRouterClient(BaseOpenRouterClient):
+    """asyncio-native client for interacting with the OpenRouter API.
+
+    Payload building, trimming and error mapping are shared with
+    OpenRouterClient. Steps that may block, such as loading the model
+    catalog or the learned limits and calibration files, run in worker
+    threads so the event loop stays free. At most ``max_concurrency``
+    requests are in flight at once; further calls wait for a free slot.
+    Cancelling a call closes its connection.
+    """
+
+    def __init__(
+        self,
+        api_token: str,
+        client: Optional["httpx.AsyncClient"] = None,
+        max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+        catalog_ttl: int = DEFAULT_MODEL_CACHE_TTL,
+        api_endpoint: str = API_ENDPOINT,
+        retry_policy: Optional[RetryPolicy] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+        deadline: Optional[Deadline] = None,
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        token_calibration: Optional[TokenCalibration] = None,
+        context_limits: Optional[ContextLimits] = None,
+    ):
+        """Initialize the asynchronous OpenRouter API client.
+
+        Args:
+            api_token: OpenRouter API token
+            client: httpx client to send requests through (not closed by the client)
+            max_concurrency: Maximum number of requests in flight at once
+            catalog_ttl: Seconds before the cached model catalog is revalidated
+            api_endpoint: Chat completions endpoint URL
+            retry_policy: Policy for retrying transient failures
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of a response
+            deadline: Time budget shared by every request the client makes
+            max_tokens: Maximum number of tokens the model may generate
+            circuit_breaker: Tracker of recently failed models to skip
+            token_calibration: Correction factors for token estimates
+            context_limits: Context lengths learned from overflow errors
+
+        Raises:
+            AcmsgError: If httpx is not installed
+        """
+        if httpx is None:
+            raise AcmsgError(
+                "AsyncOpenRouterClient requires httpx. "
+                "Install it with: pip install 'acmsg[async]'"
+            )
+
+        super().__init__(
+            api_token,
+            get_shared_session(),
+            catalog_ttl,
+            api_endpoint,
+            retry_policy,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            deadline=deadline,
+            max_tokens=max_tokens,
+            circuit_breaker=circuit_breaker,
+            token_calibration=token_calibration,
+            context_limits=context_limits,
+        )
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=None,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "AsyncOpenRouterClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Release the client's connection pool if it owns one."""
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def _prepare(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        stream: bool,
+    ) -> Tuple[Dict[str, Any], TokenBudget]:
+        """Build the request payload without blocking the event loop.
+
+        Budget planning may download the model catalog and read the learned
+        limits and token calibration from disk, so it runs in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self._build_payload,
+            model,
+            system_prompt,
+            user_prompt,
+            temperature,
+            stream=stream,
+        )
+
+    async def _send(
+        self, payload: Dict[str, Any], stream: bool
+    ) -> Tuple["httpx.Response", int]:
+        """Send a completion request, retrying transient failures.
+
+        Args:
+            payload: Request payload
+            stream: Whether to stream the response body
+
+        Returns:
+            Tuple of (response, number of attempts made)
+
+        Raises:
+            ApiError: If the API cannot be reached
+            DeadlineExceeded: If the deadline passes before a response arrives
+        """
+        policy = self._retry_policy
+        headers = {"Authorization": f"Bearer {self._api_token}"}
+        attempt = 0
+
+        while True:
+            attempt += 1
+            connect_timeout, read_timeout = self._request_timeout()
+            request = self._client.build_request(
+                "POST",
+                self._api_endpoint,
+                headers=headers,
+                content=json.dumps(payload),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            try:
+                response = await self._client.send(request, stream=stream)
+            except httpx.HTTPError as e:
+                self._deadline.check("waiting for the API")
+                # Only failures before the request reached the server are retried
+                retryable = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                delay = self._retry_delay(attempt) if retryable else None
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    continue
+                raise ApiError(
+                    f"Failed to connect to OpenRouter API{describe_attempts(attempt)}: {e}"
+                )
+
+            if policy.is_retryable_status(response.status_code):
+                delay = self._retry_delay(
+                    attempt, parse_retry_after(response.headers.get("Retry-After"))
+                )
+                if delay is not None:
+                    await response.aclose()
+                    await asyncio.sleep(delay)
+                    continue
+
+            return response, attempt
+
+    async def generate_completion(
+        self,
+        model: ModelChain,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        stream: bool = False,
+    ) -> str:
+        """Generate a completion using the OpenRouter API.
+
+        Given several models, each is tried in order until one succeeds.
+
+        Args:
+            model: Model ID, or ordered list of model IDs, to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+            stream: Whether to stream the response (chunks are joined)
+
+        Returns:
+            Generated text
+
+        Raises:
+            ApiError: If the API request fails for every model
+        """
+        if stream:
+            chunks = []
+            async for chunk in self.stream_completion(
+                model, system_prompt, user_prompt, temperature
+            ):
+                chunks.append(chunk)
+            return "".join(chunks)
+
+        chain = self._model_chain(model)
+        for position, candidate in enumerate(chain):
+            try:
+                result = await self._complete(
+                    candidate, system_prompt, user_prompt, temperature
+                )
+            except ApiError as e:
+                next_model = chain[position + 1] if position + 1 < len(chain) else None
+                self._fail_over(candidate, e, next_model)
+                continue
+
+            self._circuit_breaker.record_success(candidate)
+            return result
+
+        raise ApiError("No model could generate a completion")
+
+    async def _complete(
+        self, model: str, system_prompt: str, user_prompt: str, temperature: float
+    ) -> str:
+        """Generate a non-streamed completion with a single model.
+
+        A context overflow that reports the model's true limits is retried
+        once, with the request re-planned from those limits.
+
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Returns:
+            Generated text
+
+        Raises:
+            ApiError: If the API request fails
+        """
+        retried = False
+        while True:
+            payload, budget = await self._prepare(
+                model, system_prompt, user_prompt, temperature, stream=False
+            )
+
+            async with self._semaphore:
+                response, attempts = await self._send(payload, stream=False)
+
+            try:
+                # Parsing records the token usage and learned limits on disk
+                return await asyncio.to_thread(
+                    self._parse_completion,
+                    response.is_success,
+                    response.json(),
+                    response.text,
+                    budget,
+                    attempts,
+                )
+            except ContextLengthError as e:
+                if retried or e.context_length is None:
+                    raise
+                retried = True
+                self._warn_context_retry(model, e)
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                raise ApiError(f"Failed to parse API response: {e}")
+
+    async def stream_completion(
+        self,
+        model: ModelChain,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+    ) -> AsyncGenerator[str, None]:
+        """Generate a completion, yielding text chunks as they arrive.
+
+        Given several models, the next one is tried if a model fails before
+        its first chunk.
+
+        Args:
+            model: Model ID, or ordered list of model IDs, to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Yields:
+            Generated text chunks
+
+        Raises:
+            ApiError: If the API request fails for every model
+        """
+        chain = self._model_chain(model)
+        for position, candidate in enumerate(chain):
+            try:
+                chunks, first = await self._open_stream(
+                    candidate, system_prompt, user_prompt, temperature
+                )
+            except ApiError as e:
+                next_model = chain[position + 1] if position + 1 < len(chain) else None
+                self._fail_over(candidate, e, next_model)
+                continue
+
+            self._circuit_breaker.record_success(candidate)
+            try:
+                if first is not None:
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+            finally:
+                await chunks.aclose()
+            return
+
+    async def _open_stream(
+        self, model: str, system_prompt: str, user_prompt: str, temperature: float
+    ) -> Tuple[AsyncGenerator[str, None], Optional[str]]:
+        """Stream a completion from a single model up to its first chunk.
+
+        A context overflow that reports the model's true limits is retried
+        once, with the request re-planned from those limits.
+
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Returns:
+            Tuple of (iterator over the remaining chunks, first chunk or None)
+
+        Raises:
+            ApiError: If the API request fails before the first chunk
+        """
+        retried = False
+        while True:
+            chunks = self._stream_model(model, system_prompt, user_prompt, temperature)
+            try:
+                return chunks, await chunks.__anext__()
+            except StopAsyncIteration:
+                return chunks, None
+            except ContextLengthError as e:
+                await chunks.aclose()
+                if retried or e.context_length is None:
+                    raise
+                retried = True
+                self._warn_context_retry(model, e)
+            except ApiError:
+                await chunks.aclose()
+                raise
+
+    async def _stream_model(
+        self, model: str, system_prompt: str, user_prompt: str, temperature: float
+    ) -> AsyncGenerator[str, None]:
+        """Stream a completion from a single model.
+
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Yields:
+            Generated text chunks
+
+        Raises:
+            ApiError: If the API request fails
+        """
+        payload, budget = await self._prepare(
+            model, system_prompt, user_prompt, temperature, stream=True
+        )
+
+        async with self._semaphore:
+            response, attempts = await self._send(payload, stream=True)
+            try:
+                content_type = response.headers.get("Content-Type", "")
+                if not response.is_success or "text/event-stream" not in content_type:
+                    # Errors (and servers that ignore `stream`) reply with plain JSON
+                    await response.aread()
+                    yield await asyncio.to_thread(
+                        self._parse_completion,
+                        response.is_success,
+                        response.json(),
+                        response.text,
+                        budget,
+                        attempts,
+                    )
+                    return
+
+                async for data in aiter_sse_data(response.aiter_lines()):
+                    # The read timeout only bounds each chunk, not the whole stream
+                    self._deadline.check("streaming the response")
+                    event = json.loads(data)
+                    if event.get("usage") or "error" in event:
+                        # These update the token calibration or learned limits
+                        content = await asyncio.to_thread(
+                            self._parse_stream_event, data, budget
+                        )
+                    else:
+                        content = self._parse_stream_event(data, budget)
+                    if content:
+                        yield content
+            except httpx.HTTPError as e:
+                self._deadline.check("streaming the response")
+                raise ApiError(f"Failed to connect to OpenRouter API: {e}")
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                raise ApiError(f"Failed to parse API response: {e}")
+            finally:
+                await response.aclose()
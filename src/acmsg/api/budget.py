@@ -0,0 +1,206 @@
+"""Token budget planning for completion requests."""
+
+from typing import Callable, Optional, Tuple
+
+from ..constants import (
+    DEFAULT_MAX_TOKENS,
+    PROMPT_OVERHEAD_TOKENS,
+    TRANSFORMS_THRESHOLD,
+)
+
+TRIM_MARKER = "\n\n[...content trimmed due to length constraints...]\n\n"
+
+
+def trim_middle(
+    text: str, keep_tokens: int, head_ratio: float, chars_per_token: float = 4.0
+) -> str:
+    """Cut the middle out of a text, keeping its start and end.
+
+    Args:
+        text: Text to trim
+        keep_tokens: Number of tokens to keep
+        head_ratio: Fraction of the kept tokens taken from the start
+        chars_per_token: Average characters per token of the text
+
+    Returns:
+        Trimmed text with a marker where content was removed
+    """
+    keep_tokens = max(0, keep_tokens)
+    keep_start = int(keep_tokens * head_ratio)
+    keep_end = keep_tokens - keep_start
+    start_chars = int(keep_start * chars_per_token)
+    end_chars = min(len(text) - start_chars, int(keep_end * chars_per_token))
+    return text[:start_chars] + TRIM_MARKER + text[len(text) - max(0, end_chars) :]
+
+
+def trim_prompts(
+    system_prompt: str,
+    user_prompt: str,
+    system_tokens: int,
+    user_tokens: int,
+    available_tokens: int,
+    system_max_ratio: float = 0.3,
+) -> Tuple[str, str, int, int, bool]:
+    """Trim the prompts so their combined size fits a token allowance.
+
+    Each prompt is cut at its own estimated characters per token, so text
+    that tokenizes densely loses proportionally fewer characters.
+
+    Args:
+        system_prompt: System prompt
+        user_prompt: User prompt
+        system_tokens: Estimated tokens of the system prompt
+        user_tokens: Estimated tokens of the user prompt
+        available_tokens: Tokens the two prompts may use together
+        system_max_ratio: Maximum share of the allowance for the system prompt
+
+    Returns:
+        Tuple of (system_prompt, user_prompt, system_tokens, user_tokens,
+        was_trimmed), with the token counts of the trimmed prompts
+    """
+    if system_tokens + user_tokens <= available_tokens:
+        return system_prompt, user_prompt, system_tokens, user_tokens, False
+
+    max_system_tokens = min(system_tokens, int(available_tokens * system_max_ratio))
+    max_user_tokens = available_tokens - max_system_tokens
+
+    if system_tokens > max_system_tokens:
+        system_prompt = trim_middle(
+            system_prompt,
+            max_system_tokens,
+            0.6,
+            len(system_prompt) / max(1, system_tokens),
+        )
+        system_tokens = max_system_tokens
+    if user_tokens > max_user_tokens:
+        user_prompt = trim_middle(
+            user_prompt, max_user_tokens, 0.7, len(user_prompt) / max(1, user_tokens)
+        )
+        user_tokens = max_user_tokens
+
+    return system_prompt, user_prompt, system_tokens, user_tokens, True
+
+
+class TokenBudget:
+    """Token plan of a single completion request.
+
+    The plan is made once per request from one context length lookup and
+    one estimate per prompt. It fixes the prompts actually sent (trimmed if
+    necessary), whether OpenRouter's middle-out transform is requested and
+    how many tokens the response may use, so the payload and any error
+    report agree on what was sent.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        context_length: int,
+        system_prompt: str,
+        user_prompt: str,
+        system_tokens: int,
+        user_tokens: int,
+        max_tokens: Optional[int],
+        was_trimmed: bool = False,
+        use_transforms: bool = False,
+        prompt_limit: Optional[int] = None,
+    ):
+        """Initialize the plan.
+
+        Args:
+            model: Model ID the plan was made for
+            context_length: Context length of the model in tokens
+            system_prompt: System prompt to send
+            user_prompt: User prompt to send
+            system_tokens: Estimated tokens of the system prompt
+            user_tokens: Estimated tokens of the user prompt
+            max_tokens: Maximum tokens of the response (None for no limit)
+            was_trimmed: Whether the prompts were trimmed to fit
+            use_transforms: Whether to request the middle-out transform
+            prompt_limit: Tokens the prompt may use, including message
+                overhead (defaults to the whole context)
+        """
+        self.model = model
+        self.context_length = context_length
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.system_tokens = system_tokens
+        self.user_tokens = user_tokens
+        self.max_tokens = max_tokens
+        self.was_trimmed = was_trimmed
+        self.use_transforms = use_transforms
+        self.prompt_limit = context_length if prompt_limit is None else prompt_limit
+
+    @classmethod
+    def plan(
+        cls,
+        model: str,
+        context_length: int,
+        system_prompt: str,
+        user_prompt: str,
+        estimate: Callable[[str], int],
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+        system_max_ratio: float = 0.3,
+    ) -> "TokenBudget":
+        """Plan the token budget of a request.
+
+        Room for the response is reserved first, capped at a quarter of the
+        context so small models keep most of their window for the prompt.
+        Prompts that do not fit in the rest are trimmed, and the response
+        may use whatever the prompts leave free up to ``max_tokens``.
+
+        Args:
+            model: Model ID
+            context_length: Context length of the model in tokens
+            system_prompt: System prompt
+            user_prompt: User prompt
+            estimate: Function estimating the tokens of a text
+            max_tokens: Maximum tokens of the response (None for no limit)
+            system_max_ratio: Maximum share of the prompt allowance for the
+                system prompt when trimming
+
+        Returns:
+            The token budget
+        """
+        system_tokens = estimate(system_prompt)
+        user_tokens = estimate(user_prompt)
+
+        reserve = min(max_tokens, context_length // 4) if max_tokens else 0
+        prompt_limit = context_length - reserve
+
+        system_prompt, user_prompt, system_tokens, user_tokens, was_trimmed = (
+            trim_prompts(
+                system_prompt,
+                user_prompt,
+                system_tokens,
+                user_tokens,
+                prompt_limit - PROMPT_OVERHEAD_TOKENS,
+                system_max_ratio,
+            )
+        )
+        prompt_tokens = system_tokens + user_tokens + PROMPT_OVERHEAD_TOKENS
+
+        if max_tokens is not None:
+            max_tokens = max(1, min(max_tokens, context_length - prompt_tokens))
+
+        return cls(
+            model,
+            context_length,
+            system_prompt,
+            user_prompt,
+            system_tokens,
+            user_tokens,
+            max_tokens,
+            was_trimmed=was_trimmed,
+            # Let OpenRouter compress further if the estimate is close to the limit
+            use_transforms=prompt_tokens > prompt_limit * TRANSFORMS_THRESHOLD,
+            prompt_limit=prompt_limit,
+        )
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Get the estimated tokens of the prompt, including message overhead.
+
+        Returns:
+            Estimated prompt tokens
+        """
+        return self.system_tokens + self.user_tokens + PROMPT_OVERHEAD_TOKENS
@@ -0,0 +1,423 @@
+"""On-disk cache of the OpenRouter model catalog."""
+
+import atexit
+import bisect
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from ..constants import (
+    CATALOG_CACHE_FILENAME,
+    CATALOG_READ_TIMEOUT,
+    CATALOG_REFRESH_EXIT_WAIT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MODEL_CACHE_TTL,
+    MODELS_ENDPOINT,
+)
+from ..exceptions import DeadlineExceeded
+from ..storage import get_cache_dir, read_json, write_json
+from .deadline import Deadline
+
+# Background refreshes still running, joined at exit so they can save the catalog
+_pending_refreshes: List[threading.Thread] = []
+_pending_refreshes_lock = threading.Lock()
+
+
+def _join_pending_refreshes(timeout: float = CATALOG_REFRESH_EXIT_WAIT) -> None:
+    """Wait a bounded time for background catalog refreshes to finish.
+
+    Refresh threads are daemons, so without this the interpreter would kill
+    them at exit, usually before the revalidated catalog is written.
+
+    Args:
+        timeout: Maximum number of seconds to wait for all refreshes together
+    """
+    with _pending_refreshes_lock:
+        threads = list(_pending_refreshes)
+        _pending_refreshes.clear()
+    end = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, end - time.monotonic()))
+
+
+atexit.register(_join_pending_refreshes)
+
+
+def _trigrams(text: str) -> Iterator[str]:
+    """Yield the distinct three-character substrings of a text."""
+    seen = set()
+    for i in range(len(text) - 2):
+        gram = text[i : i + 3]
+        if gram not in seen:
+            seen.add(gram)
+            yield gram
+
+
+def _price_per_million(model: Dict[str, Any], kind: str) -> Optional[float]:
+    """Get a model's price in USD per million tokens.
+
+    Args:
+        model: Model entry from the catalog
+        kind: Pricing kind, e.g. ``"prompt"`` or ``"completion"``
+
+    Returns:
+        Price per million tokens, or None if unknown
+    """
+    try:
+        return float(model.get("pricing", {})[kind]) * 1_000_000
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ModelIndex:
+    """Lookup structures over one version of the model catalog.
+
+    The index holds a hash map from lowercased model IDs to catalog
+    positions, a sorted ID list for prefix queries, and a trigram posting
+    index over IDs and display names for substring queries. Results are
+    always reported in catalog order, matching a linear scan.
+    """
+
+    def __init__(self, models: List[Dict[str, Any]]):
+        """Build the index.
+
+        Args:
+            models: Model entries in catalog order
+        """
+        self._models = models
+        self._ids: List[str] = []
+        self._haystacks: List[str] = []
+        self._by_id: Dict[str, int] = {}
+        self._trigram_index: Dict[str, List[int]] = {}
+
+        for position, model in enumerate(models):
+            model_id = str(model.get("id", "")).lower()
+            haystack = f"{model_id}\n{str(model.get('name', '')).lower()}"
+            self._ids.append(model_id)
+            self._haystacks.append(haystack)
+            self._by_id.setdefault(model_id, position)
+            for gram in _trigrams(haystack):
+                self._trigram_index.setdefault(gram, []).append(position)
+
+        self._sorted_ids: List[Tuple[str, int]] = sorted(
+            (model_id, position) for position, model_id in enumerate(self._ids)
+        )
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def get(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """Get a model by exact (case-insensitive) ID.
+
+        Args:
+            model_id: The model identifier
+
+        Returns:
+            Model entry or None if not found
+        """
+        position = self._by_id.get(model_id.lower())
+        return None if position is None else self._models[position]
+
+    def lookup(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """Resolve a model by exact ID, falling back to the first partial match.
+
+        Args:
+            model_id: The model identifier or a fragment of it
+
+        Returns:
+            Model entry or None if nothing matches
+        """
+        model_info = self.get(model_id)
+        if model_info is not None:
+            return model_info
+
+        query = model_id.lower()
+        for position in self._candidates(query):
+            if query in self._ids[position]:
+                return self._models[position]
+        return None
+
+    def with_prefix(self, prefix: str) -> List[Dict[str, Any]]:
+        """Get every model whose ID starts with a prefix.
+
+        Args:
+            prefix: ID prefix, e.g. ``"anthropic/"``
+
+        Returns:
+            Matching model entries in catalog order
+        """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._sorted_ids, (prefix, -1))
+        positions = []
+        for model_id, position in self._sorted_ids[start:]:
+            if not model_id.startswith(prefix):
+                break
+            positions.append(position)
+        return [self._models[position] for position in sorted(positions)]
+
+    def search(
+        self,
+        query: str = "",
+        min_context: Optional[int] = None,
+        max_prompt_price: Optional[float] = None,
+        free_only: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Search the catalog by name, context length and pricing.
+
+        Args:
+            query: Substring to match against model IDs and names
+            min_context: Minimum context length in tokens
+            max_prompt_price: Maximum prompt price in USD per million tokens
+            free_only: Only include models with zero prompt and completion price
+
+        Returns:
+            Matching model entries in catalog order
+        """
+        query = query.lower()
+        results = []
+        for position in self._candidates(query):
+            if query and query not in self._haystacks[position]:
+                continue
+
+            model = self._models[position]
+            if (
+                min_context is not None
+                and int(model.get("context_length") or 0) < min_context
+            ):
+                continue
+
+            prompt_price = _price_per_million(model, "prompt")
+            if max_prompt_price is not None and (
+                prompt_price is None or prompt_price > max_prompt_price
+            ):
+                continue
+            if free_only and (
+                prompt_price != 0 or _price_per_million(model, "completion") != 0
+            ):
+                continue
+
+            results.append(model)
+        return results
+
+    def _candidates(self, query: str) -> List[int]:
+        """Get catalog positions that may contain a query, in catalog order."""
+        if len(query) < 3:
+            return list(range(len(self._models)))
+
+        postings = []
+        for gram in _trigrams(query):
+            posting = self._trigram_index.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+
+class ModelCatalog:
+    """Model catalog persisted on disk with stale-while-revalidate refresh.
+
+    The catalog is stored under ``XDG_CACHE_HOME/acmsg`` together with the
+    ``ETag`` and ``Last-Modified`` validators returned by OpenRouter. Fresh
+    entries are served directly. Stale entries are served immediately while a
+    background thread revalidates them with a conditional request, so a full
+    catalog download is only ever on the critical path when no cache exists.
+    Pending refreshes are given a few seconds to finish when the process exits.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        headers: Optional[Dict[str, str]] = None,
+        ttl: int = DEFAULT_MODEL_CACHE_TTL,
+        cache_file: Optional[Path] = None,
+        background_refresh: bool = True,
+        timeout: Tuple[float, float] = (DEFAULT_CONNECT_TIMEOUT, CATALOG_READ_TIMEOUT),
+        deadline: Optional[Deadline] = None,
+    ):
+        """Initialize the model catalog.
+
+        Args:
+            session: HTTP session used to download the catalog
+            headers: Extra headers to send with catalog requests
+            ttl: Seconds a downloaded catalog is considered fresh
+            cache_file: Location of the cache file (defaults to the cache dir)
+            background_refresh: Revalidate stale entries in a background thread
+            timeout: Connect and read timeouts for catalog requests
+            deadline: Time budget that catalog requests must fit in
+        """
+        self._session = session
+        self._headers = dict(headers or {})
+        self._ttl = ttl
+        self._cache_file = cache_file or get_cache_dir() / CATALOG_CACHE_FILENAME
+        self._background_refresh = background_refresh
+        self._timeout = timeout
+        self._deadline = deadline or Deadline()
+        self._entry: Optional[Dict[str, Any]] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._index: Optional[ModelIndex] = None
+        self._index_source: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def ttl(self) -> int:
+        """Get the freshness lifetime of a downloaded catalog.
+
+        Returns:
+            TTL in seconds
+        """
+        return self._ttl
+
+    @property
+    def cache_file(self) -> Path:
+        """Get the path of the on-disk catalog cache.
+
+        Returns:
+            Path to the cache file
+        """
+        return self._cache_file
+
+    def models(self) -> List[Dict[str, Any]]:
+        """Get the list of models in the catalog.
+
+        Returns:
+            Model entries as returned by the ``/models`` endpoint, or an empty
+            list if no catalog is cached and it could not be downloaded
+        """
+        entry = self._load()
+
+        if entry is None:
+            entry = self._revalidate(None)
+        elif self._is_stale(entry):
+            if self._background_refresh:
+                self._start_background_refresh(entry)
+            else:
+                entry = self._revalidate(entry)
+
+        return entry.get("data", []) if entry else []
+
+    def index(self) -> ModelIndex:
+        """Get the lookup index for the current catalog version.
+
+        The index is built once per downloaded catalog and reused until a
+        refresh replaces the model list.
+
+        Returns:
+            Index over the catalog's models
+        """
+        models = self.models()
+        with self._lock:
+            if self._index is None or self._index_source is not models:
+                self._index = ModelIndex(models)
+                self._index_source = models
+            return self._index
+
+    def refresh(self) -> List[Dict[str, Any]]:
+        """Synchronously revalidate the catalog regardless of its age.
+
+        Returns:
+            Model entries after revalidation
+        """
+        entry = self._revalidate(self._load())
+        return entry.get("data", []) if entry else []
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for a pending background refresh to finish.
+
+        Args:
+            timeout: Maximum number of seconds to wait
+        """
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Load the cached entry from disk once per catalog instance."""
+        with self._lock:
+            if not self._loaded:
+                entry = read_json(self._cache_file)
+                if isinstance(entry, dict) and isinstance(entry.get("data"), list):
+                    self._entry = entry
+                self._loaded = True
+            return self._entry
+
+    def _is_stale(self, entry: Dict[str, Any]) -> bool:
+        """Check whether a cached entry has outlived its TTL."""
+        return time.time() >= float(entry.get("fetched_at", 0)) + self._ttl
+
+    def _start_background_refresh(self, entry: Dict[str, Any]) -> None:
+        """Revalidate a stale entry without blocking the caller."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self._revalidate, args=(entry,), daemon=True
+            )
+            self._refresh_thread = thread
+            thread.start()
+        with _pending_refreshes_lock:
+            _pending_refreshes[:] = [t for t in _pending_refreshes if t.is_alive()]
+            _pending_refreshes.append(thread)
+
+    def _revalidate(self, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Fetch the catalog, using conditional headers when an entry exists.
+
+        Args:
+            entry: Currently cached entry, if any
+
+        Returns:
+            The up-to-date entry, or the given entry if the request failed
+        """
+        headers = dict(self._headers)
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self._session.get(
+                url=MODELS_ENDPOINT,
+                headers=headers,
+                timeout=self._deadline.timeout(*self._timeout),
+            )
+
+            if response.status_code == 304 and entry is not None:
+                new_entry = dict(entry, fetched_at=time.time())
+            elif response.ok:
+                new_entry = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": time.time(),
+                    "data": response.json().get("data", []),
+                }
+            else:
+                return entry
+        except (
+            requests.RequestException,
+            DeadlineExceeded,
+            ValueError,
+            AttributeError,
+        ):
+            return entry
+
+        with self._lock:
+            self._entry = new_entry
+            self._loaded = True
+
+        try:
+            write_json(self._cache_file, new_entry)
+        except (OSError, TypeError, ValueError):
+            pass
+
+        return new_entry
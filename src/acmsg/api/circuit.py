@@ -0,0 +1,104 @@
+"""Per-model circuit breaker persisted between runs."""
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..constants import (
+    CIRCUIT_COOLDOWN,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_STATE_FILENAME,
+)
+from ..storage import get_cache_dir, read_json, write_json
+
+
+class CircuitBreaker:
+    """Track failing models so later runs can skip them.
+
+    A model's circuit opens after ``failure_threshold`` consecutive failures
+    and stays open for ``cooldown`` seconds. After the cooldown the circuit
+    is half-open: the next request is let through, and its outcome either
+    closes the circuit again or restarts the cooldown. The state is stored
+    in the cache directory so it carries over between commits.
+    """
+
+    def __init__(
+        self,
+        cache_file: Optional[Path] = None,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        cooldown: float = CIRCUIT_COOLDOWN,
+    ):
+        """Initialize the circuit breaker.
+
+        Args:
+            cache_file: Location of the state file (defaults to the cache dir)
+            failure_threshold: Consecutive failures before a circuit opens
+            cooldown: Seconds an open circuit rejects requests
+        """
+        self._cache_file = cache_file or get_cache_dir() / CIRCUIT_STATE_FILENAME
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @property
+    def cache_file(self) -> Path:
+        """Get the path of the on-disk circuit state.
+
+        Returns:
+            Path to the state file
+        """
+        return self._cache_file
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the state from disk once per instance (call with the lock held)."""
+        if self._state is None:
+            state = read_json(self._cache_file)
+            self._state = state if isinstance(state, dict) else {}
+        return self._state
+
+    def _save(self) -> None:
+        """Write the state to disk (call with the lock held)."""
+        try:
+            write_json(self._cache_file, self._state)
+        except OSError:
+            pass
+
+    def allow(self, model: str) -> bool:
+        """Check whether a request to a model should be attempted.
+
+        Args:
+            model: Model ID
+
+        Returns:
+            False while the model's circuit is open
+        """
+        with self._lock:
+            entry = self._load().get(model)
+        if not entry or entry.get("failures", 0) < self._failure_threshold:
+            return True
+        return time.time() >= float(entry.get("opened_at", 0)) + self._cooldown
+
+    def record_success(self, model: str) -> None:
+        """Close a model's circuit after a successful request.
+
+        Args:
+            model: Model ID
+        """
+        with self._lock:
+            if self._load().pop(model, None) is not None:
+                self._save()
+
+    def record_failure(self, model: str) -> None:
+        """Count a failed request, opening the circuit at the threshold.
+
+        Args:
+            model: Model ID
+        """
+        with self._lock:
+            entry = self._load().setdefault(model, {"failures": 0})
+            entry["failures"] = entry.get("failures", 0) + 1
+            if entry["failures"] >= self._failure_threshold:
+                entry["opened_at"] = time.time()
+            self._save()
@@ -0,0 +1,108 @@
+"""Time budgets spanning several API requests."""
+
+import time
+from typing import Optional, Tuple
+
+from ..exceptions import ConfigError, DeadlineExceeded
+
+
+class Deadline:
+    """A single time budget shared by every request of an operation.
+
+    Each request derives its timeouts from the time that is left, so the
+    catalog lookup, the completion request and any retries together cannot
+    run past the deadline. A deadline without a budget never expires.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        """Start the deadline.
+
+        Args:
+            seconds: Time budget in seconds, or None for no limit
+
+        Raises:
+            ConfigError: If the budget is not positive
+        """
+        if seconds is not None and seconds <= 0:
+            raise ConfigError(f"Deadline must be positive, got {seconds}")
+
+        self._seconds = seconds
+        self._expires_at = None if seconds is None else time.monotonic() + seconds
+
+    @property
+    def seconds(self) -> Optional[float]:
+        """Get the total time budget.
+
+        Returns:
+            Budget in seconds, or None if unlimited
+        """
+        return self._seconds
+
+    @property
+    def expired(self) -> bool:
+        """Check whether the budget has run out.
+
+        Returns:
+            True if no time is left
+        """
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def remaining(self) -> Optional[float]:
+        """Get the time left before the deadline.
+
+        Returns:
+            Seconds left (never negative), or None if unlimited
+        """
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def allows(self, delay: float) -> bool:
+        """Check whether waiting would still leave time for another request.
+
+        Args:
+            delay: Seconds to wait
+
+        Returns:
+            True if the deadline is not reached after waiting
+        """
+        remaining = self.remaining()
+        return remaining is None or delay < remaining
+
+    def check(self, activity: str) -> None:
+        """Raise if the budget has run out.
+
+        Args:
+            activity: What was being done, for the error message
+
+        Raises:
+            DeadlineExceeded: If the deadline has passed
+        """
+        if self.expired:
+            raise DeadlineExceeded(
+                f"Deadline of {self._seconds:g}s exceeded while {activity}"
+            )
+
+    def timeout(
+        self, connect: float, read: Optional[float]
+    ) -> Tuple[float, Optional[float]]:
+        """Clamp request timeouts to the time left.
+
+        Args:
+            connect: Connect timeout in seconds
+            read: Read timeout in seconds, or None for no limit
+
+        Returns:
+            Tuple of (connect timeout, read timeout)
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed
+        """
+        self.check("waiting to send a request")
+        remaining = self.remaining()
+        if remaining is None:
+            return connect, read
+        return min(connect, remaining), remaining if read is None else min(
+            read, remaining
+        )
@@ -0,0 +1,311 @@
+"""Hedged requests for tail-latency control."""
+
+import math
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import requests
+
+from ..constants import (
+    DEFAULT_HEDGE_DELAY,
+    DEFAULT_HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_STATS_FILENAME,
+    HEDGE_STATS_WINDOW,
+)
+from ..exceptions import ConfigError
+from ..storage import get_cache_dir, read_json, write_json
+
+
+class HedgePolicy:
+    """When and where to send a hedge request.
+
+    If the primary request has not produced its first token after the hedge
+    delay, the same prompt is sent to a secondary model (or to the same
+    model pinned to another provider) and whichever answers first is used.
+    Without a fixed delay, the observed latency percentile of the primary
+    model is used once enough samples have been collected.
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        provider: Optional[str] = None,
+        delay: Optional[float] = None,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+    ):
+        """Initialize the hedge policy.
+
+        Args:
+            model: Model for the hedge request (defaults to the primary model)
+            provider: OpenRouter provider to route the hedge request to
+            delay: Fixed hedge delay in seconds (defaults to the observed percentile)
+            percentile: Latency percentile used when no fixed delay is set
+
+        Raises:
+            ConfigError: If a value is out of range
+        """
+        if model is None and provider is None:
+            raise ConfigError("A hedge needs a secondary model or provider")
+        if delay is not None and delay < 0:
+            raise ConfigError(f"Hedge delay must not be negative, got {delay}")
+        if not 0 < percentile < 1:
+            raise ConfigError(
+                f"Hedge percentile must be between 0 and 1, got {percentile}"
+            )
+
+        self.model = model
+        self.provider = provider
+        self.delay = delay
+        self.percentile = percentile
+
+    @classmethod
+    def from_config(cls, data: Optional[Mapping[str, Any]]) -> Optional["HedgePolicy"]:
+        """Create a hedge policy from a config mapping.
+
+        Args:
+            data: Mapping with any of ``model``, ``provider``, ``delay`` and
+                ``percentile``
+
+        Returns:
+            Hedge policy, or None if hedging is not configured
+
+        Raises:
+            ConfigError: If the mapping is invalid
+        """
+        if data is None:
+            return None
+        if not isinstance(data, Mapping):
+            raise ConfigError(f"hedge must be a mapping, got {data!r}")
+
+        unknown = set(data) - {"model", "provider", "delay", "percentile"}
+        if unknown:
+            raise ConfigError(f"Unknown hedge options: {', '.join(sorted(unknown))}")
+
+        try:
+            delay = data.get("delay")
+            return cls(
+                model=data.get("model"),
+                provider=data.get("provider"),
+                delay=None if delay is None else float(delay),
+                percentile=float(data.get("percentile", DEFAULT_HEDGE_PERCENTILE)),
+            )
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"Invalid hedge configuration: {e}")
+
+    def delay_for(self, model: str, stats: "HedgeStats") -> float:
+        """Get how long to wait for the primary request before hedging.
+
+        Args:
+            model: Primary model ID
+            stats: Observed latencies
+
+        Returns:
+            Delay in seconds
+        """
+        if self.delay is not None:
+            return self.delay
+        observed = stats.percentile(model, self.percentile)
+        return DEFAULT_HEDGE_DELAY if observed is None else observed
+
+
+class Cancellation:
+    """Cancellation of one request of a hedged race, from another thread.
+
+    Cancelling wakes the request if it is waiting to retry, and shuts down
+    its connection if it is waiting for the response, so a losing request
+    does not hold its connection and thread until it times out.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the cancellation, not yet cancelled."""
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response: Optional[requests.Response] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """Check whether the request was cancelled.
+
+        Returns:
+            True once ``cancel`` was called
+        """
+        return self._event.is_set()
+
+    def wait(self, delay: float) -> bool:
+        """Sleep before a retry, waking early if the request is cancelled.
+
+        Args:
+            delay: Seconds to sleep
+
+        Returns:
+            True if the request was cancelled
+        """
+        return self._event.wait(delay)
+
+    def attach(self, response: requests.Response) -> bool:
+        """Register the response of the request, so cancelling can close it.
+
+        Args:
+            response: Response whose body is still to be read
+
+        Returns:
+            False if the request was already cancelled, in which case the
+            response is closed
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._response = response
+                return True
+        response.close()
+        return False
+
+    def cancel(self) -> None:
+        """Cancel the request and shut down its connection."""
+        with self._lock:
+            self._event.set()
+            response, self._response = self._response, None
+        if response is None:
+            return
+        # Closing alone does not wake a thread blocked reading the socket
+        shutdown = getattr(response.raw, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
+        response.close()
+
+
+class HedgeStats:
+    """Time-to-first-token samples and hedge outcomes, persisted on disk.
+
+    Only the most recent samples per model are kept, so the percentile used
+    for the hedge delay follows changes in provider latency.
+    """
+
+    def __init__(
+        self, cache_file: Optional[Path] = None, window: int = HEDGE_STATS_WINDOW
+    ):
+        """Initialize the statistics store.
+
+        Args:
+            cache_file: Location of the stats file (defaults to the cache dir)
+            window: Number of latency samples kept per model
+        """
+        self._cache_file = cache_file or get_cache_dir() / HEDGE_STATS_FILENAME
+        self._window = window
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+
+    @property
+    def cache_file(self) -> Path:
+        """Get the path of the on-disk stats file.
+
+        Returns:
+            Path to the stats file
+        """
+        return self._cache_file
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the stats from disk once per instance (call with the lock held)."""
+        if self._data is None:
+            data = read_json(self._cache_file)
+            if not isinstance(data, dict):
+                data = {}
+            data.setdefault("latency", {})
+            data.setdefault("requests", 0)
+            data.setdefault("hedged", 0)
+            data.setdefault("hedge_wins", 0)
+            self._data = data
+        return self._data
+
+    def models(self) -> List[str]:
+        """Get the models with recorded latency samples.
+
+        Returns:
+            Model IDs in sorted order
+        """
+        with self._lock:
+            return sorted(self._load()["latency"])
+
+    def samples(self, model: str) -> List[float]:
+        """Get the recorded time-to-first-token samples of a model.
+
+        Args:
+            model: Model ID
+
+        Returns:
+            Latencies in seconds, oldest first
+        """
+        with self._lock:
+            return list(self._load()["latency"].get(model, []))
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        """Get a time-to-first-token percentile of a model.
+
+        Args:
+            model: Model ID
+            q: Percentile as a fraction, e.g. ``0.95``
+
+        Returns:
+            Latency in seconds, or None if too few samples were recorded
+        """
+        samples = sorted(self.samples(model))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+    def record(
+        self,
+        latencies: Sequence[Tuple[str, float]],
+        hedged: bool,
+        hedge_won: bool,
+    ) -> None:
+        """Record the outcome of one request and save the stats.
+
+        Args:
+            latencies: (model, time to first token in seconds) of each
+                request that reached its first token
+            hedged: Whether a hedge request was sent
+            hedge_won: Whether the hedge request answered first
+        """
+        with self._lock:
+            data = self._load()
+            for model, latency in latencies:
+                samples = data["latency"].setdefault(model, [])
+                samples.append(round(latency, 3))
+                del samples[: -self._window]
+            data["requests"] += 1
+            data["hedged"] += int(hedged)
+            data["hedge_wins"] += int(hedge_won)
+            snapshot = dict(
+                data,
+                latency={
+                    name: list(values) for name, values in data["latency"].items()
+                },
+            )
+
+        try:
+            write_json(self._cache_file, snapshot)
+        except OSError:
+            pass
+
+    def summary(self) -> Dict[str, Any]:
+        """Summarize hedge counts and win rates.
+
+        Returns:
+            Mapping with request and hedge counts, the hedge rate and the
+            fraction of hedges that won
+        """
+        with self._lock:
+            data = self._load()
+            requests_made = data["requests"]
+            hedged = data["hedged"]
+            wins = data["hedge_wins"]
+
+        return {
+            "requests": requests_made,
+            "hedged": hedged,
+            "hedge_wins": wins,
+            "hedge_rate": hedged / requests_made if requests_made else 0.0,
+            "win_rate": wins / hedged if hedged else 0.0,
+        }
@@ -0,0 +1,79 @@
+"""Context lengths learned from the API, persisted between runs."""
+
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..constants import CONTEXT_LIMITS_FILENAME
+from ..storage import get_cache_dir, read_json, write_json
+
+
+class ContextLimits:
+    """Context lengths reported by the API in context overflow errors.
+
+    The catalog and the known model families only give the advertised
+    context length of a model, while the endpoint serving a request may
+    accept less. Limits learned from overflow errors are stored in the
+    cache directory and take precedence in later runs.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        """Initialize the limits store.
+
+        Args:
+            cache_file: Location of the limits file (defaults to the cache dir)
+        """
+        self._cache_file = cache_file or get_cache_dir() / CONTEXT_LIMITS_FILENAME
+        self._lock = threading.Lock()
+        self._limits: Optional[Dict[str, int]] = None
+
+    @property
+    def cache_file(self) -> Path:
+        """Get the path of the on-disk limits file.
+
+        Returns:
+            Path to the limits file
+        """
+        return self._cache_file
+
+    def _load(self) -> Dict[str, int]:
+        """Load the limits from disk once per instance (call with the lock held)."""
+        if self._limits is None:
+            data = read_json(self._cache_file)
+            self._limits = {
+                model: limit
+                for model, limit in (data.items() if isinstance(data, dict) else [])
+                if isinstance(limit, int) and limit > 0
+            }
+        return self._limits
+
+    def get(self, model: str) -> Optional[int]:
+        """Get the learned context length of a model.
+
+        Args:
+            model: Model ID
+
+        Returns:
+            Context length in tokens, or None if none was learned
+        """
+        with self._lock:
+            return self._load().get(model)
+
+    def record(self, model: str, context_length: int) -> None:
+        """Remember the context length the API reported for a model.
+
+        Args:
+            model: Model ID
+            context_length: Context length in tokens
+        """
+        with self._lock:
+            limits = self._load()
+            if limits.get(model) == context_length:
+                return
+            limits[model] = context_length
+            snapshot = dict(limits)
+
+        try:
+            write_json(self._cache_file, snapshot)
+        except OSError:
+            pass
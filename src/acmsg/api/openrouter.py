@@ -1,22 +1,58 @@
 """OpenRouter API client for communication with AI models."""
 
 import json
+import math
+import queue
 import re
+import threading
 import time
-from typing import Dict, Any, Optional, Tuple
+from typing import (
+    Dict,
+    Any,
+    Generator,
+    List,
+    NoReturn,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import requests
 import colorama
 from colorama import Fore, Style
 
-from ..constants import API_ENDPOINT
-from ..exceptions import ApiError
+from ..constants import (
+    API_ENDPOINT,
+    CATALOG_READ_TIMEOUT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_MODEL_CACHE_TTL,
+    DEFAULT_READ_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    PROMPT_OVERHEAD_TOKENS,
+)
+from ..exceptions import ApiError, ContextLengthError, DeadlineExceeded
+from .budget import TokenBudget, trim_prompts
+from .catalog import ModelCatalog
+from .circuit import CircuitBreaker
+from .deadline import Deadline
+from .hedging import Cancellation, HedgePolicy, HedgeStats
+from .limits import ContextLimits
+from .retry import RetryPolicy, describe_attempts, parse_retry_after
+from .streaming import iter_sse_data
+from .tokenizer import TokenCalibration, tokenizer_for
+from .session import create_session, get_shared_session
 
 colorama.init()
 
+# A model ID, or an ordered list of model IDs to fail over through
+ModelChain = Union[str, Sequence[str]]
 
-class OpenRouterClient:
-    """Client for interacting with the OpenRouter API."""
+
+class BaseOpenRouterClient:
+    """Request planning and response handling shared by the OpenRouter clients."""
 
     # Known context limits for various model families
     MODEL_TOKEN_LIMITS = {
@@ -35,35 +71,218 @@ class OpenRouterClient:
         "qwen": 32768,
     }
 
-    def __init__(self, api_token: str):
-        """Initialize the OpenRouter API client.
+    def __init__(
+        self,
+        api_token: str,
+        catalog_session: requests.Session,
+        catalog_ttl: int = DEFAULT_MODEL_CACHE_TTL,
+        api_endpoint: str = API_ENDPOINT,
+        retry_policy: Optional[RetryPolicy] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+        deadline: Optional[Deadline] = None,
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        token_calibration: Optional[TokenCalibration] = None,
+        context_limits: Optional[ContextLimits] = None,
+    ):
+        """Initialize the shared client state.
 
         Args:
             api_token: OpenRouter API token
+            catalog_session: Session used to download the model catalog
+            catalog_ttl: Seconds before the cached model catalog is revalidated
+            api_endpoint: Chat completions endpoint URL
+            retry_policy: Policy for retrying transient failures
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of a response
+            deadline: Time budget shared by every request the client makes
+            max_tokens: Maximum number of tokens the model may generate
+            circuit_breaker: Tracker of recently failed models to skip
+            token_calibration: Correction factors for token estimates
+            context_limits: Context lengths learned from overflow errors
         """
         self._api_token = api_token
-        self._api_endpoint = API_ENDPOINT
-        self._models_info_cache: Dict[str, Any] = {}  # Cache for model info
-        self._cache_expiry: Dict[str, int] = {}  # Expiry timestamps for cached info
-        self._cache_ttl: int = 3600  # Cache TTL (1 hour)
+        self._api_endpoint = api_endpoint
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._deadline = deadline or Deadline()
+        self._max_tokens = max_tokens
+        self._circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._token_calibration = token_calibration or TokenCalibration()
+        self._context_limits = context_limits or ContextLimits()
+        self._catalog = ModelCatalog(
+            catalog_session,
+            headers={
+                "Authorization": f"Bearer {self._api_token}",
+                "HTTP-Referer": "https://github.com/quinneden/acmsg",
+                "X-Title": "acmsg",
+            },
+            ttl=catalog_ttl,
+            timeout=(connect_timeout, CATALOG_READ_TIMEOUT),
+            deadline=self._deadline,
+        )
+        self._family_limits: Dict[str, int] = {}
+
+    @property
+    def catalog(self) -> ModelCatalog:
+        """Get the model catalog used to resolve model information.
+
+        Returns:
+            Disk-backed model catalog
+        """
+        return self._catalog
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        """Get the policy used to retry transient failures.
+
+        Returns:
+            Retry policy
+        """
+        return self._retry_policy
+
+    @property
+    def deadline(self) -> Deadline:
+        """Get the time budget shared by the client's requests.
+
+        Returns:
+            Deadline (unlimited unless one was given)
+        """
+        return self._deadline
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """Get the tracker of recently failed models.
+
+        Returns:
+            Circuit breaker
+        """
+        return self._circuit_breaker
+
+    @property
+    def context_limits(self) -> ContextLimits:
+        """Get the context lengths learned from overflow errors.
+
+        Returns:
+            Context limits store
+        """
+        return self._context_limits
+
+    def _model_chain(self, model: ModelChain) -> List[str]:
+        """Get the models to try in order, skipping those that failed recently.
+
+        Args:
+            model: Model ID or ordered list of model IDs
+
+        Returns:
+            Model IDs to try
+
+        Raises:
+            ApiError: If no model is given
+        """
+        chain = [model] if isinstance(model, str) else list(model)
+        if not chain:
+            raise ApiError("No model configured")
+
+        available = [m for m in chain if self._circuit_breaker.allow(m)]
+        # With every circuit open, trying them all beats failing outright
+        return available or chain
+
+    def _fail_over(
+        self, model: str, error: ApiError, next_model: Optional[str]
+    ) -> None:
+        """Record a failed model and announce the fallback to the next one.
 
-    def _estimate_tokens(self, text: str) -> int:
+        Context overflows say nothing about the model's health, so they move
+        on to the next model without opening its circuit.
+
+        Args:
+            model: Model that failed
+            error: The error it failed with
+            next_model: Next model in the chain, if any
+
+        Raises:
+            ApiError: The given error, if there is nothing left to fall back to
+        """
+        if isinstance(error, DeadlineExceeded):
+            raise error
+        if not isinstance(error, ContextLengthError):
+            self._circuit_breaker.record_failure(model)
+        if next_model is None:
+            raise error
+
+        print(
+            f"{Fore.YELLOW}Warning: {model} failed, falling back to {next_model}.{Style.RESET_ALL}"
+        )
+
+    def _request_timeout(self) -> Tuple[float, Optional[float]]:
+        """Get the timeouts for the next request, clamped to the deadline.
+
+        Returns:
+            Tuple of (connect timeout, read timeout)
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed
+        """
+        return self._deadline.timeout(self._connect_timeout, self._read_timeout)
+
+    def _retry_delay(
+        self, attempt: int, retry_after: Optional[float] = None
+    ) -> Optional[float]:
+        """Get the delay before retrying a failed attempt.
+
+        Args:
+            attempt: Number of the attempt that just failed (starting at 1)
+            retry_after: Delay requested by the server, if any
+
+        Returns:
+            Seconds to wait, or None if no further attempt should be made
+        """
+        if attempt >= self._retry_policy.max_attempts:
+            return None
+        delay = self._retry_policy.delay(attempt, retry_after)
+        # Don't sleep through the rest of the budget
+        return delay if self._deadline.allows(delay) else None
+
+    def estimate_tokens(self, text: str, model: Optional[str] = None) -> int:
         """Estimate the number of tokens in a text.
 
-        Uses a simple estimation method of 4 characters per token.
+        Uses the tokenizer of the model's family, corrected by the factor
+        learned from the usage the API reported for the model.
 
         Args:
             text: The text to estimate tokens for
+            model: Model ID (None for an uncalibrated default estimate)
 
         Returns:
             Estimated token count
         """
-        # Generally 4 chars per token for English text
-        # This is an approximation - actual tokenization varies by model
-        return len(text) // 4 + 1
+        tokens = tokenizer_for(model).count(text)
+        if model is None:
+            return tokens
+        return math.ceil(tokens * self._token_calibration.factor(model))
+
+    def _record_usage(self, budget: TokenBudget, usage: Any) -> None:
+        """Calibrate token estimates against the usage reported by the API.
+
+        Args:
+            budget: Token budget of the request
+            usage: ``usage`` object of the response, if any
+        """
+        if not isinstance(usage, dict):
+            return
+        actual = usage.get("prompt_tokens")
+        # Trimmed or compressed prompts say little about the tokenizer
+        if not isinstance(actual, int) or budget.was_trimmed or budget.use_transforms:
+            return
+        self._token_calibration.record(
+            budget.model, budget.system_tokens + budget.user_tokens, actual
+        )
 
     def _fetch_model_info(self, model_id: str) -> Optional[Dict[str, Any]]:
-        """Fetch model information from OpenRouter API.
+        """Fetch model information from the cached OpenRouter model catalog.
 
         Args:
             model_id: The model identifier
@@ -72,121 +291,123 @@ class OpenRouterClient:
             Dictionary with model information or None if not found
         """
         try:
-            # Check if we have a valid cached response
-            current_time = time.time()
-            if (
-                model_id in self._models_info_cache
-                and current_time < self._cache_expiry.get(model_id, 0)
-            ):
-                return self._models_info_cache[model_id]
-
-            # Make API request to fetch model information
-            headers = {
-                "Authorization": f"Bearer {self._api_token}",
-                "HTTP-Referer": "https://github.com/quinneden/acmsg",
-                "X-Title": "acmsg",
-                "Content-Type": "application/json",
-            }
-            response = requests.get(
-                url="https://openrouter.ai/api/v1/models", headers=headers
-            )
-
-            if not response.ok:
-                return None
-
-            models_data = response.json().get("data", [])
-
-            # Find the requested model
-            model_info = None
-            for model_data in models_data:
-                if model_data.get("id", "").lower() == model_id.lower():
-                    model_info = model_data
-                    break
-
-            # If exact match not found, try partial match
-            if model_info is None:
-                for model_data in models_data:
-                    if model_id.lower() in model_data.get("id", "").lower():
-                        model_info = model_data
-                        break
-
-            # Cache the result with expiry
-            if model_info:
-                self._models_info_cache[model_id] = model_info
-                self._cache_expiry[model_id] = int(current_time + self._cache_ttl)
-
-            return model_info
+            return self._catalog.index().lookup(model_id)
         except Exception:
             return None
 
     def _get_model_context_length(self, model: str) -> int:
         """Get the context length for a given model.
 
+        A limit the API reported in an earlier overflow error takes
+        precedence over the advertised one.
+
         Args:
             model: The model identifier
 
         Returns:
             Context length in tokens
         """
+        learned = self._context_limits.get(model)
+        if learned is not None:
+            return learned
+
         # Try to get model context length from API
         model_info = self._fetch_model_info(model)
         if model_info and "context_length" in model_info:
             return int(model_info["context_length"])
 
         # Fall back to checking known model families
-        for model_family, token_limit in self.MODEL_TOKEN_LIMITS.items():
-            if model_family.lower() in model.lower():
-                return token_limit
+        return self._get_family_token_limit(model)
 
-        # Default if no specific model is matched
-        return self.MODEL_TOKEN_LIMITS["default"]
+    def _get_family_token_limit(self, model: str) -> int:
+        """Get the context length of the known model family a model belongs to.
 
-    def _get_estimated_token_counts(
-        self, model: str, system_prompt: str, user_prompt: str
-    ) -> Tuple[int, int, int, int]:
-        """Get estimated token counts for the prompts.
+        Resolved limits are memoized per model ID.
+
+        Args:
+            model: The model identifier
+
+        Returns:
+            Context length in tokens
+        """
+        token_limit = self._family_limits.get(model)
+        if token_limit is None:
+            model_lower = model.lower()
+            token_limit = next(
+                (
+                    limit
+                    for model_family, limit in self.MODEL_TOKEN_LIMITS.items()
+                    if model_family.lower() in model_lower
+                ),
+                # Default if no specific model is matched
+                self.MODEL_TOKEN_LIMITS["default"],
+            )
+            self._family_limits[model] = token_limit
+        return token_limit
+
+    def plan_budget(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        context_length: Optional[int] = None,
+    ) -> TokenBudget:
+        """Plan the token budget of a request.
 
         Args:
             model: Model ID
             system_prompt: System prompt
             user_prompt: User prompt
+            context_length: Context length to plan for (defaults to the model's)
 
         Returns:
-            Tuple of (context_length, system_tokens, user_tokens, total_estimated_tokens)
+            Token budget deciding trimming, transforms and the response size
         """
-        # Get the context length for this model
-        context_length = self._get_model_context_length(model)
+        if context_length is None:
+            context_length = self._get_model_context_length(model)
+        return TokenBudget.plan(
+            model,
+            context_length,
+            system_prompt,
+            user_prompt,
+            lambda text: self.estimate_tokens(text, model),
+            max_tokens=self._max_tokens,
+        )
 
-        # Estimate tokens
-        system_tokens = self._estimate_tokens(system_prompt)
-        user_tokens = self._estimate_tokens(user_prompt)
+    def _learn_context_error(
+        self, budget: TokenBudget, input_tokens: int, context_length: int
+    ) -> None:
+        """Learn the true limits of a model from a context overflow error.
 
-        # Add extra tokens for message formatting (role markers, etc.)
-        total_estimated_tokens = system_tokens + user_tokens + 200
+        The reported context length is remembered for the model, and if the
+        input was underestimated, the model's token estimates are corrected
+        by the full observed ratio rather than a smoothed step, so that a
+        re-planned request fits.
 
-        return context_length, system_tokens, user_tokens, total_estimated_tokens
+        Args:
+            budget: Token budget of the failed request
+            input_tokens: Input size reported by the API
+            context_length: Context length reported by the API
+        """
+        self._context_limits.record(budget.model, context_length)
+        estimated = budget.system_tokens + budget.user_tokens
+        if input_tokens > estimated:
+            self._token_calibration.record(
+                budget.model, estimated, input_tokens, smoothing=1.0
+            )
 
-    def _should_use_transforms(
-        self, model: str, system_prompt: str, user_prompt: str
-    ) -> bool:
-        """Determine if we should use transforms for this request.
+    def _warn_context_retry(self, model: str, error: ContextLengthError) -> None:
+        """Announce that a request is retried after a context overflow.
 
         Args:
             model: Model ID
-            system_prompt: System prompt
-            user_prompt: User prompt
-
-        Returns:
-            True if transforms should be used, False otherwise
+            error: The overflow error, with the counts reported by the API
         """
-        # Get token counts
-        context_length, _, _, total_estimated_tokens = self._get_estimated_token_counts(
-            model, system_prompt, user_prompt
+        print(
+            f"{Fore.YELLOW}Warning: {model} accepts {error.context_length} tokens "
+            f"but the input was {error.input_tokens}, retrying with less input.{Style.RESET_ALL}"
         )
 
-        # Return true if we're approaching the context limit
-        return total_estimated_tokens > (context_length * 0.9)
-
     def _trim_content(
         self,
         system_prompt: str,
@@ -205,58 +426,383 @@ class OpenRouterClient:
         Returns:
             Tuple of (trimmed_system_prompt, trimmed_user_prompt, was_trimmed)
         """
-        # Reserve tokens for message formatting
-        available_tokens = max_tokens - 200
+        trimmed_system, trimmed_user, _, _, was_trimmed = trim_prompts(
+            system_prompt,
+            user_prompt,
+            self.estimate_tokens(system_prompt),
+            self.estimate_tokens(user_prompt),
+            # Reserve tokens for message formatting
+            max_tokens - PROMPT_OVERHEAD_TOKENS,
+            system_max_ratio,
+        )
+        return trimmed_system, trimmed_user, was_trimmed
+
+    def _build_payload(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        stream: bool,
+    ) -> Tuple[Dict[str, Any], TokenBudget]:
+        """Build the request payload, trimming the prompts if necessary.
+
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+            stream: Whether to request a streamed response
 
-        # Estimate current token counts
-        system_tokens = self._estimate_tokens(system_prompt)
-        user_tokens = self._estimate_tokens(user_prompt)
-        total_tokens = system_tokens + user_tokens
+        Returns:
+            Tuple of (payload, token budget)
+        """
+        budget = self.plan_budget(model, system_prompt, user_prompt)
+        if budget.was_trimmed:
+            print(
+                f"{Fore.YELLOW}Warning: Input content was trimmed to fit within the model's context length.{Style.RESET_ALL}"
+            )
 
-        # If we're within limits, return as is
-        if total_tokens <= available_tokens:
-            return system_prompt, user_prompt, False
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Parse the following messages as markdown.",
+                },
+                {"role": "system", "content": budget.system_prompt},
+                {"role": "user", "content": budget.user_prompt},
+            ],
+            "stream": stream,
+            "temperature": temperature,
+        }
+        if budget.max_tokens is not None:
+            payload["max_tokens"] = budget.max_tokens
 
-        # Calculate allocation
-        max_system_tokens = min(system_tokens, int(available_tokens * system_max_ratio))
-        max_user_tokens = available_tokens - max_system_tokens
+        # Add middle-out transform in case request exceeds context limit
+        if budget.use_transforms:
+            payload["transforms"] = ["middle-out"]
 
-        trimmed_system = system_prompt
-        trimmed_user = user_prompt
+        return payload, budget
 
-        # Trim system prompt if needed, manual middle-out
-        if system_tokens > max_system_tokens:
-            keep_start = int(max_system_tokens * 0.6)
-            keep_end = max_system_tokens - keep_start
+    def _raise_api_error(
+        self,
+        error_message: str,
+        budget: TokenBudget,
+        attempts: int = 1,
+    ) -> NoReturn:
+        """Raise an ApiError describing an error reported by the API.
 
-            start_chars = keep_start * 4
-            end_chars = keep_end * 4
+        Args:
+            error_message: Error message returned by the API
+            budget: Token budget of the failed request
+            attempts: Number of attempts made before giving up
 
-            trimmed_system = (
-                system_prompt[:start_chars]
-                + "\n\n[...content trimmed due to length constraints...]\n\n"
-                + system_prompt[-end_chars:]
+        Raises:
+            ApiError: Always
+        """
+        # Check for context length error
+        if "longer than the model's context length" in error_message:
+            # Prefer the counts reported by the API over our own estimates
+            input_tokens_match = re.search(r"input \((\d+) tokens\)", error_message)
+            context_length_match = re.search(
+                r"context length \((\d+) tokens\)", error_message
+            )
+            reported = bool(input_tokens_match and context_length_match)
+            input_tokens = (
+                int(input_tokens_match.group(1))
+                if input_tokens_match
+                else budget.prompt_tokens
+            )
+            context_length = (
+                int(context_length_match.group(1))
+                if context_length_match
+                else budget.context_length
+            )
+            tokens_exceed = input_tokens - context_length
+            if reported:
+                self._learn_context_error(budget, input_tokens, context_length)
+
+            # Notify user if both transforms and trimming were tried
+            transform_note = ""
+            if budget.use_transforms:
+                transform_note = " Even with content compression enabled,"
+                if budget.was_trimmed:
+                    transform_note += " and after automatic content trimming,"
+                transform_note += " the request exceeded the models context limit."
+
+            # Remove prefix from model name for display
+            model_display = budget.model.split("/")[-1]
+
+            raise ContextLengthError(
+                f"{Fore.RED}Context length exceeded for {model_display}:{Style.RESET_ALL}{transform_note} "
+                f"Input is {input_tokens} tokens, but model only supports {context_length} tokens "
+                f"(exceeding by {tokens_exceed} tokens). "
+                f"Try splitting your staged changes into multiple smaller commits, or use a model "
+                f"with a larger context size.",
+                input_tokens=input_tokens if reported else None,
+                context_length=context_length if reported else None,
             )
 
-        # Trim user prompt if needed
-        if user_tokens > max_user_tokens:
-            keep_start = int(max_user_tokens * 0.7)
-            keep_end = max_user_tokens - keep_start
+        # Generic error fallback
+        raise ApiError(
+            f"{Fore.RED}API request failed{describe_attempts(attempts)}:{Style.RESET_ALL}\n{error_message}"
+        )
 
-            start_chars = keep_start * 4
-            end_chars = keep_end * 4
+    def _parse_completion(
+        self,
+        ok: bool,
+        response_json: Dict[str, Any],
+        response_text: str,
+        budget: TokenBudget,
+        attempts: int = 1,
+    ) -> str:
+        """Extract the generated text from a non-streamed response.
+
+        Args:
+            ok: Whether the HTTP status indicated success
+            response_json: Decoded response body
+            response_text: Raw response body, used as a fallback error message
+            budget: Token budget of the request
+            attempts: Number of attempts made to get the response
 
-            trimmed_user = (
-                user_prompt[:start_chars]
-                + "\n\n[...content trimmed due to length constraints...]\n\n"
-                + user_prompt[-end_chars:]
+        Returns:
+            Generated text
+
+        Raises:
+            ApiError: If the response reports an error or is malformed
+        """
+        # Check for API & HTTP errors
+        if not ok or "error" in response_json:
+            error_info = response_json.get("error", {})
+            error_message = error_info.get("message", response_text)
+            self._raise_api_error(error_message, budget, attempts)
+
+        if "choices" not in response_json or not response_json["choices"]:
+            raise ApiError(
+                f"{Fore.RED}API returned unexpected response format:{Style.RESET_ALL}\n{response_json}"
             )
 
-        return trimmed_system, trimmed_user, True
+        self._record_usage(budget, response_json.get("usage"))
+        return response_json["choices"][0]["message"]["content"]
+
+    def _parse_stream_event(self, data: str, budget: TokenBudget) -> Optional[str]:
+        """Extract the text delta from one server-sent event.
+
+        Args:
+            data: Event payload
+            budget: Token budget of the request
+
+        Returns:
+            Text delta, or None if the event carries no content
+
+        Raises:
+            ApiError: If the event reports an error
+        """
+        event = json.loads(data)
+        if "error" in event:
+            error_info = event["error"]
+            self._raise_api_error(error_info.get("message", data), budget)
+
+        # The final event of a stream reports the token usage
+        self._record_usage(budget, event.get("usage"))
+        choices = event.get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content") or None
+
+
+class OpenRouterClient(BaseOpenRouterClient):
+    """Client for interacting with the OpenRouter API."""
+
+    def __init__(
+        self,
+        api_token: str,
+        session: Optional[requests.Session] = None,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        catalog_ttl: int = DEFAULT_MODEL_CACHE_TTL,
+        api_endpoint: str = API_ENDPOINT,
+        retry_policy: Optional[RetryPolicy] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+        deadline: Optional[Deadline] = None,
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+        hedge_policy: Optional[HedgePolicy] = None,
+        hedge_stats: Optional[HedgeStats] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        token_calibration: Optional[TokenCalibration] = None,
+        context_limits: Optional[ContextLimits] = None,
+    ):
+        """Initialize the OpenRouter API client.
+
+        Every request made by the client goes through a single pooled,
+        keep-alive session. Unless a session or pool sizes are given, the
+        process-wide shared session is used so that connections survive
+        across client instances.
+
+        Args:
+            api_token: OpenRouter API token
+            session: Session to send requests through (not closed by the client)
+            pool_connections: Number of per-host pools for a dedicated session
+            pool_maxsize: Maximum pooled connections per host for a dedicated session
+            catalog_ttl: Seconds before the cached model catalog is revalidated
+            api_endpoint: Chat completions endpoint URL
+            retry_policy: Policy for retrying transient failures
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait between bytes of a response
+            deadline: Time budget shared by every request the client makes
+            max_tokens: Maximum number of tokens the model may generate
+            hedge_policy: Policy for hedging slow requests (disabled if None)
+            hedge_stats: Store for latency samples and hedge outcomes
+            circuit_breaker: Tracker of recently failed models to skip
+            token_calibration: Correction factors for token estimates
+            context_limits: Context lengths learned from overflow errors
+        """
+        self._owns_session = False
+        self._hedge_policy = hedge_policy
+        self._hedge_stats = hedge_stats or HedgeStats()
+        if session is not None:
+            self._session = session
+        elif pool_connections is not None or pool_maxsize is not None:
+            if pool_connections is None:
+                pool_connections = HTTP_POOL_CONNECTIONS
+            if pool_maxsize is None:
+                pool_maxsize = HTTP_POOL_MAXSIZE
+            self._session = create_session(pool_connections, pool_maxsize)
+            self._owns_session = True
+        else:
+            self._session = get_shared_session()
+        super().__init__(
+            api_token,
+            self._session,
+            catalog_ttl,
+            api_endpoint,
+            retry_policy,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            deadline=deadline,
+            max_tokens=max_tokens,
+            circuit_breaker=circuit_breaker,
+            token_calibration=token_calibration,
+            context_limits=context_limits,
+        )
+
+    def __enter__(self) -> "OpenRouterClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """Get the HTTP session used for all requests.
+
+        Returns:
+            Pooled requests session
+        """
+        return self._session
+
+    @property
+    def hedge_stats(self) -> HedgeStats:
+        """Get the latency samples and hedge outcomes recorded by the client.
+
+        Returns:
+            Hedge statistics
+        """
+        return self._hedge_stats
+
+    def close(self) -> None:
+        """Release the client's connection pool if it owns one."""
+        if self._owns_session:
+            self._session.close()
+
+    def _post(self, payload: Dict[str, Any], stream: bool) -> requests.Response:
+        """Send a completion request.
+
+        Args:
+            payload: Request payload
+            stream: Whether to stream the response body
+
+        Returns:
+            HTTP response
+        """
+        headers = {"Authorization": f"Bearer {self._api_token}"}
+        return self._session.post(
+            url=self._api_endpoint,
+            headers=headers,
+            data=json.dumps(payload),
+            stream=stream,
+            timeout=self._request_timeout(),
+        )
+
+    def _send(
+        self,
+        payload: Dict[str, Any],
+        stream: bool,
+        cancellation: Optional[Cancellation] = None,
+    ) -> Tuple[requests.Response, int]:
+        """Send a completion request, retrying transient failures.
+
+        Args:
+            payload: Request payload
+            stream: Whether to stream the response body
+            cancellation: Cancellation of the request, if it is hedged
+
+        Returns:
+            Tuple of (response, number of attempts made)
+
+        Raises:
+            ApiError: If the API cannot be reached, or the request was cancelled
+            DeadlineExceeded: If the deadline passes before a response arrives
+        """
+        policy = self._retry_policy
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if cancellation is not None and cancellation.cancelled:
+                raise ApiError("Request cancelled")
+            try:
+                response = self._post(payload, stream=stream)
+            except requests.RequestException as e:
+                self._deadline.check("waiting for the API")
+                delay = (
+                    self._retry_delay(attempt)
+                    if policy.is_retryable_exception(e)
+                    else None
+                )
+                if delay is not None:
+                    self._sleep(delay, cancellation)
+                    continue
+                raise ApiError(
+                    f"Failed to connect to OpenRouter API{describe_attempts(attempt)}: {e}"
+                )
+
+            if policy.is_retryable_status(response.status_code):
+                delay = self._retry_delay(
+                    attempt, parse_retry_after(response.headers.get("Retry-After"))
+                )
+                if delay is not None:
+                    response.close()
+                    self._sleep(delay, cancellation)
+                    continue
+
+            if cancellation is not None and not cancellation.attach(response):
+                raise ApiError("Request cancelled")
+            return response, attempt
+
+    @staticmethod
+    def _sleep(delay: float, cancellation: Optional[Cancellation]) -> None:
+        """Wait before a retry, waking early if the request is cancelled."""
+        if cancellation is None:
+            time.sleep(delay)
+        else:
+            cancellation.wait(delay)
 
     def generate_completion(
         self,
-        model: str,
+        model: ModelChain,
         system_prompt: str,
         user_prompt: str,
         temperature: float,
@@ -264,135 +810,332 @@ class OpenRouterClient:
     ) -> str:
         """Generate a completion using the OpenRouter API.
 
+        Given several models, each is tried in order until one succeeds.
+
         Args:
-            model: Model ID to use for generation
+            model: Model ID, or ordered list of model IDs, to use for generation
             system_prompt: System prompt for the model
             user_prompt: User prompt for the model
             temperature: Temperature for the model
-            stream: Whether to stream the response
+            stream: Whether to stream the response (chunks are joined)
 
         Returns:
             Generated text
 
         Raises:
-            ApiError: If the API request fails
+            ApiError: If the API request fails for every model
         """
-        # Get token estimates and context length
-        context_length, system_tokens, user_tokens, total_tokens = (
-            self._get_estimated_token_counts(model, system_prompt, user_prompt)
-        )
-
-        # Check if manual trimming is needed (if we're over context length even with transforms)
-        trimmed_system_prompt, trimmed_user_prompt, was_trimmed = (
-            system_prompt,
-            user_prompt,
-            False,
-        )
-        if total_tokens > context_length:
-            # Try to trim content to fit within context length
-            trimmed_system_prompt, trimmed_user_prompt, was_trimmed = (
-                self._trim_content(system_prompt, user_prompt, context_length)
+        # Hedging races on the first token, which needs a streamed response
+        if stream or self._hedge_policy is not None:
+            return "".join(
+                self.stream_completion(model, system_prompt, user_prompt, temperature)
             )
 
-            if was_trimmed:
-                print(
-                    f"{Fore.YELLOW}Warning: Input content was trimmed to fit within the model's context length.{Style.RESET_ALL}"
+        chain = self._model_chain(model)
+        for position, candidate in enumerate(chain):
+            try:
+                result = self._complete(
+                    candidate, system_prompt, user_prompt, temperature
                 )
+            except ApiError as e:
+                next_model = chain[position + 1] if position + 1 < len(chain) else None
+                self._fail_over(candidate, e, next_model)
+                continue
 
-        payload = {
-            "model": model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Parse the following messages as markdown.",
-                },
-                {"role": "system", "content": trimmed_system_prompt},
-                {"role": "user", "content": trimmed_user_prompt},
-            ],
-            "stream": stream,
-            "temperature": temperature,
-        }
+            self._circuit_breaker.record_success(candidate)
+            return result
 
-        # Add middle-out transform in case request exceeds context limit
-        if self._should_use_transforms(
-            model, trimmed_system_prompt, trimmed_user_prompt
-        ):
-            payload["transforms"] = ["middle-out"]
+        raise ApiError("No model could generate a completion")
 
-        headers = {"Authorization": f"Bearer {self._api_token}"}
+    def _complete(
+        self, model: str, system_prompt: str, user_prompt: str, temperature: float
+    ) -> str:
+        """Generate a non-streamed completion with a single model.
 
-        try:
-            response = requests.post(
-                url=self._api_endpoint,
-                headers=headers,
-                data=json.dumps(payload),
+        A context overflow that reports the model's true limits is retried
+        once, with the request re-planned from those limits.
+
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Returns:
+            Generated text
+
+        Raises:
+            ApiError: If the API request fails
+        """
+        retried = False
+        while True:
+            payload, budget = self._build_payload(
+                model, system_prompt, user_prompt, temperature, stream=False
             )
 
-            response_json = response.json()
-
-            # Check for API & HTTP errors
-            if not response.ok or "error" in response_json:
-                error_data = response_json
-                error_info = error_data.get("error", {})
-                error_message = error_info.get("message", response.text)
-
-                # Check for context length error
-                if "longer than the model's context length" in error_message:
-                    try:
-                        # Try to parse token counts from the error message
-                        input_tokens_match = re.search(
-                            r"input \((\d+) tokens\)", error_message
-                        )
-                        context_length_match = re.search(
-                            r"context length \((\d+) tokens\)", error_message
-                        )
-
-                        if input_tokens_match and context_length_match:
-                            input_tokens = int(input_tokens_match.group(1))
-                            context_length = int(context_length_match.group(1))
-                            tokens_exceed = input_tokens - context_length
-
-                            # Notify user if both transforms and trimming were tried
-                            transform_note = ""
-                            if "transforms" in payload:
-                                transform_note = (
-                                    " Even with content compression enabled,"
-                                )
-                                if was_trimmed:
-                                    transform_note += (
-                                        " and after automatic content trimming,"
-                                    )
-                                transform_note += (
-                                    " the request exceeded the models context limit."
-                                )
-
-                            # Remove prefix from model name for display
-                            model_display = (
-                                model.split("/")[-1] if "/" in model else model
-                            )
-
-                            raise ApiError(
-                                f"{Fore.RED}Context length exceeded for {model_display}:{Style.RESET_ALL}{transform_note} "
-                                f"Input is {input_tokens} tokens, but model only supports {context_length} tokens "
-                                f"(exceeding by {tokens_exceed} tokens). "
-                                f"Try splitting your staged changes into multiple smaller commits, or use a model "
-                                f"with a larger context size."
-                            )
-                    except (AttributeError, ValueError):
-                        pass
-
-                # Generic error fallback
-                raise ApiError(
-                    f"{Fore.RED}API request failed:{Style.RESET_ALL}\n{error_message}"
+            response, attempts = self._send(payload, stream=False)
+
+            try:
+                return self._parse_completion(
+                    response.ok,
+                    response.json(),
+                    response.text,
+                    budget,
+                    attempts,
                 )
+            except ContextLengthError as e:
+                if retried or e.context_length is None:
+                    raise
+                retried = True
+                self._warn_context_retry(model, e)
+            except requests.RequestException as e:
+                self._deadline.check("reading the response")
+                raise ApiError(f"Failed to connect to OpenRouter API: {e}")
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                raise ApiError(f"Failed to parse API response: {e}")
+
+    def stream_completion(
+        self,
+        model: ModelChain,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+    ) -> Generator[str, None, None]:
+        """Generate a completion, yielding text chunks as they arrive.
 
-            if "choices" not in response_json or not response_json["choices"]:
-                raise ApiError(
-                    f"{Fore.RED}API returned unexpected response format:{Style.RESET_ALL}\n{response_json}"
+        The response is consumed as server-sent events. Closing the returned
+        generator early closes the underlying connection. With a hedge policy,
+        a slow request is raced against a hedge request as well. Given several
+        models, the next one is tried if a model fails before its first chunk.
+
+        Args:
+            model: Model ID, or ordered list of model IDs, to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Yields:
+            Generated text chunks
+
+        Raises:
+            ApiError: If the API request fails for every model
+        """
+        chain = self._model_chain(model)
+        for position, candidate in enumerate(chain):
+            try:
+                chunks, first = self._open_stream(
+                    candidate, system_prompt, user_prompt, temperature
                 )
+            except ApiError as e:
+                next_model = chain[position + 1] if position + 1 < len(chain) else None
+                self._fail_over(candidate, e, next_model)
+                continue
+
+            self._circuit_breaker.record_success(candidate)
+            try:
+                if first is not None:
+                    yield first
+                    yield from chunks
+            finally:
+                chunks.close()
+            return
+
+    def _open_stream(
+        self, model: str, system_prompt: str, user_prompt: str, temperature: float
+    ) -> Tuple[Generator[str, None, None], Optional[str]]:
+        """Stream a completion from a single model up to its first chunk.
+
+        A context overflow that reports the model's true limits is retried
+        once, with the request re-planned from those limits.
+
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Returns:
+            Tuple of (iterator over the remaining chunks, first chunk or None)
+
+        Raises:
+            ApiError: If the API request fails before the first chunk
+        """
+        retried = False
+        while True:
+            chunks = self._stream_model(model, system_prompt, user_prompt, temperature)
+            try:
+                return chunks, next(chunks, None)
+            except ContextLengthError as e:
+                if retried or e.context_length is None:
+                    raise
+                retried = True
+                self._warn_context_retry(model, e)
+
+    def _stream_model(
+        self, model: str, system_prompt: str, user_prompt: str, temperature: float
+    ) -> Generator[str, None, None]:
+        """Stream a completion from a single model, hedging if configured.
 
-            return response_json["choices"][0]["message"]["content"]
+        Args:
+            model: Model ID to use for generation
+            system_prompt: System prompt for the model
+            user_prompt: User prompt for the model
+            temperature: Temperature for the model
+
+        Returns:
+            Iterator over the generated text chunks
+        """
+        payload, budget = self._build_payload(
+            model, system_prompt, user_prompt, temperature, stream=True
+        )
+
+        policy = self._hedge_policy
+        if policy is None:
+            return self._stream_payload(payload, budget)
+
+        hedge_model = policy.model or model
+        if hedge_model == model:
+            hedge_payload, hedge_budget = dict(payload), budget
+        else:
+            hedge_payload, hedge_budget = self._build_payload(
+                hedge_model, system_prompt, user_prompt, temperature, stream=True
+            )
+        if policy.provider:
+            hedge_payload["provider"] = {
+                "order": [policy.provider],
+                "allow_fallbacks": False,
+            }
+
+        return self._hedged_stream(
+            [(payload, budget), (hedge_payload, hedge_budget)],
+            policy.delay_for(model, self._hedge_stats),
+        )
+
+    def _stream_payload(
+        self,
+        payload: Dict[str, Any],
+        budget: TokenBudget,
+        cancellation: Optional[Cancellation] = None,
+    ) -> Generator[str, None, None]:
+        """Send a streamed completion request and yield its text chunks.
+
+        Args:
+            payload: Request payload
+            budget: Token budget the payload was built from
+            cancellation: Cancellation of the request, if it is hedged
+
+        Yields:
+            Generated text chunks
+
+        Raises:
+            ApiError: If the API request fails
+        """
+        response, attempts = self._send(payload, stream=True, cancellation=cancellation)
+
+        try:
+            content_type = response.headers.get("Content-Type", "")
+            if not response.ok or "text/event-stream" not in content_type:
+                # Errors (and servers that ignore `stream`) reply with plain JSON
+                yield self._parse_completion(
+                    response.ok,
+                    response.json(),
+                    response.text,
+                    budget,
+                    attempts,
+                )
+                return
+
+            for data in iter_sse_data(response.iter_lines()):
+                # The read timeout only bounds each chunk, not the whole stream
+                self._deadline.check("streaming the response")
+                content = self._parse_stream_event(data, budget)
+                if content:
+                    yield content
         except requests.RequestException as e:
+            self._deadline.check("streaming the response")
             raise ApiError(f"Failed to connect to OpenRouter API: {e}")
         except (KeyError, ValueError, json.JSONDecodeError) as e:
             raise ApiError(f"Failed to parse API response: {e}")
+        finally:
+            response.close()
+
+    def _hedged_stream(
+        self, attempts: List[Tuple[Dict[str, Any], TokenBudget]], delay: float
+    ) -> Generator[str, None, None]:
+        """Race a primary request against a delayed hedge request.
+
+        Each request streams in its own daemon thread. The hedge request is
+        only sent if the primary has not produced its first chunk within the
+        hedge delay; the first request to produce a chunk wins and the other
+        is cancelled, which shuts down its connection.
+
+        Args:
+            attempts: Payload and token budget of the primary and hedge requests
+            delay: Seconds to wait for the primary before sending the hedge
+
+        Yields:
+            Generated text chunks of the winning request
+
+        Raises:
+            ApiError: If the winning request fails, or both requests fail
+        """
+        events: "queue.Queue[Tuple[int, str, Any]]" = queue.Queue()
+        cancellations = [Cancellation() for _ in attempts]
+        started: List[float] = []
+
+        def run(index: int) -> None:
+            chunks = self._stream_payload(*attempts[index], cancellations[index])
+            try:
+                for chunk in chunks:
+                    if cancellations[index].cancelled:
+                        return
+                    events.put((index, "chunk", chunk))
+                events.put((index, "done", None))
+            except Exception as e:
+                events.put((index, "error", e))
+            finally:
+                chunks.close()
+
+        def launch() -> None:
+            started.append(time.monotonic())
+            threading.Thread(target=run, args=(len(started) - 1,), daemon=True).start()
+
+        hedge_at = time.monotonic() + delay
+        errors: Dict[int, BaseException] = {}
+        launch()
+
+        try:
+            while True:
+                hedged = len(started) > 1
+                timeout = None if hedged else max(0.0, hedge_at - time.monotonic())
+                try:
+                    index, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    launch()
+                    continue
+
+                if kind != "error":
+                    break
+                errors[index] = value
+                if len(errors) == len(started):
+                    raise errors[0]
+
+            winner = index
+            # A loser is cut off before its first chunk, so its elapsed time
+            # would understate its latency and pull the hedge delay down
+            latency = (attempts[winner][0]["model"], time.monotonic() - started[winner])
+            for i, cancellation in enumerate(cancellations):
+                if i != winner:
+                    cancellation.cancel()
+            self._hedge_stats.record([latency], hedged, hedge_won=winner == 1)
+
+            while kind != "done":
+                if kind == "error":
+                    raise value
+                yield value
+                index, kind, value = events.get()
+                while index != winner:
+                    index, kind, value = events.get()
+        finally:
+            for cancellation in cancellations:
+                cancellation.cancel()
@@ -0,0 +1,174 @@
+"""Retry policy for OpenRouter API requests."""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Mapping, Optional
+
+import requests
+
+from ..constants import (
+    DEFAULT_RETRY_BACKOFF_BASE,
+    DEFAULT_RETRY_BACKOFF_CAP,
+    DEFAULT_RETRY_MAX_ATTEMPTS,
+    RETRYABLE_STATUS_CODES,
+)
+from ..exceptions import ConfigError
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header.
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+
+    Returns:
+        Number of seconds to wait, or None if absent or malformed
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Exponential backoff policy for transient API failures.
+
+    Only failures where the request is known not to have been processed are
+    retried: connection errors raised before a response, request timeouts,
+    rate limiting and gateway/availability errors. Read timeouts and other
+    server errors are not retried, because the completion may already have
+    been generated (and billed).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_RETRY_MAX_ATTEMPTS,
+        backoff_base: float = DEFAULT_RETRY_BACKOFF_BASE,
+        backoff_cap: float = DEFAULT_RETRY_BACKOFF_CAP,
+        jitter: bool = True,
+    ):
+        """Initialize the retry policy.
+
+        Args:
+            max_attempts: Total number of attempts, including the first one
+            backoff_base: Delay in seconds before the first retry
+            backoff_cap: Maximum delay in seconds between attempts
+            jitter: Randomize delays ("full jitter") to spread out retries
+
+        Raises:
+            ConfigError: If a value is out of range
+        """
+        if max_attempts < 1:
+            raise ConfigError(f"max_attempts must be at least 1, got {max_attempts}")
+        if backoff_base < 0 or backoff_cap < 0:
+            raise ConfigError("Retry backoff values must not be negative")
+
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, data: Optional[Mapping[str, Any]]) -> "RetryPolicy":
+        """Create a retry policy from a config mapping.
+
+        Args:
+            data: Mapping with any of ``max_attempts``, ``backoff_base``,
+                ``backoff_cap`` and ``jitter``
+
+        Returns:
+            Retry policy with defaults for missing keys
+
+        Raises:
+            ConfigError: If the mapping is invalid
+        """
+        if data is None:
+            return cls()
+        if not isinstance(data, Mapping):
+            raise ConfigError(f"retry must be a mapping, got {data!r}")
+
+        unknown = set(data) - {"max_attempts", "backoff_base", "backoff_cap", "jitter"}
+        if unknown:
+            raise ConfigError(f"Unknown retry options: {', '.join(sorted(unknown))}")
+
+        try:
+            return cls(
+                max_attempts=int(data.get("max_attempts", DEFAULT_RETRY_MAX_ATTEMPTS)),
+                backoff_base=float(
+                    data.get("backoff_base", DEFAULT_RETRY_BACKOFF_BASE)
+                ),
+                backoff_cap=float(data.get("backoff_cap", DEFAULT_RETRY_BACKOFF_CAP)),
+                jitter=bool(data.get("jitter", True)),
+            )
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"Invalid retry configuration: {e}")
+
+    def is_retryable_status(self, status_code: Any) -> bool:
+        """Check whether an HTTP status is worth retrying.
+
+        Args:
+            status_code: HTTP status code of the response
+
+        Returns:
+            True if the request can safely be retried
+        """
+        return status_code in RETRYABLE_STATUS_CODES
+
+    def is_retryable_exception(self, error: BaseException) -> bool:
+        """Check whether a transport error is worth retrying.
+
+        Args:
+            error: Exception raised while sending the request
+
+        Returns:
+            True if the request can safely be retried
+        """
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        if isinstance(error, requests.Timeout):
+            # Read timeouts may have reached the model already
+            return False
+        return isinstance(error, requests.ConnectionError)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Compute how long to wait before the next attempt.
+
+        Args:
+            attempt: Number of the attempt that just failed (starting at 1)
+            retry_after: Delay requested by the server, if any
+
+        Returns:
+            Seconds to wait
+        """
+        backoff = min(self.backoff_cap, self.backoff_base * (2 ** (attempt - 1)))
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+        if retry_after is not None:
+            # Honour the server's request, even beyond our own cap
+            return max(backoff, retry_after)
+        return backoff
+
+
+def describe_attempts(attempts: int) -> str:
+    """Describe how many attempts were made, for error messages.
+
+    Args:
+        attempts: Number of attempts made
+
+    Returns:
+        A suffix such as `` (after 3 attempts)``, or an empty string
+    """
+    return f" (after {attempts} attempts)" if attempts > 1 else ""
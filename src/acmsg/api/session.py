@@ -0,0 +1,63 @@
+"""Pooled HTTP sessions shared by the API clients."""
+
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..constants import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def create_session(
+    pool_connections: int = HTTP_POOL_CONNECTIONS,
+    pool_maxsize: int = HTTP_POOL_MAXSIZE,
+    pool_block: bool = False,
+) -> requests.Session:
+    """Create a keep-alive HTTP session backed by a connection pool.
+
+    Args:
+        pool_connections: Number of per-host connection pools to cache
+        pool_maxsize: Maximum number of connections kept alive per host
+        pool_block: Whether to block when the pool has no free connection
+
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """Get the process-wide session, creating it on first use.
+
+    Returns:
+        Session shared by every client that was not given its own
+    """
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+def close_shared_session() -> None:
+    """Close the process-wide session and release its pooled connections."""
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is not None:
+            _shared_session.close()
+            _shared_session = None
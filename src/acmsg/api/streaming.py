@@ -0,0 +1,107 @@
+"""Server-sent event parsing for streamed API responses."""
+
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Union
+
+
+class SSEDecoder:
+    """Incremental decoder for a server-sent event stream.
+
+    Multi-line ``data`` fields are joined with newlines, comment lines (such
+    as OpenRouter's ``: OPENROUTER PROCESSING`` keep-alives) and other fields
+    are ignored, and the stream ends at the ``[DONE]`` sentinel.
+    """
+
+    def __init__(self):
+        """Initialize the decoder."""
+        self._data_lines: list[str] = []
+        self.done = False
+
+    def decode(self, raw_line: Union[str, bytes]) -> Optional[str]:
+        """Feed one line of the response body.
+
+        Args:
+            raw_line: Line without its terminator
+
+        Returns:
+            The ``data`` payload if the line completed an event, else None
+        """
+        line = (
+            raw_line.decode("utf-8", errors="replace")
+            if isinstance(raw_line, bytes)
+            else raw_line
+        )
+        line = line.rstrip("\r")
+
+        if not line:
+            # A blank line dispatches the buffered event
+            return self.flush()
+
+        if not line.startswith(":"):
+            field, _, value = line.partition(":")
+            if field == "data":
+                self._data_lines.append(value[1:] if value.startswith(" ") else value)
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Dispatch the buffered event, if any.
+
+        Returns:
+            The buffered ``data`` payload, or None
+        """
+        if not self._data_lines:
+            return None
+
+        data = "\n".join(self._data_lines)
+        self._data_lines = []
+        if data == "[DONE]":
+            self.done = True
+            return None
+        return data
+
+
+def iter_sse_data(lines: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """Parse a server-sent event stream into event payloads.
+
+    Args:
+        lines: Lines of the response body, without line terminators
+
+    Yields:
+        The ``data`` payload of each event
+    """
+    decoder = SSEDecoder()
+
+    for line in lines:
+        data = decoder.decode(line)
+        if decoder.done:
+            return
+        if data is not None:
+            yield data
+
+    data = decoder.flush()
+    if data is not None:
+        yield data
+
+
+async def aiter_sse_data(
+    lines: AsyncIterable[Union[str, bytes]],
+) -> AsyncIterator[str]:
+    """Parse an asynchronous server-sent event stream into event payloads.
+
+    Args:
+        lines: Lines of the response body, without line terminators
+
+    Yields:
+        The ``data`` payload of each event
+    """
+    decoder = SSEDecoder()
+
+    async for line in lines:
+        data = decoder.decode(line)
+        if decoder.done:
+            return
+        if data is not None:
+            yield data
+
+    data = decoder.flush()
+    if data is not None:
+        yield data
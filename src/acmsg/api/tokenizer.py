@@ -0,0 +1,257 @@
+"""Token count estimation with per-model calibration."""
+
+import hashlib
+import string
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..constants import (
+    TOKENIZER_CACHE_SIZE,
+    TOKENIZER_CALIBRATION_FILENAME,
+    TOKENIZER_CALIBRATION_MIN_TOKENS,
+    TOKENIZER_CALIBRATION_SMOOTHING,
+    TOKENIZER_FACTOR_RANGE,
+)
+from ..storage import get_cache_dir, read_json, write_json
+
+# Approximate characters per token of plain ASCII text, by model family
+FAMILY_CHARS_PER_TOKEN = {
+    "default": 4.0,
+    "gpt-3.5": 4.0,
+    "gpt-4": 4.0,
+    "gpt-4o": 4.4,
+    "claude": 3.5,
+    "gemini": 4.0,
+    "mistral": 3.6,
+    "llama": 3.6,
+    "llama-3": 4.2,
+    "qwen": 4.0,
+    "deepseek": 4.0,
+}
+
+_DELETE_SYMBOLS = str.maketrans("", "", string.punctuation)
+
+
+class Tokenizer(ABC):
+    """Interface for estimating how many tokens a text uses.
+
+    Subclasses implement ``_count``. Counts are memoized per text, so a diff
+    chunk seen in several prompts is only measured once.
+    """
+
+    def __init__(self, cache_size: int = TOKENIZER_CACHE_SIZE):
+        """Initialize the tokenizer.
+
+        Args:
+            cache_size: Number of texts whose counts are remembered
+        """
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Estimate the number of tokens in a text.
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            Estimated token count
+        """
+        # A digest rather than the text, so the cache does not keep large diffs alive
+        key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+        with self._lock:
+            tokens = self._cache.get(key)
+            if tokens is not None:
+                self._cache.move_to_end(key)
+                return tokens
+
+        tokens = self._count(text)
+        with self._lock:
+            self._cache[key] = tokens
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    @abstractmethod
+    def _count(self, text: str) -> int:
+        """Count the tokens of a text without memoization."""
+
+
+class RatioTokenizer(Tokenizer):
+    """Estimate tokens from character classes.
+
+    Plain ASCII text is counted at a fixed number of characters per token,
+    while punctuation and non-ASCII characters, which tokenizers split far
+    more finely, are counted per character.
+    """
+
+    def __init__(
+        self,
+        chars_per_token: float = 4.0,
+        symbol_tokens: float = 0.6,
+        non_ascii_tokens: float = 1.0,
+        cache_size: int = TOKENIZER_CACHE_SIZE,
+    ):
+        """Initialize the tokenizer.
+
+        Args:
+            chars_per_token: Characters per token of plain ASCII text
+            symbol_tokens: Tokens per ASCII punctuation character
+            non_ascii_tokens: Tokens per non-ASCII character
+            cache_size: Number of texts whose counts are remembered
+        """
+        super().__init__(cache_size)
+        self.chars_per_token = chars_per_token
+        self.symbol_tokens = symbol_tokens
+        self.non_ascii_tokens = non_ascii_tokens
+
+    def _count(self, text: str) -> int:
+        """Count the tokens of a text without memoization."""
+        non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+        symbols = len(text) - non_ascii - len(text.translate(_DELETE_SYMBOLS))
+        plain = len(text) - non_ascii - symbols
+        return (
+            int(
+                plain / self.chars_per_token
+                + symbols * self.symbol_tokens
+                + non_ascii * self.non_ascii_tokens
+            )
+            + 1
+        )
+
+
+_tokenizers: Dict[str, Tokenizer] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def model_family(model: str) -> str:
+    """Get the tokenizer family of a model.
+
+    Args:
+        model: Model ID
+
+    Returns:
+        The longest known family name contained in the ID, or ``default``
+    """
+    model_lower = model.lower()
+    matches = [family for family in FAMILY_CHARS_PER_TOKEN if family in model_lower]
+    return max(matches, key=len, default="default")
+
+
+def tokenizer_for(model: Optional[str]) -> Tokenizer:
+    """Get the shared tokenizer of a model's family.
+
+    Args:
+        model: Model ID (None for the default tokenizer)
+
+    Returns:
+        Tokenizer instance, shared between all models of the family
+    """
+    family = model_family(model) if model else "default"
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(family)
+        if tokenizer is None:
+            tokenizer = RatioTokenizer(FAMILY_CHARS_PER_TOKEN[family])
+            _tokenizers[family] = tokenizer
+        return tokenizer
+
+
+class TokenCalibration:
+    """Per-model correction factors learned from reported token usage.
+
+    After each response, the prompt token count reported by the API is
+    compared with the estimate and the model's factor moves towards the
+    observed ratio. The factors are stored in the cache directory so
+    estimates keep improving across runs.
+    """
+
+    def __init__(
+        self,
+        cache_file: Optional[Path] = None,
+        smoothing: float = TOKENIZER_CALIBRATION_SMOOTHING,
+        min_tokens: int = TOKENIZER_CALIBRATION_MIN_TOKENS,
+    ):
+        """Initialize the calibration store.
+
+        Args:
+            cache_file: Location of the factors file (defaults to the cache dir)
+            smoothing: Weight of a new observation, between 0 and 1
+            min_tokens: Smallest estimate worth learning from
+        """
+        self._cache_file = (
+            cache_file or get_cache_dir() / TOKENIZER_CALIBRATION_FILENAME
+        )
+        self._smoothing = smoothing
+        self._min_tokens = min_tokens
+        self._lock = threading.Lock()
+        self._factors: Optional[Dict[str, float]] = None
+
+    @property
+    def cache_file(self) -> Path:
+        """Get the path of the on-disk factors file.
+
+        Returns:
+            Path to the factors file
+        """
+        return self._cache_file
+
+    def _load(self) -> Dict[str, float]:
+        """Load the factors from disk once per instance (call with the lock held)."""
+        if self._factors is None:
+            data = read_json(self._cache_file)
+            self._factors = {
+                model: float(factor)
+                for model, factor in (data.items() if isinstance(data, dict) else [])
+                if isinstance(factor, (int, float))
+            }
+        return self._factors
+
+    def factor(self, model: str) -> float:
+        """Get the correction factor of a model's estimates.
+
+        Args:
+            model: Model ID
+
+        Returns:
+            Factor to multiply estimates by (1.0 until usage was recorded)
+        """
+        with self._lock:
+            return self._load().get(model, 1.0)
+
+    def record(
+        self,
+        model: str,
+        estimated: int,
+        actual: int,
+        smoothing: Optional[float] = None,
+    ) -> None:
+        """Learn from the token usage reported for a request and save it.
+
+        Args:
+            model: Model ID
+            estimated: Calibrated estimate of the prompt tokens
+            actual: Prompt tokens reported by the API
+            smoothing: Weight of this observation (defaults to the store's)
+        """
+        if estimated < self._min_tokens or actual <= 0:
+            return
+
+        if smoothing is None:
+            smoothing = self._smoothing
+        low, high = TOKENIZER_FACTOR_RANGE
+        with self._lock:
+            factors = self._load()
+            current = factors.get(model, 1.0)
+            target = current * actual / estimated
+            updated = current + smoothing * (target - current)
+            factors[model] = round(min(high, max(low, updated)), 4)
+            snapshot = dict(factors)
+
+        try:
+            write_json(self._cache_file, snapshot)
+        except OSError:
+            pass
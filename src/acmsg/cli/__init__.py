@@ -1,6 +1,12 @@
 """Package for command-line interface components."""
 
-from .commands import handle_commit, handle_config
+from .commands import handle_commit, handle_config, handle_models, handle_stats
 from .parsers import create_parser
 
-__all__ = ["handle_commit", "handle_config", "create_parser"]
+__all__ = [
+    "handle_commit",
+    "handle_config",
+    "handle_models",
+    "handle_stats",
+    "create_parser",
+]
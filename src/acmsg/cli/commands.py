@@ -1,20 +1,38 @@
 """CLI command handlers for acmsg."""
 
+import itertools
 import os
 import subprocess
 import sys
 import tempfile
 import threading
 import time
-from typing import Any, Union
+from typing import Any, Dict, List, Optional, Union
 
 import colorama
 from colorama import Fore, Style
 
+from ..api.catalog import ModelCatalog
+from ..api.deadline import Deadline
+from ..api.hedging import HedgeStats
+from ..api.session import get_shared_session
+from ..api.tokenizer import tokenizer_for
+from ..constants import (
+    SUMMARY_CACHE_DIR,
+    SUMMARY_CACHE_MAX_ENTRIES,
+    SYMBOL_CACHE_DIR,
+    SYMBOL_CACHE_MAX_BYTES,
+    SYMBOL_CACHE_MAX_ENTRIES,
+)
+from ..core.cache import ResponseCache
+from ..core.compaction import CompactionPolicy, compact_diff
 from ..core.config import Config
+from ..core.filters import DiffFilter
 from ..core.git import GitUtils
-from ..core.generation import CommitMessageGenerator, format_message
+from ..core.symbols import SymbolSummarizer
+from ..core.generation import CommitMessageGenerator, StreamFormatter, format_message
 from ..exceptions import AcmsgError, GitError, ApiError, ConfigError
+from ..storage import get_cache_dir
 
 colorama.init()
 
@@ -137,24 +155,167 @@ def ensure_api_token_configured(config):
     return api_token
 
 
-def generate_commit_message(repo, api_token, model, temperature):
-    """Generate a commit message and return it formatted."""
+def create_generator(
+    api_token: str,
+    model: Any,
+    temperature: float,
+    cache: Optional[ResponseCache],
+    client_options: Dict[str, Any],
+    repo: Optional[GitUtils] = None,
+) -> CommitMessageGenerator:
+    """Create a commit message generator.
+
+    Summaries of diff parts and the symbols of staged files are cached
+    next to the generated messages, and only when message caching is
+    enabled.
+
+    Args:
+        api_token: OpenRouter API token
+        model: Model ID, or ordered list of model IDs
+        temperature: Temperature to use for generation
+        cache: Cache of previously generated messages (disabled if None)
+        client_options: Extra keyword arguments for the API client
+        repo: Repository whose staged files are summarized by symbol when
+            the diff has to be cut down (not summarized if None)
+
+    Returns:
+        The generator
+    """
+    summary_cache = symbol_cache = None
+    if cache is not None:
+        summary_cache = ResponseCache(
+            get_cache_dir() / SUMMARY_CACHE_DIR,
+            max_entries=SUMMARY_CACHE_MAX_ENTRIES,
+        )
+        symbol_cache = ResponseCache(
+            get_cache_dir() / SYMBOL_CACHE_DIR,
+            max_entries=SYMBOL_CACHE_MAX_ENTRIES,
+            max_bytes=SYMBOL_CACHE_MAX_BYTES,
+        )
+    if repo is not None:
+        summarizer = SymbolSummarizer(
+            lambda: repo.files,
+            repo.blob_lines,
+            cache=symbol_cache,
+            namespace=lambda: repo.toplevel,
+        )
+        client_options = {**client_options, "symbols": summarizer.describe}
+    return CommitMessageGenerator(
+        api_token,
+        model,
+        temperature,
+        cache=cache,
+        summary_cache=summary_cache,
+        **client_options,
+    )
+
+
+def generate_commit_message(
+    repo,
+    api_token,
+    model,
+    temperature,
+    cache=None,
+    diff=None,
+    notes=None,
+    **client_options,
+):
+    """Generate a commit message and return it formatted.
+
+    The message is generated from ``diff`` if given (e.g. the staged diff
+    with generated files summarized), otherwise from the staged diff.
+    Warnings about cutting the diff down are added to ``notes``, to be
+    printed once the spinner has stopped.
+    """
     stop_spinner = threading.Event()
     spinner_thread = threading.Thread(target=spinner, args=(stop_spinner,))
     spinner_thread.start()
 
     try:
-        generator = CommitMessageGenerator(api_token, model, temperature)
-        message = generator.generate(repo.files_status, repo.diff)
+        generator = create_generator(
+            api_token, model, temperature, cache, client_options, repo
+        )
+        tree = repo.staged_tree if cache is not None else None
+        git_diff = repo.diff if diff is None else diff
+        message = generator.generate(repo.files_status, git_diff, tree=tree)
     finally:
         stop_spinner.set()
         spinner_thread.join()
         sys.stdout.write("\r" + " " * 80 + "\r")
         sys.stdout.flush()
 
+    if notes is not None:
+        notes.extend(generator.notes)
     return format_message(message)
 
 
+def stream_commit_message(
+    repo,
+    api_token,
+    model,
+    temperature,
+    cache=None,
+    diff=None,
+    notes=None,
+    **client_options,
+):
+    """Generate a commit message, printing it as it streams in.
+
+    The spinner is shown until the first chunk arrives. The message is then
+    wrapped incrementally and printed in the same layout as print_message.
+    As with generate_commit_message, ``diff`` replaces the staged diff and
+    warnings are added to ``notes``.
+
+    Returns:
+        The complete formatted commit message
+    """
+    stop_spinner = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=(stop_spinner,))
+    spinner_thread.start()
+
+    chunks = []
+    try:
+        generator = create_generator(
+            api_token, model, temperature, cache, client_options, repo
+        )
+        tree = repo.staged_tree if cache is not None else None
+        git_diff = repo.diff if diff is None else diff
+        stream = generator.generate_stream(repo.files_status, git_diff, tree=tree)
+        first_chunk = next(stream, "")
+    finally:
+        stop_spinner.set()
+        spinner_thread.join()
+        sys.stdout.write("\r" + " " * 80 + "\r")
+        sys.stdout.flush()
+
+    # The diff is cut down before the first chunk, so every warning is in
+    if notes is not None:
+        notes.extend(generator.notes)
+
+    formatter = StreamFormatter()
+    sys.stdout.write(f"\n{Fore.LIGHTBLACK_EX}Commit message:{Style.RESET_ALL}\n\n  ")
+
+    for chunk in itertools.chain([first_chunk], stream):
+        chunks.append(chunk)
+        sys.stdout.write(formatter.feed(chunk).replace("\n", "\n  "))
+        sys.stdout.flush()
+
+    sys.stdout.write(formatter.flush().replace("\n", "\n  ") + "\n\n")
+    sys.stdout.flush()
+
+    return format_message("".join(chunks))
+
+
+def print_notes(notes: List[str]) -> None:
+    """Print the warnings collected while generating a message.
+
+    Args:
+        notes: Warnings, one per line
+    """
+    for note in notes:
+        print(f"{Fore.YELLOW}{note}{Style.RESET_ALL}")
+
+
 def commit_with_message(formatted_message):
     """Execute the git commit and handle results."""
     try:
@@ -166,21 +327,100 @@ def commit_with_message(formatted_message):
         return False
 
 
+def client_options(cfg: Config, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Collect API client options from the configuration.
+
+    Args:
+        cfg: Loaded configuration
+        deadline: Time budget for the API requests
+
+    Returns:
+        Keyword arguments for the OpenRouter client
+    """
+    return {
+        "catalog_ttl": cfg.model_cache_ttl,
+        "retry_policy": cfg.retry_policy,
+        "hedge_policy": cfg.hedge_policy,
+        "deadline": deadline,
+    }
+
+
 def handle_commit(args: Any) -> None:
     """Handle the commit command."""
     try:
         cfg = Config()
+        deadline = Deadline(
+            args.deadline if args.deadline is not None else cfg.deadline
+        )
         api_token = ensure_api_token_configured(cfg)
-        model = args.model or cfg.model
+        if args.model:
+            model = [name.strip() for name in args.model.split(",") if name.strip()]
+        else:
+            model = cfg.models
         temperature = args.temperature or cfg.temperature
+        cache = None if args.no_cache else ResponseCache()
 
-        repo = GitUtils()
+        compaction = (
+            CompactionPolicy.disabled() if args.no_compact else cfg.compaction_policy
+        )
+        diff_filter = None if args.no_filter else DiffFilter(cfg.exclude)
+        repo = GitUtils(
+            max_diff_bytes=cfg.max_diff_size,
+            pathspecs=args.pathspec,
+            diff_options=compaction.git_options(),
+            prescan=True,
+            left_out=None if diff_filter is None else diff_filter.left_out,
+        )
         if not repo.files_status or not repo.diff:
             print(Fore.YELLOW + "Nothing to commit." + Style.RESET_ALL)
             sys.exit(1)
+        if repo.staged_changes.truncated:
+            print(
+                f"{Fore.YELLOW}Warning: {repo.staged_changes.describe()}{Style.RESET_ALL}"
+            )
 
-        formatted_message = generate_commit_message(repo, api_token, model, temperature)
-        print_message(formatted_message)
+        diff = None
+        if diff_filter is not None:
+            filtered = diff_filter.filter_repo(repo)
+            if filtered.changed:
+                diff = filtered.text
+                print(f"{Fore.LIGHTBLACK_EX}{filtered.describe()}{Style.RESET_ALL}")
+        if not args.no_compact:
+            compacted = compact_diff(
+                repo.diff if diff is None else diff,
+                compaction,
+                tokenizer_for(model[0]).count,
+            )
+            if compacted.saved_bytes > 0:
+                diff = compacted.text
+                print(f"{Fore.LIGHTBLACK_EX}{compacted.describe()}{Style.RESET_ALL}")
+
+        notes: List[str] = []
+        if not args.no_stream and sys.stdout.isatty():
+            formatted_message = stream_commit_message(
+                repo,
+                api_token,
+                model,
+                temperature,
+                cache=cache,
+                diff=diff,
+                notes=notes,
+                **client_options(cfg, deadline),
+            )
+            print_notes(notes)
+        else:
+            formatted_message = generate_commit_message(
+                repo,
+                api_token,
+                model,
+                temperature,
+                cache=cache,
+                diff=diff,
+                notes=notes,
+                **client_options(cfg, deadline),
+            )
+            print_notes(notes)
+            print_message(formatted_message)
 
         while True:
             user_input = prompt_for_action(formatted_message)
@@ -205,6 +445,115 @@ def handle_commit(args: Any) -> None:
         sys.exit(1)
 
 
+def format_price(price: Any) -> str:
+    """Format a per-token price as USD per million tokens.
+
+    Args:
+        price: Price per token as reported by the catalog
+
+    Returns:
+        Formatted price, or ``?`` if unknown
+    """
+    try:
+        value = float(price) * 1_000_000
+    except (TypeError, ValueError):
+        return "?"
+    return "free" if value == 0 else f"${value:.2f}"
+
+
+def handle_models(args: Any) -> None:
+    """Handle the models command.
+
+    Args:
+        args: Command line arguments
+    """
+    try:
+        cfg = Config()
+        # Nothing else runs meanwhile, so a stale catalog is revalidated first
+        catalog = ModelCatalog(
+            get_shared_session(), ttl=cfg.model_cache_ttl, background_refresh=False
+        )
+        if args.refresh:
+            catalog.refresh()
+
+        results = catalog.index().search(
+            args.query,
+            min_context=args.min_context,
+            max_prompt_price=args.max_price,
+            free_only=args.free,
+        )
+        if not results:
+            print(f"{Fore.YELLOW}No matching models found.{Style.RESET_ALL}")
+            return
+
+        shown = results[: args.limit] if args.limit > 0 else results
+        width = max(len(str(model.get("id", ""))) for model in shown)
+        print(
+            f"{Fore.LIGHTBLACK_EX}{'MODEL':<{width}}  {'CONTEXT':>9}  "
+            f"{'PROMPT/M':>9}  {'COMPL/M':>9}{Style.RESET_ALL}"
+        )
+        for model in shown:
+            pricing = model.get("pricing") or {}
+            print(
+                f"{str(model.get('id', '')):<{width}}  "
+                f"{model.get('context_length') or '?':>9}  "
+                f"{format_price(pricing.get('prompt')):>9}  "
+                f"{format_price(pricing.get('completion')):>9}"
+            )
+        if len(shown) < len(results):
+            print(
+                f"{Fore.LIGHTBLACK_EX}... {len(results) - len(shown)} more "
+                f"(use --limit 0 to show all){Style.RESET_ALL}"
+            )
+    except ConfigError as e:
+        print(f"{Fore.RED}Configuration error: {e}{Style.RESET_ALL}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"{Fore.RED}Unexpected error: {e}{Style.RESET_ALL}")
+        sys.exit(1)
+
+
+def handle_stats(args: Any) -> None:
+    """Handle the stats command.
+
+    Args:
+        args: Command line arguments
+    """
+    try:
+        stats = HedgeStats()
+        summary = stats.summary()
+        if not summary["requests"]:
+            print(f"{Fore.YELLOW}No hedged requests recorded yet.{Style.RESET_ALL}")
+            return
+
+        print(f"Requests:   {summary['requests']}")
+        print(f"Hedged:     {summary['hedged']} ({summary['hedge_rate']:.0%})")
+        print(
+            f"Hedge wins: {summary['hedge_wins']} "
+            f"({summary['win_rate']:.0%} of hedged requests)"
+        )
+
+        models = stats.models()
+        if not models:
+            return
+        width = max(len(model) for model in models)
+        print(
+            f"\n{Fore.LIGHTBLACK_EX}{'MODEL':<{width}}  {'SAMPLES':>7}  "
+            f"{'P50':>7}  {'P95':>7}{Style.RESET_ALL}"
+        )
+        for model in models:
+            p50 = stats.percentile(model, 0.5)
+            p95 = stats.percentile(model, 0.95)
+            print(
+                f"{model:<{width}}  {len(stats.samples(model)):>7}  "
+                f"{'?' if p50 is None else f'{p50:.2f}s':>7}  "
+                f"{'?' if p95 is None else f'{p95:.2f}s':>7}"
+            )
+    except Exception as e:
+        print(f"{Fore.RED}Unexpected error: {e}{Style.RESET_ALL}")
+        sys.exit(1)
+
+
 def handle_config(args: Any) -> None:
     """Handle the config command.
 
@@ -226,6 +575,12 @@ def handle_config(args: Any) -> None:
                     print(cfg._default_model)
                 elif args.parameter == "temperature":
                     print(cfg._default_temperature)
+                elif args.parameter == "model_cache_ttl":
+                    print(cfg._default_model_cache_ttl)
+                elif args.parameter == "deadline":
+                    print("unlimited")
+                elif args.parameter == "max_diff_size":
+                    print(cfg._default_max_diff_size)
                 elif args.parameter == "api_token":
                     print(f"{Fore.YELLOW}API token not set.{Style.RESET_ALL}")
     except ConfigError as e:
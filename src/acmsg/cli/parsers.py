@@ -2,6 +2,25 @@
 
 import argparse
 
+from ..constants import CONFIG_PARAMETERS
+
+
+def model_list(value: str) -> str:
+    """Check that a ``--model`` value names at least one model.
+
+    Args:
+        value: Model ID or comma-separated model IDs
+
+    Returns:
+        The value, unchanged
+
+    Raises:
+        argparse.ArgumentTypeError: If the value has no model ID
+    """
+    if not any(name.strip() for name in value.split(",")):
+        raise argparse.ArgumentTypeError("expected a model ID or comma-separated IDs")
+    return value
+
 
 def create_parser() -> argparse.ArgumentParser:
     """Create the main argument parser for acmsg.
@@ -31,14 +50,91 @@ def create_parser() -> argparse.ArgumentParser:
     )
     commit_parser.add_argument(
         "--model",
-        type=str,
-        help="specify the AI model used for generation (overrides config)",
+        type=model_list,
+        help="specify the AI model used for generation, or comma-separated models to fall back through (overrides config)",
     )
     commit_parser.add_argument(
         "--temperature",
         type=float,
         help="specify the temperature for the AI model (overrides config)",
     )
+    commit_parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="wait for the complete message instead of streaming it as it is generated",
+    )
+    commit_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always generate a new message instead of reusing one cached for the same staged changes",
+    )
+    commit_parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="give up if no message was generated within this many seconds (overrides config)",
+    )
+    commit_parser.add_argument(
+        "--no-filter",
+        action="store_true",
+        help="include the full diffs of lockfiles and generated files instead of summarizing them",
+    )
+    commit_parser.add_argument(
+        "--no-compact",
+        action="store_true",
+        help="send the diff as git writes it, with full context, blob hashes and path prefixes",
+    )
+    commit_parser.add_argument(
+        "pathspec",
+        nargs="*",
+        help="only describe the staged changes to these paths (the commit still includes everything staged)",
+    )
+
+    # Models command parser
+    models_parser = subparsers.add_parser(
+        "models",
+        help="search available models",
+        description="Search the cached OpenRouter model catalog by name, context length and pricing",
+    )
+    models_parser.add_argument(
+        "query",
+        nargs="?",
+        default="",
+        help="substring to match against model IDs and names",
+    )
+    models_parser.add_argument(
+        "--min-context",
+        type=int,
+        help="only show models with at least this many context tokens",
+    )
+    models_parser.add_argument(
+        "--max-price",
+        type=float,
+        help="only show models whose prompt price is at most this many USD per million tokens",
+    )
+    models_parser.add_argument(
+        "--free",
+        action="store_true",
+        help="only show free models",
+    )
+    models_parser.add_argument(
+        "--limit",
+        type=int,
+        default=25,
+        help="maximum number of models to list (default: 25, 0 for no limit)",
+    )
+    models_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="download the latest catalog before searching",
+    )
+
+    # Stats command parser
+    subparsers.add_parser(
+        "stats",
+        help="show request latency and hedging statistics",
+        description="Show time-to-first-token percentiles per model and how often hedge requests were sent and won",
+    )
 
     # Config command parser
     config_parser = subparsers.add_parser(
@@ -57,7 +153,7 @@ def create_parser() -> argparse.ArgumentParser:
     )
     config_set.add_argument(
         "parameter",
-        choices=["api_token", "model", "temperature"],
+        choices=CONFIG_PARAMETERS,
         help="parameter name",
     )
     config_set.add_argument("value", type=str, help="Value")
@@ -70,7 +166,7 @@ def create_parser() -> argparse.ArgumentParser:
     )
     config_get.add_argument(
         "parameter",
-        choices=["api_token", "model", "temperature"],
+        choices=CONFIG_PARAMETERS,
         help="parameter name",
     )
 
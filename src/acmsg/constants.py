@@ -3,5 +3,129 @@
 DEFAULT_MODEL = "qwen/qwen3-30b-a3b:free"
 DEFAULT_TEMPERATURE = 0.8
 API_ENDPOINT = "https://openrouter.ai/api/v1/chat/completions"
+MODELS_ENDPOINT = "https://openrouter.ai/api/v1/models"
 CONFIG_FILENAME = "config.yaml"
 CONFIG_DIR = "acmsg"
+CACHE_DIR = "acmsg"
+CONFIG_PARAMETERS = [
+    "api_token",
+    "model",
+    "temperature",
+    "model_cache_ttl",
+    "deadline",
+    "max_diff_size",
+]
+
+# HTTP connection pooling
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 8
+ASYNC_MAX_CONCURRENCY = 8
+
+# Model catalog cache
+CATALOG_CACHE_FILENAME = "models.json"
+DEFAULT_MODEL_CACHE_TTL = 3600
+# Seconds to let a background catalog refresh finish when the process exits
+CATALOG_REFRESH_EXIT_WAIT = 5.0
+
+# Retry policy
+DEFAULT_RETRY_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF_BASE = 0.5
+DEFAULT_RETRY_BACKOFF_CAP = 8.0
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 502, 503, 504})
+
+# Request timeouts (seconds) and response size
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+CATALOG_READ_TIMEOUT = 15.0
+DEFAULT_MAX_TOKENS = 1024
+
+# Staged diff reading
+DIFF_MAX_BYTES = 4 * 1024 * 1024
+DIFF_MAX_FILE_BYTES = 512 * 1024
+DIFF_MAX_LINE_BYTES = 4096
+# Rough patch size estimates of the pre-scan, per file header and per line
+PRESCAN_HEADER_BYTES = 160
+PRESCAN_LINE_BYTES = 40
+
+# Files whose diffs are replaced by a one-line summary
+DEFAULT_EXCLUDE_PATTERNS = (
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lockb",
+    "poetry.lock",
+    "Pipfile.lock",
+    "uv.lock",
+    "pdm.lock",
+    "Cargo.lock",
+    "Gemfile.lock",
+    "composer.lock",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.snap",
+)
+DEPENDENCY_SUMMARY_MAX_ITEMS = 100
+
+# Notebook and data file reduction
+REDUCE_MIN_JSON_BYTES = 16 * 1024
+REDUCE_POOL_MIN_BYTES = 256 * 1024
+REDUCE_MAX_WORKERS = 4
+REDUCE_SAMPLE_LINES = 5
+
+# Diff compaction: (max file diff size, context lines) for automatic context
+DEFAULT_DIFF_CONTEXT = 3
+COMPACTION_AUTO_CONTEXT = (
+    (8 * 1024, 3),
+    (64 * 1024, 2),
+    (256 * 1024, 1),
+)
+
+# Folding of repeated edits and moves
+DEDUP_MIN_REPEATS = 3
+DEDUP_MAX_HUNK_LINES = 40
+DEDUP_MAX_PATHS = 5
+
+# Token budget
+PROMPT_OVERHEAD_TOKENS = 200
+TRANSFORMS_THRESHOLD = 0.9
+CONTEXT_LIMITS_FILENAME = "limits.json"
+
+# Token estimation
+TOKENIZER_CACHE_SIZE = 1024
+TOKENIZER_CALIBRATION_FILENAME = "tokenizer.json"
+TOKENIZER_CALIBRATION_SMOOTHING = 0.3
+TOKENIZER_CALIBRATION_MIN_TOKENS = 200
+TOKENIZER_FACTOR_RANGE = (0.5, 2.0)
+
+# Hedged requests
+DEFAULT_HEDGE_DELAY = 4.0
+DEFAULT_HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 5
+HEDGE_STATS_WINDOW = 50
+HEDGE_STATS_FILENAME = "latency.json"
+
+# Model fallback circuit breaker
+CIRCUIT_FAILURE_THRESHOLD = 1
+CIRCUIT_COOLDOWN = 600
+CIRCUIT_STATE_FILENAME = "circuits.json"
+
+# Generated message cache
+RESPONSE_CACHE_DIR = "responses"
+RESPONSE_CACHE_MAX_ENTRIES = 200
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 * 1024
+
+# Map-reduce generation for diffs larger than the context
+MAP_CHUNK_TOKENS = 6000
+MAP_MAX_WORKERS = 4
+SUMMARY_CACHE_DIR = "summaries"
+SUMMARY_CACHE_MAX_ENTRIES = 2000
+
+# Symbol-level change summaries
+SYMBOL_SUMMARY_MAX_ITEMS = 12
+SYMBOL_MAX_BLOB_BYTES = 1024 * 1024
+SYMBOL_CACHE_DIR = "symbols"
+SYMBOL_CACHE_MAX_ENTRIES = 5000
+SYMBOL_CACHE_MAX_BYTES = 8 * 1024 * 1024
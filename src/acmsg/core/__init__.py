@@ -2,6 +2,11 @@
 
 from .git import GitUtils
 from .config import Config
-from .generation import CommitMessageGenerator
+from .generation import AsyncCommitMessageGenerator, CommitMessageGenerator
 
-__all__ = ["GitUtils", "Config", "CommitMessageGenerator"]
+__all__ = [
+    "GitUtils",
+    "Config",
+    "CommitMessageGenerator",
+    "AsyncCommitMessageGenerator",
+]
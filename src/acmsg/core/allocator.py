@@ -0,0 +1,241 @@
+"""Token budget allocation over the files and hunks of a diff."""
+
+import fnmatch
+import posixpath
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .diff import FileDiff, Hunk, list_paths
+
+# Hunk priorities, lowest first
+SOURCE, TESTS, DOCS, GENERATED = range(4)
+
+GENERATED_PATTERNS = (
+    "*.lock",
+    "*-lock.json",
+    "*-lock.yaml",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.snap",
+    "*_pb2.py",
+    "*.pb.go",
+    "*.generated.*",
+)
+GENERATED_DIRS = {
+    "dist",
+    "build",
+    "vendor",
+    "node_modules",
+    "generated",
+    "__generated__",
+}
+DOCS_EXTENSIONS = {".md", ".rst", ".txt", ".adoc"}
+DOCS_DIRS = {"doc", "docs"}
+TEST_PATTERNS = (
+    "test_*",
+    "*_test.*",
+    "*_tests.*",
+    "*.test.*",
+    "*.spec.*",
+    "conftest.py",
+)
+TEST_DIRS = {"test", "tests", "__tests__", "spec"}
+
+
+def path_priority(path: str) -> int:
+    """Classify a file by how much its changes tell about a commit.
+
+    Args:
+        path: File path relative to the repository root
+
+    Returns:
+        One of ``SOURCE``, ``TESTS``, ``DOCS`` or ``GENERATED``
+    """
+    name = posixpath.basename(path).lower()
+    dirs = set(path.lower().split("/")[:-1])
+
+    if dirs & GENERATED_DIRS or any(
+        fnmatch.fnmatchcase(name, pattern) for pattern in GENERATED_PATTERNS
+    ):
+        return GENERATED
+    if dirs & TEST_DIRS or any(
+        fnmatch.fnmatchcase(name, pattern) for pattern in TEST_PATTERNS
+    ):
+        return TESTS
+    if dirs & DOCS_DIRS or posixpath.splitext(name)[1] in DOCS_EXTENSIONS:
+        return DOCS
+    return SOURCE
+
+
+def omitted_marker(hunks: Sequence[Hunk]) -> str:
+    """Describe a run of left-out hunks in place of their text.
+
+    Args:
+        hunks: Hunks that were left out
+
+    Returns:
+        A single marker line with the hunk count and line stats
+    """
+    added = sum(hunk.added for hunk in hunks)
+    removed = sum(hunk.removed for hunk in hunks)
+    return _format_marker(len(hunks), added, removed)
+
+
+def _format_marker(hunks: int, added: int, removed: int) -> str:
+    """Format the marker for a run of left-out hunks from its counts."""
+    noun = "hunk" if hunks == 1 else "hunks"
+    return f"[... {hunks} {noun} omitted: +{added} -{removed} lines ...]"
+
+
+class DiffAllocation:
+    """A diff cut down to a token budget, with a record of what was left out."""
+
+    def __init__(
+        self,
+        text: str,
+        omitted: Dict[str, List[Hunk]],
+        total_hunks: int,
+        described: Optional[Set[str]] = None,
+    ):
+        """Initialize the allocation.
+
+        Args:
+            text: Diff text that fits the budget
+            omitted: Left-out hunks by file path
+            total_hunks: Number of hunks in the original diff
+            described: Paths of files whose left-out hunks are stood in
+                for by a summary of their changes
+        """
+        self.text = text
+        self.omitted = omitted
+        self.total_hunks = total_hunks
+        self.described = described or set()
+
+    @property
+    def omitted_hunks(self) -> int:
+        """Get the number of hunks that were left out.
+
+        Returns:
+            Left-out hunk count
+        """
+        return sum(len(hunks) for hunks in self.omitted.values())
+
+    @property
+    def undescribed(self) -> List[str]:
+        """Get the files with left-out hunks that no summary stands in for.
+
+        Returns:
+            File paths
+        """
+        return [path for path in self.omitted if path not in self.described]
+
+    def describe(self, max_paths: int = 5) -> str:
+        """Describe what was left out, for warnings.
+
+        Args:
+            max_paths: Maximum number of file paths to list
+
+        Returns:
+            Summary of the left-out hunks, or an empty string if none were
+        """
+        if not self.omitted:
+            return ""
+
+        paths = list(self.omitted)
+        text = (
+            f"Left out {self.omitted_hunks} of {self.total_hunks} hunks "
+            f"from {len(paths)} files to fit the model's context: "
+            f"{list_paths(paths, max_paths)}"
+        )
+        if self.described:
+            text += f" ({len(self.described)} summarized by changed symbols)"
+        return text
+
+
+def _choose_hunks(
+    candidates: Sequence[Tuple[int, int, int, int]], remaining: int
+) -> Set[Tuple[int, int]]:
+    """Choose hunks in candidate order while they fit the remaining tokens."""
+    chosen: Set[Tuple[int, int]] = set()
+    for _, tokens, i, j in candidates:
+        if tokens <= remaining:
+            chosen.add((i, j))
+            remaining -= tokens
+    return chosen
+
+
+def allocate_diff(
+    files: Sequence[FileDiff],
+    budget: int,
+    count: Callable[[str], int],
+    describe: Optional[Callable[[FileDiff], Optional[str]]] = None,
+) -> DiffAllocation:
+    """Fit a diff into a token budget by choosing whole hunks.
+
+    Every file keeps its header, and every run of left-out hunks is replaced
+    by a marker with its line stats, so each file is at least named with a
+    diffstat. The remaining tokens go to hunks in priority order: source
+    before tests, docs and generated files, and within each group small
+    hunks before large ones. Chosen hunks keep their original order.
+
+    With ``describe``, files that lose hunks also get a one-line summary
+    of their changes after the header. The summaries' tokens are taken
+    from the budget and the hunks are chosen again, which may leave more
+    hunks out (of those files or, undescribed, of others).
+
+    Args:
+        files: Parsed file diffs
+        budget: Tokens available for the diff
+        count: Function estimating the tokens of a text
+        describe: Function summarizing a file's changes in one line, or
+            returning None if it cannot
+
+    Returns:
+        The allocation
+    """
+    # The marker is about the same size whatever the counts
+    marker_tokens = count(_format_marker(1, 999, 0))
+    remaining = budget - sum(count(f.header) + marker_tokens for f in files)
+
+    candidates: List[Tuple[int, int, int, int]] = []
+    for i, file_diff in enumerate(files):
+        priority = path_priority(file_diff.path)
+        for j, hunk in enumerate(file_diff.hunks):
+            candidates.append((priority, count(hunk.text), i, j))
+    candidates.sort()
+
+    chosen = _choose_hunks(candidates, remaining)
+    notes: Dict[int, str] = {}
+    if describe is not None:
+        for i, file_diff in enumerate(files):
+            if any((i, j) not in chosen for j in range(len(file_diff.hunks))):
+                note = describe(file_diff)
+                if note:
+                    notes[i] = note
+        if notes:
+            remaining -= sum(count(note) for note in notes.values())
+            chosen = _choose_hunks(candidates, remaining)
+
+    parts: List[str] = []
+    omitted: Dict[str, List[Hunk]] = {}
+    described: Set[str] = set()
+    for i, file_diff in enumerate(files):
+        parts.append(file_diff.header)
+        if i in notes:
+            parts.append(notes[i])
+            described.add(file_diff.path)
+        run: List[Hunk] = []
+        for j, hunk in enumerate(file_diff.hunks):
+            if (i, j) in chosen:
+                if run:
+                    parts.append(omitted_marker(run))
+                    run = []
+                parts.append(hunk.text)
+            else:
+                run.append(hunk)
+                omitted.setdefault(file_diff.path, []).append(hunk)
+        if run:
+            parts.append(omitted_marker(run))
+
+    return DiffAllocation("\n".join(parts), omitted, len(candidates), described)
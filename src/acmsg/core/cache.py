@@ -0,0 +1,148 @@
+"""On-disk cache of generated commit messages."""
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+from ..constants import (
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_MAX_ENTRIES,
+)
+from ..storage import get_cache_dir, read_json, write_json
+
+
+class ResponseCache:
+    """Content-addressed cache of generated messages.
+
+    Entries are keyed on the staged tree, the rendered prompts, the model
+    and the temperature, so a rerun on an unchanged index gets the same
+    message back without an API request. Each entry is a small JSON file
+    whose modification time records its last use; the least recently used
+    entries are evicted once the entry count or total size exceeds its
+    limit.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+    ):
+        """Initialize the response cache.
+
+        Args:
+            cache_dir: Directory holding the entries (defaults to the cache dir)
+            max_entries: Maximum number of cached messages
+            max_bytes: Maximum total size of the cached messages in bytes
+        """
+        self._cache_dir = cache_dir or get_cache_dir() / RESPONSE_CACHE_DIR
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+
+    @property
+    def cache_dir(self) -> Path:
+        """Get the directory holding the cached messages.
+
+        Returns:
+            Path to the cache directory
+        """
+        return self._cache_dir
+
+    @staticmethod
+    def key(
+        tree: str,
+        system_prompt: str,
+        user_prompt: str,
+        model: Union[str, Sequence[str]],
+        temperature: float,
+    ) -> str:
+        """Compute the cache key of a generation request.
+
+        Args:
+            tree: Hash of the staged tree (``git write-tree``)
+            system_prompt: Rendered system prompt
+            user_prompt: Rendered user prompt
+            model: Model ID or ordered list of model IDs
+            temperature: Sampling temperature
+
+        Returns:
+            Hex digest identifying the request
+        """
+        models = model if isinstance(model, str) else ",".join(model)
+        prompt_hash = hashlib.sha256(
+            f"{system_prompt}\0{user_prompt}".encode("utf-8")
+        ).hexdigest()
+        return hashlib.sha256(
+            f"{tree}\0{prompt_hash}\0{models}\0{float(temperature)!r}".encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        """Get the file of a cache entry."""
+        return self._cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached message and mark it as recently used.
+
+        Args:
+            key: Cache key from ``key()``
+
+        Returns:
+            The cached message, or None on a miss
+        """
+        path = self._path(key)
+        entry = read_json(path)
+        if not isinstance(entry, dict) or not isinstance(entry.get("message"), str):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["message"]
+
+    def put(self, key: str, message: str) -> None:
+        """Store a message and evict the least recently used entries.
+
+        Args:
+            key: Cache key from ``key()``
+            message: Generated message
+        """
+        try:
+            write_json(self._path(key), {"message": message, "created_at": time.time()})
+            self._evict()
+        except OSError:
+            pass
+
+    def _entries(self) -> List[os.DirEntry]:
+        """List the cache entry files."""
+        try:
+            with os.scandir(self._cache_dir) as it:
+                return [entry for entry in it if entry.name.endswith(".json")]
+        except OSError:
+            return []
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is within its limits."""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        count = len(entries)
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if count <= self._max_entries and total_bytes <= self._max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            count -= 1
+            total_bytes -= size
@@ -0,0 +1,139 @@
+"""Splitting of large diffs into parts that are summarized separately."""
+
+import hashlib
+import posixpath
+from itertools import groupby
+from typing import Callable, List
+
+from .diff import FileDiff, Hunk
+
+# Number of leading directories that define a file group
+GROUP_DEPTH = 2
+
+
+def file_group(path: str) -> str:
+    """Get the group of files a path is summarized with.
+
+    Args:
+        path: File path relative to the repository root
+
+    Returns:
+        The first ``GROUP_DEPTH`` directories of the path
+    """
+    return "/".join(posixpath.dirname(path).split("/")[:GROUP_DEPTH])
+
+
+class DiffChunk:
+    """A part of a diff: whole files, or some of the hunks of one file."""
+
+    def __init__(self, files: List[FileDiff]):
+        """Initialize the chunk.
+
+        Args:
+            files: File diffs of the part, possibly holding a subset of hunks
+        """
+        self.files = files
+
+    @property
+    def paths(self) -> str:
+        """Get the paths of the files in the chunk.
+
+        Returns:
+            Comma-separated file paths
+        """
+        return ", ".join(f.path for f in self.files)
+
+    @property
+    def text(self) -> str:
+        """Get the chunk as diff text.
+
+        Returns:
+            File diffs joined by newlines
+        """
+        return "\n".join(f.text for f in self.files)
+
+    @property
+    def key(self) -> str:
+        """Get a digest identifying the content of the chunk.
+
+        File headers carry the blob hashes of both sides of each file, and
+        hunk headers tell which part of a split file the chunk holds, so
+        this is much cheaper than hashing the diff text itself. Files whose
+        ``index`` line was compacted away are hashed with their hunks.
+
+        Returns:
+            Hex digest of the chunk's file and hunk headers
+        """
+        digest = hashlib.sha256()
+        for f in self.files:
+            digest.update(f.header.encode("utf-8"))
+            hashed = (h.header if f.blobs else h.text for h in f.hunks)
+            for hunk in hashed:
+                digest.update(b"\0" + hunk.encode("utf-8"))
+            digest.update(b"\0\0")
+        return digest.hexdigest()
+
+
+def _split_file(
+    file_diff: FileDiff, chunk_tokens: int, count: Callable[[str], int]
+) -> List[FileDiff]:
+    """Split a file diff between hunks into parts of about ``chunk_tokens``."""
+    header_tokens = count(file_diff.header)
+    groups: List[List[Hunk]] = [[]]
+    used = header_tokens
+    for hunk in file_diff.hunks:
+        tokens = count(hunk.text)
+        if groups[-1] and used + tokens > chunk_tokens:
+            groups.append([])
+            used = header_tokens
+        groups[-1].append(hunk)
+        used += tokens
+    return [file_diff.with_hunks(hunks) for hunks in groups]
+
+
+def split_diff(
+    files: List[FileDiff], chunk_tokens: int, count: Callable[[str], int]
+) -> List[DiffChunk]:
+    """Split a diff into chunks of at most about ``chunk_tokens`` tokens.
+
+    Files are grouped by their leading directories and chunks never span
+    groups, so a change in one group leaves the chunks (and cached
+    summaries) of the others untouched. Within a group, files are packed
+    in path order; a file too large for one chunk is split between hunks,
+    each part repeating the file header.
+
+    Args:
+        files: Parsed file diffs
+        chunk_tokens: Target size of a chunk in tokens
+        count: Function estimating the tokens of a text
+
+    Returns:
+        Chunks in path order
+    """
+    chunks: List[DiffChunk] = []
+    ordered = sorted(files, key=lambda f: (file_group(f.path), f.path))
+
+    for _, group in groupby(ordered, key=lambda f: file_group(f.path)):
+        current: List[FileDiff] = []
+        used = 0
+        for file_diff in group:
+            tokens = count(file_diff.text)
+            if tokens > chunk_tokens and len(file_diff.hunks) > 1:
+                if current:
+                    chunks.append(DiffChunk(current))
+                    current, used = [], 0
+                chunks.extend(
+                    DiffChunk([part])
+                    for part in _split_file(file_diff, chunk_tokens, count)
+                )
+                continue
+
+            if current and used + tokens > chunk_tokens:
+                chunks.append(DiffChunk(current))
+                current, used = [], 0
+            current.append(file_diff)
+            used += tokens
+        if current:
+            chunks.append(DiffChunk(current))
+
+    return chunks
@@ -0,0 +1,463 @@
+"""Compaction of diff boilerplate before prompting.
+
+Much of a typical diff says nothing about the intent of a change: blob
+hashes, file modes, ``a/``/``b/`` prefixes, context lines far from the
+change and hunks that only re-indent code. Compaction runs after the
+staged diff has been filtered (which still needs the blob hashes) and
+removes this boilerplate step by step, recording what each step saved.
+"""
+
+import re
+from typing import Any, Callable, List, Mapping, Optional, Tuple
+
+from ..constants import COMPACTION_AUTO_CONTEXT, DEFAULT_DIFF_CONTEXT
+from ..exceptions import ConfigError
+from .dedup import fold_repeats
+from .diff import FileDiff, Hunk, parse_diff
+
+DIFF_ALGORITHMS = ("default", "myers", "minimal", "patience", "histogram")
+
+_HUNK_RANGE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+
+
+class CompactionPolicy:
+    """Settings for how the staged diff is compacted."""
+
+    def __init__(
+        self,
+        context: Optional[int] = None,
+        algorithm: str = "histogram",
+        strip_prefixes: bool = True,
+        strip_index: bool = True,
+        strip_modes: bool = True,
+        collapse_whitespace: bool = True,
+        deduplicate: bool = True,
+    ):
+        """Initialize the compaction policy.
+
+        Args:
+            context: Lines of context around changes, or None to choose
+                per file by the size of its diff
+            algorithm: Diff algorithm git uses (one of ``DIFF_ALGORITHMS``)
+            strip_prefixes: Remove the ``a/`` and ``b/`` path prefixes
+            strip_index: Remove ``index <hash>..<hash>`` lines
+            strip_modes: Remove file modes and similarity lines
+            collapse_whitespace: Replace whitespace-only hunks by a marker
+            deduplicate: Detect renames and copies, and fold repeated
+                edits and directory moves
+
+        Raises:
+            ConfigError: If a value is out of range
+        """
+        if context is not None and context < 0:
+            raise ConfigError(f"context must not be negative, got {context}")
+        if algorithm not in DIFF_ALGORITHMS:
+            raise ConfigError(
+                f"algorithm must be one of {', '.join(DIFF_ALGORITHMS)}, "
+                f"got {algorithm!r}"
+            )
+
+        self.context = context
+        self.algorithm = algorithm
+        self.strip_prefixes = strip_prefixes
+        self.strip_index = strip_index
+        self.strip_modes = strip_modes
+        self.collapse_whitespace = collapse_whitespace
+        self.deduplicate = deduplicate
+
+    @classmethod
+    def from_config(cls, data: Optional[Mapping[str, Any]]) -> "CompactionPolicy":
+        """Create a compaction policy from a config mapping.
+
+        Args:
+            data: Mapping with any of ``context`` (lines or ``auto``),
+                ``algorithm``, ``strip_prefixes``, ``strip_index``,
+                ``strip_modes``, ``collapse_whitespace`` and ``deduplicate``
+
+        Returns:
+            Compaction policy with defaults for missing keys
+
+        Raises:
+            ConfigError: If the mapping is invalid
+        """
+        if data is None:
+            return cls()
+        if not isinstance(data, Mapping):
+            raise ConfigError(f"compaction must be a mapping, got {data!r}")
+
+        flags = (
+            "strip_prefixes",
+            "strip_index",
+            "strip_modes",
+            "collapse_whitespace",
+            "deduplicate",
+        )
+        unknown = set(data) - {"context", "algorithm", *flags}
+        if unknown:
+            raise ConfigError(
+                f"Unknown compaction options: {', '.join(sorted(unknown))}"
+            )
+
+        context = data.get("context", "auto")
+        try:
+            return cls(
+                context=None if context == "auto" else int(context),
+                algorithm=str(data.get("algorithm", "histogram")),
+                **{flag: bool(data.get(flag, True)) for flag in flags},
+            )
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"Invalid compaction configuration: {e}")
+
+    @classmethod
+    def disabled(cls) -> "CompactionPolicy":
+        """Create a policy that leaves the diff as git writes it by default.
+
+        Returns:
+            Compaction policy with every step turned off
+        """
+        return cls(
+            context=DEFAULT_DIFF_CONTEXT,
+            algorithm="default",
+            strip_prefixes=False,
+            strip_index=False,
+            strip_modes=False,
+            collapse_whitespace=False,
+            deduplicate=False,
+        )
+
+    def git_options(self) -> List[str]:
+        """Get the ``git diff`` options that implement the policy.
+
+        Git writes the most context any file may keep; files that should
+        keep less are trimmed afterwards.
+
+        Returns:
+            Command line options
+        """
+        context = (
+            COMPACTION_AUTO_CONTEXT[0][1] if self.context is None else self.context
+        )
+        options = [f"-U{context}"]
+        if self.algorithm != "default":
+            options.append(f"--diff-algorithm={self.algorithm}")
+        if self.deduplicate:
+            options += ["--find-renames", "--find-copies"]
+        return options
+
+    def context_for(self, size: int) -> int:
+        """Get the lines of context to keep around the changes of a file.
+
+        Args:
+            size: Length of the file diff in characters
+
+        Returns:
+            Context lines
+        """
+        if self.context is not None:
+            return self.context
+        for max_size, context in COMPACTION_AUTO_CONTEXT:
+            if size <= max_size:
+                return context
+        return 0
+
+
+class CompactedDiff:
+    """A compacted diff with the savings of each compaction step."""
+
+    def __init__(self, text: str, savings: List[Tuple[str, int, int]]):
+        """Initialize the compacted diff.
+
+        Args:
+            text: Compacted diff text
+            savings: (step, bytes saved, tokens saved) of each step that ran
+        """
+        self.text = text
+        self.savings = savings
+
+    @property
+    def saved_bytes(self) -> int:
+        """Get the bytes saved by all steps.
+
+        Returns:
+            Byte count
+        """
+        return sum(saved for _, saved, _ in self.savings)
+
+    @property
+    def saved_tokens(self) -> int:
+        """Get the estimated tokens saved by all steps.
+
+        Returns:
+            Token count
+        """
+        return sum(saved for _, _, saved in self.savings)
+
+    def describe(self) -> str:
+        """Describe what each step saved, for notes.
+
+        Returns:
+            Summary of the savings, or an empty string if nothing was saved
+        """
+        steps = [
+            f"{step} {_format_size(saved)}/{tokens} tokens"
+            for step, saved, tokens in self.savings
+            if saved > 0
+        ]
+        if not steps:
+            return ""
+        return (
+            f"Compacted the diff by {_format_size(self.saved_bytes)} "
+            f"(~{self.saved_tokens} tokens): {', '.join(steps)}"
+        )
+
+
+def _format_size(size: int) -> str:
+    """Format a byte count for notes."""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MiB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size} B"
+
+
+def _range(start: int, count: int) -> str:
+    """Format one side of a hunk range the way git does."""
+    return str(start) if count == 1 else f"{start},{count}"
+
+
+def trim_hunk(hunk: Hunk, context: int) -> List[str]:
+    """Keep only ``context`` lines of context around the changes of a hunk.
+
+    A hunk whose changes end up further apart than twice the context is
+    split, each part with its own ``@@`` line.
+
+    Args:
+        hunk: Hunk to trim
+        context: Context lines to keep before and after each change
+
+    Returns:
+        Lines of the trimmed hunk or hunks, headers included; the hunk
+        as it is if its header has no line ranges
+    """
+    match = _HUNK_RANGE.match(hunk.header)
+    if not match:
+        return [hunk.text]
+    old_line, new_line = int(match.group(1)), int(match.group(3))
+    if match.group(2) == "0":
+        old_line += 1
+    if match.group(4) == "0":
+        new_line += 1
+    section = match.group(5)
+
+    lines = hunk.lines
+    changes = [i for i, line in enumerate(lines) if line[:1] in ("+", "-")]
+    if not changes:
+        return [hunk.text]
+
+    keep = [False] * len(lines)
+    for i in changes:
+        for j in range(max(0, i - context), min(len(lines), i + context + 1)):
+            keep[j] = True
+    for i, line in enumerate(lines):
+        if line.startswith("\\") and i > 0:
+            keep[i] = keep[i - 1]
+        elif line[:1] not in (" ", "+", "-", "\\"):
+            # Notes left by earlier steps are kept wherever they are
+            keep[i] = True
+    if all(keep):
+        return [hunk.text]
+
+    out: List[str] = []
+    part: List[str] = []
+    part_old = part_new = 0
+    old_count = new_count = 0
+
+    def close_part() -> None:
+        if part:
+            old_start = part_old if old_count else part_old - 1
+            new_start = part_new if new_count else part_new - 1
+            suffix = section if not out else ""
+            out.append(
+                f"@@ -{_range(old_start, old_count)} "
+                f"+{_range(new_start, new_count)} @@{suffix}"
+            )
+            out.extend(part)
+
+    for i, line in enumerate(lines):
+        note = line[:1] not in (" ", "+", "-", "\\")
+        if note and not part and out:
+            out.append(line)
+        elif keep[i]:
+            if not part:
+                part_old, part_new = old_line, new_line
+                old_count = new_count = 0
+            part.append(line)
+            if line.startswith("-"):
+                old_count += 1
+            elif line.startswith("+"):
+                new_count += 1
+            elif not line.startswith("\\") and not note:
+                old_count += 1
+                new_count += 1
+        elif part:
+            close_part()
+            part = []
+
+        if note:
+            continue
+        if line.startswith("-"):
+            old_line += 1
+        elif line.startswith("+"):
+            new_line += 1
+        elif not line.startswith("\\"):
+            old_line += 1
+            new_line += 1
+    close_part()
+    return out
+
+
+def is_whitespace_only(hunk: Hunk) -> bool:
+    """Check whether a hunk only changes whitespace.
+
+    Args:
+        hunk: Hunk to check
+
+    Returns:
+        True if the removed and added lines differ only in whitespace
+    """
+    removed: List[str] = []
+    added: List[str] = []
+    for line in hunk.lines:
+        if line.startswith("-"):
+            removed.extend(line[1:].split())
+        elif line.startswith("+"):
+            added.extend(line[1:].split())
+    changed = hunk.added or hunk.removed
+    return bool(changed) and removed == added
+
+
+def _collapse_whitespace(hunk: Hunk) -> List[str]:
+    """Replace the lines of a whitespace-only hunk by a marker."""
+    if not is_whitespace_only(hunk):
+        return [hunk.text]
+    collapsed = [
+        f"{hunk.header} [whitespace only]",
+        f"[... whitespace-only change: +{hunk.added} -{hunk.removed} lines ...]",
+    ]
+    if len(collapsed[1]) >= hunk.size - len(hunk.header):
+        return [hunk.text]
+    return collapsed
+
+
+def _strip_prefix_line(line: str) -> str:
+    """Remove ``a/``/``b/`` prefixes from a file header line."""
+    if line.startswith("diff --git a/"):
+        old, separator, new = line[len("diff --git a/") :].partition(" b/")
+        if separator:
+            return f"diff --git {old} {new}"
+    for marker, prefix in (("--- ", "a/"), ("+++ ", "b/")):
+        if line.startswith(marker + prefix):
+            return marker + line[len(marker + prefix) :]
+    return line
+
+
+def _header(file_diff: FileDiff, policy: CompactionPolicy) -> List[str]:
+    """Apply the header steps of a policy to a file header."""
+    lines = file_diff.header_lines
+    if policy.strip_index:
+        lines = [line for line in lines if not line.startswith("index ")]
+    if policy.strip_modes:
+        compact = []
+        for line in lines:
+            if line.startswith(("new file mode ", "deleted file mode ")):
+                compact.append(line.rsplit(" mode ", 1)[0])
+            elif not line.startswith(("similarity index ", "dissimilarity index ")):
+                compact.append(line)
+        lines = compact
+    if policy.strip_prefixes:
+        lines = [_strip_prefix_line(line) for line in lines]
+    return lines
+
+
+def _rebuild(
+    files: List[FileDiff],
+    header: Callable[[FileDiff], List[str]],
+    hunk: Callable[[FileDiff, Hunk], List[str]],
+) -> str:
+    """Rebuild diff text from transformed file headers and hunks."""
+    parts: List[str] = []
+    for file_diff in files:
+        parts.extend(header(file_diff))
+        for h in file_diff.hunks:
+            parts.extend(hunk(file_diff, h))
+    return "\n".join(parts)
+
+
+def compact_diff(
+    diff: str, policy: CompactionPolicy, count: Callable[[str], int]
+) -> CompactedDiff:
+    """Compact a diff according to a policy.
+
+    Steps run in order (repeats, context, whitespace, headers) and each is
+    measured on its own. Text before the first file (none in git's
+    output) is dropped.
+
+    Args:
+        diff: Diff text, possibly with filtered or reduced files
+        policy: What to compact
+        count: Function estimating the tokens of a text
+
+    Returns:
+        The compacted diff
+    """
+    steps: List[Tuple[str, Callable[[List[FileDiff]], str]]] = []
+    if policy.deduplicate:
+        steps.append(("repeats", fold_repeats))
+    if policy.context is None or policy.context < DEFAULT_DIFF_CONTEXT:
+        steps.append(
+            (
+                "context",
+                lambda files: _rebuild(
+                    files,
+                    lambda f: f.header_lines,
+                    lambda f, h: trim_hunk(h, policy.context_for(f.size)),
+                ),
+            )
+        )
+    if policy.collapse_whitespace:
+        steps.append(
+            (
+                "whitespace",
+                lambda files: _rebuild(
+                    files,
+                    lambda f: f.header_lines,
+                    lambda f, h: _collapse_whitespace(h),
+                ),
+            )
+        )
+    if policy.strip_index or policy.strip_modes or policy.strip_prefixes:
+        steps.append(
+            (
+                "headers",
+                lambda files: _rebuild(
+                    files, lambda f: _header(f, policy), lambda f, h: [h.text]
+                ),
+            )
+        )
+
+    text = diff
+    savings: List[Tuple[str, int, int]] = []
+    for name, step in steps:
+        files = parse_diff(text)
+        if not files:
+            break
+        compacted = step(files)
+        savings.append(
+            (
+                name,
+                len(text.encode("utf-8")) - len(compacted.encode("utf-8")),
+                count(text) - count(compacted),
+            )
+        )
+        text = compacted
+    return CompactedDiff(text, savings)
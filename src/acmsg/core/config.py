@@ -3,11 +3,22 @@
 import os
 import yaml
 from pathlib import Path
-from typing import Optional, Any
-
-from ..constants import DEFAULT_MODEL, DEFAULT_TEMPERATURE, CONFIG_FILENAME, CONFIG_DIR
+from typing import Any, List, Optional
+
+from ..constants import (
+    DEFAULT_MODEL,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_MODEL_CACHE_TTL,
+    DIFF_MAX_BYTES,
+    DEFAULT_EXCLUDE_PATTERNS,
+    CONFIG_FILENAME,
+    CONFIG_DIR,
+)
+from ..api.hedging import HedgePolicy
+from ..api.retry import RetryPolicy
 from ..exceptions import ConfigError
 from ..templates import renderer
+from .compaction import CompactionPolicy
 
 
 class Config:
@@ -17,6 +28,8 @@ class Config:
         """Initialize the Config instance with configuration values."""
         self._default_model = DEFAULT_MODEL
         self._default_temperature = DEFAULT_TEMPERATURE
+        self._default_model_cache_ttl = DEFAULT_MODEL_CACHE_TTL
+        self._default_max_diff_size = DIFF_MAX_BYTES
         self._config_file = self._init_config_file()
         self._load_config()
 
@@ -44,13 +57,50 @@ class Config:
             with open(self._config_file, "r") as f:
                 data = yaml.safe_load(f) or {}
 
-            self._model = data.get("model") or self._default_model
+            self._models = self._validate_models(data.get("model")) or [
+                self._default_model
+            ]
             temp_value = data.get("temperature") or self._default_temperature
             self._temperature = (
                 self._validate_temperature(temp_value) or self._default_temperature
             )
 
             self._api_token = data.get("api_token")
+
+            ttl_value = data.get("model_cache_ttl")
+            self._model_cache_ttl = (
+                self._default_model_cache_ttl
+                if ttl_value is None
+                else self._validate_model_cache_ttl(ttl_value)
+            )
+
+            self._retry_policy = RetryPolicy.from_config(data.get("retry"))
+            self._hedge_policy = HedgePolicy.from_config(data.get("hedge"))
+
+            deadline_value = data.get("deadline")
+            self._deadline = (
+                None
+                if deadline_value is None
+                else self._validate_deadline(deadline_value)
+            )
+
+            size_value = data.get("max_diff_size")
+            self._max_diff_size = (
+                self._default_max_diff_size
+                if size_value is None
+                else self._validate_max_diff_size(size_value)
+            )
+
+            exclude_value = data.get("exclude")
+            self._exclude = (
+                list(DEFAULT_EXCLUDE_PATTERNS)
+                if exclude_value is None
+                else self._validate_exclude(exclude_value)
+            )
+
+            self._compaction_policy = CompactionPolicy.from_config(
+                data.get("compaction")
+            )
         except Exception as e:
             raise ConfigError(f"Failed to load configuration: {e}")
 
@@ -76,14 +126,127 @@ class Config:
         except ValueError:
             raise ConfigError(f"Temperature must be a number, got {temperature}")
 
+    def _validate_models(self, models: Any) -> List[str]:
+        """Validate and normalize the configured model or model list.
+
+        Args:
+            models: A model ID, comma-separated model IDs, or a list of model IDs
+
+        Returns:
+            Model IDs in order of preference (empty if none are configured)
+
+        Raises:
+            ConfigError: If the value is not a model ID or list of model IDs
+        """
+        if not models:
+            return []
+        if isinstance(models, str):
+            models = models.split(",")
+        if not isinstance(models, list) or not all(
+            isinstance(model, str) for model in models
+        ):
+            raise ConfigError(
+                f"Model must be a model ID or a list of them, got {models}"
+            )
+        return [model.strip() for model in models if model.strip()]
+
+    def _validate_model_cache_ttl(self, ttl: Any) -> int:
+        """Validate and convert the model catalog cache TTL.
+
+        Args:
+            ttl: TTL value in seconds
+
+        Returns:
+            Validated TTL as int
+
+        Raises:
+            ConfigError: If the TTL is invalid
+        """
+        try:
+            value = int(ttl)
+        except (TypeError, ValueError):
+            raise ConfigError(f"Model cache TTL must be an integer, got {ttl}")
+        if value < 0:
+            raise ConfigError(f"Model cache TTL must not be negative, got {value}")
+        return value
+
+    def _validate_deadline(self, deadline: Any) -> float:
+        """Validate and convert the commit deadline.
+
+        Args:
+            deadline: Deadline in seconds
+
+        Returns:
+            Validated deadline as float
+
+        Raises:
+            ConfigError: If the deadline is invalid
+        """
+        try:
+            value = float(deadline)
+        except (TypeError, ValueError):
+            raise ConfigError(f"Deadline must be a number, got {deadline}")
+        if value <= 0:
+            raise ConfigError(f"Deadline must be positive, got {value}")
+        return value
+
+    def _validate_max_diff_size(self, size: Any) -> int:
+        """Validate and convert the staged diff size limit.
+
+        Args:
+            size: Limit in bytes
+
+        Returns:
+            Validated limit as int
+
+        Raises:
+            ConfigError: If the limit is invalid
+        """
+        try:
+            value = int(size)
+        except (TypeError, ValueError):
+            raise ConfigError(f"Max diff size must be an integer, got {size}")
+        if value <= 0:
+            raise ConfigError(f"Max diff size must be positive, got {value}")
+        return value
+
+    def _validate_exclude(self, patterns: Any) -> List[str]:
+        """Validate the patterns of files whose diffs are left out.
+
+        Args:
+            patterns: A list of glob patterns
+
+        Returns:
+            Validated patterns
+
+        Raises:
+            ConfigError: If the value is not a list of patterns
+        """
+        if not isinstance(patterns, list) or not all(
+            isinstance(pattern, str) for pattern in patterns
+        ):
+            raise ConfigError(
+                f"Exclude must be a list of glob patterns, got {patterns}"
+            )
+        return [pattern.strip() for pattern in patterns if pattern.strip()]
+
     @property
     def model(self) -> str:
-        """Get the configured model.
+        """Get the preferred configured model.
 
         Returns:
             Model ID string
         """
-        return self._model
+        return self._models[0]
+
+    @property
+    def models(self) -> List[str]:
+        """Get the configured models in the order they should be tried.
+
+        Returns:
+            List of model IDs, starting with the preferred model
+        """
+        return list(self._models)
 
     @property
     def temperature(self) -> float:
@@ -94,6 +257,69 @@ class Config:
         """
         return self._temperature
 
+    @property
+    def model_cache_ttl(self) -> int:
+        """Get the freshness lifetime of the cached model catalog.
+
+        Returns:
+            TTL in seconds
+        """
+        return self._model_cache_ttl
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        """Get the policy for retrying transient API failures.
+
+        Returns:
+            Retry policy built from the ``retry`` section
+        """
+        return self._retry_policy
+
+    @property
+    def hedge_policy(self) -> Optional[HedgePolicy]:
+        """Get the policy for hedging slow requests.
+
+        Returns:
+            Hedge policy built from the ``hedge`` section, or None if disabled
+        """
+        return self._hedge_policy
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """Get the time budget for generating a commit message.
+
+        Returns:
+            Deadline in seconds, or None if unlimited
+        """
+        return self._deadline
+
+    @property
+    def max_diff_size(self) -> int:
+        """Get the number of bytes of the staged diff to read at most.
+
+        Returns:
+            Size limit in bytes
+        """
+        return self._max_diff_size
+
+    @property
+    def exclude(self) -> List[str]:
+        """Get the glob patterns of files whose diffs are left out of prompts.
+
+        Returns:
+            Glob patterns, the built-in lockfile and asset patterns by default
+        """
+        return list(self._exclude)
+
+    @property
+    def compaction_policy(self) -> CompactionPolicy:
+        """Get the policy for compacting the staged diff.
+
+        Returns:
+            Compaction policy built from the ``compaction`` section
+        """
+        return self._compaction_policy
+
     @property
     def api_token(self) -> Optional[str]:
         """Get the configured API token.
@@ -132,9 +358,15 @@ class Config:
                 yaml.dump(data, f, default_flow_style=False)
 
             if parameter == "model":
-                self._model = value
+                self._models = self._validate_models(value) or [self._default_model]
             elif parameter == "temperature":
                 self._temperature = self._validate_temperature(value)
+            elif parameter == "model_cache_ttl":
+                self._model_cache_ttl = self._validate_model_cache_ttl(value)
+            elif parameter == "deadline":
+                self._deadline = self._validate_deadline(value)
+            elif parameter == "max_diff_size":
+                self._max_diff_size = self._validate_max_diff_size(value)
             elif parameter == "api_token":
                 self._api_token = value
         except Exception as e:
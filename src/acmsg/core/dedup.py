@@ -0,0 +1,163 @@
+"""Folding of repeated edits and directory moves in a diff.
+
+A codemod or a directory rename touches many files in the same way. The
+model needs to see such a change once, with the list of places it was
+applied, rather than hundreds of near-identical hunks or rename headers.
+"""
+
+import hashlib
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..constants import DEDUP_MAX_HUNK_LINES, DEDUP_MAX_PATHS, DEDUP_MIN_REPEATS
+from .diff import COPIED, RENAMED, FileDiff, Hunk, list_paths
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def fingerprint(hunk: Hunk) -> Optional[str]:
+    """Get a digest of the edit a hunk makes, independent of where it is.
+
+    Context lines and line numbers are ignored, and so are the tokens
+    the removed and added lines have in common: renaming ``old.pkg`` to
+    ``new.pkg`` gives the same fingerprint in every import that names a
+    different symbol from it.
+
+    Args:
+        hunk: Hunk to fingerprint
+
+    Returns:
+        Hex digest, or None for hunks that are not compared (no line
+        ranges, no changes or more than ``DEDUP_MAX_HUNK_LINES`` changes)
+    """
+    changed = hunk.added + hunk.removed
+    if not hunk.header.startswith("@@ -") or not changed:
+        return None
+    if changed > DEDUP_MAX_HUNK_LINES:
+        return None
+
+    removed: List[str] = []
+    added: List[str] = []
+    for line in hunk.lines:
+        if line.startswith("-"):
+            removed.extend(_TOKEN.findall(line[1:]))
+            removed.append("\n")
+        elif line.startswith("+"):
+            added.extend(_TOKEN.findall(line[1:]))
+            added.append("\n")
+
+    matcher = SequenceMatcher(None, removed, added, autojunk=False)
+    edits = [
+        (tag, removed[i1:i2], added[j1:j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+    return hashlib.sha256(repr(edits).encode("utf-8")).hexdigest()
+
+
+def move_of(file_diff: FileDiff) -> Optional[Tuple[str, str, str]]:
+    """Get the directory move a renamed or copied file is part of.
+
+    Args:
+        file_diff: File diff to check
+
+    Returns:
+        (status, old directory, new directory) once the path components
+        the two paths end with are removed, or None if the file was not
+        renamed or copied, or its name changed
+    """
+    if file_diff.status not in (RENAMED, COPIED) or not file_diff.old_path:
+        return None
+    old = file_diff.old_path.split("/")
+    new = file_diff.path.split("/")
+    if old[-1] != new[-1]:
+        return None
+    while len(old) > 1 and len(new) > 1 and old[-2] == new[-2]:
+        old.pop(-2)
+        new.pop(-2)
+    return file_diff.status, "/".join(old[:-1]), "/".join(new[:-1])
+
+
+def _directory(path: str) -> str:
+    """Format a directory for a move header."""
+    return f"{path}/" if path else "./"
+
+
+def _move_text(move: Tuple[str, str, str], paths: List[str]) -> str:
+    """Render a group of moved files as one header-only file diff."""
+    status, old, new = move
+    verb = "rename" if status == RENAMED else "copy"
+    old, new = _directory(old), _directory(new)
+    moved = [path[len(new) :] if new != "./" else path for path in paths]
+    return (
+        f"diff --git a/{old} b/{new}\n"
+        f"{verb} from {old}\n"
+        f"{verb} to {new}\n"
+        f"[... {verb}d {len(paths)} files: "
+        f"{list_paths(moved, DEDUP_MAX_PATHS)} ...]"
+    )
+
+
+def fold_repeats(files: List[FileDiff]) -> str:
+    """Fold repeated edits and directory moves of a diff.
+
+    The first hunk of each edit made at least ``DEDUP_MIN_REPEATS`` times
+    is kept, followed by a line listing where else it was made; the other
+    hunks are left out. Files with no hunks left are left out too (the
+    file statuses still list them), and files renamed or copied from one
+    directory to another with no hunks left are listed under a single
+    header per move.
+
+    Args:
+        files: Parsed diff
+
+    Returns:
+        Diff text with repeats folded
+    """
+    prints = [[fingerprint(hunk) for hunk in f.hunks] for f in files]
+    places: Dict[str, List[str]] = {}
+    for f, file_prints in zip(files, prints):
+        for value in file_prints:
+            if value is not None:
+                places.setdefault(value, []).append(f.path)
+    repeated = {
+        value: paths
+        for value, paths in places.items()
+        if len(paths) >= DEDUP_MIN_REPEATS
+    }
+
+    shown: Set[str] = set()
+    kept: List[List[str]] = []
+    for f, file_prints in zip(files, prints):
+        kept.append([])
+        for hunk, value in zip(f.hunks, file_prints):
+            if value not in repeated:
+                kept[-1].append(hunk.text)
+            elif value not in shown:
+                shown.add(value)
+                others = repeated[value][1:]
+                paths = list(dict.fromkeys(others))
+                kept[-1].append(
+                    f"{hunk.text}\n[... same change in {len(others)} more "
+                    f"places: {list_paths(paths, DEDUP_MAX_PATHS)} ...]"
+                )
+
+    moves: Dict[Tuple[str, str, str], List[str]] = {}
+    moved: List[Optional[Tuple[str, str, str]]] = []
+    for f, hunks in zip(files, kept):
+        move = None if hunks else move_of(f)
+        if move is not None:
+            moves.setdefault(move, []).append(f.path)
+        moved.append(move)
+
+    parts: List[str] = []
+    shown_moves: Set[Tuple[str, str, str]] = set()
+    for f, hunks, move in zip(files, kept, moved):
+        if move is not None and len(moves[move]) >= DEDUP_MIN_REPEATS:
+            if move not in shown_moves:
+                shown_moves.add(move)
+                parts.append(_move_text(move, moves[move]))
+        elif hunks or not f.hunks or f.status in (RENAMED, COPIED):
+            parts.append("\n".join([f.header, *hunks]))
+    return "\n".join(parts)
@@ -0,0 +1,433 @@
+"""Summaries of dependency changes in lockfiles and manifests.
+
+Lockfile diffs are long and repetitive, while the change they record
+usually fits in a line: which packages were added, bumped or removed.
+Both sides of a lockfile or manifest are read line by line from git and
+reduced to a map of package versions, so even a huge lockfile is never
+held in memory as a whole. The parsers expect the files as their tools
+write them (one key per line), not arbitrary TOML or JSON.
+"""
+
+import posixpath
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..constants import DEPENDENCY_SUMMARY_MAX_ITEMS
+from .diff import ADDED, DELETED, FileDiff, Hunk
+
+ARROW = "→"
+
+_TOML_TABLE = re.compile(r"^\s*\[\[?\s*([^\]]+?)\s*\]\]?\s*(?:#.*)?$")
+_TOML_STRING = re.compile(r'^\s*([A-Za-z0-9_.-]+)\s*=\s*"([^"]*)"')
+_TOML_ARRAY_START = re.compile(r"^\s*([A-Za-z0-9_.-]+)\s*=\s*\[")
+_TOML_KEY = re.compile(r'^\s*"?([A-Za-z0-9_.-]+)"?\s*=\s*(.*)$')
+_QUOTED = re.compile(r'"([^"]*)"|\'([^\']*)\'')
+_VERSION_FIELD = re.compile(r'version\s*=\s*"([^"]*)"')
+_REQUIREMENT = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*)$")
+_JSON_OBJECT = re.compile(r'^\s*"((?:[^"\\]|\\.)*)"\s*:\s*\{\s*$')
+_JSON_SCALAR = re.compile(
+    r'^\s*"((?:[^"\\]|\\.)*)"\s*:\s*("(?:[^"\\]|\\.)*"|[^,{\[]+?),?\s*$'
+)
+_HUNK_RANGE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+class Manifest:
+    """Package versions read from one side of a lockfile or manifest."""
+
+    def __init__(self, packages: Dict[str, str], lines: Optional[Set[int]] = None):
+        """Initialize the manifest.
+
+        Args:
+            packages: Version (or version constraint) by package name
+            lines: Numbers of the lines that declare dependencies, or None
+                if every line of the file does (lockfiles)
+        """
+        self.packages = packages
+        self.lines = lines
+
+    def declares(self, line: int) -> bool:
+        """Check whether a line is part of the dependency declarations.
+
+        Args:
+            line: 1-based line number
+
+        Returns:
+            True if the line declares dependencies
+        """
+        return self.lines is None or line in self.lines
+
+
+class DependencyChanges:
+    """Packages added, bumped and removed between two manifests."""
+
+    def __init__(
+        self,
+        added: Dict[str, str],
+        bumped: Dict[str, Tuple[str, str]],
+        removed: Dict[str, str],
+    ):
+        """Initialize the changes.
+
+        Args:
+            added: Version by name of added packages
+            bumped: Old and new version by name of changed packages
+            removed: Version by name of removed packages
+        """
+        self.added = added
+        self.bumped = bumped
+        self.removed = removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.bumped or self.removed)
+
+    def describe(self, max_items: int = DEPENDENCY_SUMMARY_MAX_ITEMS) -> str:
+        """Describe the changes in one line.
+
+        Args:
+            max_items: Maximum number of packages to list
+
+        Returns:
+            E.g. ``added x 1.2, bumped y 3.4→3.5, removed z 0.1``
+        """
+        items = [
+            *(_join("added", name, v) for name, v in sorted(self.added.items())),
+            *(
+                _join("bumped", name, f"{old}{ARROW}{new}")
+                for name, (old, new) in sorted(self.bumped.items())
+            ),
+            *(_join("removed", name, v) for name, v in sorted(self.removed.items())),
+        ]
+        text = ", ".join(items[:max_items])
+        if len(items) > max_items:
+            text += f" and {len(items) - max_items} more"
+        return text
+
+
+def _join(action: str, name: str, version: str) -> str:
+    """Format one item of a change summary."""
+    return f"{action} {name} {version}".rstrip()
+
+
+def compare(old: Manifest, new: Manifest) -> DependencyChanges:
+    """Work out which packages changed between two manifests.
+
+    Args:
+        old: Manifest before the change
+        new: Manifest after the change
+
+    Returns:
+        The dependency changes
+    """
+    added = {n: v for n, v in new.packages.items() if n not in old.packages}
+    removed = {n: v for n, v in old.packages.items() if n not in new.packages}
+    bumped = {
+        name: (old.packages[name], version)
+        for name, version in new.packages.items()
+        if name in old.packages and old.packages[name] != version
+    }
+    return DependencyChanges(added, bumped, removed)
+
+
+def _add_version(packages: Dict[str, str], name: str, version: str) -> None:
+    """Record a package version, keeping all versions of repeated names."""
+    if name in packages and version not in packages[name].split(", "):
+        versions = sorted([*packages[name].split(", "), version])
+        packages[name] = ", ".join(versions)
+    else:
+        packages[name] = version
+
+
+def parse_toml_lock(lines: Iterable[str]) -> Manifest:
+    """Read package versions from a ``uv.lock`` or ``Cargo.lock``.
+
+    Both list packages as ``[[package]]`` tables starting with their
+    ``name`` and ``version``.
+
+    Args:
+        lines: Lines of the file
+
+    Returns:
+        The manifest
+    """
+    packages: Dict[str, str] = {}
+    name: Optional[str] = None
+    in_package = False
+    for line in lines:
+        table = _TOML_TABLE.match(line)
+        if table:
+            in_package = line.lstrip().startswith("[[") and table.group(1) == "package"
+            name = None
+            continue
+        if not in_package:
+            continue
+        field = _TOML_STRING.match(line)
+        if not field:
+            continue
+        key, value = field.groups()
+        if key == "name":
+            name = value
+        elif key == "version" and name is not None:
+            _add_version(packages, name, value)
+            in_package = False
+    return Manifest(packages)
+
+
+def _json_fields(lines: Iterable[str]) -> Iterable[Tuple[Tuple[str, ...], str, str]]:
+    """Yield the scalar fields of pretty-printed JSON with their object path.
+
+    The path leaves out the top-level object; objects in arrays are named
+    with an empty string.
+    """
+    path: List[str] = []
+    for line in lines:
+        stripped = line.strip()
+        obj = _JSON_OBJECT.match(line)
+        if obj:
+            path.append(obj.group(1))
+        elif stripped.startswith("}"):
+            if path:
+                path.pop()
+        elif stripped.endswith("{") or stripped.endswith("["):
+            # Anonymous or array-valued containers: track depth only
+            path.append("")
+        elif stripped.startswith("]"):
+            if path:
+                path.pop()
+        else:
+            field = _JSON_SCALAR.match(line)
+            if field:
+                yield tuple(path[1:]), field.group(1), field.group(2).strip('"')
+
+
+def parse_package_lock(lines: Iterable[str]) -> Manifest:
+    """Read package versions from a ``package-lock.json`` (version 2 or 3).
+
+    Args:
+        lines: Lines of the file
+
+    Returns:
+        The manifest
+    """
+    packages: Dict[str, str] = {}
+    for path, key, value in _json_fields(lines):
+        if key != "version" or len(path) != 2 or path[0] != "packages":
+            continue
+        _, marker, name = path[1].rpartition("node_modules/")
+        if marker:
+            _add_version(packages, name, value)
+    return Manifest(packages)
+
+
+def parse_flake_lock(lines: Iterable[str]) -> Manifest:
+    """Read the locked revisions of the inputs of a ``flake.lock``.
+
+    Args:
+        lines: Lines of the file
+
+    Returns:
+        The manifest, with short revisions (or ``lastModified``) as versions
+    """
+    revisions: Dict[str, str] = {}
+    modified: Dict[str, str] = {}
+    for path, key, value in _json_fields(lines):
+        if len(path) != 3 or path[0] != "nodes" or path[2] != "locked":
+            continue
+        if key == "rev":
+            revisions[path[1]] = value[:7]
+        elif key == "lastModified":
+            modified[path[1]] = value
+    return Manifest({**modified, **revisions})
+
+
+def _requirement(text: str) -> Optional[Tuple[str, str]]:
+    """Split a PEP 508 requirement into its name and version constraint."""
+    match = _REQUIREMENT.match(text)
+    if not match:
+        return None
+    name, _, spec = match.groups()
+    spec = spec.split(";")[0].strip()
+    if spec.startswith("(") and spec.endswith(")"):
+        spec = spec[1:-1].strip()
+    return name.lower().replace("_", "-"), spec
+
+
+def parse_pyproject(lines: Iterable[str]) -> Manifest:
+    """Read the declared dependencies of a ``pyproject.toml``.
+
+    Covers ``project.dependencies``, optional dependencies, dependency
+    groups and Poetry dependency tables. Dependencies outside the main
+    list are named with their group, e.g. ``pytest (dev)``.
+
+    Args:
+        lines: Lines of the file
+
+    Returns:
+        The manifest, with version constraints as versions and the
+        numbers of the lines that declare them
+    """
+    packages: Dict[str, str] = {}
+    declaring: Set[int] = set()
+    table = ""
+    group: Optional[str] = None  # Open dependency array, if any
+
+    def add(requirement: str, group: str) -> None:
+        parsed = _requirement(requirement)
+        if parsed:
+            name, spec = parsed
+            packages[name if group == "main" else f"{name} ({group})"] = spec
+
+    for number, line in enumerate(lines, start=1):
+        if group is not None:
+            declaring.add(number)
+            code = line.split("#")[0]
+            for match in _QUOTED.finditer(code):
+                add(match.group(1) or match.group(2) or "", group)
+            if "]" in _QUOTED.sub("", code):
+                group = None
+            continue
+
+        header = _TOML_TABLE.match(line)
+        if header:
+            table = header.group(1)
+            continue
+
+        array = _TOML_ARRAY_START.match(line)
+        if array:
+            key = array.group(1)
+            if table == "project" and key == "dependencies":
+                group = "main"
+            elif table in ("project.optional-dependencies", "dependency-groups"):
+                group = key
+            elif table == "build-system" and key == "requires":
+                group = "build"
+            if group is not None:
+                # The array may open and close on this line
+                declaring.add(number)
+                code = line.split("#")[0][array.end() :]
+                for match in _QUOTED.finditer(code):
+                    add(match.group(1) or match.group(2) or "", group)
+                if "]" in _QUOTED.sub("", code):
+                    group = None
+            continue
+
+        if table.startswith("tool.poetry") and table.endswith("dependencies"):
+            field = _TOML_KEY.match(line)
+            if not field or field.group(1) == "python":
+                continue
+            name, value = field.groups()
+            poetry_group = table.split(".")[3] if table.count(".") >= 4 else "main"
+            if table == "tool.poetry.dev-dependencies":
+                poetry_group = "dev"
+            version = _VERSION_FIELD.search(value)
+            quoted = _QUOTED.match(value.strip())
+            spec = version.group(1) if version else quoted.group(1) if quoted else ""
+            add(f"{name} {spec}", poetry_group)
+            declaring.add(number)
+
+    return Manifest(packages, declaring)
+
+
+# Parsers by file name
+PARSERS: Dict[str, Callable[[Iterable[str]], Manifest]] = {
+    "uv.lock": parse_toml_lock,
+    "Cargo.lock": parse_toml_lock,
+    "package-lock.json": parse_package_lock,
+    "flake.lock": parse_flake_lock,
+    "pyproject.toml": parse_pyproject,
+}
+
+
+def find_parser(path: str) -> Optional[Callable[[Iterable[str]], Manifest]]:
+    """Get the parser for a lockfile or manifest path.
+
+    Args:
+        path: File path relative to the repository root
+
+    Returns:
+        The parser, or None if the file is not a known lockfile or manifest
+    """
+    return PARSERS.get(posixpath.basename(path))
+
+
+class DependencySummary:
+    """Dependency changes of one file, and which of its hunks they cover."""
+
+    def __init__(self, changes: DependencyChanges, old: Manifest, new: Manifest):
+        """Initialize the summary.
+
+        Args:
+            changes: Packages added, bumped and removed
+            old: Manifest before the change
+            new: Manifest after the change
+        """
+        self.changes = changes
+        self._old = old
+        self._new = new
+
+    def covers(self, hunk: Hunk) -> bool:
+        """Check whether a hunk only changes dependency declarations.
+
+        Args:
+            hunk: Hunk of the summarized file
+
+        Returns:
+            True if every added and removed line of the hunk declares
+            dependencies, so the summary can stand in for the hunk
+        """
+        match = _HUNK_RANGE.match(hunk.header)
+        if not match:
+            return False
+        old_line, new_line = int(match.group(1)), int(match.group(2))
+        for line in hunk.lines:
+            if line.startswith("-"):
+                if not self._old.declares(old_line):
+                    return False
+                old_line += 1
+            elif line.startswith("+"):
+                if not self._new.declares(new_line):
+                    return False
+                new_line += 1
+            elif not line.startswith("\\"):
+                old_line += 1
+                new_line += 1
+        return True
+
+    def render(self, file_diff: FileDiff) -> str:
+        """Render a file diff with the covered hunks replaced by the summary.
+
+        Args:
+            file_diff: The summarized file diff
+
+        Returns:
+            Diff text with the file header, the summary and the hunks the
+            summary does not cover
+        """
+        kept = [hunk.text for hunk in file_diff.hunks if not self.covers(hunk)]
+        summary = f"[dependencies: {self.changes.describe()}]"
+        return "\n".join([file_diff.header, summary, *kept])
+
+
+def summarize_file(
+    file_diff: FileDiff, read_blob: Callable[[str], Iterable[str]]
+) -> Optional[DependencySummary]:
+    """Summarize the dependency changes of a lockfile or manifest diff.
+
+    Args:
+        file_diff: File diff of the lockfile or manifest
+        read_blob: Function streaming the lines of a blob by its ID
+
+    Returns:
+        The summary, or None if the file is not a known lockfile or
+        manifest, its blobs are unknown, or no dependency changed
+    """
+    parse = find_parser(file_diff.path)
+    blobs = file_diff.blobs
+    if parse is None or blobs is None or file_diff.binary:
+        return None
+    old_blob, new_blob = blobs
+    old = parse(read_blob(old_blob)) if file_diff.status != ADDED else Manifest({})
+    new = parse(read_blob(new_blob)) if file_diff.status != DELETED else Manifest({})
+    changes = compare(old, new)
+    if not changes:
+        return None
+    return DependencySummary(changes, old, new)
@@ -0,0 +1,384 @@
+"""Parsing of unified git diffs into compact, offset-based records."""
+
+from typing import List, Optional, Sequence, Tuple
+
+# File statuses, as reported by ``git diff --name-status``
+ADDED, DELETED, MODIFIED, RENAMED, COPIED = "A", "D", "M", "R", "C"
+
+STATUS_NAMES = {
+    ADDED: "added",
+    DELETED: "deleted",
+    RENAMED: "renamed",
+    COPIED: "copied",
+}
+
+
+class Hunk:
+    """One hunk of a file diff, as offsets into the parsed diff text.
+
+    The hunk spans from its ``@@ -a,b +c,d @@`` line to the end of its last
+    line. Nothing is copied out of the source text until ``header``,
+    ``lines`` or ``text`` is asked for.
+    """
+
+    __slots__ = ("_source", "start", "header_end", "end", "added", "removed")
+
+    def __init__(
+        self,
+        source: str,
+        start: int,
+        header_end: int,
+        end: int,
+        added: int = 0,
+        removed: int = 0,
+    ):
+        """Initialize the hunk.
+
+        Args:
+            source: The whole diff text
+            start: Offset of the ``@@`` line
+            header_end: Offset of the end of the ``@@`` line
+            end: Offset of the end of the hunk's last line
+            added: Number of added lines
+            removed: Number of removed lines
+        """
+        self._source = source
+        self.start = start
+        self.header_end = header_end
+        self.end = end
+        self.added = added
+        self.removed = removed
+
+    @property
+    def header(self) -> str:
+        """Get the ``@@ -a,b +c,d @@`` line.
+
+        Returns:
+            Hunk header
+        """
+        return self._source[self.start : self.header_end]
+
+    @property
+    def lines(self) -> List[str]:
+        """Get the context, added and removed lines of the hunk.
+
+        Returns:
+            Lines after the header
+        """
+        if self.end <= self.header_end:
+            return []
+        return self._source[self.header_end + 1 : self.end].split("\n")
+
+    @property
+    def text(self) -> str:
+        """Get the hunk as diff text.
+
+        Returns:
+            Header and lines joined by newlines
+        """
+        return self._source[self.start : self.end]
+
+    @property
+    def size(self) -> int:
+        """Get the length of the hunk text without building it.
+
+        Returns:
+            Number of characters
+        """
+        return self.end - self.start
+
+
+class FileDiff:
+    """The diff of a single file, as offsets into the parsed diff text.
+
+    Path, status, rename source and binary flag are resolved while parsing.
+    A file diff may hold only some of the parsed hunks (see ``with_hunks``),
+    in which case its text is assembled from the header and those hunks.
+    """
+
+    __slots__ = (
+        "_source",
+        "start",
+        "header_end",
+        "end",
+        "hunks",
+        "path",
+        "old_path",
+        "status",
+        "binary",
+        "_whole",
+    )
+
+    def __init__(
+        self,
+        source: str,
+        start: int,
+        header_end: int,
+        end: int,
+        hunks: Optional[List[Hunk]] = None,
+        path: str = "",
+        old_path: Optional[str] = None,
+        status: str = MODIFIED,
+        binary: bool = False,
+    ):
+        """Initialize the file diff.
+
+        Args:
+            source: The whole diff text
+            start: Offset of the ``diff --git`` line
+            header_end: Offset of the end of the last header line
+            end: Offset of the end of the file's last line
+            hunks: Hunks of the file
+            path: Path of the file after the change
+            old_path: Path before the change, if it was renamed or copied
+            status: One of ``ADDED``, ``DELETED``, ``MODIFIED``, ``RENAMED``
+                or ``COPIED``
+            binary: Whether git reported the file as binary
+        """
+        self._source = source
+        self.start = start
+        self.header_end = header_end
+        self.end = end
+        self.hunks = hunks if hunks is not None else []
+        self.path = path
+        self.old_path = old_path
+        self.status = status
+        self.binary = binary
+        self._whole = True
+
+    def with_hunks(self, hunks: Sequence[Hunk]) -> "FileDiff":
+        """Get a file diff with the same header and only some hunks.
+
+        Args:
+            hunks: Hunks of this file to keep, in order
+
+        Returns:
+            A new file diff sharing the source text
+        """
+        part = FileDiff(
+            self._source,
+            self.start,
+            self.header_end,
+            self.end,
+            list(hunks),
+            self.path,
+            self.old_path,
+            self.status,
+            self.binary,
+        )
+        part._whole = len(part.hunks) == len(self.hunks) and self._whole
+        return part
+
+    @property
+    def header_lines(self) -> List[str]:
+        """Get the lines from ``diff --git`` up to the first hunk.
+
+        Returns:
+            Header lines
+        """
+        return self.header.split("\n")
+
+    @property
+    def header(self) -> str:
+        """Get the file header as diff text.
+
+        Returns:
+            Header lines joined by newlines
+        """
+        return self._source[self.start : self.header_end]
+
+    @property
+    def blobs(self) -> Optional[Tuple[str, str]]:
+        """Get the (abbreviated) blob IDs from the ``index`` header line.
+
+        Returns:
+            IDs of the old and new blob, or None if the header has none
+            (e.g. pure renames); the missing side of an added or deleted
+            file is all zeros
+        """
+        for line in self.header_lines[1:]:
+            if line.startswith("index "):
+                old, _, new = line[len("index ") :].split(" ")[0].partition("..")
+                return (old, new) if new else None
+        return None
+
+    @property
+    def added(self) -> int:
+        """Get the number of added lines across all hunks.
+
+        Returns:
+            Added line count
+        """
+        return sum(hunk.added for hunk in self.hunks)
+
+    @property
+    def removed(self) -> int:
+        """Get the number of removed lines across all hunks.
+
+        Returns:
+            Removed line count
+        """
+        return sum(hunk.removed for hunk in self.hunks)
+
+    @property
+    def text(self) -> str:
+        """Get the file diff as diff text.
+
+        Returns:
+            Header and hunks joined by newlines
+        """
+        if self._whole:
+            return self._source[self.start : self.end]
+        return "\n".join([self.header, *(hunk.text for hunk in self.hunks)])
+
+    @property
+    def size(self) -> int:
+        """Get the length of the file diff text without building it.
+
+        Returns:
+            Number of characters
+        """
+        if self._whole:
+            return self.end - self.start
+        return self.header_end - self.start + sum(h.size + 1 for h in self.hunks)
+
+
+def list_paths(paths: Sequence[str], max_paths: int) -> str:
+    """Join paths for notes and markers, listing at most ``max_paths`` of them.
+
+    Args:
+        paths: File paths
+        max_paths: Maximum number of paths to list
+
+    Returns:
+        Comma-separated paths, with a count of the ones not listed
+    """
+    listed = ", ".join(paths[:max_paths])
+    if len(paths) > max_paths:
+        listed += f" and {len(paths) - max_paths} more"
+    return listed
+
+
+def _strip_prefix(path: str, prefix: str) -> str:
+    """Remove a ``a/``/``b/`` diff prefix from a path."""
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+def _unprefixed_path(line: str) -> str:
+    """Get the new path from a ``diff --git`` line without a/ and b/ prefixes."""
+    paths = line[len("diff --git ") :]
+    half = len(paths) // 2
+    if paths[half : half + 1] == " " and paths[:half] == paths[half + 1 :]:
+        return paths[:half]
+    return paths.rsplit(" ", 1)[-1]
+
+
+def _uses_prefixes(line: str) -> bool:
+    """Check whether a ``diff --git`` line has git's a/ and b/ path prefixes.
+
+    Compacted diffs drop the prefixes, and then a path may itself start with
+    ``a/`` or ``b/`` as a real top-level directory.
+    """
+    return line.startswith("diff --git a/") and " b/" in line
+
+
+def _describe_file(file_diff: FileDiff) -> None:
+    """Resolve the path, status and binary flag of a file from its header."""
+    values = {}
+    status = MODIFIED
+    for line in file_diff.header_lines[1:]:
+        if line.startswith("new file"):
+            status = ADDED
+        elif line.startswith("deleted file"):
+            status = DELETED
+        elif line.startswith("rename from "):
+            status = RENAMED
+        elif line.startswith("copy from "):
+            status = COPIED
+        elif line.startswith("Binary files ") or line == "GIT binary patch":
+            file_diff.binary = True
+        for prefix in (
+            "+++ ",
+            "--- ",
+            "rename from ",
+            "rename to ",
+            "copy from ",
+            "copy to ",
+        ):
+            if line.startswith(prefix) and prefix not in values:
+                values[prefix] = line[len(prefix) :].rstrip("\t")
+
+    first = file_diff.header_lines[0]
+    prefixed = _uses_prefixes(first)
+    new_path = values.get("+++ ")
+    old_path = values.get("--- ")
+    if new_path and new_path != "/dev/null":
+        path = _strip_prefix(new_path, "b/") if prefixed else new_path
+    elif "rename to " in values or "copy to " in values:
+        path = values.get("rename to ") or values["copy to "]
+    elif old_path and old_path != "/dev/null":
+        path = _strip_prefix(old_path, "a/") if prefixed else old_path
+    elif prefixed:
+        # Header without ---/+++ lines, e.g. binary files or mode changes
+        path = first.partition(" b/")[2]
+    else:
+        path = _unprefixed_path(first)
+
+    file_diff.path = path
+    file_diff.status = status
+    if status in (RENAMED, COPIED):
+        file_diff.old_path = values.get("rename from ") or values.get("copy from ")
+
+
+def parse_diff(diff: str) -> List[FileDiff]:
+    """Split a unified git diff into files and hunks in one pass.
+
+    The records hold offsets into ``diff`` rather than copies of its
+    lines. Text before the first ``diff --git`` line is ignored.
+
+    Args:
+        diff: Output of ``git diff``
+
+    Returns:
+        File diffs in the order they appear
+    """
+    files: List[FileDiff] = []
+    current: Optional[FileDiff] = None
+    hunk: Optional[Hunk] = None
+    length = len(diff)
+    pos = 0
+
+    def close_file() -> None:
+        if current is not None:
+            _describe_file(current)
+
+    while pos < length:
+        newline = diff.find("\n", pos)
+        line_end = length if newline == -1 else newline
+
+        if diff.startswith("diff --git ", pos):
+            close_file()
+            current = FileDiff(diff, pos, line_end, line_end)
+            files.append(current)
+            hunk = None
+        elif current is None:
+            pass
+        elif diff.startswith("@@", pos):
+            hunk = Hunk(diff, pos, line_end, line_end)
+            current.hunks.append(hunk)
+            current.end = line_end
+        elif hunk is not None:
+            if diff.startswith("+", pos):
+                hunk.added += 1
+            elif diff.startswith("-", pos):
+                hunk.removed += 1
+            hunk.end = line_end
+            current.end = line_end
+        else:
+            current.header_end = line_end
+            current.end = line_end
+
+        pos = line_end + 1
+
+    close_file()
+    return files
@@ -0,0 +1,185 @@
+"""Incremental reading of staged changes from a git pipe, within a size limit."""
+
+from typing import IO, List
+
+from ..constants import DIFF_MAX_BYTES, DIFF_MAX_FILE_BYTES, DIFF_MAX_LINE_BYTES
+
+LINE_TRUNCATED_MARKER = b" [... line truncated ...]\n"
+
+
+def _format_size(size: int) -> str:
+    """Format a byte count for markers and warnings."""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MiB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size} B"
+
+
+class StagedChanges:
+    """File status and patch of the staged changes, possibly cut short."""
+
+    def __init__(
+        self,
+        files_status: str,
+        diff: str,
+        files_total: int,
+        files_read: int,
+        bytes_skipped: int = 0,
+        files_reduced: int = 0,
+    ):
+        """Initialize the staged changes.
+
+        Args:
+            files_status: One ``<status> <path>`` line per staged file
+            diff: Patch text that was kept
+            files_total: Number of staged files
+            files_read: Number of files whose patch was read
+            bytes_skipped: Bytes of patch lines that were read but not kept
+            files_reduced: Number of files whose patch was read without
+                context lines to fit the size limit
+        """
+        self.files_status = files_status
+        self.diff = diff
+        self.files_total = files_total
+        self.files_read = files_read
+        self.bytes_skipped = bytes_skipped
+        self.files_reduced = files_reduced
+
+    @property
+    def truncated(self) -> bool:
+        """Check whether any part of the patch was left out.
+
+        Returns:
+            True if files, lines or context were not kept
+        """
+        return (
+            self.files_read < self.files_total
+            or self.bytes_skipped > 0
+            or self.files_reduced > 0
+        )
+
+    def describe(self) -> str:
+        """Describe what was left out, for warnings.
+
+        Returns:
+            Summary of the left-out content, or an empty string if none was
+        """
+        if not self.truncated:
+            return ""
+        parts = []
+        if self.files_read < self.files_total:
+            parts.append(
+                f"only {self.files_read} of {self.files_total} files were read"
+            )
+        if self.bytes_skipped:
+            parts.append(
+                f"{_format_size(self.bytes_skipped)} of oversized files and lines "
+                "were left out"
+            )
+        if self.files_reduced:
+            parts.append(f"{self.files_reduced} files were read without context")
+        return f"The staged diff exceeds the size limit: {', '.join(parts)}."
+
+
+def _status_line(raw_line: bytes) -> str:
+    """Turn a ``--raw`` line into the ``--name-status`` form, space-separated."""
+    meta, _, paths = raw_line.rstrip(b"\n").decode("utf-8", "replace").partition("\t")
+    status = meta.rsplit(" ", 1)[-1]
+    return " ".join([status, *paths.split("\t")])
+
+
+def read_patch_with_raw(
+    stream: IO[bytes],
+    max_bytes: int = DIFF_MAX_BYTES,
+    max_file_bytes: int = DIFF_MAX_FILE_BYTES,
+    max_line_bytes: int = DIFF_MAX_LINE_BYTES,
+) -> StagedChanges:
+    """Read ``git diff --patch-with-raw`` output file by file within limits.
+
+    The raw section lists every staged file and is always read in full.
+    Patch lines are kept until a file's diff reaches ``max_file_bytes``;
+    the rest of that file is read past and replaced by a marker. Reading
+    stops at the first file that starts once ``max_bytes`` are kept, so
+    the caller can stop the producer. Lines longer than ``max_line_bytes``
+    (e.g. minified assets) are cut, without ever being held in full. Bytes
+    are decoded once at the end, replacing invalid UTF-8.
+
+    Args:
+        stream: Binary output of the command
+        max_bytes: Patch bytes to keep in total
+        max_file_bytes: Patch bytes to keep per file
+        max_line_bytes: Bytes to keep of a single line
+
+    Returns:
+        The staged changes, with ``files_read`` telling how far reading got
+    """
+    status_lines: List[str] = []
+    kept: List[bytes] = []
+    kept_bytes = 0
+    file_bytes = 0
+    files_read = 0
+    bytes_skipped = 0
+    file_skipped_lines = 0
+    in_patch = False
+    stopped = False
+
+    def end_file() -> None:
+        nonlocal file_skipped_lines
+        if file_skipped_lines:
+            kept.append(
+                f"[... {file_skipped_lines} more lines of this file not read ...]\n".encode()
+            )
+            file_skipped_lines = 0
+
+    while True:
+        line = stream.readline(max_line_bytes)
+        if not line:
+            break
+        if len(line) == max_line_bytes and not line.endswith(b"\n"):
+            # Read past the rest of an overlong line
+            skipped = 0
+            rest = line
+            while rest and not rest.endswith(b"\n"):
+                rest = stream.readline(max_line_bytes)
+                skipped += len(rest)
+            if skipped:
+                bytes_skipped += skipped
+                line += LINE_TRUNCATED_MARKER
+
+        if not in_patch:
+            if line.startswith(b":"):
+                status_lines.append(_status_line(line))
+                continue
+            in_patch = True
+            if line == b"\n":
+                continue
+
+        if line.startswith(b"diff --git "):
+            end_file()
+            if kept_bytes >= max_bytes:
+                stopped = True
+                break
+            files_read += 1
+            file_bytes = 0
+
+        if file_bytes + len(line) > max_file_bytes or kept_bytes >= max_bytes:
+            file_skipped_lines += 1
+            bytes_skipped += len(line)
+            continue
+        kept.append(line)
+        file_bytes += len(line)
+        kept_bytes += len(line)
+
+    end_file()
+    files_total = max(len(status_lines), files_read)
+    if stopped:
+        kept.append(
+            f"[... {files_total - files_read} more files not read: "
+            f"diff size limit of {_format_size(max_bytes)} reached ...]\n".encode()
+        )
+
+    diff = b"".join(kept).rstrip().decode("utf-8", "replace")
+    return StagedChanges(
+        "\n".join(status_lines), diff, files_total, files_read, bytes_skipped
+    )
@@ -0,0 +1,324 @@
+"""Filtering of generated, vendored and lock files out of the staged diff."""
+
+import fnmatch
+import posixpath
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..constants import DEFAULT_EXCLUDE_PATTERNS
+from ..exceptions import GitError
+from .dependencies import DependencySummary, summarize_file
+from .diff import STATUS_NAMES, FileDiff, list_paths
+from .git import GitUtils
+from .reducers import Reduction, reduce_files
+
+# Git attributes that mark files whose diffs say little about a commit
+FILTER_ATTRIBUTES = ("linguist-generated", "linguist-vendored", "diff")
+
+
+def matches_pattern(path: str, pattern: str) -> bool:
+    """Check a path against a glob, gitignore style.
+
+    Patterns without a slash match the file name in any directory, and
+    patterns ending in a slash match everything below a directory.
+
+    Args:
+        path: File path relative to the repository root
+        pattern: Glob pattern
+
+    Returns:
+        True if the path matches
+    """
+    if pattern.endswith("/"):
+        directory = pattern.rstrip("/")
+        if "/" not in directory:
+            return directory in path.split("/")[:-1]
+        return fnmatch.fnmatchcase(path, f"{directory}/*")
+    if "/" not in pattern:
+        return fnmatch.fnmatchcase(posixpath.basename(path), pattern)
+    return fnmatch.fnmatchcase(path, pattern.lstrip("/"))
+
+
+def _is_true(value: Optional[str]) -> bool:
+    """Check whether a ``git check-attr`` value sets an attribute."""
+    return value in ("set", "true")
+
+
+def _is_false(value: Optional[str]) -> bool:
+    """Check whether a ``git check-attr`` value explicitly clears an attribute."""
+    return value in ("unset", "false")
+
+
+def stub(
+    file_diff: FileDiff, reason: str, summary: Optional[DependencySummary] = None
+) -> str:
+    """Replace a file's diff with its first header line and a summary.
+
+    Args:
+        file_diff: File diff to replace
+        reason: Why the diff was left out
+        summary: Dependency changes of the file, if it is a lockfile
+
+    Returns:
+        Diff text naming the file with its status and line counts
+    """
+    last = file_diff.header_lines[-1]
+    if not file_diff.hunks and last.startswith("[... ") and "diff left out" in last:
+        # The patch was never read, and the stub has the line counts
+        line = last
+    else:
+        status = STATUS_NAMES.get(file_diff.status, "modified")
+        if file_diff.old_path:
+            status += f" from {file_diff.old_path}"
+        counts = (
+            "binary"
+            if file_diff.binary
+            else (f"+{file_diff.added} -{file_diff.removed} lines")
+        )
+        line = (
+            f"[... {file_diff.path} ({status}, {counts}): diff left out, {reason} ...]"
+        )
+    text = f"{file_diff.header_lines[0]}\n{line}"
+    if summary is not None:
+        text += f"\n[dependencies: {summary.changes.describe()}]"
+    return text
+
+
+class FilteredDiff:
+    """A diff with the diffs of some files replaced by stubs."""
+
+    def __init__(
+        self,
+        text: str,
+        filtered: List[Tuple[str, str]],
+        summarized: Optional[List[str]] = None,
+        reduced: Optional[List[str]] = None,
+    ):
+        """Initialize the filtered diff.
+
+        Args:
+            text: Diff text with stubs in place of the filtered files
+            filtered: Pairs of (path, reason) of the filtered files
+            summarized: Paths of lockfiles and manifests whose dependency
+                changes were summarized
+            reduced: Paths of notebooks and data files that were reduced
+        """
+        self.text = text
+        self.filtered = filtered
+        self.summarized = summarized or []
+        self.reduced = reduced or []
+
+    @property
+    def changed(self) -> bool:
+        """Check whether the diff differs from the staged diff.
+
+        Returns:
+            True if any file was filtered, summarized or reduced
+        """
+        return bool(self.filtered or self.summarized or self.reduced)
+
+    def describe(self, max_paths: int = 5) -> str:
+        """Describe what was filtered, for notes.
+
+        Args:
+            max_paths: Maximum number of file paths to list
+
+        Returns:
+            Summary of the filtered, summarized and reduced files, or an
+            empty string if there were none
+        """
+        parts = []
+        if self.filtered:
+            paths = [path for path, _ in self.filtered]
+            noun = "file" if len(paths) == 1 else "files"
+            parts.append(
+                f"Left out the diffs of {len(paths)} generated {noun}: "
+                f"{list_paths(paths, max_paths)}"
+            )
+        if self.summarized:
+            parts.append(
+                "Summarized dependency changes in "
+                f"{list_paths(self.summarized, max_paths)}"
+            )
+        if self.reduced:
+            parts.append(
+                "Reduced notebooks and data files to their changes in "
+                f"{list_paths(self.reduced, max_paths)}"
+            )
+        return "\n".join(parts)
+
+
+class DiffFilter:
+    """Decide which files' diffs are left out of the prompt.
+
+    A file is left out if git attributes mark it ``linguist-generated``,
+    ``linguist-vendored`` or ``-diff``, or if its path matches one of the
+    exclude patterns. ``linguist-generated=false`` or
+    ``linguist-vendored=false`` keeps a file that a pattern would exclude.
+
+    Lockfiles and manifests are also summarized as a list of added,
+    bumped and removed packages, which goes into the stub of a filtered
+    lockfile or in place of the hunks that only change dependencies.
+    Notebooks and data files that are not filtered are reduced to their
+    source cell, schema and row count changes.
+    """
+
+    def __init__(
+        self,
+        patterns: Sequence[str] = DEFAULT_EXCLUDE_PATTERNS,
+        use_attributes: bool = True,
+    ):
+        """Initialize the filter.
+
+        Args:
+            patterns: Glob patterns of files to leave out
+            use_attributes: Whether to honour git attributes
+        """
+        self.patterns = list(patterns)
+        self.use_attributes = use_attributes
+        # Attributes already looked up, so filter_repo reuses those of left_out
+        self._attributes_repo: Optional[GitUtils] = None
+        self._attributes: Dict[str, Dict[str, str]] = {}
+
+    def reason(
+        self, path: str, attributes: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """Get why a file's diff should be left out.
+
+        Args:
+            path: File path relative to the repository root
+            attributes: Values of ``FILTER_ATTRIBUTES`` for the file
+
+        Returns:
+            Reason to leave the diff out, or None to keep it
+        """
+        attributes = attributes or {}
+        generated = attributes.get("linguist-generated")
+        vendored = attributes.get("linguist-vendored")
+        if _is_true(generated):
+            return "marked linguist-generated"
+        if _is_true(vendored):
+            return "marked linguist-vendored"
+        if _is_false(attributes.get("diff")):
+            return "marked -diff"
+        if _is_false(generated) or _is_false(vendored):
+            return None
+        for pattern in self.patterns:
+            if matches_pattern(path, pattern):
+                return f"matches {pattern}"
+        return None
+
+    def left_out(self, repo: GitUtils, paths: Sequence[str]) -> Dict[str, str]:
+        """Get why files' diffs should be left out, before reading them.
+
+        Args:
+            repo: Repository with staged changes
+            paths: File paths relative to the repository root
+
+        Returns:
+            Reasons to leave the diffs out, by path of the files to leave out
+        """
+        attributes = self._check_attr(repo, paths)
+        reasons = {}
+        for path in paths:
+            reason = self.reason(path, attributes.get(path))
+            if reason is not None:
+                reasons[path] = reason
+        return reasons
+
+    def _check_attr(
+        self, repo: GitUtils, paths: Sequence[str]
+    ) -> Dict[str, Dict[str, str]]:
+        """Look up the filter attributes of files, once per file and repository.
+
+        Args:
+            repo: Repository with staged changes
+            paths: File paths relative to the repository root
+
+        Returns:
+            Attribute values by path, empty if attributes are not honoured
+        """
+        if not self.use_attributes:
+            return {}
+        if self._attributes_repo is not repo:
+            self._attributes_repo, self._attributes = repo, {}
+        missing = [path for path in paths if path not in self._attributes]
+        if missing:
+            found = repo.check_attr(missing, FILTER_ATTRIBUTES)
+            for path in missing:
+                self._attributes[path] = found.get(path, {})
+        return {path: self._attributes[path] for path in paths}
+
+    def apply(
+        self,
+        files: Sequence[FileDiff],
+        attributes: Optional[Dict[str, Dict[str, str]]] = None,
+        summaries: Optional[Dict[str, DependencySummary]] = None,
+        reductions: Optional[Dict[str, Reduction]] = None,
+    ) -> FilteredDiff:
+        """Replace the diffs of filtered files by stubs.
+
+        Args:
+            files: Parsed file diffs
+            attributes: Attribute values by file path
+            summaries: Dependency changes by lockfile or manifest path
+            reductions: Reduced diffs by notebook or data file path
+
+        Returns:
+            The filtered diff
+        """
+        attributes = attributes or {}
+        summaries = summaries or {}
+        reductions = reductions or {}
+        parts: List[str] = []
+        filtered: List[Tuple[str, str]] = []
+        summarized: List[str] = []
+        reduced: List[str] = []
+        for file_diff in files:
+            reason = self.reason(file_diff.path, attributes.get(file_diff.path))
+            summary = summaries.get(file_diff.path)
+            if summary is not None:
+                summarized.append(file_diff.path)
+            if reason is not None:
+                parts.append(stub(file_diff, reason, summary))
+                filtered.append((file_diff.path, reason))
+            elif summary is not None:
+                parts.append(summary.render(file_diff))
+            elif file_diff.path in reductions:
+                parts.append(reductions[file_diff.path].render(file_diff))
+                reduced.append(file_diff.path)
+            else:
+                parts.append(file_diff.text)
+        return FilteredDiff("\n".join(parts), filtered, summarized, reduced)
+
+    def filter_repo(self, repo: GitUtils) -> FilteredDiff:
+        """Filter the staged diff of a repository.
+
+        Args:
+            repo: Repository with staged changes
+
+        Returns:
+            The filtered diff, or the staged diff itself if nothing was filtered
+        """
+        files = repo.files
+        attributes = self._check_attr(repo, [file_diff.path for file_diff in files])
+        summaries = {}
+        for file_diff in files:
+            try:
+                summary = summarize_file(file_diff, repo.blob_lines)
+            except GitError:
+                # The raw diff (or stub) still describes the file
+                continue
+            if summary is not None:
+                summaries[file_diff.path] = summary
+        kept = [
+            file_diff
+            for file_diff in files
+            if file_diff.path not in summaries
+            and self.reason(file_diff.path, attributes.get(file_diff.path)) is None
+        ]
+        reductions = reduce_files(kept, repo.blob_lines)
+        result = self.apply(files, attributes, summaries, reductions)
+        if not result.changed:
+            # Keep the original text rather than a rebuilt copy of it
+            result.text = repo.diff
+        return result
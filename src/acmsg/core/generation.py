@@ -1,34 +1,105 @@
 """Message generation functionality for acmsg."""
 
-from ..api.openrouter import OpenRouterClient
+import asyncio
+import hashlib
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from ..api.async_openrouter import AsyncOpenRouterClient
+from ..api.openrouter import BaseOpenRouterClient, ModelChain, OpenRouterClient
+from ..constants import MAP_CHUNK_TOKENS, MAP_MAX_WORKERS, PROMPT_OVERHEAD_TOKENS
 from ..exceptions import AcmsgError
 from ..templates import renderer
+from .allocator import DiffAllocation, allocate_diff
+from .cache import ResponseCache
+from .chunks import DiffChunk, split_diff
+from .diff import FileDiff, parse_diff
 
 
 class CommitMessageGenerator:
-    """Generate commit messages from git changes."""
+    """Generate commit messages from git changes.
+
+    Attributes:
+        notes: Warnings about diffs that were cut down or summarized to fit
+            the model's context, for the caller to show
+    """
 
-    def __init__(self, api_token: str, model: str, temperature: float):
+    def __init__(
+        self,
+        api_token: str,
+        model: ModelChain,
+        temperature: float,
+        cache: Optional[ResponseCache] = None,
+        summary_cache: Optional[ResponseCache] = None,
+        map_reduce: Optional[bool] = None,
+        max_workers: int = MAP_MAX_WORKERS,
+        symbols: Optional[Callable[[FileDiff], Optional[str]]] = None,
+        **client_options: Any,
+    ):
         """Initialize the commit message generator.
 
+        Diffs too large for the model's context are either cut down to the
+        hunks that fit, or summarized part by part ("map") with the message
+        written from the summaries ("reduce"). By default map-reduce is used
+        when cutting down would leave hunks out of a file that ``symbols``
+        cannot summarize.
+
         Args:
             api_token: OpenRouter API token
-            model: Model ID to use for generation
+            model: Model ID, or ordered list of model IDs to fall back through
             temperature: Temperature to use for generation
+            cache: Cache of previously generated messages (disabled if None)
+            summary_cache: Cache of diff part summaries (disabled if None)
+            map_reduce: Always (True), never (False) or automatically (None)
+                summarize the diff in parts
+            max_workers: Maximum number of parts summarized at once
+            symbols: Function summarizing a file's changes by the symbols
+                they touch, for files that lose hunks when the diff is cut
+                down (see ``SymbolSummarizer.describe``)
+            **client_options: Extra keyword arguments for the OpenRouterClient
         """
         if not api_token:
             raise AcmsgError("API token is required")
 
-        self._api_client = OpenRouterClient(api_token)
+        self._api_client = OpenRouterClient(api_token, **client_options)
         self._model = model
         self._temperature = temperature
+        self._cache = cache
+        self._summary_cache = summary_cache
+        self._map_reduce = map_reduce
+        self._max_workers = max_workers
+        self._symbols = symbols
+        self.notes: List[str] = []
+
+    def _cache_key(
+        self, tree: Optional[str], system_prompt: str, user_prompt: str
+    ) -> Optional[str]:
+        """Get the response cache key, or None if caching is not possible."""
+        if self._cache is None or not tree:
+            return None
+        return ResponseCache.key(
+            tree, system_prompt, user_prompt, self._model, self._temperature
+        )
 
-    def generate(self, git_status: str, git_diff: str) -> str:
+    def generate(
+        self, git_status: str, git_diff: str, tree: Optional[str] = None
+    ) -> str:
         """Generate a commit message from git status and diff.
 
         Args:
             git_status: Output of git status command
             git_diff: Output of git diff command
+            tree: Hash of the staged tree, used to look up cached messages
 
         Returns:
             Generated commit message
@@ -36,15 +107,447 @@ class CommitMessageGenerator:
         Raises:
             AcmsgError: If the generation fails
         """
-        system_prompt = renderer.render_system_prompt()
-        user_prompt = renderer.render_user_prompt(status=git_status, diff=git_diff)
+        system_prompt, user_prompt = _render_prompts(git_status, git_diff)
 
-        return self._api_client.generate_completion(
+        cache = self._cache
+        key = self._cache_key(tree, system_prompt, user_prompt)
+        if cache is not None and key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        user_prompt = self._fit_prompt(git_status, git_diff, system_prompt, user_prompt)
+        message = self._api_client.generate_completion(
             model=self._model,
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             temperature=self._temperature,
         )
+        if cache is not None and key is not None:
+            cache.put(key, message)
+        return message
+
+    def generate_stream(
+        self, git_status: str, git_diff: str, tree: Optional[str] = None
+    ) -> Iterator[str]:
+        """Generate a commit message, yielding text chunks as they arrive.
+
+        A cached message is yielded as a single chunk. A streamed message is
+        only cached once the stream has been consumed completely.
+
+        Args:
+            git_status: Output of git status command
+            git_diff: Output of git diff command
+            tree: Hash of the staged tree, used to look up cached messages
+
+        Yields:
+            Chunks of the generated commit message
+
+        Raises:
+            AcmsgError: If the generation fails
+        """
+        system_prompt, user_prompt = _render_prompts(git_status, git_diff)
+
+        cache = self._cache
+        key = self._cache_key(tree, system_prompt, user_prompt)
+        if cache is not None and key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        user_prompt = self._fit_prompt(git_status, git_diff, system_prompt, user_prompt)
+        chunks = []
+        for chunk in self._api_client.stream_completion(
+            model=self._model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=self._temperature,
+        ):
+            chunks.append(chunk)
+            yield chunk
+
+        if cache is not None and key is not None:
+            cache.put(key, "".join(chunks))
+
+    def _fit_prompt(
+        self, git_status: str, git_diff: str, system_prompt: str, user_prompt: str
+    ) -> str:
+        """Get a user prompt that fits the context of the first model.
+
+        Args:
+            git_status: Output of git status command
+            git_diff: Output of git diff command
+            system_prompt: Rendered system prompt
+            user_prompt: Rendered user prompt
+
+        Returns:
+            The user prompt, a prompt with a reduced diff, or a prompt with
+            summaries of the diff
+        """
+        planned = _plan_diff(
+            self._api_client,
+            self._model,
+            git_status,
+            git_diff,
+            system_prompt,
+            user_prompt,
+            force=bool(self._map_reduce),
+        )
+        if planned is None:
+            return user_prompt
+
+        files, allowance = planned
+        if not self._map_reduce:
+            allocation = allocate_diff(
+                files,
+                allowance,
+                _token_counter(self._api_client, self._model),
+                describe=self._symbols,
+            )
+            if self._map_reduce is False or not allocation.undescribed:
+                return _render_allocation(git_status, allocation, self.notes)
+
+        return self._summarize(git_status, files, allowance)
+
+    def _summarize(self, git_status: str, files: List[FileDiff], allowance: int) -> str:
+        """Summarize a diff part by part and render the reduce prompt.
+
+        Parts are summarized concurrently by a bounded pool of workers, and
+        summaries found in the summary cache are reused.
+
+        Args:
+            git_status: Output of git status command
+            files: Parsed file diffs
+            allowance: Tokens available for the diff in a prompt
+
+        Returns:
+            User prompt asking for a message from the summaries
+
+        Raises:
+            AcmsgError: If summarizing a part fails
+        """
+        chunks = split_diff(
+            files,
+            max(1, min(MAP_CHUNK_TOKENS, allowance)),
+            _token_counter(self._api_client, self._model),
+        )
+        system_prompt = renderer.render_summary_system_prompt()
+        keys = [self._summary_key(chunk, system_prompt) for chunk in chunks]
+
+        summaries: List[Optional[str]] = [
+            self._summary_cache.get(key) if self._summary_cache else None
+            for key in keys
+        ]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        self.notes.append(
+            f"Diff too large for the model's context; summarizing it in "
+            f"{len(chunks)} parts ({len(chunks) - len(missing)} cached)."
+        )
+
+        def summarize(index: int) -> str:
+            return self._api_client.generate_completion(
+                model=self._model,
+                system_prompt=system_prompt,
+                user_prompt=renderer.render_summary_prompt(
+                    chunks[index].text, index + 1, len(chunks)
+                ),
+                temperature=self._temperature,
+            )
+
+        if missing:
+            with ThreadPoolExecutor(
+                max_workers=min(self._max_workers, len(missing))
+            ) as executor:
+                futures = [executor.submit(summarize, i) for i in missing]
+                try:
+                    for index, future in zip(missing, futures):
+                        summary = future.result().strip()
+                        summaries[index] = summary
+                        if self._summary_cache is not None:
+                            self._summary_cache.put(keys[index], summary)
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        # Every part is now either cached or summarized
+        texts = [summary for summary in summaries if summary is not None]
+        assert len(texts) == len(chunks)
+        return renderer.render_reduce_prompt(
+            status=git_status,
+            summaries=[
+                {"paths": chunk.paths, "text": text}
+                for chunk, text in zip(chunks, texts)
+            ],
+        )
+
+    def _summary_key(self, chunk: DiffChunk, system_prompt: str) -> str:
+        """Get the summary cache key of a diff part."""
+        models = self._model if isinstance(self._model, str) else ",".join(self._model)
+        return hashlib.sha256(
+            f"{chunk.key}\0{models}\0{float(self._temperature)!r}\0{system_prompt}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+
+class AsyncCommitMessageGenerator:
+    """Generate commit messages from git changes with asyncio.
+
+    Attributes:
+        notes: Warnings about diffs that were cut down to fit the model's
+            context, for the caller to show
+    """
+
+    def __init__(
+        self,
+        api_token: str,
+        model: ModelChain,
+        temperature: float,
+        **client_options: Any,
+    ):
+        """Initialize the asynchronous commit message generator.
+
+        Args:
+            api_token: OpenRouter API token
+            model: Model ID, or ordered list of model IDs to fall back through
+            temperature: Temperature to use for generation
+            **client_options: Extra keyword arguments for the AsyncOpenRouterClient
+        """
+        if not api_token:
+            raise AcmsgError("API token is required")
+
+        self._api_client = AsyncOpenRouterClient(api_token, **client_options)
+        self._model = model
+        self._temperature = temperature
+        self.notes: List[str] = []
+
+    async def __aenter__(self) -> "AsyncCommitMessageGenerator":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying API client."""
+        await self._api_client.aclose()
+
+    async def generate(self, git_status: str, git_diff: str) -> str:
+        """Generate a commit message from git status and diff.
+
+        Args:
+            git_status: Output of git status command
+            git_diff: Output of git diff command
+
+        Returns:
+            Generated commit message
+
+        Raises:
+            AcmsgError: If the generation fails
+        """
+        system_prompt, user_prompt = _render_prompts(git_status, git_diff)
+        user_prompt = await asyncio.to_thread(
+            _fit_diff,
+            self._api_client,
+            self._model,
+            git_status,
+            git_diff,
+            system_prompt,
+            user_prompt,
+            self.notes,
+        )
+
+        return await self._api_client.generate_completion(
+            model=self._model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=self._temperature,
+        )
+
+    async def generate_stream(
+        self, git_status: str, git_diff: str
+    ) -> AsyncIterator[str]:
+        """Generate a commit message, yielding text chunks as they arrive.
+
+        Args:
+            git_status: Output of git status command
+            git_diff: Output of git diff command
+
+        Yields:
+            Chunks of the generated commit message
+
+        Raises:
+            AcmsgError: If the generation fails
+        """
+        system_prompt, user_prompt = _render_prompts(git_status, git_diff)
+        user_prompt = await asyncio.to_thread(
+            _fit_diff,
+            self._api_client,
+            self._model,
+            git_status,
+            git_diff,
+            system_prompt,
+            user_prompt,
+            self.notes,
+        )
+
+        async for chunk in self._api_client.stream_completion(
+            model=self._model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=self._temperature,
+        ):
+            yield chunk
+
+    async def generate_many(self, changes: Iterable[Tuple[str, str]]) -> List[str]:
+        """Generate commit messages for several sets of changes concurrently.
+
+        Concurrency is bounded by the client's ``max_concurrency``. If any
+        generation fails, the remaining ones are cancelled and the error is
+        raised.
+
+        Args:
+            changes: Pairs of (git_status, git_diff)
+
+        Returns:
+            Generated commit messages, in the order of ``changes``
+
+        Raises:
+            AcmsgError: If any generation fails
+        """
+        tasks = [
+            asyncio.ensure_future(self.generate(git_status, git_diff))
+            for git_status, git_diff in changes
+        ]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+def _render_prompts(git_status: str, git_diff: str) -> Tuple[str, str]:
+    """Render the system and user prompts.
+
+    Args:
+        git_status: Output of git status command
+        git_diff: Output of git diff command
+
+    Returns:
+        Tuple of (system_prompt, user_prompt)
+    """
+    system_prompt = renderer.render_system_prompt()
+    user_prompt = renderer.render_user_prompt(status=git_status, diff=git_diff)
+    return system_prompt, user_prompt
+
+
+def _primary_model(model: ModelChain) -> str:
+    """Get the first model of a model chain."""
+    return model if isinstance(model, str) else model[0]
+
+
+def _token_counter(client: BaseOpenRouterClient, model: ModelChain):
+    """Get a function estimating tokens for the first model of a chain."""
+    primary = _primary_model(model)
+    return lambda text: client.estimate_tokens(text, primary)
+
+
+def _plan_diff(
+    client: BaseOpenRouterClient,
+    model: ModelChain,
+    git_status: str,
+    git_diff: str,
+    system_prompt: str,
+    user_prompt: str,
+    force: bool = False,
+) -> Optional[Tuple[List[FileDiff], int]]:
+    """Work out how many tokens the diff may use if the prompts overflow.
+
+    The budget is planned for the first model of the chain. Prompts small
+    enough for any model skip the context length lookup.
+
+    Args:
+        client: API client used to plan the token budget
+        model: Model ID, or ordered list of model IDs
+        git_status: Output of git status command
+        git_diff: Output of git diff command
+        system_prompt: Rendered system prompt
+        user_prompt: Rendered user prompt
+        force: Plan even if the prompts fit
+
+    Returns:
+        Tuple of (parsed diff, tokens available for the diff), or None if
+        the prompts fit as they are
+    """
+    primary = _primary_model(model)
+    budget = client.plan_budget(
+        primary,
+        system_prompt,
+        user_prompt,
+        context_length=client.MODEL_TOKEN_LIMITS["default"],
+    )
+    if budget.was_trimmed or force:
+        budget = client.plan_budget(primary, system_prompt, user_prompt)
+    if not budget.was_trimmed and not force:
+        return None
+
+    frame = renderer.render_user_prompt(status=git_status, diff="")
+    allowance = (
+        budget.prompt_limit
+        - PROMPT_OVERHEAD_TOKENS
+        - client.estimate_tokens(system_prompt, primary)
+        - client.estimate_tokens(frame, primary)
+    )
+    return parse_diff(git_diff), allowance
+
+
+def _render_allocation(
+    git_status: str, allocation: DiffAllocation, notes: List[str]
+) -> str:
+    """Render the user prompt for a diff cut down to whole hunks."""
+    if allocation.omitted:
+        notes.append(f"Warning: {allocation.describe()}.")
+    return renderer.render_user_prompt(status=git_status, diff=allocation.text)
+
+
+def _fit_diff(
+    client: BaseOpenRouterClient,
+    model: ModelChain,
+    git_status: str,
+    git_diff: str,
+    system_prompt: str,
+    user_prompt: str,
+    notes: List[str],
+) -> str:
+    """Cut the diff down hunk by hunk if the prompts overflow the context.
+
+    Args:
+        client: API client used to plan the token budget
+        model: Model ID, or ordered list of model IDs
+        git_status: Output of git status command
+        git_diff: Output of git diff command
+        system_prompt: Rendered system prompt
+        user_prompt: Rendered user prompt
+        notes: List to add a warning to if hunks are left out
+
+    Returns:
+        The user prompt, re-rendered with a reduced diff if it did not fit
+    """
+    planned = _plan_diff(
+        client, model, git_status, git_diff, system_prompt, user_prompt
+    )
+    if planned is None:
+        return user_prompt
+
+    files, allowance = planned
+    return _render_allocation(
+        git_status,
+        allocate_diff(files, allowance, _token_counter(client, model)),
+        notes,
+    )
 
 
 def format_message(msg: str) -> str:
@@ -56,8 +559,6 @@ def format_message(msg: str) -> str:
     Returns:
         Formatted commit message with lines wrapped
     """
-    import textwrap
-
     lines = msg.splitlines()
     formatted_lines = []
 
@@ -69,3 +570,87 @@ def format_message(msg: str) -> str:
             formatted_lines.append(line)
 
     return "\n".join(formatted_lines)
+
+
+class StreamFormatter:
+    """Incrementally wrap a streamed commit message.
+
+    Text fed to the formatter is released word by word, wrapped greedily at
+    the same width as ``format_message`` so the streamed output matches the
+    final formatted message.
+    """
+
+    def __init__(self, width: int = 80):
+        """Initialize the formatter.
+
+        Args:
+            width: Maximum line width
+        """
+        self._width = width
+        self._column = 0
+        self._space = ""
+        self._word = ""
+
+    def feed(self, text: str) -> str:
+        """Add streamed text.
+
+        Args:
+            text: Next chunk of the message
+
+        Returns:
+            Wrapped text that can be displayed now
+        """
+        output = []
+        for char in text:
+            if char == "\n":
+                output.append(self._release_word())
+                output.append("\n")
+                self._column = 0
+                self._space = ""
+            elif char.isspace():
+                output.append(self._release_word())
+                self._space += char
+            else:
+                self._word += char
+        return "".join(output)
+
+    def flush(self) -> str:
+        """Release any buffered text at the end of the stream.
+
+        Returns:
+            Remaining wrapped text
+        """
+        return self._release_word()
+
+    def _release_word(self) -> str:
+        """Emit the buffered word, breaking the line first if it does not fit."""
+        if not self._word:
+            return ""
+
+        word, space = self._word, self._space
+        self._word, self._space = "", ""
+        output = []
+
+        if (
+            self._column > 0
+            and len(word) <= self._width
+            and self._column + len(space) + len(word) > self._width
+        ):
+            output.append("\n")
+            self._column = 0
+            space = ""
+
+        # Words longer than the line width fill the line and are broken, as
+        # textwrap does
+        while self._column + len(space) + len(word) > self._width:
+            room = self._width - self._column - len(space)
+            if room > 0:
+                output.append(space + word[:room])
+                word = word[room:]
+            output.append("\n")
+            self._column = 0
+            space = ""
+
+        output.append(space + word)
+        self._column += len(space) + len(word)
+        return "".join(output)
@@ -1,23 +1,109 @@
 """Git operations and utilities."""
 
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Sequence
 
 import colorama
 from colorama import Fore, Style
 
+from ..constants import DIFF_MAX_BYTES, DIFF_MAX_FILE_BYTES
 from ..exceptions import GitError
+from .diff import FileDiff, parse_diff
+from .diffreader import StagedChanges, read_patch_with_raw
+from .prescan import (
+    FULL,
+    REDUCED,
+    StagedFile,
+    estimate_patch_bytes,
+    plan_fetch,
+    read_numstat_with_raw,
+    stub_text,
+)
 
 colorama.init(autoreset=True)
 
+# Options that change which files and line counts the pre-scan reports. Any
+# other diff option, such as -U, would make git add patches to its output.
+_SCAN_OPTION_PREFIXES = (
+    "-M",
+    "-C",
+    "--find-renames",
+    "--find-copies",
+    "--no-renames",
+    "--diff-algorithm",
+    "--minimal",
+    "--patience",
+    "--histogram",
+)
+
 
 class GitUtils:
-    """Git operations and utilities for version control."""
+    """Git operations and utilities for version control.
+
+    The repository check and the staged changes are collected concurrently
+    when the instance is created. The staged changes come from a single
+    ``git diff --cached --patch-with-raw`` call, read incrementally from
+    the pipe up to a size limit, so memory stays bounded however large
+    the staged diff is.
+
+    With ``prescan``, the staged files are listed with their line counts
+    first, and only the patches that fit the size limit are fetched, by
+    path: in full, without context lines, or not at all. Git then never
+    writes out patches that would be cut or left out anyway.
+    """
+
+    def __init__(
+        self,
+        max_diff_bytes: int = DIFF_MAX_BYTES,
+        pathspecs: Optional[Sequence[str]] = None,
+        diff_options: Optional[Sequence[str]] = None,
+        prescan: bool = False,
+        left_out: Optional[
+            Callable[["GitUtils", Sequence[str]], Mapping[str, str]]
+        ] = None,
+    ):
+        """Initialize the GitUtils instance and start collecting repository state.
 
-    def __init__(self):
-        """Initialize the GitUtils instance with repository state."""
-        self._check_git_repo()
-        self._files_status = self._get_git_status()
-        self._diff = self._get_git_diff()
+        Args:
+            max_diff_bytes: Bytes of the staged diff to read at most
+            pathspecs: Limit the staged changes to these paths (all if empty)
+            diff_options: Extra ``git diff`` options, e.g. context lines
+                or the diff algorithm
+            prescan: Whether to plan which patches to fetch from the
+                staged files' line counts
+            left_out: Function giving the reasons to leave files' diffs
+                out by path, for the paths of the staged files; these
+                patches are not fetched when pre-scanning
+
+        Raises:
+            GitError: If the current directory is not a git repository
+        """
+        self._max_diff_bytes = max_diff_bytes
+        self._pathspecs = list(pathspecs or [])
+        self._diff_options = list(diff_options or [])
+        self._prescan = prescan
+        self._left_out = left_out
+        executor = ThreadPoolExecutor(max_workers=2)
+        check = executor.submit(self._check_git_repo)
+        self._staged = executor.submit(self._read_staged_changes)
+        # The diff keeps running in the background until it is needed
+        executor.shutdown(wait=False)
+        check.result()
+
+    @property
+    def staged_changes(self) -> StagedChanges:
+        """Get the staged changes, waiting for git if they are still being read.
+
+        Returns:
+            File status and patch of the staged changes
+
+        Raises:
+            GitError: If the git command fails
+        """
+        return self._staged.result()
 
     @property
     def files_status(self) -> str:
@@ -26,16 +112,145 @@ class GitUtils:
         Returns:
             Formatted output of git status command
         """
-        return self._files_status
+        return self.staged_changes.files_status
 
     @property
     def diff(self) -> str:
         """Get the diff of staged changes in the git repository.
 
         Returns:
-            Formatted output of git diff command
+            Formatted output of git diff command, cut to the size limit
+        """
+        return self.staged_changes.diff
+
+    @cached_property
+    def files(self) -> List[FileDiff]:
+        """Get the staged diff parsed into files and hunks.
+
+        The records point into ``diff`` rather than copying it.
+
+        Returns:
+            File diffs in the order git reported them
         """
-        return self._diff
+        return parse_diff(self.diff)
+
+    @cached_property
+    def staged_tree(self) -> Optional[str]:
+        """Get the hash of the tree recorded in the index.
+
+        The tree is written with ``git write-tree`` on first access, so it
+        identifies exactly the staged content.
+
+        Returns:
+            Tree hash, or None if the index cannot be written as a tree
+            (e.g. while merge conflicts are unresolved)
+        """
+        try:
+            output = subprocess.run(
+                ["git", "write-tree"], capture_output=True, text=True, check=True
+            )
+        except subprocess.CalledProcessError:
+            return None
+        return output.stdout.strip() or None
+
+    @cached_property
+    def toplevel(self) -> str:
+        """Get the root directory of the working tree.
+
+        Returns:
+            Absolute path of the working tree
+
+        Raises:
+            GitError: If the git command fails
+        """
+        try:
+            output = subprocess.run(
+                ["git", "rev-parse", "--show-toplevel"],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            raise GitError(f"Failed to find the repository root: {e.stderr}")
+        return output.stdout.strip()
+
+    def check_attr(
+        self, paths: Sequence[str], attributes: Sequence[str]
+    ) -> Dict[str, Dict[str, str]]:
+        """Look up git attributes (e.g. from ``.gitattributes``) of files.
+
+        All paths are checked with a single ``git check-attr`` call.
+
+        Args:
+            paths: File paths relative to the repository root
+            attributes: Attribute names
+
+        Returns:
+            Attribute values by path and name, as reported by git
+            (``set``, ``unset``, ``unspecified`` or the value)
+
+        Raises:
+            GitError: If the git command fails
+        """
+        if not paths:
+            return {}
+        try:
+            output = subprocess.run(
+                ["git", "check-attr", "-z", "--stdin", *attributes],
+                input="\0".join(paths).encode("utf-8") + b"\0",
+                capture_output=True,
+                check=True,
+                cwd=self.toplevel,
+            )
+        except subprocess.CalledProcessError as e:
+            message = e.stderr.decode("utf-8", "replace")
+            raise GitError(f"Failed to check git attributes: {message}")
+
+        fields = output.stdout.decode("utf-8", "replace").split("\0")
+        result: Dict[str, Dict[str, str]] = {}
+        for i in range(0, len(fields) - 2, 3):
+            path, name, value = fields[i : i + 3]
+            result.setdefault(path, {})[name] = value
+        return result
+
+    @staticmethod
+    def blob_lines(blob: str) -> Iterator[str]:
+        """Stream the lines of a blob from the object database.
+
+        Lines are read from the pipe as they are used, so large blobs are
+        never held in memory as a whole. Git is stopped if the caller
+        stops early.
+
+        Args:
+            blob: Blob ID, possibly abbreviated
+
+        Yields:
+            Lines of the blob, with invalid UTF-8 replaced
+
+        Raises:
+            GitError: If the blob cannot be read
+        """
+        try:
+            process = subprocess.Popen(
+                ["git", "cat-file", "blob", blob],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise GitError(f"Failed to read blob {blob}: {e}")
+
+        with process:
+            assert process.stdout is not None
+            finished = False
+            try:
+                for line in process.stdout:
+                    yield line.decode("utf-8", "replace")
+                finished = True
+            finally:
+                if not finished:
+                    process.kill()
+            if process.wait() != 0:
+                raise GitError(f"Failed to read blob {blob}")
 
     def _check_git_repo(self) -> None:
         """Check if the current directory is a git repository.
@@ -47,48 +262,211 @@ class GitUtils:
             subprocess.run(
                 ["git", "rev-parse", "--is-inside-work-tree"],
                 capture_output=True,
-                text=True,
                 check=True,
             )
         except subprocess.CalledProcessError:
             raise GitError(f"{Fore.RED}Not a git repository{Style.RESET_ALL}")
 
-    def _get_git_status(self) -> str:
-        """Get the status of files in the git repository.
+    def _read_staged_changes(self) -> StagedChanges:
+        """Read the staged changes from git, stopping at the size limit.
 
         Returns:
-            Formatted output of git status command
+            File status and patch of the staged changes
+
+        Raises:
+            GitError: If a git command fails
+        """
+        if not self._prescan:
+            return self._read_patch(
+                self._diff_options, self._pathspecs, self._max_diff_bytes
+            )
+
+        files = self._scan_staged_files()
+        left_out: Mapping[str, str] = {}
+        if self._left_out is not None and files:
+            left_out = self._left_out(self, [f.path for f in files])
+        if sum(map(estimate_patch_bytes, files)) > self._max_diff_bytes:
+            # Sizes only matter to the plan when not everything fits
+            self._read_blob_sizes(files)
+        plan = plan_fetch(files, self._max_diff_bytes, DIFF_MAX_FILE_BYTES, left_out)
+        if not plan.selective:
+            return self._read_patch(
+                self._diff_options, self._pathspecs, self._max_diff_bytes
+            )
+
+        patches: Dict[str, str] = {}
+        remaining = self._max_diff_bytes
+        bytes_skipped = 0
+        for action, options in ((FULL, []), (REDUCED, ["-U0"])):
+            selected = [f for f in files if plan.actions[f.path] == action]
+            if not selected:
+                continue
+            others = [f for f in files if plan.actions[f.path] != action]
+            changes = self._read_patch(
+                [*self._diff_options, *options],
+                self._fetch_pathspecs(selected, others),
+                remaining,
+            )
+            diff = changes.diff
+            if changes.files_read < changes.files_total:
+                # Unread files get stubs rather than the reader's marker
+                diff = diff.rpartition("\n")[0]
+            for file_diff in parse_diff(diff):
+                patches[file_diff.path] = file_diff.text
+            remaining = max(0, remaining - len(diff.encode("utf-8")))
+            bytes_skipped += changes.bytes_skipped
+
+        parts = []
+        files_read = files_reduced = 0
+        for staged_file in files:
+            text = patches.get(staged_file.path)
+            if text is not None:
+                files_read += 1
+                files_reduced += plan.actions[staged_file.path] == REDUCED
+            else:
+                reason = plan.reasons.get(
+                    staged_file.path, "not read: diff size limit reached"
+                )
+                text = stub_text(staged_file, reason)
+                # Files that are left out anyway are not missing
+                files_read += staged_file.path in left_out
+            parts.append(text)
+        return StagedChanges(
+            "\n".join(f.status_line for f in files),
+            "\n".join(parts),
+            len(files),
+            files_read,
+            bytes_skipped,
+            files_reduced,
+        )
+
+    def _scan_staged_files(self) -> List[StagedFile]:
+        """List the staged files with their line counts, without patches.
+
+        Returns:
+            Staged files in the order git reports them
 
         Raises:
             GitError: If the git command fails
         """
+        command = [
+            "git",
+            "diff",
+            "--cached",
+            "--raw",
+            "--numstat",
+            "-z",
+            *(o for o in self._diff_options if o.startswith(_SCAN_OPTION_PREFIXES)),
+        ]
+        if self._pathspecs:
+            command += ["--", *self._pathspecs]
+        try:
+            output = subprocess.run(command, capture_output=True, check=True)
+        except subprocess.CalledProcessError as e:
+            message = e.stderr.decode("utf-8", "replace")
+            raise GitError(f"Failed to scan staged changes: {message}")
+        return read_numstat_with_raw(output.stdout)
+
+    @staticmethod
+    def _read_blob_sizes(files: Sequence[StagedFile]) -> None:
+        """Look up the blob sizes of staged files with one ``git cat-file`` call.
+
+        Sizes only refine the patch estimates, so they are left unset if
+        git cannot tell them.
+        """
+        blobs = sorted(
+            {
+                blob
+                for f in files
+                for blob in (f.old_blob, f.new_blob)
+                if blob.strip("0")
+            }
+        )
+        if not blobs:
+            return
         try:
             output = subprocess.run(
-                ["git", "diff", "--cached", "--name-status"],
+                ["git", "cat-file", "--batch-check=%(objectsize)"],
+                input="\n".join(blobs).encode() + b"\n",
                 capture_output=True,
-                text=True,
                 check=True,
             )
-            return output.stdout.strip().replace("\t", " ")
-        except subprocess.CalledProcessError as e:
-            raise GitError(f"Failed to get git status: {e.stderr}")
+        except subprocess.CalledProcessError:
+            return
 
-    def _get_git_diff(self) -> str:
-        """Get the diff of staged changes in the git repository.
+        sizes = {}
+        for blob, line in zip(blobs, output.stdout.decode().splitlines()):
+            if line.isdigit():
+                sizes[blob] = int(line)
+        for f in files:
+            # The missing side of an added or deleted file is empty
+            f.old_size = sizes.get(f.old_blob) if f.old_blob.strip("0") else 0
+            f.new_size = sizes.get(f.new_blob) if f.new_blob.strip("0") else 0
+
+    def _fetch_pathspecs(
+        self, selected: Sequence[StagedFile], others: Sequence[StagedFile]
+    ) -> List[str]:
+        """Get pathspecs matching the selected files but not the others.
+
+        Paths are matched literally and from the repository root. The
+        shorter of the two lists is used: the selected paths, or the
+        original pathspecs with the other paths excluded.
+        """
+        paths = [path for f in selected for path in f.paths]
+        excluded = [path for f in others for path in f.paths]
+        if len(paths) <= len(excluded):
+            return [f":(top,literal){path}" for path in paths]
+        return [
+            *(self._pathspecs or [":/"]),
+            *(f":(top,literal,exclude){path}" for path in excluded),
+        ]
+
+    def _read_patch(
+        self, options: Sequence[str], pathspecs: Sequence[str], max_bytes: int
+    ) -> StagedChanges:
+        """Read ``git diff --cached --patch-with-raw`` output up to a size limit.
+
+        Git's error output goes to a temporary file, so a chatty stderr
+        cannot block the pipe that is being read.
+
+        Args:
+            options: Extra ``git diff`` options
+            pathspecs: Limit the diff to these paths (all if empty)
+            max_bytes: Patch bytes to keep in total
 
         Returns:
-            Formatted output of git diff command
+            File status and patch of the staged changes
 
         Raises:
             GitError: If the git command fails
         """
-        try:
-            output = subprocess.run(
-                ["git", "diff", "--cached"], capture_output=True, text=True, check=True
-            )
-            return output.stdout.strip()
-        except subprocess.CalledProcessError as e:
-            raise GitError(f"Failed to get git diff: {e.stderr}")
+        command = ["git", "diff", "--cached", "--patch-with-raw", *options]
+        if pathspecs:
+            command += ["--", *pathspecs]
+
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=stderr,
+                )
+            except OSError as e:
+                raise GitError(f"Failed to get git diff: {e}")
+
+            with process:
+                assert process.stdout is not None
+                changes = read_patch_with_raw(process.stdout, max_bytes)
+                stopped_early = bool(process.stdout.read(1))
+                if stopped_early:
+                    process.kill()
+                returncode = process.wait()
+
+            if returncode != 0 and not stopped_early:
+                stderr.seek(0)
+                message = stderr.read().decode("utf-8", "replace")
+                raise GitError(f"Failed to get git diff: {message}")
+        return changes
 
     @staticmethod
     def git_commit(message: str) -> str:
@@ -0,0 +1,286 @@
+"""Pre-scan of the staged changes, to plan which patches are worth fetching."""
+
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from ..constants import (
+    DIFF_MAX_BYTES,
+    DIFF_MAX_FILE_BYTES,
+    PRESCAN_HEADER_BYTES,
+    PRESCAN_LINE_BYTES,
+)
+from .diff import ADDED, COPIED, DELETED, RENAMED, STATUS_NAMES
+
+# What to fetch of a file: its patch, its patch without context, or nothing
+FULL, REDUCED, STUB = "full", "reduced", "stub"
+
+
+class StagedFile:
+    """One staged file as listed by ``git diff --raw --numstat``."""
+
+    __slots__ = (
+        "path",
+        "status_code",
+        "old_path",
+        "old_mode",
+        "new_mode",
+        "old_blob",
+        "new_blob",
+        "added",
+        "removed",
+        "old_size",
+        "new_size",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        status_code: str,
+        old_path: Optional[str] = None,
+        old_mode: str = "000000",
+        new_mode: str = "000000",
+        old_blob: str = "0000000",
+        new_blob: str = "0000000",
+    ):
+        """Initialize the staged file.
+
+        Args:
+            path: Path after the change
+            status_code: Raw status, e.g. ``M`` or ``R087`` with a similarity
+            old_path: Path before the change, if it was renamed or copied
+            old_mode: File mode before the change
+            new_mode: File mode after the change
+            old_blob: (Abbreviated) blob ID before the change
+            new_blob: (Abbreviated) blob ID after the change
+        """
+        self.path = path
+        self.status_code = status_code
+        self.old_path = old_path
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.old_blob = old_blob
+        self.new_blob = new_blob
+        self.added: Optional[int] = None
+        self.removed: Optional[int] = None
+        self.old_size: Optional[int] = None
+        self.new_size: Optional[int] = None
+
+    @property
+    def status(self) -> str:
+        """Get the file status.
+
+        Returns:
+            One of ``ADDED``, ``DELETED``, ``MODIFIED``, ``RENAMED`` or ``COPIED``
+        """
+        return self.status_code[:1]
+
+    @property
+    def binary(self) -> bool:
+        """Check whether git reported the file as binary.
+
+        Returns:
+            True if the file has no line counts
+        """
+        return self.added is None
+
+    @property
+    def status_line(self) -> str:
+        """Get the file in ``--name-status`` form, space-separated.
+
+        Returns:
+            Status and paths
+        """
+        paths = [self.old_path, self.path] if self.old_path else [self.path]
+        return " ".join([self.status_code, *paths])
+
+    @property
+    def paths(self) -> List[str]:
+        """Get the paths the file's patch is found under.
+
+        Returns:
+            The old path of a renamed or copied file, then the path
+        """
+        return [self.old_path, self.path] if self.old_path else [self.path]
+
+
+def read_numstat_with_raw(output: bytes) -> List[StagedFile]:
+    """Parse ``git diff --raw --numstat -z`` output.
+
+    Git lists every file in the raw format first, then again with its line
+    counts, in the same order.
+
+    Args:
+        output: Binary output of the command
+
+    Returns:
+        Staged files with their line counts
+    """
+    fields = output.decode("utf-8", "replace").split("\0")
+    files: List[StagedFile] = []
+    counts = []
+    i = 0
+    while i < len(fields):
+        field = fields[i]
+        if not field:
+            i += 1
+        elif field.startswith(":"):
+            old_mode, new_mode, old_blob, new_blob, code = field[1:].split(" ")
+            if code[:1] in (RENAMED, COPIED):
+                old_path, path = fields[i + 1], fields[i + 2]
+                i += 3
+            else:
+                old_path, path = None, fields[i + 1]
+                i += 2
+            files.append(
+                StagedFile(path, code, old_path, old_mode, new_mode, old_blob, new_blob)
+            )
+        else:
+            added, removed, path = field.split("\t", 2)
+            # Renamed and copied files have an empty path and two more fields
+            i += 1 if path else 3
+            counts.append((added, removed))
+
+    for staged_file, (added, removed) in zip(files, counts):
+        if added != "-":
+            staged_file.added = int(added)
+            staged_file.removed = int(removed)
+    return files
+
+
+def estimate_patch_bytes(staged_file: StagedFile, context: bool = True) -> int:
+    """Estimate the size of a file's patch from its line counts.
+
+    The estimate is rough, but never more than the patch of a file
+    rewritten from its old content to its new one, when the blob sizes
+    are known.
+
+    Args:
+        staged_file: Staged file
+        context: Whether the patch has context lines
+
+    Returns:
+        Estimated patch bytes
+    """
+    added, removed = staged_file.added, staged_file.removed
+    if added is None or removed is None:
+        # Binary files only get a one-line patch
+        return PRESCAN_HEADER_BYTES
+    changed = added + removed
+    lines = 2 * changed + 6 if context else changed + 1
+    estimate = PRESCAN_HEADER_BYTES + lines * PRESCAN_LINE_BYTES
+    old_size, new_size = staged_file.old_size, staged_file.new_size
+    if old_size is not None and new_size is not None:
+        estimate = min(estimate, PRESCAN_HEADER_BYTES + old_size + new_size + changed)
+    return estimate
+
+
+class FetchPlan:
+    """What to fetch of each staged file, with the reasons for left-out ones."""
+
+    def __init__(self, actions: Dict[str, str], reasons: Dict[str, str]):
+        """Initialize the plan.
+
+        Args:
+            actions: ``FULL``, ``REDUCED`` or ``STUB`` by file path
+            reasons: Why the diff was left out, by path of the stubbed files
+        """
+        self.actions = actions
+        self.reasons = reasons
+
+    @property
+    def selective(self) -> bool:
+        """Check whether any file is fetched other than in full.
+
+        Returns:
+            True if the patches have to be fetched by path
+        """
+        return any(action != FULL for action in self.actions.values())
+
+
+def plan_fetch(
+    files: Sequence[StagedFile],
+    max_bytes: int = DIFF_MAX_BYTES,
+    max_file_bytes: int = DIFF_MAX_FILE_BYTES,
+    left_out: Optional[Mapping[str, str]] = None,
+) -> FetchPlan:
+    """Decide what to fetch of each file within the diff size limits.
+
+    Files that are left out anyway are not fetched. The others get their
+    estimated patch size from the limit, smallest first: the full patch if
+    it fits, else the patch without context lines (which the reader still
+    cuts to ``max_file_bytes``), else nothing but a stub.
+
+    Args:
+        files: Staged files
+        max_bytes: Patch bytes to fetch in total
+        max_file_bytes: Patch bytes to fetch per file
+        left_out: Reasons to leave a file's diff out, by path
+
+    Returns:
+        The plan
+    """
+    left_out = left_out or {}
+    actions: Dict[str, str] = {}
+    reasons: Dict[str, str] = {}
+    for staged_file in files:
+        if staged_file.path in left_out:
+            actions[staged_file.path] = STUB
+            reasons[staged_file.path] = left_out[staged_file.path]
+
+    remaining = max_bytes
+    candidates = [f for f in files if f.path not in actions]
+    for staged_file in sorted(candidates, key=estimate_patch_bytes):
+        full = estimate_patch_bytes(staged_file)
+        reduced = min(estimate_patch_bytes(staged_file, context=False), max_file_bytes)
+        if full <= min(remaining, max_file_bytes):
+            actions[staged_file.path] = FULL
+            remaining -= full
+        elif reduced <= remaining:
+            actions[staged_file.path] = REDUCED
+            remaining -= reduced
+        else:
+            actions[staged_file.path] = STUB
+            reasons[staged_file.path] = "too large for the diff size limit"
+    return FetchPlan(actions, reasons)
+
+
+def stub_text(staged_file: StagedFile, reason: str) -> str:
+    """Write a file diff without hunks for a file whose patch was not fetched.
+
+    The header has the file's status and blob IDs, like git's, so the stub
+    parses as the file's diff and its blobs can still be read.
+
+    Args:
+        staged_file: Staged file
+        reason: Why the diff was left out
+
+    Returns:
+        Diff text naming the file with its status and line counts
+    """
+    path = staged_file.path
+    lines = [f"diff --git a/{staged_file.old_path or path} b/{path}"]
+    if staged_file.status == ADDED:
+        lines.append(f"new file mode {staged_file.new_mode}")
+    elif staged_file.status == DELETED:
+        lines.append(f"deleted file mode {staged_file.old_mode}")
+    elif staged_file.old_mode != staged_file.new_mode:
+        lines.append(f"old mode {staged_file.old_mode}")
+        lines.append(f"new mode {staged_file.new_mode}")
+    if staged_file.old_path:
+        verb = "rename" if staged_file.status == RENAMED else "copy"
+        lines.append(f"{verb} from {staged_file.old_path}")
+        lines.append(f"{verb} to {path}")
+    index = f"index {staged_file.old_blob}..{staged_file.new_blob}"
+    if staged_file.old_mode == staged_file.new_mode:
+        index += f" {staged_file.new_mode}"
+    lines.append(index)
+
+    status = STATUS_NAMES.get(staged_file.status, "modified")
+    if staged_file.old_path:
+        status += f" from {staged_file.old_path}"
+    counts = (
+        "binary"
+        if staged_file.binary
+        else f"+{staged_file.added} -{staged_file.removed} lines"
+    )
+    lines.append(f"[... {path} ({status}, {counts}): diff left out, {reason} ...]")
+    return "\n".join(lines)
@@ -0,0 +1,474 @@
+"""Reduction of notebook and data file diffs to the changes that matter.
+
+A notebook diff is mostly base64 images, execution counts and output
+cells, and a data fixture diff is mostly rows. Reducers read both sides
+of such a file from git and replace its hunks with the source cell
+changes, or with the schema and row count deltas plus a small sample of
+changed rows. Reduced changes are written as pseudo-hunks (``@@ ... @@``
+lines), so the budget allocator can still keep or drop them one by one.
+"""
+
+import csv
+import difflib
+import json
+import multiprocessing
+import posixpath
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..constants import (
+    REDUCE_MAX_WORKERS,
+    REDUCE_MIN_JSON_BYTES,
+    REDUCE_POOL_MIN_BYTES,
+    REDUCE_SAMPLE_LINES,
+)
+from ..exceptions import GitError
+from .diff import ADDED, DELETED, FileDiff
+
+# Reduced hunks: (pseudo-hunk header, lines)
+ReducedHunk = Tuple[str, List[str]]
+BlobReader = Callable[[str], Iterable[str]]
+
+# Keys and column names listed at most in a schema description
+MAX_NAMES = 20
+
+
+class Reduction:
+    """The reduced form of a notebook or data file diff."""
+
+    def __init__(self, note: str, hunks: Optional[List[ReducedHunk]] = None):
+        """Initialize the reduction.
+
+        Args:
+            note: One-line description of the change, e.g. the row delta
+            hunks: Pseudo-hunks with the changes worth showing
+        """
+        self.note = note
+        self.hunks = hunks or []
+
+    def render(self, file_diff: FileDiff) -> str:
+        """Render a file diff with its hunks replaced by the reduction.
+
+        Args:
+            file_diff: The reduced file diff
+
+        Returns:
+            Diff text with the file header, the note and the pseudo-hunks
+        """
+        parts = [file_diff.header, self.note]
+        for header, lines in self.hunks:
+            parts.append(header)
+            parts.extend(lines)
+        return "\n".join(parts)
+
+
+def _read_side(read_blob: BlobReader, blob: str, present: bool) -> Iterable[str]:
+    """Stream one side of a file, or nothing if the file is absent there."""
+    return read_blob(blob) if present else iter(())
+
+
+def _sample(file_diff: FileDiff, limit: int = REDUCE_SAMPLE_LINES) -> List[str]:
+    """Take the first removed and added lines of a diff as a sample."""
+    removed: List[str] = []
+    added: List[str] = []
+    for hunk in file_diff.hunks:
+        for line in hunk.lines:
+            if line.startswith("-") and len(removed) < limit:
+                removed.append(line)
+            elif line.startswith("+") and len(added) < limit:
+                added.append(line)
+        if len(removed) >= limit and len(added) >= limit:
+            break
+    return removed + added
+
+
+def _sample_hunk(sample: List[str]) -> List[ReducedHunk]:
+    """Wrap sampled lines in a pseudo-hunk, if there are any."""
+    return [("@@ sample of changed lines @@", sample)] if sample else []
+
+
+def _cells(lines: Iterable[str]) -> List[Tuple[str, str]]:
+    """Read the (type, source) pairs of the cells of a notebook."""
+    text = "".join(lines)
+    if not text.strip():
+        return []
+    notebook = json.loads(text)
+    if not isinstance(notebook, dict) or not isinstance(
+        notebook.get("cells", []), list
+    ):
+        raise ValueError("Not a notebook")
+    cells = []
+    for cell in notebook.get("cells", []):
+        if not isinstance(cell, dict):
+            raise ValueError("Not a notebook cell")
+        source = cell.get("source", "")
+        if isinstance(source, list):
+            source = "".join(str(part) for part in source)
+        elif not isinstance(source, str):
+            raise ValueError("Not a notebook cell source")
+        cells.append((str(cell.get("cell_type", "code")), source))
+    return cells
+
+
+def _prefixed(prefix: str, source: str) -> List[str]:
+    """Prefix every line of a cell source like a diff line."""
+    return [prefix + line for line in source.splitlines()] or [prefix]
+
+
+def _cell_diff(old: str, new: str) -> List[str]:
+    """Diff the sources of a changed cell, without file or hunk headers."""
+    lines = list(
+        difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=2)
+    )[3:]
+    # Later hunk headers of the cell mark skipped unchanged lines
+    return [" ..." if line.startswith("@@") else line for line in lines]
+
+
+def reduce_notebook(
+    old_lines: Iterable[str], new_lines: Iterable[str], sample: List[str]
+) -> Reduction:
+    """Reduce a Jupyter notebook diff to the changes of its cell sources.
+
+    Outputs, execution counts and metadata are left out.
+
+    Args:
+        old_lines: Lines of the notebook before the change
+        new_lines: Lines of the notebook after the change
+        sample: Changed lines of the diff (unused)
+
+    Returns:
+        The reduction, with one pseudo-hunk per changed, added or
+        removed cell
+    """
+    old = _cells(old_lines)
+    new = _cells(new_lines)
+    hunks: List[ReducedHunk] = []
+    counts = {"changed": 0, "added": 0, "removed": 0}
+
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        for k in range(paired):
+            (_, old_source), (kind, new_source) = old[i1 + k], new[j1 + k]
+            hunks.append(
+                (
+                    f"@@ {kind} cell {j1 + k + 1} changed @@",
+                    _cell_diff(old_source, new_source),
+                )
+            )
+            counts["changed"] += 1
+        for i in range(i1 + paired, i2):
+            kind, source = old[i]
+            hunks.append((f"@@ {kind} cell {i + 1} removed @@", _prefixed("-", source)))
+            counts["removed"] += 1
+        for j in range(j1 + paired, j2):
+            kind, source = new[j]
+            hunks.append((f"@@ {kind} cell {j + 1} added @@", _prefixed("+", source)))
+            counts["added"] += 1
+
+    if not hunks:
+        return Reduction(
+            "[notebook: only outputs, execution counts or metadata changed]"
+        )
+    changes = ", ".join(f"{n} {what}" for what, n in counts.items() if n)
+    return Reduction(
+        f"[notebook: cells {changes}; outputs and execution counts left out]",
+        hunks,
+    )
+
+
+def _table_stats(lines: Iterable[str], delimiter: str) -> Tuple[List[str], int]:
+    """Read the column names of a table and count its rows, streaming."""
+    iterator = iter(lines)
+    first = next(iterator, None)
+    if first is None:
+        return [], 0
+    columns = next(csv.reader([first], delimiter=delimiter), [])
+    return columns, sum(1 for line in iterator if line.strip())
+
+
+def _records_stats(lines: Iterable[str]) -> Tuple[List[str], int]:
+    """Read the keys of the first record of JSON lines and count records."""
+    keys: List[str] = []
+    rows = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        if rows == 0:
+            record = json.loads(line)
+            keys = list(record) if isinstance(record, dict) else []
+        rows += 1
+    return keys, rows
+
+
+def _names(names: Sequence[str]) -> str:
+    """List names for a schema description, up to ``MAX_NAMES``."""
+    listed = ", ".join(names[:MAX_NAMES])
+    if len(names) > MAX_NAMES:
+        listed += f" and {len(names) - MAX_NAMES} more"
+    return listed
+
+
+def _describe_rows(
+    kind: str,
+    old: Tuple[List[str], int],
+    new: Tuple[List[str], int],
+    sample: List[str],
+) -> Reduction:
+    """Describe the column and row deltas of a table or list of records."""
+    (old_columns, old_rows), (new_columns, new_rows) = old, new
+    added = [c for c in new_columns if c not in old_columns]
+    removed = [c for c in old_columns if c not in new_columns]
+    if added or removed:
+        columns = "; ".join(
+            part
+            for part in (
+                f"columns added: {_names(added)}" if added else "",
+                f"columns removed: {_names(removed)}" if removed else "",
+            )
+            if part
+        )
+    else:
+        columns = f"columns: {_names(new_columns)}"
+    rows = f"rows: {old_rows}→{new_rows} ({new_rows - old_rows:+d})"
+    return Reduction(f"[{kind}: {columns}; {rows}]", _sample_hunk(sample))
+
+
+def reduce_table(
+    old_lines: Iterable[str],
+    new_lines: Iterable[str],
+    sample: List[str],
+    delimiter: str = ",",
+) -> Reduction:
+    """Reduce a CSV or TSV diff to its column and row count deltas.
+
+    Rows are counted as non-empty lines after the header, without
+    holding the table in memory.
+
+    Args:
+        old_lines: Lines of the table before the change
+        new_lines: Lines of the table after the change
+        sample: Changed lines of the diff to show
+        delimiter: Field delimiter
+
+    Returns:
+        The reduction
+    """
+    return _describe_rows(
+        "table",
+        _table_stats(old_lines, delimiter),
+        _table_stats(new_lines, delimiter),
+        sample,
+    )
+
+
+def reduce_tsv(
+    old_lines: Iterable[str], new_lines: Iterable[str], sample: List[str]
+) -> Reduction:
+    """Reduce a TSV diff, like ``reduce_table``."""
+    return reduce_table(old_lines, new_lines, sample, delimiter="\t")
+
+
+def reduce_json_lines(
+    old_lines: Iterable[str], new_lines: Iterable[str], sample: List[str]
+) -> Reduction:
+    """Reduce a JSON lines diff to its key and record count deltas.
+
+    Args:
+        old_lines: Lines of the file before the change
+        new_lines: Lines of the file after the change
+        sample: Changed lines of the diff to show
+
+    Returns:
+        The reduction
+    """
+    return _describe_rows(
+        "records", _records_stats(old_lines), _records_stats(new_lines), sample
+    )
+
+
+def json_shape(value: Any, depth: int = 2) -> str:
+    """Describe the structure of a JSON value.
+
+    Args:
+        value: Decoded JSON value
+        depth: Levels of nesting to describe
+
+    Returns:
+        E.g. ``list[120] of {id: number, tags: list[2] of string}``
+    """
+    if isinstance(value, dict):
+        if depth <= 0:
+            return f"object({len(value)} keys)"
+        keys = list(value)
+        fields = ", ".join(
+            f"{key}: {json_shape(value[key], depth - 1)}" for key in keys[:MAX_NAMES]
+        )
+        if len(keys) > MAX_NAMES:
+            fields += f", and {len(keys) - MAX_NAMES} more"
+        return "{" + fields + "}"
+    if isinstance(value, list):
+        if not value or depth <= 0:
+            return f"list[{len(value)}]"
+        return f"list[{len(value)}] of {json_shape(value[0], depth - 1)}"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "null"
+
+
+def reduce_json(
+    old_lines: Iterable[str], new_lines: Iterable[str], sample: List[str]
+) -> Reduction:
+    """Reduce a JSON data diff to its shape delta.
+
+    Args:
+        old_lines: Lines of the file before the change
+        new_lines: Lines of the file after the change
+        sample: Changed lines of the diff to show
+
+    Returns:
+        The reduction
+    """
+    shapes = []
+    for lines in (old_lines, new_lines):
+        text = "".join(lines)
+        shapes.append(json_shape(json.loads(text)) if text.strip() else "nothing")
+    old, new = shapes
+    note = f"[json: shape {old}]" if old == new else f"[json: shape {old} → {new}]"
+    return Reduction(note, _sample_hunk(sample))
+
+
+Reducer = Callable[[Iterable[str], Iterable[str], List[str]], Reduction]
+
+# Reducers by file extension
+REDUCERS: Dict[str, Reducer] = {
+    ".ipynb": reduce_notebook,
+    ".csv": reduce_table,
+    ".tsv": reduce_tsv,
+    ".json": reduce_json,
+    ".jsonl": reduce_json_lines,
+    ".ndjson": reduce_json_lines,
+}
+
+
+def find_reducer(
+    file_diff: FileDiff,
+) -> Optional[Reducer]:
+    """Get the reducer for a file diff, if it should be reduced.
+
+    JSON files are only reduced when their diff is large, since small
+    ones are usually configuration whose diff is worth reading.
+
+    Args:
+        file_diff: Parsed file diff
+
+    Returns:
+        The reducer, or None to keep the diff as it is
+    """
+    if file_diff.binary or file_diff.blobs is None:
+        return None
+    extension = posixpath.splitext(file_diff.path)[1].lower()
+    reducer = REDUCERS.get(extension)
+    if reducer is reduce_json and file_diff.size < REDUCE_MIN_JSON_BYTES:
+        return None
+    return reducer
+
+
+def reduce_file(
+    reducer: Reducer,
+    status: str,
+    blobs: Tuple[str, str],
+    sample: List[str],
+    read_blob: BlobReader,
+) -> Optional[Reduction]:
+    """Reduce one file from its blobs; runs in a worker process if pooled.
+
+    Args:
+        reducer: Reducer for the file type
+        status: Status of the file
+        blobs: IDs of the old and new blob
+        sample: Changed lines of the diff
+        read_blob: Function streaming the lines of a blob by its ID
+
+    Returns:
+        The reduction, or None if the file could not be read or parsed
+    """
+    old_blob, new_blob = blobs
+    try:
+        return reducer(
+            _read_side(read_blob, old_blob, status != ADDED),
+            _read_side(read_blob, new_blob, status != DELETED),
+            sample,
+        )
+    except (GitError, ValueError, TypeError, csv.Error):
+        # json.JSONDecodeError is a ValueError; keep the raw diff instead
+        return None
+
+
+def reduce_files(
+    files: Sequence[FileDiff],
+    read_blob: BlobReader,
+    max_workers: int = REDUCE_MAX_WORKERS,
+) -> Dict[str, Reduction]:
+    """Reduce the notebooks and data files of a diff.
+
+    Files are reduced in a process pool when several large ones are
+    staged, as parsing them is CPU-bound; otherwise in this process.
+    ``read_blob`` must then be picklable (e.g. ``GitUtils.blob_lines``).
+
+    Args:
+        files: Parsed file diffs
+        read_blob: Function streaming the lines of a blob by its ID
+        max_workers: Maximum number of worker processes
+
+    Returns:
+        Reductions by file path
+    """
+    jobs: List[Tuple[FileDiff, Reducer, Tuple[str, str]]] = []
+    for file_diff in files:
+        reducer = find_reducer(file_diff)
+        blobs = file_diff.blobs
+        if reducer is not None and blobs is not None:
+            jobs.append((file_diff, reducer, blobs))
+
+    results: List[Optional[Reduction]]
+    large = sum(1 for f, _, _ in jobs if f.size >= REDUCE_POOL_MIN_BYTES)
+    if large >= 2 and max_workers > 1:
+        # Spawned workers avoid forking the threads that read the diff
+        with ProcessPoolExecutor(
+            max_workers=min(large, max_workers),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    reduce_file, reducer, f.status, blobs, _sample(f), read_blob
+                )
+                for f, reducer, blobs in jobs
+            ]
+            results = [_result(future) for future in futures]
+    else:
+        results = [
+            reduce_file(reducer, f.status, blobs, _sample(f), read_blob)
+            for f, reducer, blobs in jobs
+        ]
+
+    return {
+        f.path: reduction
+        for (f, _, _), reduction in zip(jobs, results)
+        if reduction is not None
+    }
+
+
+def _result(future: "Future[Optional[Reduction]]") -> Optional[Reduction]:
+    """Get a pooled reduction, or None if its worker failed."""
+    try:
+        return future.result()
+    except Exception:
+        # A file that cannot be reduced keeps its raw diff; the others still count
+        return None
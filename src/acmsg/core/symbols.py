@@ -0,0 +1,409 @@
+"""Summaries of a file's changes by the symbols they touch.
+
+When a diff does not fit the model's context, a line such as
+``[symbols: added def parse, modified class Config]`` tells more about
+the left-out hunks of a file than their line counts. Symbols are read
+from both sides of the file: with ``ast`` for Python, and with
+line-based patterns for other languages. Each blob's symbols are cached
+by its hash, so reruns on the same staged content skip the parsing.
+"""
+
+import ast
+import hashlib
+import json
+import posixpath
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..constants import SYMBOL_MAX_BLOB_BYTES, SYMBOL_SUMMARY_MAX_ITEMS
+from ..exceptions import GitError
+from .cache import ResponseCache
+from .diff import FileDiff
+
+# Bump when extraction changes, so cached symbols are read again
+EXTRACTOR_VERSION = 1
+
+# A symbol's name and its first and last line (1-based, inclusive)
+Span = Tuple[str, int, int]
+
+
+def python_spans(source: str) -> List[Span]:
+    """Find the functions, methods and classes of Python source.
+
+    Args:
+        source: Python source code
+
+    Returns:
+        Spans named like ``def Config.load`` and ``class Config``, with
+        decorators included
+
+    Raises:
+        SyntaxError: If the source does not parse
+    """
+    spans: List[Span] = []
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "def"
+            elif isinstance(child, ast.ClassDef):
+                kind = "class"
+            else:
+                continue
+            start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+            end = child.end_lineno or child.lineno
+            spans.append((f"{kind} {prefix}{child.name}", start, end))
+            visit(child, f"{prefix}{child.name}.")
+
+    visit(ast.parse(source), "")
+    return spans
+
+
+# Definition patterns by language; the name is the last non-empty group
+_JS = (
+    (
+        "function",
+        r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(\w+)",
+    ),
+    ("class", r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(\w+)"),
+    (
+        "function",
+        r"^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*(?::[^=]+)?=\s*"
+        r"(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|\w+\s*=>)",
+    ),
+    ("type", r"^\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+(\w+)"),
+    (
+        "method",
+        r"^\s+(?:(?:public|private|protected|static|async|readonly|override|get|set)\s+)*"
+        r"(?!(?:if|for|while|switch|catch|return|function)\b)(\w+)\s*\([^)]*\)\s*(?::[^{]+)?\{\s*$",
+    ),
+)
+_GO = (
+    ("func", r"^func\s+\(\s*\w*\s*\*?(\w+)[^)]*\)\s*(\w+)"),
+    ("func", r"^func\s+(\w+)"),
+    ("type", r"^type\s+(\w+)"),
+)
+_RUST = (
+    (
+        "fn",
+        r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?"
+        r"(?:extern\s+\"[^\"]*\"\s+)?fn\s+(\w+)",
+    ),
+    ("type", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|union|trait|type)\s+(\w+)"),
+    ("impl", r"^\s*impl(?:<[^>]*>)?\s+(?:[\w:]+(?:<[^>]*>)?\s+for\s+)?([\w:]+)"),
+    ("mod", r"^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+(\w+)"),
+)
+_JVM = (
+    (
+        "class",
+        r"^\s*(?:(?:public|private|protected|internal|static|final|abstract|sealed|"
+        r"data|open|partial|inner)\s+)*(?:class|interface|enum|record|object|struct)\s+(\w+)",
+    ),
+    ("fun", r"^\s*(?:(?:\w+)\s+)*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?(\w+)\s*\("),
+    (
+        "method",
+        r"^\s+(?:@\w+\s+)*(?:(?:public|private|protected|internal|static|final|"
+        r"abstract|synchronized|override|virtual|async|native)\s+)+"
+        r"[\w<>\[\],.?\s]*?(\w+)\s*\([^;]*$",
+    ),
+)
+_RUBY = (
+    ("def", r"^\s*def\s+((?:self\.)?[\w?!=]+)"),
+    ("class", r"^\s*(?:class|module)\s+([\w:]+)"),
+)
+_PHP = (
+    (
+        "class",
+        r"^\s*(?:(?:abstract|final|readonly)\s+)*(?:class|interface|trait|enum)\s+(\w+)",
+    ),
+    (
+        "function",
+        r"^\s*(?:(?:public|private|protected|static|abstract|final)\s+)*function\s+&?(\w+)",
+    ),
+)
+_C = (
+    ("type", r"^(?:typedef\s+)?(?:struct|class|union|enum(?:\s+class)?)\s+(\w+)[^;]*$"),
+    (
+        "function",
+        r"^(?!\s|#|typedef\b|return\b|else\b)(?:[\w*&:<>,]+\s+)+[*&]*"
+        r"((?:\w+::)*~?\w+)\s*\([^;]*$",
+    ),
+)
+
+PATTERNS = {
+    ".js": _JS,
+    ".jsx": _JS,
+    ".mjs": _JS,
+    ".cjs": _JS,
+    ".ts": _JS,
+    ".tsx": _JS,
+    ".go": _GO,
+    ".rs": _RUST,
+    ".java": _JVM,
+    ".kt": _JVM,
+    ".kts": _JVM,
+    ".scala": _JVM,
+    ".cs": _JVM,
+    ".rb": _RUBY,
+    ".php": _PHP,
+    ".c": _C,
+    ".h": _C,
+    ".cc": _C,
+    ".cpp": _C,
+    ".cxx": _C,
+    ".hpp": _C,
+}
+_COMPILED = {
+    ext: [(kind, re.compile(pattern)) for kind, pattern in patterns]
+    for ext, patterns in PATTERNS.items()
+}
+
+
+def pattern_spans(source: str, extension: str) -> List[Span]:
+    """Find definitions in source code with line patterns.
+
+    A definition spans from its line to the line before the next one, so
+    nested definitions are listed on their own without their parent's
+    name (Go methods are named after their receiver type).
+
+    Args:
+        source: Source code
+        extension: Lowercase file extension, a key of ``PATTERNS``
+
+    Returns:
+        Spans named like ``func Server.Start``
+    """
+    starts: List[Tuple[str, int]] = []
+    lines = source.split("\n")
+    for number, line in enumerate(lines, start=1):
+        for kind, pattern in _COMPILED[extension]:
+            match = pattern.match(line)
+            if match:
+                names = [group for group in match.groups() if group]
+                starts.append((f"{kind} {'.'.join(names)}", number))
+                break
+
+    return [
+        (name, start, (starts[i + 1][1] - 1) if i + 1 < len(starts) else len(lines))
+        for i, (name, start) in enumerate(starts)
+    ]
+
+
+def find_extractor(path: str) -> Optional[Callable[[str], List[Span]]]:
+    """Get the symbol extractor for a file.
+
+    Args:
+        path: File path
+
+    Returns:
+        Function from source code to spans, or None for other files
+    """
+    extension = posixpath.splitext(path)[1].lower()
+    if extension in (".py", ".pyi"):
+        return python_spans
+    if extension in PATTERNS:
+        return lambda source: pattern_spans(source, extension)
+    return None
+
+
+def fingerprint_spans(source: str, spans: Sequence[Span]) -> Dict[str, str]:
+    """Hash the lines of each symbol that no nested symbol covers.
+
+    A class whose method changed is then not reported as changed itself.
+    Symbols defined twice under the same name keep the first definition.
+
+    Args:
+        source: Source code
+        spans: Spans from an extractor
+
+    Returns:
+        Short digest of each symbol's own lines, in source order
+    """
+    lines = source.split("\n")
+    symbols: Dict[str, str] = {}
+    for i, (name, start, end) in enumerate(spans):
+        digest = hashlib.sha256()
+        line = start
+        for _, child_start, child_end in spans[i + 1 :]:
+            if child_start > end:
+                break
+            if child_start >= line:
+                digest.update("\n".join(lines[line - 1 : child_start - 1]).encode())
+                line = child_end + 1
+        digest.update("\n".join(lines[line - 1 : end]).encode())
+        symbols.setdefault(name, digest.hexdigest()[:16])
+    return symbols
+
+
+class SymbolChanges:
+    """Symbols added, modified and removed between two versions of a file."""
+
+    def __init__(self, added: List[str], modified: List[str], removed: List[str]):
+        """Initialize the symbol changes.
+
+        Args:
+            added: Symbols only in the new version
+            modified: Symbols whose own lines changed
+            removed: Symbols only in the old version
+        """
+        self.added = added
+        self.modified = modified
+        self.removed = removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    def describe(self, max_items: int = SYMBOL_SUMMARY_MAX_ITEMS) -> str:
+        """Describe the changes in one line.
+
+        Args:
+            max_items: Maximum number of symbols to list
+
+        Returns:
+            Comma-separated changes, e.g. ``added def a, modified class B``
+        """
+        items = (
+            [f"added {name}" for name in self.added]
+            + [f"modified {name}" for name in self.modified]
+            + [f"removed {name}" for name in self.removed]
+        )
+        text = ", ".join(items[:max_items])
+        if len(items) > max_items:
+            text += f" and {len(items) - max_items} more"
+        return text
+
+
+def compare_symbols(old: Dict[str, str], new: Dict[str, str]) -> SymbolChanges:
+    """Compare the symbols of two versions of a file.
+
+    Args:
+        old: Symbol digests of the old version
+        new: Symbol digests of the new version
+
+    Returns:
+        The symbol changes
+    """
+    return SymbolChanges(
+        added=[name for name in new if name not in old],
+        modified=[name for name in new if name in old and old[name] != new[name]],
+        removed=[name for name in old if name not in new],
+    )
+
+
+def _read_source(lines: Iterable[str]) -> Optional[str]:
+    """Join blob lines into source, or None if the blob is too large."""
+    parts: List[str] = []
+    size = 0
+    for line in lines:
+        size += len(line)
+        if size > SYMBOL_MAX_BLOB_BYTES:
+            return None
+        parts.append(line)
+    return "".join(parts)
+
+
+class SymbolSummarizer:
+    """Describe the changes of staged files by the symbols they touch.
+
+    Blob hashes are taken from the staged diff as git wrote it, since the
+    diff that is sent may have had its ``index`` lines compacted away.
+    """
+
+    def __init__(
+        self,
+        files: Callable[[], Sequence[FileDiff]],
+        read_blob: Callable[[str], Iterator[str]],
+        cache: Optional[ResponseCache] = None,
+        namespace: Callable[[], str] = str,
+    ):
+        """Initialize the summarizer.
+
+        Args:
+            files: Function returning the parsed staged diff, called once
+                the first file is described
+            read_blob: Function yielding the lines of a blob by its ID
+            cache: Cache of extracted symbols by blob (disabled if None)
+            namespace: Function returning a name that keeps cache keys of
+                different repositories apart (abbreviated blob IDs may
+                collide between them)
+        """
+        self._files = files
+        self._read_blob = read_blob
+        self._cache = cache
+        self._namespace = namespace
+        self._blobs: Optional[Dict[str, Tuple[str, str, str]]] = None
+        self._prefix = ""
+
+    def _cache_key(self, blob: str, path: str) -> str:
+        """Get the cache key of a blob's symbols."""
+        extension = posixpath.splitext(path)[1].lower()
+        return hashlib.sha256(
+            f"{self._prefix}\0{blob}\0{extension}\0{EXTRACTOR_VERSION}".encode("utf-8")
+        ).hexdigest()
+
+    def symbols(self, path: str, blob: str) -> Optional[Dict[str, str]]:
+        """Get the symbols of one side of a file.
+
+        Args:
+            path: Path of the file on that side
+            blob: Blob ID, all zeros for a missing side
+
+        Returns:
+            Symbol digests, or None if the file's language is unknown or
+            the blob cannot be read or parsed
+        """
+        extractor = find_extractor(path)
+        if extractor is None:
+            return None
+        if not blob.strip("0"):
+            return {}
+
+        key = self._cache_key(blob, path)
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                try:
+                    return json.loads(cached)
+                except ValueError:
+                    pass
+
+        try:
+            source = _read_source(self._read_blob(blob))
+            if source is None:
+                return None
+            symbols = fingerprint_spans(source, extractor(source))
+        except (GitError, SyntaxError, ValueError):
+            return None
+
+        if self._cache is not None:
+            self._cache.put(key, json.dumps(symbols))
+        return symbols
+
+    def describe(self, file_diff: FileDiff) -> Optional[str]:
+        """Describe the symbol changes of a file in one line.
+
+        Args:
+            file_diff: File diff, matched to the staged diff by its path
+
+        Returns:
+            A ``[symbols: ...]`` line, or None if nothing can be said
+        """
+        if self._blobs is None:
+            self._prefix = self._namespace()
+            self._blobs = {
+                f.path: (f.old_path or f.path, *f.blobs)
+                for f in self._files()
+                if f.blobs
+            }
+
+        entry = self._blobs.get(file_diff.path)
+        if entry is None:
+            return None
+        old_path, old_blob, new_blob = entry
+        old = self.symbols(old_path, old_blob)
+        new = self.symbols(file_diff.path, new_blob)
+        if old is None or new is None:
+            return None
+
+        changes = compare_symbols(old, new)
+        return f"[symbols: {changes.describe()}]" if changes else None
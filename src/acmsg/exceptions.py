@@ -1,5 +1,7 @@
 """Custom exceptions for the acmsg package."""
 
+from typing import Optional
+
 
 class AcmsgError(Exception):
     """Base exception for all acmsg errors."""
@@ -13,6 +15,27 @@ class ApiError(AcmsgError):
     pass
 
 
+class ContextLengthError(ApiError):
+    """The request did not fit in the model's context window."""
+
+    def __init__(
+        self,
+        message: str,
+        input_tokens: Optional[int] = None,
+        context_length: Optional[int] = None,
+    ):
+        """Initialize the error.
+
+        Args:
+            message: Error message
+            input_tokens: Input size reported by the API, if it was
+            context_length: Context length reported by the API, if it was
+        """
+        super().__init__(message)
+        self.input_tokens = input_tokens
+        self.context_length = context_length
+
+
 class GitError(AcmsgError):
     """Error occurred during git operations."""
 
@@ -23,3 +46,9 @@ class ConfigError(AcmsgError):
     """Error occurred related to configuration."""
 
     pass
+
+
+class DeadlineExceeded(ApiError):
+    """The time budget for an operation ran out."""
+
+    pass
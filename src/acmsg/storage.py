@@ -0,0 +1,57 @@
+"""On-disk cache storage helpers."""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+from .constants import CACHE_DIR
+
+
+def get_cache_dir() -> Path:
+    """Get the acmsg cache directory, honouring ``XDG_CACHE_HOME``.
+
+    Returns:
+        Path to the cache directory (not necessarily existing yet)
+    """
+    user_cache_home = os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return Path(user_cache_home) / CACHE_DIR
+
+
+def read_json(path: Path) -> Optional[Any]:
+    """Read a JSON document from disk.
+
+    Args:
+        path: File to read
+
+    Returns:
+        Decoded document, or None if the file is missing or unreadable
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Atomically write a JSON document to disk.
+
+    The document is written to a temporary file in the same directory and
+    then moved into place, so concurrent readers never see a partial file.
+
+    Args:
+        path: Destination file
+        data: JSON-serializable document
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
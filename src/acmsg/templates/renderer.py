@@ -1,6 +1,7 @@
 """Template loading and rendering utilities."""
 
 from pathlib import Path
+from typing import Mapping, Sequence
 
 from jinja2 import Environment, FileSystemLoader
 
@@ -17,6 +18,11 @@ class TemplateRenderer:
         self._config_template = self._env.get_template("template_config.yaml")
         self._system_prompt_template = self._env.get_template("system_prompt.md")
         self._user_prompt_template = self._env.get_template("user_prompt.md")
+        self._summary_system_prompt_template = self._env.get_template(
+            "summary_system_prompt.md"
+        )
+        self._summary_prompt_template = self._env.get_template("summary_prompt.md")
+        self._reduce_prompt_template = self._env.get_template("reduce_prompt.md")
 
     @property
     def assets_dir(self) -> Path:
@@ -39,6 +45,37 @@ class TemplateRenderer:
         """
         return self._user_prompt_template.render(status=status, diff=diff)
 
+    def render_summary_system_prompt(self) -> str:
+        """Render the system prompt for summarizing part of a diff."""
+        return self._summary_system_prompt_template.render()
+
+    def render_summary_prompt(self, diff: str, part: int, parts: int) -> str:
+        """Render the user prompt for summarizing part of a diff.
+
+        Args:
+            diff: Diff text of the part
+            part: Number of the part, starting at 1
+            parts: Total number of parts
+
+        Returns:
+            Rendered summary prompt template
+        """
+        return self._summary_prompt_template.render(diff=diff, part=part, parts=parts)
+
+    def render_reduce_prompt(
+        self, status: str, summaries: Sequence[Mapping[str, str]]
+    ) -> str:
+        """Render the user prompt for writing a message from part summaries.
+
+        Args:
+            status: Output of git status command
+            summaries: Mappings with the ``paths`` and ``text`` of each summary
+
+        Returns:
+            Rendered reduce prompt template
+        """
+        return self._reduce_prompt_template.render(status=status, summaries=summaries)
+
     def render_config_template(self) -> str:
         """Render the configuration template.
 
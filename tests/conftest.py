@@ -21,6 +21,14 @@ print(f"Src directory: {src_dir}")
 print(f"Python path: {sys.path}")
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Point the acmsg cache directory at a per-test temporary directory."""
+    cache_home = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    return cache_home / "acmsg"
+
+
 @pytest.fixture
 def temp_config_file():
     """Create a temporary config file for testing."""
@@ -114,7 +122,7 @@ def mock_responses():
 @pytest.fixture
 def mock_requests():
     """Mock requests library."""
-    with patch("requests.post") as mock_post:
+    with patch("requests.Session.post") as mock_post:
         mock_post.return_value.ok = True
         mock_post.return_value.json.return_value = {
             "choices": [{"message": {"content": "feat: add new feature"}}]
@@ -0,0 +1,123 @@
+from acmsg.core.allocator import (
+    DOCS,
+    GENERATED,
+    SOURCE,
+    TESTS,
+    allocate_diff,
+    omitted_marker,
+    path_priority,
+)
+from acmsg.core.diff import parse_diff
+
+
+def count(text):
+    return len(text) // 4 + 1
+
+
+def file_diff(path, *hunk_sizes):
+    lines = [
+        f"diff --git a/{path} b/{path}",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+    ]
+    for i, size in enumerate(hunk_sizes, start=1):
+        lines.append(f"@@ -{i},1 +{i},{size} @@")
+        lines.extend(f"+{path} line {n}" for n in range(size))
+    return parse_diff("\n".join(lines))[0]
+
+
+class TestPathPriority:
+    def test_classification(self):
+        assert path_priority("src/acmsg/core/git.py") == SOURCE
+        assert path_priority("tests/test_git.py") == TESTS
+        assert path_priority("pkg/git_test.go") == TESTS
+        assert path_priority("README.md") == DOCS
+        assert path_priority("docs/usage.py") == DOCS
+        assert path_priority("uv.lock") == GENERATED
+        assert path_priority("vendor/lib/x.py") == GENERATED
+
+
+class TestAllocateDiff:
+    def test_everything_fits(self):
+        files = [file_diff("a.py", 2, 3), file_diff("tests/test_a.py", 2)]
+        allocation = allocate_diff(files, 10000, count)
+
+        assert allocation.omitted == {}
+        assert allocation.describe() == ""
+        assert allocation.text == "\n".join(f.text for f in files)
+
+    def test_small_hunks_before_large(self):
+        files = [file_diff("a.py", 200, 5), file_diff("b.py", 3)]
+        allocation = allocate_diff(files, 200, count)
+
+        assert "a.py line 4" in allocation.text
+        assert "b.py line 2" in allocation.text
+        assert allocation.omitted == {"a.py": [files[0].hunks[0]]}
+
+    def test_source_before_tests_docs_and_generated(self):
+        files = [
+            file_diff("tests/test_a.py", 10),
+            file_diff("README.md", 10),
+            file_diff("uv.lock", 10),
+            file_diff("a.py", 10),
+        ]
+        marker = omitted_marker(file_diff("x.py", 999).hunks)
+        fixed = sum(count(f.header) + count(marker) for f in files)
+        # Room for exactly one of the equally sized hunks
+        allocation = allocate_diff(files, fixed + count(files[3].hunks[0].text), count)
+
+        assert list(allocation.omitted) == ["tests/test_a.py", "README.md", "uv.lock"]
+
+    def test_every_file_keeps_header_and_stats(self):
+        files = [file_diff(f"f{i}.py", 50) for i in range(3)]
+        allocation = allocate_diff(files, 0, count)
+
+        for f in files:
+            assert f.header in allocation.text
+        assert allocation.text.count("[... 1 hunk omitted: +50 -0 lines ...]") == 3
+        assert allocation.describe().startswith("Left out 3 of 3 hunks from 3 files")
+
+    def test_keeps_original_order(self):
+        files = [file_diff("a.py", 40, 1, 40, 1)]
+        allocation = allocate_diff(files, 80, count)
+
+        marker = "[... 1 hunk omitted: +40 -0 lines ...]"
+        hunks = files[0].hunks
+        assert allocation.text == "\n".join(
+            [files[0].header, marker, hunks[1].text, marker, hunks[3].text]
+        )
+        assert parse_diff(allocation.text)[0].path == "a.py"
+
+    def test_describe_limits_listed_paths(self):
+        files = [file_diff(f"f{i}.py", 50) for i in range(7)]
+        assert (
+            allocate_diff(files, 0, count)
+            .describe(max_paths=2)
+            .endswith("f0.py, f1.py and 5 more")
+        )
+
+    def test_files_losing_hunks_are_described(self):
+        files = [file_diff("a.py", 200, 5), file_diff("b.py", 3)]
+        described = []
+
+        def describe(file_diff):
+            described.append(file_diff.path)
+            return "[symbols: modified def f]"
+
+        allocation = allocate_diff(files, 200, count, describe=describe)
+
+        assert described == ["a.py"]
+        assert allocation.text.startswith(
+            files[0].header + "\n[symbols: modified def f]\n"
+        )
+        assert allocation.described == {"a.py"}
+        assert allocation.undescribed == []
+        assert allocation.describe().endswith("(1 summarized by changed symbols)")
+
+    def test_undescribed_files(self):
+        files = [file_diff("a.py", 200), file_diff("b.md", 200)]
+        allocation = allocate_diff(
+            files, 50, count, describe=lambda f: None if f.path == "b.md" else "[s]"
+        )
+
+        assert allocation.undescribed == ["b.md"]
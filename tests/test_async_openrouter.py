@@ -0,0 +1,354 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from acmsg.api.retry import RetryPolicy
+from acmsg.api.tokenizer import TokenCalibration
+from acmsg.core.generation import AsyncCommitMessageGenerator
+from acmsg.exceptions import ApiError
+from acmsg.storage import write_json
+
+httpx = pytest.importorskip("httpx")
+
+from acmsg.api.async_openrouter import AsyncOpenRouterClient  # noqa: E402
+
+ENDPOINT = "http://localhost:8080/v1/chat/completions"
+
+
+@pytest.fixture(autouse=True)
+def warm_catalog(isolated_cache_dir):
+    """Seed a fresh model catalog so no test touches the network."""
+    write_json(
+        isolated_cache_dir / "models.json",
+        {
+            "fetched_at": time.time(),
+            "data": [{"id": "test_model", "context_length": 8192}],
+        },
+    )
+
+
+def stand_in(handler):
+    """Build an httpx client backed by a local OpenAI-compatible stand-in."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def completion(content):
+    """Build a non-streamed completion response."""
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+class TestAsyncOpenRouterClient:
+    """Tests for the AsyncOpenRouterClient class."""
+
+    def test_generate_completion(self):
+        """Test a non-streamed completion against the stand-in."""
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return completion("feat: async support")
+
+        async def run():
+            async with AsyncOpenRouterClient(
+                "test_token", client=stand_in(handler), api_endpoint=ENDPOINT
+            ) as client:
+                return await client.generate_completion(
+                    "test_model", "System", "User", 0.7
+                )
+
+        assert asyncio.run(run()) == "feat: async support"
+        request = requests_seen[0]
+        assert str(request.url) == ENDPOINT
+        assert request.headers["Authorization"] == "Bearer test_token"
+        payload = json.loads(request.content)
+        assert payload["model"] == "test_model"
+        assert payload["messages"][2]["content"] == "User"
+
+    def test_stream_completion(self):
+        """Test that streamed deltas are yielded as they arrive."""
+        body = "".join(
+            f"data: {json.dumps({'choices': [{'delta': {'content': part}}]})}\n\n"
+            for part in ["fix: ", "stream"]
+        )
+        body = ": OPENROUTER PROCESSING\n\n" + body + "data: [DONE]\n\n"
+
+        def handler(request):
+            return httpx.Response(
+                200, headers={"Content-Type": "text/event-stream"}, text=body
+            )
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token", client=stand_in(handler), api_endpoint=ENDPOINT
+            )
+            return [
+                chunk
+                async for chunk in client.stream_completion(
+                    "test_model", "System", "User", 0.7
+                )
+            ]
+
+        assert asyncio.run(run()) == ["fix: ", "stream"]
+
+    def test_blocking_steps_run_off_the_event_loop(self):
+        """Test that catalog loads and calibration writes run in worker threads."""
+        body = (
+            f"data: {json.dumps({'choices': [{'delta': {'content': 'fix: x'}}]})}\n\n"
+            f"data: {json.dumps({'choices': [], 'usage': {'prompt_tokens': 9}})}\n\n"
+        )
+
+        def handler(request):
+            return httpx.Response(
+                200, headers={"Content-Type": "text/event-stream"}, text=body
+            )
+
+        async def run():
+            calibration = TokenCalibration()
+            client = AsyncOpenRouterClient(
+                "test_token",
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+                token_calibration=calibration,
+            )
+            loop_thread = threading.current_thread()
+            blocked = []
+            index, record = client.catalog.index, calibration.record
+
+            def track(method):
+                def tracked(*args, **kwargs):
+                    blocked.append(threading.current_thread() is loop_thread)
+                    return method(*args, **kwargs)
+
+                return tracked
+
+            client.catalog.index = track(index)
+            calibration.record = track(record)
+            async for _ in client.stream_completion("test_model", "S", "U", 0.7):
+                pass
+            return blocked
+
+        blocked = asyncio.run(run())
+        assert len(blocked) >= 2
+        assert not any(blocked)
+
+    def test_error_mapping(self):
+        """Test that API errors are mapped like the synchronous client."""
+
+        def handler(request):
+            return httpx.Response(429, json={"error": {"message": "Rate limited"}})
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token",
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+                retry_policy=RetryPolicy(max_attempts=1),
+            )
+            await client.generate_completion("test_model", "System", "User", 0.7)
+
+        with pytest.raises(ApiError) as exc_info:
+            asyncio.run(run())
+
+        assert "API request failed" in str(exc_info.value)
+        assert "Rate limited" in str(exc_info.value)
+
+    def test_connection_error(self):
+        """Test that transport failures raise ApiError."""
+
+        def handler(request):
+            raise httpx.ConnectError("connection refused")
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token",
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+                retry_policy=RetryPolicy(max_attempts=1),
+            )
+            await client.generate_completion("test_model", "System", "User", 0.7)
+
+        with pytest.raises(ApiError) as exc_info:
+            asyncio.run(run())
+
+        assert "Failed to connect" in str(exc_info.value)
+
+    def test_retries_transient_failures(self):
+        """Test that rate limiting and connection failures are retried."""
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.ConnectError("connection refused"),
+            completion("feat: retried"),
+        ]
+
+        def handler(request):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token",
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+                retry_policy=RetryPolicy(backoff_base=0),
+            )
+            return await client.generate_completion(
+                "test_model", "System", "User", 0.7
+            )
+
+        assert asyncio.run(run()) == "feat: retried"
+        assert responses == []
+
+    def test_retries_exhausted(self):
+        """Test the error message once every attempt was rate limited."""
+
+        def handler(request):
+            return httpx.Response(503, json={"error": {"message": "Unavailable"}})
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token",
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+                retry_policy=RetryPolicy(max_attempts=2, backoff_base=0),
+            )
+            await client.generate_completion("test_model", "System", "User", 0.7)
+
+        with pytest.raises(ApiError) as exc_info:
+            asyncio.run(run())
+
+        assert "(after 2 attempts)" in str(exc_info.value)
+
+    def test_model_failover(self):
+        """Test that the next model is tried when one fails."""
+        models_seen = []
+
+        def handler(request):
+            model = json.loads(request.content)["model"]
+            models_seen.append(model)
+            if model == "test_model":
+                return httpx.Response(400, json={"error": {"message": "Bad model"}})
+            return completion(f"feat: from {model}")
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token", client=stand_in(handler), api_endpoint=ENDPOINT
+            )
+            return await client.generate_completion(
+                ["test_model", "backup_model"], "System", "User", 0.7
+            )
+
+        assert asyncio.run(run()) == "feat: from backup_model"
+        assert models_seen == ["test_model", "backup_model"]
+
+    def test_context_overflow_retried(self):
+        """Test that an overflow is retried within the reported limits."""
+        payloads = []
+
+        def handler(request):
+            payloads.append(json.loads(request.content))
+            if len(payloads) == 1:
+                message = (
+                    "Your input (3000 tokens) is longer than the model's "
+                    "context length (2048 tokens)."
+                )
+                return httpx.Response(400, json={"error": {"message": message}})
+            return completion("feat: fits")
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token", client=stand_in(handler), api_endpoint=ENDPOINT
+            )
+            result = await client.generate_completion(
+                "test_model", "System", "a" * 8000, 0.7
+            )
+            return result, client.context_limits.get("test_model")
+
+        assert asyncio.run(run()) == ("feat: fits", 2048)
+        assert "content trimmed" in payloads[1]["messages"][2]["content"]
+
+    def test_bounded_concurrency(self):
+        """Test that no more than max_concurrency requests run at once."""
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return completion("chore: ok")
+
+        async def run():
+            client = AsyncOpenRouterClient(
+                "test_token",
+                client=stand_in(handler),
+                max_concurrency=2,
+                api_endpoint=ENDPOINT,
+            )
+            return await asyncio.gather(
+                *(
+                    client.generate_completion("test_model", "S", "U", 0.7)
+                    for _ in range(6)
+                )
+            )
+
+        assert asyncio.run(run()) == ["chore: ok"] * 6
+        assert peak == 2
+
+
+class TestAsyncCommitMessageGenerator:
+    """Tests for the AsyncCommitMessageGenerator class."""
+
+    def test_generate_many(self):
+        """Test generating messages for several diffs concurrently."""
+
+        def handler(request):
+            user_prompt = json.loads(request.content)["messages"][2]["content"]
+            return completion("feat: one" if "one.py" in user_prompt else "fix: two")
+
+        async def run():
+            async with AsyncCommitMessageGenerator(
+                "test_token",
+                "test_model",
+                0.7,
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+            ) as generator:
+                return await generator.generate_many(
+                    [("A one.py", "diff one.py"), ("M two.py", "diff two.py")]
+                )
+
+        assert asyncio.run(run()) == ["feat: one", "fix: two"]
+
+    def test_generate_many_cancels_on_failure(self):
+        """Test that a failing generation cancels the others."""
+
+        async def handler(request):
+            user_prompt = json.loads(request.content)["messages"][2]["content"]
+            if "bad" in user_prompt:
+                return httpx.Response(500, json={"error": {"message": "boom"}})
+            await asyncio.sleep(10)
+            return completion("never")
+
+        async def run():
+            generator = AsyncCommitMessageGenerator(
+                "test_token",
+                "test_model",
+                0.7,
+                client=stand_in(handler),
+                api_endpoint=ENDPOINT,
+            )
+            start = time.monotonic()
+            with pytest.raises(ApiError):
+                await generator.generate_many(
+                    [("M slow.py", "slow"), ("M bad.py", "bad")]
+                )
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) < 5
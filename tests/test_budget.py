@@ -0,0 +1,108 @@
+import pytest
+
+from acmsg.api.budget import TRIM_MARKER, TokenBudget, trim_middle, trim_prompts
+from acmsg.api.openrouter import OpenRouterClient
+from acmsg.exceptions import ContextLengthError
+
+
+def estimate(text):
+    return len(text) // 4 + 1
+
+
+class TestTrimming:
+    def test_trim_middle_keeps_both_ends(self):
+        text = "A" * 400 + "B" * 400 + "C" * 400
+        trimmed = trim_middle(text, 100, 0.5)
+        assert trimmed == "A" * 200 + TRIM_MARKER + "C" * 200
+
+    def test_trim_middle_with_nothing_left_for_the_end(self):
+        trimmed = trim_middle("A" * 100, 1, 1.0)
+        assert trimmed == "AAAA" + TRIM_MARKER
+
+    def test_trim_prompts_within_allowance(self):
+        assert trim_prompts("S", "U", 10, 20, 100) == ("S", "U", 10, 20, False)
+
+    def test_trim_prompts_reports_trimmed_sizes(self):
+        system, user, system_tokens, user_tokens, was_trimmed = trim_prompts(
+            "S" * 400, "U" * 4000, 101, 1001, 500
+        )
+        assert was_trimmed
+        assert (system_tokens, user_tokens) == (101, 399)
+        assert system == "S" * 400
+        assert TRIM_MARKER in user
+
+
+    def test_trim_prompts_cuts_at_estimated_density(self):
+        # Symbol-heavy text: 2 characters per token instead of 4
+        _, user, _, _, _ = trim_prompts("S", "{}" * 2000, 1, 2000, 501)
+        assert len(user) == 1000 + len(TRIM_MARKER)
+
+
+class TestTokenBudget:
+    def test_small_prompt(self):
+        budget = TokenBudget.plan("model", 8192, "S" * 40, "U" * 400, estimate)
+        assert not budget.was_trimmed
+        assert not budget.use_transforms
+        assert budget.max_tokens == 1024
+        assert budget.prompt_tokens == 11 + 101 + 200
+
+    def test_reserves_room_for_the_response(self):
+        # Fits the context on its own, but leaves no room for the reply
+        budget = TokenBudget.plan("model", 8192, "S" * 40, "U" * 30000, estimate)
+        assert budget.was_trimmed
+        assert budget.use_transforms
+        assert budget.max_tokens == 1024
+        assert budget.prompt_tokens + budget.max_tokens <= 8192
+
+    def test_reserve_is_capped_for_small_contexts(self):
+        budget = TokenBudget.plan(
+            "model", 2048, "S" * 40, "U" * 100000, estimate, max_tokens=4096
+        )
+        assert budget.prompt_tokens == 2048 - 512
+        assert budget.max_tokens == 512
+
+    def test_without_response_limit(self):
+        budget = TokenBudget.plan("model", 100000, "S", "U", estimate, max_tokens=None)
+        assert budget.max_tokens is None
+        assert not budget.was_trimmed
+
+    def test_estimates_each_part_once(self):
+        calls = []
+
+        def counting_estimate(text):
+            calls.append(text)
+            return estimate(text)
+
+        TokenBudget.plan("model", 4096, "S" * 40, "U" * 100000, counting_estimate)
+        assert calls == ["S" * 40, "U" * 100000]
+
+
+class TestBudgetErrorReporting:
+    def test_context_error_uses_api_counts(self):
+        client = OpenRouterClient("test_token")
+        budget = TokenBudget("org/model", 4096, "S", "U", 10, 3800, 96, True, True)
+
+        with pytest.raises(ContextLengthError) as exc_info:
+            client._raise_api_error(
+                "This endpoint's maximum context length is 4096 tokens. Your input "
+                "(5000 tokens) is longer than the model's context length "
+                "(4096 tokens).",
+                budget,
+            )
+
+        message = str(exc_info.value)
+        assert "for model:" in message
+        assert "Input is 5000 tokens" in message
+        assert "after automatic content trimming" in message
+
+    def test_context_error_falls_back_to_estimates(self):
+        client = OpenRouterClient("test_token")
+        budget = TokenBudget("model", 4096, "S", "U", 100, 3900, 96)
+
+        with pytest.raises(ContextLengthError) as exc_info:
+            client._raise_api_error(
+                "Prompt is longer than the model's context length", budget
+            )
+
+        assert "Input is 4200 tokens" in str(exc_info.value)
+        assert "exceeding by 104 tokens" in str(exc_info.value)
@@ -0,0 +1,57 @@
+import os
+
+from acmsg.core.cache import ResponseCache
+
+TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+class TestResponseCache:
+    def test_key_covers_every_input(self):
+        key = ResponseCache.key(TREE, "system", "user", "model", 0.7)
+
+        assert key == ResponseCache.key(TREE, "system", "user", "model", 0.7)
+        assert key != ResponseCache.key("0" * 40, "system", "user", "model", 0.7)
+        assert key != ResponseCache.key(TREE, "system", "other", "model", 0.7)
+        assert key != ResponseCache.key(TREE, "system", "user", "other", 0.7)
+        assert key != ResponseCache.key(TREE, "system", "user", "model", 0.8)
+        assert ResponseCache.key(TREE, "s", "u", ["a", "b"], 1) == ResponseCache.key(
+            TREE, "s", "u", "a,b", 1.0
+        )
+
+    def test_get_and_put(self, tmp_path):
+        cache = ResponseCache(tmp_path)
+        key = ResponseCache.key(TREE, "system", "user", "model", 0.7)
+
+        assert cache.get(key) is None
+        cache.put(key, "feat: cached message")
+        assert cache.get(key) == "feat: cached message"
+        assert ResponseCache(tmp_path).get(key) == "feat: cached message"
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        cache = ResponseCache(tmp_path)
+        (tmp_path / "abc.json").write_text("{not json")
+
+        assert cache.get("abc") is None
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = ResponseCache(tmp_path, max_entries=2)
+        for i, key in enumerate(["a", "b"]):
+            cache.put(key, key)
+            os.utime(tmp_path / f"{key}.json", (i, i))
+
+        # Reading "a" makes "b" the least recently used entry
+        assert cache.get("a") == "a"
+        cache.put("c", "c")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "a"
+        assert cache.get("c") == "c"
+
+    def test_evicts_by_size(self, tmp_path):
+        cache = ResponseCache(tmp_path, max_bytes=300)
+        cache.put("old", "x" * 200)
+        os.utime(tmp_path / "old.json", (0, 0))
+        cache.put("new", "y" * 200)
+
+        assert cache.get("old") is None
+        assert cache.get("new") == "y" * 200
@@ -0,0 +1,199 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from acmsg.api.catalog import ModelCatalog, ModelIndex, _join_pending_refreshes
+from acmsg.storage import read_json, write_json
+
+
+def make_response(status_code=200, data=None, headers=None):
+    """Build a mock catalog response."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.ok = status_code < 400
+    response.headers = headers or {}
+    response.json.return_value = {"data": data or []}
+    return response
+
+
+class TestModelCatalog:
+    """Tests for the ModelCatalog class."""
+
+    def test_cold_cache_downloads_and_persists(self, isolated_cache_dir):
+        """Test that a missing cache is fetched synchronously and written to disk."""
+        session = MagicMock()
+        session.get.return_value = make_response(
+            data=[{"id": "test_model", "context_length": 8192}],
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+
+        catalog = ModelCatalog(session)
+        models = catalog.models()
+
+        assert models == [{"id": "test_model", "context_length": 8192}]
+        assert catalog.cache_file.parent == isolated_cache_dir
+        entry = read_json(catalog.cache_file)
+        assert entry["etag"] == '"v1"'
+        assert entry["data"] == models
+
+    def test_fresh_cache_skips_network(self, tmp_path):
+        """Test that a fresh on-disk entry is served without any request."""
+        cache_file = tmp_path / "models.json"
+        write_json(cache_file, {"fetched_at": time.time(), "data": [{"id": "m"}]})
+        session = MagicMock()
+
+        catalog = ModelCatalog(session, cache_file=cache_file)
+
+        assert catalog.models() == [{"id": "m"}]
+        session.get.assert_not_called()
+
+    def test_stale_cache_served_while_revalidating(self, tmp_path):
+        """Test that stale entries are returned immediately and revalidated."""
+        cache_file = tmp_path / "models.json"
+        write_json(
+            cache_file,
+            {"etag": '"v1"', "fetched_at": 0, "data": [{"id": "old"}]},
+        )
+        session = MagicMock()
+        session.get.return_value = make_response(status_code=304)
+
+        catalog = ModelCatalog(session, ttl=60, cache_file=cache_file)
+
+        assert catalog.models() == [{"id": "old"}]
+        catalog.wait(5)
+
+        _, kwargs = session.get.call_args
+        assert kwargs["headers"]["If-None-Match"] == '"v1"'
+        entry = read_json(cache_file)
+        assert entry["data"] == [{"id": "old"}]
+        assert entry["fetched_at"] > 0
+
+    def test_pending_refresh_joined_at_exit(self, tmp_path):
+        """Test that the exit hook lets a background refresh save the catalog."""
+        cache_file = tmp_path / "models.json"
+        write_json(cache_file, {"fetched_at": 0, "data": [{"id": "old"}]})
+        release = threading.Event()
+        session = MagicMock()
+
+        def slow_get(**kwargs):
+            release.wait(5)
+            return make_response(data=[{"id": "new"}])
+
+        session.get.side_effect = slow_get
+        catalog = ModelCatalog(session, ttl=60, cache_file=cache_file)
+
+        assert catalog.models() == [{"id": "old"}]
+        threading.Timer(0.05, release.set).start()
+        _join_pending_refreshes(timeout=5)
+
+        assert read_json(cache_file)["data"] == [{"id": "new"}]
+
+    def test_stale_cache_replaced_on_change(self, tmp_path):
+        """Test that a changed catalog replaces the stale entry."""
+        cache_file = tmp_path / "models.json"
+        write_json(cache_file, {"fetched_at": 0, "data": [{"id": "old"}]})
+        session = MagicMock()
+        session.get.return_value = make_response(data=[{"id": "new"}])
+
+        catalog = ModelCatalog(session, cache_file=cache_file, background_refresh=False)
+
+        assert catalog.models() == [{"id": "new"}]
+        assert read_json(cache_file)["data"] == [{"id": "new"}]
+
+    def test_failed_download_keeps_stale_entry(self, tmp_path):
+        """Test that network failures fall back to the cached entry."""
+        cache_file = tmp_path / "models.json"
+        write_json(cache_file, {"fetched_at": 0, "data": [{"id": "old"}]})
+        session = MagicMock()
+        session.get.return_value = make_response(status_code=503)
+
+        catalog = ModelCatalog(session, cache_file=cache_file, background_refresh=False)
+
+        assert catalog.models() == [{"id": "old"}]
+
+    def test_cold_cache_failure_returns_empty(self, tmp_path):
+        """Test that an unreachable catalog with no cache yields no models."""
+        session = MagicMock()
+        session.get.return_value = make_response(status_code=500)
+
+        catalog = ModelCatalog(session, cache_file=tmp_path / "models.json")
+
+        assert catalog.models() == []
+
+
+SAMPLE_MODELS = [
+    {
+        "id": "qwen/qwen3-30b-a3b:free",
+        "name": "Qwen: Qwen3 30B A3B (free)",
+        "context_length": 40960,
+        "pricing": {"prompt": "0", "completion": "0"},
+    },
+    {
+        "id": "anthropic/claude-3.5-sonnet",
+        "name": "Anthropic: Claude 3.5 Sonnet",
+        "context_length": 200000,
+        "pricing": {"prompt": "0.000003", "completion": "0.000015"},
+    },
+    {
+        "id": "anthropic/claude-3-haiku",
+        "name": "Anthropic: Claude 3 Haiku",
+        "context_length": 200000,
+        "pricing": {"prompt": "0.00000025", "completion": "0.00000125"},
+    },
+    {
+        "id": "openai/gpt-4o",
+        "name": "OpenAI: GPT-4o",
+        "context_length": 128000,
+        "pricing": {"prompt": "0.0000025", "completion": "0.00001"},
+    },
+]
+
+
+class TestModelIndex:
+    """Tests for the ModelIndex class."""
+
+    def test_exact_lookup_is_case_insensitive(self):
+        """Test exact ID lookup."""
+        index = ModelIndex(SAMPLE_MODELS)
+
+        assert index.get("OpenAI/GPT-4o") is SAMPLE_MODELS[3]
+        assert index.get("openai/gpt-4") is None
+
+    def test_lookup_falls_back_to_first_partial_match(self):
+        """Test that partial lookups return the first match in catalog order."""
+        index = ModelIndex(SAMPLE_MODELS)
+
+        assert index.lookup("claude-3") is SAMPLE_MODELS[1]
+        assert index.lookup("haiku") is SAMPLE_MODELS[2]
+        assert index.lookup("4o") is SAMPLE_MODELS[3]
+        assert index.lookup("mistral") is None
+
+    def test_with_prefix(self):
+        """Test prefix queries."""
+        index = ModelIndex(SAMPLE_MODELS)
+
+        assert index.with_prefix("anthropic/") == SAMPLE_MODELS[1:3]
+        assert index.with_prefix("google/") == []
+
+    def test_search_filters(self):
+        """Test searching by name, context length and price."""
+        index = ModelIndex(SAMPLE_MODELS)
+
+        assert index.search("sonnet") == [SAMPLE_MODELS[1]]
+        assert index.search(min_context=150000) == SAMPLE_MODELS[1:3]
+        assert index.search("anthropic", max_prompt_price=1.0) == [SAMPLE_MODELS[2]]
+        assert index.search(free_only=True) == [SAMPLE_MODELS[0]]
+
+    def test_catalog_index_rebuilt_only_on_new_version(self, tmp_path):
+        """Test that the catalog reuses its index until the model list changes."""
+        cache_file = tmp_path / "models.json"
+        write_json(cache_file, {"fetched_at": time.time(), "data": SAMPLE_MODELS})
+        catalog = ModelCatalog(MagicMock(), cache_file=cache_file)
+
+        first = catalog.index()
+        assert catalog.index() is first
+        assert len(first) == len(SAMPLE_MODELS)
+
+        catalog._session.get.return_value = make_response(data=SAMPLE_MODELS[:1])
+        catalog.refresh()
+        assert catalog.index() is not first
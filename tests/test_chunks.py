@@ -0,0 +1,86 @@
+from acmsg.core.chunks import file_group, split_diff
+from acmsg.core.diff import parse_diff
+
+
+def count(text):
+    return len(text) // 4 + 1
+
+
+def file_diff(path, *hunk_sizes, index="1234567..89abcde"):
+    lines = [
+        f"diff --git a/{path} b/{path}",
+        f"index {index} 100644",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+    ]
+    for i, size in enumerate(hunk_sizes, start=1):
+        lines.append(f"@@ -{i},1 +{i},{size} @@")
+        lines.extend(f"+line {n}" for n in range(size))
+    return parse_diff("\n".join(lines))[0]
+
+
+class TestFileGroup:
+    def test_groups_by_leading_directories(self):
+        assert file_group("setup.py") == ""
+        assert file_group("src/a.py") == "src"
+        assert file_group("src/acmsg/core/git.py") == "src/acmsg"
+
+
+class TestSplitDiff:
+    def test_small_files_share_a_chunk(self):
+        files = [file_diff("src/a/x.py", 2), file_diff("src/a/y.py", 2)]
+        chunks = split_diff(files, 1000, count)
+
+        assert len(chunks) == 1
+        assert chunks[0].paths == "src/a/x.py, src/a/y.py"
+        assert chunks[0].text == "\n".join(f.text for f in files)
+
+    def test_chunks_do_not_span_groups(self):
+        files = [
+            file_diff("src/b/y.py", 2),
+            file_diff("docs/x.md", 2),
+            file_diff("src/b/x.py", 2),
+        ]
+        chunks = split_diff(files, 1000, count)
+
+        assert [chunk.paths for chunk in chunks] == [
+            "docs/x.md",
+            "src/b/x.py, src/b/y.py",
+        ]
+
+    def test_packs_within_budget(self):
+        files = [file_diff(f"src/a/{name}.py", 100) for name in "xyz"]
+        chunks = split_diff(files, 300, count)
+
+        assert [chunk.paths for chunk in chunks] == [
+            "src/a/x.py",
+            "src/a/y.py",
+            "src/a/z.py",
+        ]
+
+    def test_large_file_is_split_between_hunks(self):
+        big = file_diff("src/a/big.py", 100, 100, 100)
+        chunks = split_diff([big], 250, count)
+
+        assert len(chunks) == 3
+        for chunk, hunk in zip(chunks, big.hunks):
+            assert chunk.files[0].header == big.header
+            assert chunk.files[0].hunks == [hunk]
+        assert len({chunk.key for chunk in chunks}) == 3
+
+    def test_key_follows_headers(self):
+        first = split_diff([file_diff("a.py", 2)], 1000, count)[0]
+        same = split_diff([file_diff("a.py", 2)], 1000, count)[0]
+        changed = file_diff("a.py", 2, index="1234567..fedcba9")
+
+        assert first.key == same.key
+        assert split_diff([changed], 1000, count)[0].key != first.key
+
+    def test_key_follows_hunks_without_index_line(self):
+        def compacted(line):
+            return parse_diff(f"diff --git a.py a.py\n@@ -1 +1 @@\n+{line}")
+
+        first = split_diff(compacted("x = 1"), 1000, count)[0]
+        changed = split_diff(compacted("x = 2"), 1000, count)[0]
+
+        assert first.key != changed.key
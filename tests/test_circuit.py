@@ -0,0 +1,41 @@
+from unittest.mock import patch
+
+from acmsg.api.circuit import CircuitBreaker
+from acmsg.storage import read_json
+
+
+class TestCircuitBreaker:
+    def test_closed_by_default(self, tmp_path):
+        breaker = CircuitBreaker(tmp_path / "circuits.json")
+        assert breaker.allow("model")
+
+    @patch("acmsg.api.circuit.time.time")
+    def test_opens_and_cools_down(self, mock_time, tmp_path):
+        mock_time.return_value = 1000.0
+        breaker = CircuitBreaker(
+            tmp_path / "circuits.json", failure_threshold=2, cooldown=60
+        )
+
+        breaker.record_failure("model")
+        assert breaker.allow("model")
+        breaker.record_failure("model")
+        assert not breaker.allow("model")
+        assert breaker.allow("other")
+
+        mock_time.return_value = 1061.0
+        # Half-open: one request is let through after the cooldown
+        assert breaker.allow("model")
+
+    def test_success_closes_circuit(self, tmp_path):
+        breaker = CircuitBreaker(tmp_path / "circuits.json")
+        breaker.record_failure("model")
+        assert not breaker.allow("model")
+
+        breaker.record_success("model")
+        assert breaker.allow("model")
+        assert read_json(tmp_path / "circuits.json") == {}
+
+    def test_persisted_between_runs(self, tmp_path):
+        CircuitBreaker(tmp_path / "circuits.json").record_failure("model")
+
+        assert not CircuitBreaker(tmp_path / "circuits.json").allow("model")
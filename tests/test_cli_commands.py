@@ -1,4 +1,4 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 from io import StringIO
 
 from acmsg.cli.commands import (  # type: ignore
@@ -8,10 +8,15 @@ from acmsg.cli.commands import (  # type: ignore
     prompt_for_action,
     ensure_api_token_configured,
     generate_commit_message,
+    stream_commit_message,
     commit_with_message,
     handle_commit,
     handle_config,
+    handle_models,
+    handle_stats,
 )
+from acmsg.api.hedging import HedgeStats  # type: ignore
+from acmsg.core.compaction import CompactionPolicy  # type: ignore
 from acmsg.core.generation import format_message  # type: ignore
 from acmsg.exceptions import ConfigError, GitError  # type: ignore
 
@@ -173,11 +178,22 @@ class TestCliCommands:
         mock_thread_instance = MagicMock()
         mock_thread.return_value = mock_thread_instance
         
-        result = generate_commit_message(mock_repo, "test_token", "test_model", 0.7)
+        mock_generator_instance.notes = ["Warning: 3 hunks omitted."]
+        notes = []
+        result = generate_commit_message(
+            mock_repo, "test_token", "test_model", 0.7, notes=notes
+        )
         
         assert result == "formatted message"
-        mock_generator.assert_called_once_with("test_token", "test_model", 0.7)
-        mock_generator_instance.generate.assert_called_once_with("M file.py", "diff content")
+        # Warnings are handed back instead of printed over the spinner
+        assert notes == ["Warning: 3 hunks omitted."]
+        assert "hunks omitted" not in mock_stdout.getvalue()
+        mock_generator.assert_called_once_with(
+            "test_token", "test_model", 0.7, cache=None, summary_cache=None, symbols=ANY
+        )
+        mock_generator_instance.generate.assert_called_once_with(
+            "M file.py", "diff content", tree=None
+        )
         mock_format.assert_called_once_with("feat: add new feature")
         mock_thread_instance.start.assert_called_once()
         mock_thread_instance.join.assert_called_once()
@@ -230,10 +246,12 @@ class TestCliCommands:
         mock_args = MagicMock()
         mock_args.model = None
         mock_args.temperature = None
+        mock_args.deadline = None
 
         mock_config_instance = MagicMock()
-        mock_config_instance.model = "default_model"
+        mock_config_instance.models = ["default_model"]
         mock_config_instance.temperature = 0.7
+        mock_config_instance.deadline = None
         mock_config.return_value = mock_config_instance
 
         mock_ensure_token.return_value = "test_token"
@@ -255,12 +273,135 @@ class TestCliCommands:
         mock_ensure_token.assert_called_once_with(mock_config_instance)
         mock_git.assert_called_once()
         mock_generate_message.assert_called_once_with(
-            mock_git_instance, "test_token", "default_model", 0.7
+            mock_git_instance,
+            "test_token",
+            ["default_model"],
+            0.7,
+            cache=ANY,
+            diff=None,
+            notes=[],
+            catalog_ttl=mock_config_instance.model_cache_ttl,
+            retry_policy=mock_config_instance.retry_policy,
+            hedge_policy=mock_config_instance.hedge_policy,
+            deadline=ANY,
         )
         mock_print.assert_called_once_with("formatted message")
         mock_prompt.assert_called_once_with("formatted message")
         mock_commit_with_message.assert_called_once_with("formatted message")
         
+    @patch("acmsg.cli.commands.Config")
+    @patch("acmsg.cli.commands.GitUtils")
+    @patch("acmsg.cli.commands.ensure_api_token_configured")
+    @patch("acmsg.cli.commands.DiffFilter")
+    @patch("acmsg.cli.commands.generate_commit_message")
+    @patch("acmsg.cli.commands.print_message")
+    @patch("acmsg.cli.commands.prompt_for_action")
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_handle_commit_filters_generated_files(
+        self,
+        mock_stdout,
+        mock_prompt,
+        mock_print,
+        mock_generate_message,
+        mock_filter,
+        mock_ensure_token,
+        mock_git,
+        mock_config,
+    ):
+        """Test that the filtered diff and pathspecs are used for generation."""
+        mock_args = MagicMock()
+        mock_args.model = None
+        mock_args.temperature = None
+        mock_args.deadline = None
+        mock_args.no_filter = False
+        mock_args.pathspec = ["src/"]
+
+        mock_config_instance = MagicMock()
+        mock_config_instance.deadline = None
+        mock_config_instance.exclude = ["*.lock"]
+        mock_config.return_value = mock_config_instance
+        mock_git.return_value.staged_changes.truncated = False
+
+        filtered = mock_filter.return_value.filter_repo.return_value
+        filtered.filtered = [("uv.lock", "matches *.lock")]
+        filtered.text = "filtered diff"
+        filtered.describe.return_value = "Left out the diffs of 1 generated file"
+        mock_generate_message.return_value = "formatted message"
+        mock_prompt.return_value = False
+
+        handle_commit(mock_args)
+
+        mock_git.assert_called_once_with(
+            max_diff_bytes=mock_config_instance.max_diff_size,
+            pathspecs=["src/"],
+            diff_options=["-U3"],
+            prescan=True,
+            left_out=mock_filter.return_value.left_out,
+        )
+        mock_filter.assert_called_once_with(["*.lock"])
+        mock_filter.return_value.filter_repo.assert_called_once_with(
+            mock_git.return_value
+        )
+        assert mock_generate_message.call_args.kwargs["diff"] == "filtered diff"
+        assert "Left out the diffs of 1 generated file" in mock_stdout.getvalue()
+
+    @patch("acmsg.cli.commands.Config")
+    @patch("acmsg.cli.commands.GitUtils")
+    @patch("acmsg.cli.commands.ensure_api_token_configured")
+    @patch("acmsg.cli.commands.generate_commit_message")
+    @patch("acmsg.cli.commands.print_message")
+    @patch("acmsg.cli.commands.prompt_for_action")
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_handle_commit_compacts_diff(
+        self,
+        mock_stdout,
+        mock_prompt,
+        mock_print,
+        mock_generate_message,
+        mock_ensure_token,
+        mock_git,
+        mock_config,
+    ):
+        """Test that the compacted diff is used and its savings reported."""
+        mock_args = MagicMock()
+        mock_args.model = "test-model"
+        mock_args.temperature = None
+        mock_args.deadline = None
+        mock_args.no_filter = True
+        mock_args.no_compact = False
+        mock_args.pathspec = []
+
+        mock_config_instance = MagicMock()
+        mock_config_instance.deadline = None
+        mock_config_instance.compaction_policy = CompactionPolicy(algorithm="minimal")
+        mock_config.return_value = mock_config_instance
+        mock_git.return_value.staged_changes.truncated = False
+        mock_git.return_value.diff = (
+            "diff --git a/app.py b/app.py\n"
+            "index 1111111..2222222 100644\n"
+            "--- a/app.py\n"
+            "+++ b/app.py\n"
+            "@@ -1 +1 @@\n"
+            "-old\n"
+            "+new"
+        )
+        mock_generate_message.return_value = "formatted message"
+        mock_prompt.return_value = False
+
+        handle_commit(mock_args)
+
+        assert mock_git.call_args.kwargs["diff_options"] == [
+            "-U3",
+            "--diff-algorithm=minimal",
+            "--find-renames",
+            "--find-copies",
+        ]
+        assert mock_git.call_args.kwargs["left_out"] is None
+        assert mock_generate_message.call_args.kwargs["diff"] == (
+            "diff --git app.py app.py\n--- app.py\n+++ app.py\n@@ -1 +1 @@\n-old\n+new"
+        )
+        assert "Compacted the diff by" in mock_stdout.getvalue()
+
     @patch("acmsg.cli.commands.Config")
     @patch("acmsg.cli.commands.GitUtils")
     @patch("acmsg.cli.commands.ensure_api_token_configured")
@@ -283,10 +424,12 @@ class TestCliCommands:
         mock_args = MagicMock()
         mock_args.model = None
         mock_args.temperature = None
+        mock_args.deadline = None
 
         mock_config_instance = MagicMock()
-        mock_config_instance.model = "default_model"
+        mock_config_instance.models = ["default_model"]
         mock_config_instance.temperature = 0.7
+        mock_config_instance.deadline = None
         mock_config.return_value = mock_config_instance
 
         mock_ensure_token.return_value = "test_token"
@@ -309,7 +452,17 @@ class TestCliCommands:
             mock_ensure_token.assert_called_once_with(mock_config_instance)
             mock_git.assert_called_once()
             mock_generate_message.assert_called_once_with(
-                mock_git_instance, "test_token", "default_model", 0.7
+                mock_git_instance,
+                "test_token",
+                ["default_model"],
+                0.7,
+                cache=ANY,
+                diff=None,
+                notes=[],
+                catalog_ttl=mock_config_instance.model_cache_ttl,
+                retry_policy=mock_config_instance.retry_policy,
+                hedge_policy=mock_config_instance.hedge_policy,
+                deadline=ANY,
             )
             mock_print.assert_called_once_with("formatted message")
             assert mock_prompt.call_count == 2
@@ -325,9 +478,11 @@ class TestCliCommands:
         """Test handling commit with no staged changes."""
         # Setup mocks
         mock_args = MagicMock()
+        mock_args.deadline = None
 
         mock_config_instance = MagicMock()
         mock_config_instance.api_token = "test_token"
+        mock_config_instance.deadline = None
         mock_config.return_value = mock_config_instance
 
         mock_git_instance = MagicMock()
@@ -409,3 +564,135 @@ class TestCliCommands:
         mock_exit.assert_called_once_with(1)
         # Verify the error message was printed
         assert "Configuration error" in mock_stdout.getvalue()
+
+    @patch("acmsg.cli.commands.ModelCatalog")
+    @patch("acmsg.cli.commands.Config")
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_handle_models(self, mock_stdout, mock_config, mock_catalog):
+        """Test searching the model catalog."""
+        mock_args = MagicMock()
+        mock_args.query = "claude"
+        mock_args.min_context = None
+        mock_args.max_price = None
+        mock_args.free = False
+        mock_args.limit = 25
+        mock_args.refresh = False
+
+        mock_index = mock_catalog.return_value.index.return_value
+        mock_index.search.return_value = [
+            {
+                "id": "anthropic/claude-3-haiku",
+                "context_length": 200000,
+                "pricing": {"prompt": "0.00000025", "completion": "0"},
+            }
+        ]
+
+        handle_models(mock_args)
+
+        mock_index.search.assert_called_once_with(
+            "claude", min_context=None, max_prompt_price=None, free_only=False
+        )
+        mock_catalog.return_value.refresh.assert_not_called()
+        # A stale catalog is revalidated before searching, not in the background
+        assert mock_catalog.call_args.kwargs["background_refresh"] is False
+        output = mock_stdout.getvalue()
+        assert "anthropic/claude-3-haiku" in output
+        assert "200000" in output
+        assert "$0.25" in output
+        assert "free" in output
+
+    @patch("acmsg.cli.commands.ModelCatalog")
+    @patch("acmsg.cli.commands.Config")
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_handle_models_no_results(self, mock_stdout, mock_config, mock_catalog):
+        """Test searching the model catalog with no matches."""
+        mock_args = MagicMock()
+        mock_args.refresh = True
+        mock_catalog.return_value.index.return_value.search.return_value = []
+
+        handle_models(mock_args)
+
+        mock_catalog.return_value.refresh.assert_called_once()
+        assert "No matching models found" in mock_stdout.getvalue()
+
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_handle_stats(self, mock_stdout):
+        """Test showing hedge statistics."""
+        stats = HedgeStats()
+        for latency in (1.0, 1.2, 1.4, 1.6, 3.0):
+            stats.record([("qwen/qwen3", latency)], hedged=latency > 2, hedge_won=False)
+
+        handle_stats(MagicMock())
+
+        output = mock_stdout.getvalue()
+        assert "Requests:   5" in output
+        assert "Hedged:     1 (20%)" in output
+        assert "qwen/qwen3" in output
+        assert "3.00s" in output
+
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_handle_stats_empty(self, mock_stdout):
+        """Test showing hedge statistics before any were recorded."""
+        handle_stats(MagicMock())
+
+        assert "No hedged requests recorded yet" in mock_stdout.getvalue()
+
+    @patch("acmsg.cli.commands.CommitMessageGenerator")
+    @patch("threading.Thread")
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_stream_commit_message(self, mock_stdout, mock_thread, mock_generator):
+        """Test printing a commit message as it streams in."""
+        mock_repo = MagicMock()
+        mock_repo.files_status = "M file.py"
+        mock_repo.diff = "diff content"
+
+        mock_generator_instance = mock_generator.return_value
+        mock_generator_instance.generate_stream.return_value = iter(
+            ["feat: add ", "streaming\n\nBody ", "text"]
+        )
+
+        result = stream_commit_message(mock_repo, "test_token", "test_model", 0.7)
+
+        assert result == "feat: add streaming\n\nBody text"
+        mock_generator_instance.generate_stream.assert_called_once_with(
+            "M file.py", "diff content", tree=None
+        )
+        output = mock_stdout.getvalue()
+        assert "Commit message:" in output
+        assert "  feat: add streaming\n  \n  Body text" in output
+        mock_thread.return_value.join.assert_called_once()
+
+    @patch("acmsg.cli.commands.CommitMessageGenerator")
+    @patch("threading.Thread")
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_generate_commit_message_with_cache(
+        self, mock_stdout, mock_thread, mock_generator
+    ):
+        """Test that the staged tree is passed on when caching is enabled."""
+        mock_repo = MagicMock()
+        mock_repo.files_status = "M file.py"
+        mock_repo.diff = "diff content"
+        mock_repo.staged_tree = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+        mock_generator.return_value.generate.return_value = "feat: cached"
+        cache = MagicMock()
+
+        result = generate_commit_message(
+            mock_repo, "test_token", "test_model", 0.7, cache=cache
+        )
+
+        assert result == "feat: cached"
+        mock_generator.assert_called_once_with(
+            "test_token",
+            "test_model",
+            0.7,
+            cache=cache,
+            summary_cache=ANY,
+            symbols=ANY,
+        )
+        summary_cache = mock_generator.call_args.kwargs["summary_cache"]
+        assert summary_cache.cache_dir.name == "summaries"
+        symbols = mock_generator.call_args.kwargs["symbols"].__self__
+        assert symbols._cache.cache_dir.name == "symbols"
+        mock_generator.return_value.generate.assert_called_once_with(
+            "M file.py", "diff content", tree="4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+        )
@@ -1,4 +1,4 @@
-# import pytest
+import pytest
 import argparse
 # from unittest.mock import patch
 
@@ -66,6 +66,9 @@ class TestCliParsers:
                                     "api_token",
                                     "model",
                                     "temperature",
+                                    "model_cache_ttl",
+                                    "deadline",
+                                    "max_diff_size",
                                 ]
                             elif set_action.dest == "value":
                                 has_value_arg = True
@@ -86,6 +89,9 @@ class TestCliParsers:
                                     "api_token",
                                     "model",
                                     "temperature",
+                                    "model_cache_ttl",
+                                    "deadline",
+                                    "max_diff_size",
                                 ]
 
                         assert has_parameter_arg
@@ -112,6 +118,27 @@ class TestCliParsers:
         args = parser.parse_args(["commit", "--model", "test_model"])
         assert args.command == "commit"
         assert args.model == "test_model"
+        assert args.deadline is None
+
+        args = parser.parse_args(["commit", "--model", "a, b"])
+        assert args.model == "a, b"
+
+        with pytest.raises(SystemExit) as exc_info:
+            parser.parse_args(["commit", "--model", " , "])
+        assert exc_info.value.code == 2
+
+        args = parser.parse_args(["commit", "--deadline", "30"])
+        assert args.deadline == 30.0
+        assert args.no_cache is False
+
+        args = parser.parse_args(["commit", "--no-cache"])
+        assert args.no_cache is True
+        assert args.no_filter is False
+        assert args.pathspec == []
+
+        args = parser.parse_args(["commit", "--no-filter", "src/", "README.md"])
+        assert args.no_filter is True
+        assert args.pathspec == ["src/", "README.md"]
 
     def test_parser_config_set_command(self):
         """Test the config set command."""
@@ -149,3 +176,19 @@ class TestCliParsers:
         args = parser.parse_args([])
         assert args.command is None
         assert args.version is False
+
+    def test_parser_models_command(self):
+        """Test the models command."""
+        parser = create_parser()
+        args = parser.parse_args(["models"])
+        assert args.command == "models"
+        assert args.query == ""
+        assert args.min_context is None
+        assert args.free is False
+
+        args = parser.parse_args(
+            ["models", "claude", "--min-context", "100000", "--max-price", "3"]
+        )
+        assert args.query == "claude"
+        assert args.min_context == 100000
+        assert args.max_price == 3.0
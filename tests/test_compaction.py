@@ -0,0 +1,212 @@
+import pytest
+
+from acmsg.core.compaction import (
+    CompactedDiff,
+    CompactionPolicy,
+    compact_diff,
+    is_whitespace_only,
+    trim_hunk,
+)
+from acmsg.core.diff import ADDED, RENAMED, parse_diff
+from acmsg.exceptions import ConfigError
+
+
+def count(text):
+    return len(text) // 4 + 1
+
+
+def hunk(text):
+    """Parse a one-hunk diff of app.py with the given hunk."""
+    return parse_diff(
+        "diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n" + text
+    )[0].hunks[0]
+
+
+DIFF = """\
+diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -10,3 +10,3 @@ def main():
+ a = 1
+-b = 2
++b = 3
+ c = 4
+diff --git a/new.py b/new.py
+new file mode 100755
+index 0000000..3333333
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1 @@
++print("hi")
+diff --git a/old.txt b/moved.txt
+similarity index 100%
+rename from old.txt
+rename to moved.txt"""
+
+
+class TestCompactionPolicy:
+    def test_defaults(self):
+        policy = CompactionPolicy.from_config(None)
+
+        assert policy.context is None
+        assert policy.git_options() == [
+            "-U3",
+            "--diff-algorithm=histogram",
+            "--find-renames",
+            "--find-copies",
+        ]
+
+    def test_from_config(self):
+        policy = CompactionPolicy.from_config(
+            {"context": 1, "algorithm": "default", "deduplicate": False}
+        )
+
+        assert policy.git_options() == ["-U1"]
+        assert policy.deduplicate is False
+        assert policy.context_for(10**6) == 1
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            "auto",
+            {"context": -1},
+            {"context": "many"},
+            {"algorithm": "fast"},
+            {"unified": 0},
+        ],
+    )
+    def test_invalid_config(self, data):
+        with pytest.raises(ConfigError):
+            CompactionPolicy.from_config(data)
+
+    def test_auto_context_shrinks_with_size(self):
+        policy = CompactionPolicy()
+
+        assert [policy.context_for(size) for size in (100, 20000, 200000, 10**6)] == [
+            3,
+            2,
+            1,
+            0,
+        ]
+
+
+class TestTrimHunk:
+    def test_trims_and_splits(self):
+        h = hunk(
+            "@@ -1,9 +1,9 @@ def f():\n 1\n-2\n+two\n 3\n 4\n 5\n 6\n 7\n-8\n+eight\n 9"
+        )
+
+        assert trim_hunk(h, 1) == [
+            "@@ -1,3 +1,3 @@ def f():",
+            " 1",
+            "-2",
+            "+two",
+            " 3",
+            "@@ -7,3 +7,3 @@",
+            " 7",
+            "-8",
+            "+eight",
+            " 9",
+        ]
+
+    def test_zero_context_insertion(self):
+        h = hunk("@@ -1,2 +1,3 @@\n a\n+b\n c")
+
+        assert trim_hunk(h, 0) == ["@@ -1,0 +2 @@", "+b"]
+
+    def test_untrimmed_hunk_is_kept(self):
+        h = hunk("@@ -1,2 +1,2 @@\n-a\n+b\n c")
+
+        assert trim_hunk(h, 3) == [h.text]
+
+    def test_notes_are_kept(self):
+        h = hunk(
+            "@@ -1,5 +1,5 @@\n-a\n+b\n 2\n 3\n 4\n 5\n[... same change in 3 more places ...]"
+        )
+
+        assert trim_hunk(h, 1) == [
+            "@@ -1,2 +1,2 @@",
+            "-a",
+            "+b",
+            " 2",
+            "[... same change in 3 more places ...]",
+        ]
+
+    def test_pseudo_hunks_are_kept(self):
+        h = hunk("@@ code cell 1 changed @@\n x\n x\n-a\n+b")
+
+        assert trim_hunk(h, 0) == [h.text]
+
+
+class TestWhitespace:
+    def test_reindented_lines(self):
+        assert is_whitespace_only(
+            hunk("@@ -1,2 +1,2 @@\n-if x:\n-  y()\n+if  x:\n+    y()")
+        )
+
+    def test_changed_lines(self):
+        assert not is_whitespace_only(hunk("@@ -1 +1 @@\n-x = 1\n+x = 2"))
+        assert not is_whitespace_only(hunk("@@ -1 +1 @@\n context"))
+
+
+class TestCompactDiff:
+    def test_headers(self):
+        result = compact_diff(DIFF, CompactionPolicy(), count)
+
+        assert "index " not in result.text
+        assert "similarity index" not in result.text
+        assert "diff --git src/app.py src/app.py\n--- src/app.py\n+++ src/app.py\n" in (
+            result.text
+        )
+        assert "diff --git new.py new.py\nnew file\n--- /dev/null\n" in result.text
+        assert [(f.path, f.status, f.old_path) for f in parse_diff(result.text)] == [
+            ("src/app.py", "M", None),
+            ("new.py", ADDED, None),
+            ("moved.txt", RENAMED, "old.txt"),
+        ]
+
+    def test_whitespace_hunks_are_collapsed(self):
+        body = "\n".join(f"-    b{i} = 2" for i in range(3))
+        body += "\n" + "\n".join(f"+        b{i} = 2" for i in range(3))
+        diff = DIFF.replace("-b = 2\n+b = 3", body)
+        result = compact_diff(diff, CompactionPolicy(), count)
+
+        assert "@@ -10,3 +10,3 @@ def main(): [whitespace only]\n" in result.text
+        assert "[... whitespace-only change: +3 -3 lines ...]" in result.text
+        assert "b0 = 2" not in result.text
+
+    def test_short_whitespace_hunks_are_kept(self):
+        diff = DIFF.replace("-b = 2\n+b = 3", "-b = 2\n+b =  2")
+        result = compact_diff(diff, CompactionPolicy(), count)
+
+        assert "+b =  2" in result.text
+
+    def test_savings_per_step(self):
+        result = compact_diff(DIFF, CompactionPolicy(context=0), count)
+
+        assert [step for step, _, _ in result.savings] == [
+            "repeats",
+            "context",
+            "whitespace",
+            "headers",
+        ]
+        assert (
+            dict((step, saved) for step, saved, _ in result.savings)["whitespace"] == 0
+        )
+        assert result.saved_bytes == len(DIFF) - len(result.text)
+        assert result.saved_tokens > 0
+
+    def test_disabled_policy_keeps_diff(self):
+        result = compact_diff(DIFF, CompactionPolicy.disabled(), count)
+
+        assert result.text == DIFF
+        assert result.savings == []
+        assert result.describe() == ""
+
+    def test_describe(self):
+        result = CompactedDiff("", [("context", 3000, 700), ("headers", 0, 0)])
+
+        assert result.describe() == (
+            "Compacted the diff by 2.9 KiB (~700 tokens): context 2.9 KiB/700 tokens"
+        )
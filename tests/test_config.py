@@ -127,3 +127,199 @@ class TestConfig:
         with patch("builtins.open", side_effect=IOError("Permission denied")):
             with pytest.raises(ConfigError):
                 config.get_parameter("model")
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmodel_cache_ttl: 120",
+    )
+    def test_model_cache_ttl(self, mock_file):
+        """Test reading the model catalog cache TTL."""
+        config = Config()
+
+        assert config.model_cache_ttl == 120
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmodel_cache_ttl: -5",
+    )
+    def test_model_cache_ttl_invalid(self, mock_file):
+        """Test that a negative model cache TTL is rejected."""
+        with pytest.raises(ConfigError):
+            Config()
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nretry:\n  max_attempts: 5\n  jitter: false",
+    )
+    def test_retry_policy(self, mock_file):
+        """Test reading the retry policy."""
+        config = Config()
+
+        assert config.retry_policy.max_attempts == 5
+        assert config.retry_policy.jitter is False
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nretry:\n  attempts: 5",
+    )
+    def test_retry_policy_invalid(self, mock_file):
+        """Test that unknown retry options are rejected."""
+        with pytest.raises(ConfigError):
+            Config()
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\ndeadline: 45",
+    )
+    def test_deadline(self, mock_file):
+        """Test reading the commit deadline."""
+        config = Config()
+
+        assert config.deadline == 45.0
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\ndeadline: 0",
+    )
+    def test_deadline_invalid(self, mock_file):
+        """Test that a non-positive deadline is rejected."""
+        with pytest.raises(ConfigError):
+            Config()
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmax_diff_size: 1048576",
+    )
+    def test_max_diff_size(self, mock_file):
+        """Test reading the staged diff size limit."""
+        config = Config()
+
+        assert config.max_diff_size == 1048576
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmax_diff_size: -1",
+    )
+    def test_max_diff_size_invalid(self, mock_file):
+        """Test that a non-positive diff size limit is rejected."""
+        with pytest.raises(ConfigError):
+            Config()
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nexclude:\n  - '*.lock'\n  - dist/",
+    )
+    def test_exclude(self, mock_file):
+        """Test that configured exclude patterns replace the defaults."""
+        config = Config()
+
+        assert config.exclude == ["*.lock", "dist/"]
+
+    @patch("builtins.open", new_callable=mock_open, read_data="api_token: test_token")
+    def test_exclude_default(self, mock_file):
+        """Test that lockfiles are excluded by default."""
+        config = Config()
+
+        assert "package-lock.json" in config.exclude
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nexclude: '*.lock'",
+    )
+    def test_exclude_invalid(self, mock_file):
+        """Test that exclude must be a list of patterns."""
+        with pytest.raises(ConfigError):
+            Config()
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\ncompaction:\n  context: 1\n  strip_index: false",
+    )
+    def test_compaction_policy(self, mock_file):
+        """Test reading the compaction policy."""
+        config = Config()
+
+        assert config.compaction_policy.context == 1
+        assert config.compaction_policy.strip_index is False
+        assert config.compaction_policy.strip_prefixes is True
+
+    @patch("builtins.open", new_callable=mock_open, read_data="api_token: test_token")
+    def test_compaction_policy_default(self, mock_file):
+        """Test that context is chosen per file by default."""
+        config = Config()
+
+        assert config.compaction_policy.context is None
+        assert config.compaction_policy.algorithm == "histogram"
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\ncompaction:\n  algorithm: fastest",
+    )
+    def test_compaction_policy_invalid(self, mock_file):
+        """Test that unknown diff algorithms are rejected."""
+        with pytest.raises(ConfigError):
+            Config()
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nhedge:\n  model: backup/model\n  delay: 2",
+    )
+    def test_hedge_policy(self, mock_file):
+        """Test reading the hedge policy."""
+        config = Config()
+
+        assert config.hedge_policy.model == "backup/model"
+        assert config.hedge_policy.delay == 2.0
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token",
+    )
+    def test_hedge_policy_disabled(self, mock_file):
+        """Test that hedging is disabled by default."""
+        assert Config().hedge_policy is None
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmodel:\n  - first/model\n  - second/model",
+    )
+    def test_model_list(self, mock_file):
+        """Test reading an ordered list of models."""
+        config = Config()
+
+        assert config.models == ["first/model", "second/model"]
+        assert config.model == "first/model"
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmodel: first/model, second/model",
+    )
+    def test_model_comma_separated(self, mock_file):
+        """Test reading comma-separated models."""
+        assert Config().models == ["first/model", "second/model"]
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data="api_token: test_token\nmodel:\n  name: first/model",
+    )
+    def test_model_invalid(self, mock_file):
+        """Test that a malformed model setting is rejected."""
+        with pytest.raises(ConfigError):
+            Config()
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+import pytest
+
+from acmsg.api.deadline import Deadline
+from acmsg.exceptions import ConfigError, DeadlineExceeded
+
+
+class TestDeadline:
+    def test_unlimited(self):
+        deadline = Deadline()
+        assert deadline.seconds is None
+        assert deadline.remaining() is None
+        assert not deadline.expired
+        assert deadline.allows(1e9)
+        assert deadline.timeout(5.0, 60.0) == (5.0, 60.0)
+        deadline.check("testing")
+
+    def test_invalid_budget(self):
+        with pytest.raises(ConfigError):
+            Deadline(0)
+
+    @patch("acmsg.api.deadline.time.monotonic")
+    def test_remaining_and_timeouts(self, mock_clock):
+        mock_clock.return_value = 100.0
+        deadline = Deadline(10)
+
+        mock_clock.return_value = 107.0
+        assert deadline.remaining() == pytest.approx(3.0)
+        assert deadline.timeout(5.0, 60.0) == pytest.approx((3.0, 3.0))
+        assert deadline.timeout(1.0, None) == pytest.approx((1.0, 3.0))
+        assert deadline.allows(2.0)
+        assert not deadline.allows(3.5)
+
+    @patch("acmsg.api.deadline.time.monotonic")
+    def test_expired(self, mock_clock):
+        mock_clock.return_value = 100.0
+        deadline = Deadline(2.5)
+
+        mock_clock.return_value = 103.0
+        assert deadline.expired
+        assert deadline.remaining() == 0.0
+        with pytest.raises(DeadlineExceeded) as exc_info:
+            deadline.check("generating")
+        assert str(exc_info.value) == "Deadline of 2.5s exceeded while generating"
+        with pytest.raises(DeadlineExceeded):
+            deadline.timeout(5.0, 60.0)
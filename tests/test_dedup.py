@@ -0,0 +1,119 @@
+from acmsg.core.dedup import fingerprint, fold_repeats, move_of
+from acmsg.core.diff import parse_diff
+
+
+def modified(path, body):
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        "index 1111111..2222222 100644\n"
+        f"--- a/{path}\n"
+        f"+++ b/{path}\n"
+        f"{body}"
+    )
+
+
+def renamed(old, new):
+    return (
+        f"diff --git a/{old} b/{new}\n"
+        "similarity index 100%\n"
+        f"rename from {old}\n"
+        f"rename to {new}"
+    )
+
+
+def codemod(name):
+    return f"@@ -1,2 +1,2 @@\n-from old.pkg import {name}\n+from new.pkg import {name}\n x = 1"
+
+
+class TestFingerprint:
+    def test_same_edit_on_other_names(self):
+        first, second = parse_diff(
+            modified("a.py", codemod("one")) + "\n" + modified("b.py", codemod("two"))
+        )
+
+        assert fingerprint(first.hunks[0]) == fingerprint(second.hunks[0])
+
+    def test_different_edits(self):
+        first, second = parse_diff(
+            modified("a.py", "@@ -1 +1 @@\n-x = 1\n+x = 2")
+            + "\n"
+            + modified("b.py", "@@ -1 +1 @@\n-x = 1\n+x = 3")
+        )
+
+        assert fingerprint(first.hunks[0]) != fingerprint(second.hunks[0])
+
+    def test_pseudo_and_context_only_hunks(self):
+        file_diff = parse_diff(
+            modified("a.py", "@@ code cell 1 changed @@\n-a\n+b\n@@ -1 +1 @@\n x")
+        )[0]
+
+        assert [fingerprint(hunk) for hunk in file_diff.hunks] == [None, None]
+
+
+class TestMoveOf:
+    def test_directory_move(self):
+        file_diff = parse_diff(renamed("old/pkg/sub/a.py", "new/pkg/sub/a.py"))[0]
+
+        assert move_of(file_diff) == ("R", "old", "new")
+
+    def test_move_into_root(self):
+        file_diff = parse_diff(renamed("src/a.py", "a.py"))[0]
+
+        assert move_of(file_diff) == ("R", "src", "")
+
+    def test_renamed_file_name(self):
+        assert move_of(parse_diff(renamed("a.py", "b.py"))[0]) is None
+        assert move_of(parse_diff(modified("a.py", ""))[0]) is None
+
+
+class TestFoldRepeats:
+    def test_repeated_edits_are_folded(self):
+        diff = "\n".join(
+            [modified(f"m{i}.py", codemod(f"name{i}")) for i in range(4)]
+            + [modified("other.py", "@@ -1 +1 @@\n-a\n+b")]
+        )
+
+        text = fold_repeats(parse_diff(diff))
+
+        assert [f.path for f in parse_diff(text)] == ["m0.py", "other.py"]
+        assert "+from new.pkg import name0\n x = 1\n" in text
+        assert "[... same change in 3 more places: m1.py, m2.py, m3.py ...]" in text
+        assert "name1" not in text
+
+    def test_rare_edits_are_kept(self):
+        diff = "\n".join(modified(f"m{i}.py", codemod(f"n{i}")) for i in range(2))
+
+        assert fold_repeats(parse_diff(diff)) == diff
+
+    def test_directory_moves_share_a_header(self):
+        diff = "\n".join(
+            [renamed(f"old/{name}", f"new/{name}") for name in ("a.py", "b/c.py")]
+            + [renamed("old/d.py", "new/d.py"), renamed("x.py", "y.py")]
+        )
+
+        text = fold_repeats(parse_diff(diff))
+
+        assert text == (
+            "diff --git a/old/ b/new/\n"
+            "rename from old/\n"
+            "rename to new/\n"
+            "[... renamed 3 files: a.py, b/c.py, d.py ...]\n" + renamed("x.py", "y.py")
+        )
+        assert [f.path for f in parse_diff(text)] == ["new/", "y.py"]
+
+    def test_moved_files_with_folded_edits_join_the_move(self):
+        diff = "\n".join(
+            renamed(f"old/m{i}.py", f"new/m{i}.py").replace(
+                "similarity index 100%", "similarity index 90%"
+            )
+            + "\n--- a/old/m{0}.py\n+++ b/new/m{0}.py\n".format(i)
+            + codemod(f"n{i}")
+            for i in range(4)
+        )
+
+        files = parse_diff(fold_repeats(parse_diff(diff)))
+
+        assert [f.path for f in files] == ["new/m0.py", "new/"]
+        assert files[1].header.endswith(
+            "[... renamed 3 files: m1.py, m2.py, m3.py ...]"
+        )
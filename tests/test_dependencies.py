@@ -0,0 +1,287 @@
+from acmsg.core.dependencies import (
+    Manifest,
+    compare,
+    find_parser,
+    parse_flake_lock,
+    parse_package_lock,
+    parse_pyproject,
+    parse_toml_lock,
+    summarize_file,
+)
+from acmsg.core.diff import parse_diff
+
+UV_LOCK = """\
+version = 1
+requires-python = ">=3.12"
+
+[[package]]
+name = "certifi"
+version = "2025.4.26"
+source = { registry = "https://pypi.org/simple" }
+sdist = { url = "https://files/certifi.tar.gz", hash = "sha256:0a" }
+wheels = [
+    { url = "https://files/certifi.whl", hash = "sha256:0b" },
+]
+
+[[package]]
+name = "requests"
+version = "2.32.3"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "certifi" },
+]
+
+[package.metadata]
+requires-dist = [{ name = "certifi", specifier = ">=2017" }]
+"""
+
+CARGO_LOCK = """\
+version = 3
+
+[[package]]
+name = "syn"
+version = "1.0.109"
+
+[[package]]
+name = "syn"
+version = "2.0.48"
+dependencies = [
+ "proc-macro2",
+]
+"""
+
+PACKAGE_LOCK = """\
+{
+  "name": "app",
+  "version": "1.0.0",
+  "lockfileVersion": 3,
+  "packages": {
+    "": {
+      "name": "app",
+      "version": "1.0.0",
+      "dependencies": {
+        "left-pad": "^1.0.0"
+      }
+    },
+    "node_modules/left-pad": {
+      "version": "1.3.0",
+      "funding": [
+        {
+          "type": "github"
+        }
+      ],
+      "engines": {
+        "node": ">=10"
+      }
+    },
+    "node_modules/a/node_modules/b": {
+      "version": "2.0.0",
+      "dev": true
+    }
+  }
+}
+"""
+
+FLAKE_LOCK = """\
+{
+  "nodes": {
+    "nixpkgs": {
+      "locked": {
+        "lastModified": 1700000000,
+        "narHash": "sha256-abc",
+        "owner": "NixOS",
+        "repo": "nixpkgs",
+        "rev": "dda3dcd3fe03e991015e9a74b22d35950f264a54",
+        "type": "github"
+      },
+      "original": {
+        "owner": "NixOS",
+        "ref": "nixos-unstable",
+        "repo": "nixpkgs",
+        "type": "github"
+      }
+    },
+    "root": {
+      "inputs": {
+        "nixpkgs": "nixpkgs"
+      }
+    }
+  },
+  "root": "root",
+  "version": 7
+}
+"""
+
+PYPROJECT = """\
+[project]
+name = "app"
+version = "0.1.0"
+dependencies = [
+  "requests (>=2.32.3,<3.0.0)",
+  "Jinja2>=3.1.6",  # templates
+  "uvicorn[standard]>=0.30; python_version >= '3.12'",
+]
+
+[project.optional-dependencies]
+async = ["httpx>=0.27.0"]
+
+[tool.poetry.group.dev.dependencies]
+python = "^3.12"
+pytest = "^8.0"
+mypy = { version = "^1.15", optional = true }
+
+[tool.ruff]
+line-length = 88
+"""
+
+
+class TestParsers:
+    def test_uv_lock(self):
+        manifest = parse_toml_lock(UV_LOCK.splitlines(keepends=True))
+
+        assert manifest.packages == {"certifi": "2025.4.26", "requests": "2.32.3"}
+        assert manifest.lines is None
+
+    def test_cargo_lock_keeps_all_versions(self):
+        manifest = parse_toml_lock(CARGO_LOCK.splitlines(keepends=True))
+
+        assert manifest.packages == {"syn": "1.0.109, 2.0.48"}
+
+    def test_package_lock(self):
+        manifest = parse_package_lock(PACKAGE_LOCK.splitlines(keepends=True))
+
+        assert manifest.packages == {"left-pad": "1.3.0", "b": "2.0.0"}
+
+    def test_flake_lock(self):
+        manifest = parse_flake_lock(FLAKE_LOCK.splitlines(keepends=True))
+
+        assert manifest.packages == {"nixpkgs": "dda3dcd"}
+
+    def test_pyproject(self):
+        manifest = parse_pyproject(PYPROJECT.splitlines(keepends=True))
+
+        assert manifest.packages == {
+            "requests": ">=2.32.3,<3.0.0",
+            "jinja2": ">=3.1.6",
+            "uvicorn": ">=0.30",
+            "httpx (async)": ">=0.27.0",
+            "pytest (dev)": "^8.0",
+            "mypy (dev)": "^1.15",
+        }
+        assert sorted(manifest.lines) == [4, 5, 6, 7, 8, 11, 15, 16]
+
+    def test_parsers_consume_lines_lazily(self):
+        consumed = []
+
+        def lines():
+            for line in UV_LOCK.splitlines(keepends=True):
+                consumed.append(line)
+                yield line
+
+        parse_toml_lock(lines())
+        assert len(consumed) == len(UV_LOCK.splitlines())
+
+    def test_find_parser(self):
+        assert find_parser("sub/dir/uv.lock") is parse_toml_lock
+        assert find_parser("pyproject.toml") is parse_pyproject
+        assert find_parser("setup.py") is None
+
+
+class TestCompare:
+    def test_changes(self):
+        old = Manifest({"x": "1.0", "y": "3.4", "z": "0.1"})
+        new = Manifest({"w": "1.2", "x": "1.0", "y": "3.5"})
+
+        changes = compare(old, new)
+
+        assert changes.describe() == "added w 1.2, bumped y 3.4→3.5, removed z 0.1"
+
+    def test_no_changes(self):
+        assert not compare(Manifest({"x": "1"}), Manifest({"x": "1"}))
+
+    def test_unversioned_and_capped(self):
+        changes = compare(Manifest({}), Manifest({"a": "", "b": "1", "c": "2"}))
+
+        assert changes.describe(max_items=2) == "added a, added b 1 and 1 more"
+
+
+def blob_reader(blobs):
+    """Build a read_blob function over in-memory blobs."""
+
+    def read_blob(blob):
+        return iter(blobs[blob].splitlines(keepends=True))
+
+    return read_blob
+
+
+class TestSummarizeFile:
+    def test_lockfile_hunks_are_replaced(self):
+        new_lock = UV_LOCK.replace('"2.32.3"', '"2.32.4"')
+        file_diff = parse_diff(
+            "diff --git a/uv.lock b/uv.lock\n"
+            "index 1111111..2222222 100644\n"
+            "--- a/uv.lock\n"
+            "+++ b/uv.lock\n"
+            "@@ -14,3 +14,3 @@\n"
+            ' [[package]]\n name = "requests"\n-version = "2.32.3"\n+version = "2.32.4"'
+        )[0]
+
+        summary = summarize_file(
+            file_diff, blob_reader({"1111111": UV_LOCK, "2222222": new_lock})
+        )
+
+        assert summary.changes.describe() == "bumped requests 2.32.3→2.32.4"
+        assert summary.render(file_diff) == (
+            "diff --git a/uv.lock b/uv.lock\n"
+            "index 1111111..2222222 100644\n"
+            "--- a/uv.lock\n"
+            "+++ b/uv.lock\n"
+            "[dependencies: bumped requests 2.32.3→2.32.4]"
+        )
+
+    def test_manifest_keeps_other_hunks(self):
+        new = PYPROJECT.replace('version = "0.1.0"', 'version = "0.2.0"').replace(
+            '"Jinja2>=3.1.6",', '"Jinja2>=3.1.6",\n  "rich>=13",'
+        )
+        file_diff = parse_diff(
+            "diff --git a/pyproject.toml b/pyproject.toml\n"
+            "index 1111111..2222222 100644\n"
+            "--- a/pyproject.toml\n"
+            "+++ b/pyproject.toml\n"
+            "@@ -3 +3 @@\n"
+            '-version = "0.1.0"\n'
+            '+version = "0.2.0"\n'
+            "@@ -6,0 +7 @@\n"
+            '+  "rich>=13",'
+        )[0]
+
+        summary = summarize_file(
+            file_diff, blob_reader({"1111111": PYPROJECT, "2222222": new})
+        )
+        text = summary.render(file_diff)
+
+        assert "[dependencies: added rich >=13]" in text
+        assert '+version = "0.2.0"' in text
+        assert "rich>=13" not in text.split("]\n", 1)[1]
+
+    def test_added_file_reads_only_new_blob(self):
+        file_diff = parse_diff(
+            "diff --git a/flake.lock b/flake.lock\n"
+            "new file mode 100644\n"
+            "index 0000000..2222222\n"
+            "--- /dev/null\n"
+            "+++ b/flake.lock\n"
+            "@@ -0,0 +1 @@\n"
+            "+{"
+        )[0]
+
+        summary = summarize_file(file_diff, blob_reader({"2222222": FLAKE_LOCK}))
+
+        assert summary.changes.describe() == "added nixpkgs dda3dcd"
+
+    def test_other_files_are_not_summarized(self):
+        file_diff = parse_diff(
+            "diff --git a/app.py b/app.py\nindex 1111111..2222222 100644"
+        )[0]
+
+        assert summarize_file(file_diff, blob_reader({})) is None
@@ -0,0 +1,129 @@
+from acmsg.core.diff import ADDED, DELETED, MODIFIED, RENAMED, parse_diff
+
+DIFF = """\
+diff --git a/README.md b/README.md
+new file mode 100644
+index 0000000..45b983b
+--- /dev/null
++++ b/README.md
+@@ -0,0 +1 @@
++hi
+diff --git a/bin.dat b/bin.dat
+new file mode 100644
+index 0000000..bdc955b
+Binary files /dev/null and b/bin.dat differ
+diff --git a/x.py b/src.py
+similarity index 50%
+rename from x.py
+rename to src.py
+index de98044..a7bc997 100644
+--- a/x.py
++++ b/src.py
+@@ -1,3 +1,4 @@
+ a
+-b
++B
+ c
++d
+@@ -10,2 +11,1 @@ def f():
+--- not a header
+ x
+diff --git a/old.py b/old.py
+deleted file mode 100644
+index 45b983b..0000000
+--- a/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-bye"""
+
+
+class TestParseDiff:
+    def test_files_and_paths(self):
+        files = parse_diff(DIFF)
+        assert [f.path for f in files] == ["README.md", "bin.dat", "src.py", "old.py"]
+
+    def test_hunks(self):
+        renamed = parse_diff(DIFF)[2]
+        assert len(renamed.hunks) == 2
+        assert renamed.hunks[0].header == "@@ -1,3 +1,4 @@"
+        assert (renamed.added, renamed.removed) == (2, 2)
+        # Removed lines that look like headers stay in their hunk
+        assert renamed.hunks[1].lines == ["--- not a header", " x"]
+
+    def test_binary_file_has_no_hunks(self):
+        binary = parse_diff(DIFF)[1]
+        assert binary.hunks == []
+        assert binary.header.endswith("Binary files /dev/null and b/bin.dat differ")
+
+    def test_text_round_trips(self):
+        assert "\n".join(f.text for f in parse_diff(DIFF)) == DIFF
+
+    def test_ignores_preamble_and_empty_input(self):
+        assert parse_diff("") == []
+        assert [f.path for f in parse_diff("noise\n" + DIFF)][0] == "README.md"
+
+    def test_status_rename_and_binary(self):
+        files = parse_diff(DIFF)
+        assert [f.status for f in files] == [ADDED, ADDED, RENAMED, DELETED]
+        assert files[2].old_path == "x.py"
+        assert files[0].old_path is None
+        assert [f.binary for f in files] == [False, True, False, False]
+
+    def test_records_point_into_the_source(self):
+        renamed = parse_diff(DIFF)[2]
+        hunk = renamed.hunks[1]
+        assert DIFF[hunk.start : hunk.end] == hunk.text
+        assert hunk.size == len(hunk.text)
+        assert renamed.size == len(renamed.text)
+        assert renamed.header_lines[0] == "diff --git a/x.py b/src.py"
+
+    def test_with_hunks(self):
+        renamed = parse_diff(DIFF)[2]
+        part = renamed.with_hunks(renamed.hunks[1:])
+
+        assert part.text == renamed.header + "\n" + renamed.hunks[1].text
+        assert part.size == len(part.text)
+        assert (part.path, part.status) == ("src.py", RENAMED)
+        assert renamed.with_hunks(renamed.hunks).text == renamed.text
+
+    def test_blobs(self):
+        files = parse_diff(DIFF)
+        assert files[0].blobs == ("0000000", "45b983b")
+        assert files[2].blobs == ("de98044", "a7bc997")
+        assert parse_diff("diff --git a/a b/b\nrename from a\nrename to b")[0].blobs is None
+
+    def test_mode_change_without_hunks(self):
+        files = parse_diff(
+            "diff --git a/run.sh b/run.sh\nold mode 100644\nnew mode 100755"
+        )
+        assert (files[0].path, files[0].status, files[0].hunks) == (
+            "run.sh",
+            MODIFIED,
+            [],
+        )
+
+    def test_compacted_headers(self):
+        files = parse_diff(
+            "diff --git src/a b.py src/a b.py\nnew file\n@@ -0,0 +1 @@\n+x\n"
+            "diff --git old.txt new.txt\nrename from old.txt\nrename to new.txt\n"
+            "diff --git logo.png logo.png\ndeleted file"
+        )
+        assert [(f.path, f.status) for f in files] == [
+            ("src/a b.py", ADDED),
+            ("new.txt", RENAMED),
+            ("logo.png", DELETED),
+        ]
+
+    def test_compacted_paths_under_a_and_b_directories(self):
+        files = parse_diff(
+            "diff --git b/app.py b/app.py\n--- b/app.py\n+++ b/app.py\n"
+            "@@ -1 +1 @@\n-x\n+y\n"
+            "diff --git a/lib.py a/lib.py\ndeleted file\n--- a/lib.py\n+++ /dev/null\n"
+            "@@ -1 +0,0 @@\n-x\n"
+            "diff --git b/logo.png b/logo.png\nnew file"
+        )
+        assert [(f.path, f.status) for f in files] == [
+            ("b/app.py", MODIFIED),
+            ("a/lib.py", DELETED),
+            ("b/logo.png", ADDED),
+        ]
@@ -0,0 +1,81 @@
+import io
+
+from acmsg.core.diffreader import StagedChanges, read_patch_with_raw
+
+RAW = (
+    b":100644 100644 1111111 2222222 M\tsrc/app.py\n"
+    b":000000 100644 0000000 3333333 A\tvendor/lib.js\n"
+    b":100644 100644 4444444 5555555 M\tREADME.md\n"
+    b"\n"
+)
+
+
+def file_diff(path, lines):
+    header = f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1 +1 @@\n"
+    return header.encode() + b"".join(line + b"\n" for line in lines)
+
+
+class TestReadPatchWithRaw:
+    def test_reads_everything_within_limits(self):
+        patch = file_diff("src/app.py", [b"-a", b"+b"])
+        changes = read_patch_with_raw(io.BytesIO(RAW + patch))
+
+        assert changes.files_status == ("M src/app.py\nA vendor/lib.js\nM README.md")
+        assert changes.diff == patch.decode().rstrip()
+        assert changes.files_total == 3
+        assert changes.files_read == 1
+        assert changes.truncated
+
+    def test_no_raw_section(self):
+        changes = read_patch_with_raw(io.BytesIO(b""))
+        assert changes.files_status == ""
+        assert changes.diff == ""
+        assert not changes.truncated
+
+    def test_large_file_is_cut(self):
+        big = file_diff("vendor/lib.js", [b"+x" * 10] * 100)
+        small = file_diff("README.md", [b"+docs"])
+        stream = io.BytesIO(RAW + file_diff("src/app.py", [b"+a"]) + big + small)
+
+        changes = read_patch_with_raw(stream, max_file_bytes=200)
+
+        assert "+docs" in changes.diff
+        assert "more lines of this file not read ...]" in changes.diff
+        assert changes.files_read == 3
+        assert changes.bytes_skipped > 0
+        assert "left out" in changes.describe()
+
+    def test_reduced_files_are_reported(self):
+        changes = StagedChanges("M a.py", "diff", 1, 1, files_reduced=1)
+
+        assert changes.truncated
+        assert changes.describe() == (
+            "The staged diff exceeds the size limit: 1 files were read without context."
+        )
+
+    def test_stops_at_size_limit(self):
+        first = file_diff("src/app.py", [b"+a" * 40])
+        stream = io.BytesIO(
+            RAW + first + file_diff("vendor/lib.js", [b"+b"]) + b"more output"
+        )
+
+        changes = read_patch_with_raw(stream, max_bytes=len(first))
+
+        assert changes.files_read == 1
+        assert "2 more files not read" in changes.diff
+        assert "only 1 of 3 files were read" in changes.describe()
+        # Reading stopped at the start of the second file
+        assert stream.read().startswith(b"--- a/vendor/lib.js\n")
+
+    def test_long_lines_are_cut(self):
+        stream = io.BytesIO(file_diff("min.js", [b"+" + b"x" * 5000, b"+end"]))
+
+        changes = read_patch_with_raw(stream, max_line_bytes=100)
+
+        lines = changes.diff.splitlines()
+        assert lines[4] == "+" + "x" * 99 + " [... line truncated ...]"
+        assert lines[5] == "+end"
+
+    def test_invalid_utf8_is_replaced(self):
+        stream = io.BytesIO(file_diff("latin1.txt", [b"+caf\xe9"]))
+        assert "+caf�" in read_patch_with_raw(stream).diff
@@ -0,0 +1,250 @@
+from unittest.mock import MagicMock
+
+from acmsg.core.diff import parse_diff
+from acmsg.core.filters import FILTER_ATTRIBUTES, DiffFilter, matches_pattern
+from acmsg.exceptions import GitError
+
+DIFF = """\
+diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1 +1,2 @@
+-old
++new
++more
+diff --git a/uv.lock b/uv.lock
+index 3333333..4444444 100644
+--- a/uv.lock
++++ b/uv.lock
+@@ -1,2 +1,3 @@
+ [[package]]
+-version = "1.0"
++version = "1.1"
++source = "pypi"
+diff --git a/web/dist/app.min.js b/web/dist/app.min.js
+new file mode 100644
+index 0000000..5555555
+--- /dev/null
++++ b/web/dist/app.min.js
+@@ -0,0 +1 @@
++var a=1;"""
+
+
+def make_repo(diff=DIFF, attributes=None, blobs=None):
+    """Build a stand-in for GitUtils holding the given diff."""
+    repo = MagicMock()
+    repo.diff = diff
+    repo.files = parse_diff(diff)
+    repo.check_attr.return_value = attributes or {}
+    repo.blob_lines.side_effect = lambda blob: iter((blobs or {}).get(blob, ""))
+    return repo
+
+
+class TestMatchesPattern:
+    def test_basename_pattern_matches_in_any_directory(self):
+        assert matches_pattern("uv.lock", "uv.lock")
+        assert matches_pattern("sub/project/uv.lock", "uv.lock")
+        assert matches_pattern("web/app.min.js", "*.min.js")
+        assert not matches_pattern("web/app.js", "*.min.js")
+
+    def test_path_pattern_is_anchored(self):
+        assert matches_pattern("web/dist/app.js", "web/dist/*")
+        assert matches_pattern("web/dist/app.js", "/web/dist/*")
+        assert not matches_pattern("other/web/dist/app.js", "web/dist/*")
+
+    def test_directory_pattern(self):
+        assert matches_pattern("web/dist/app.js", "dist/")
+        assert matches_pattern("vendor/lib/x.go", "vendor/")
+        assert not matches_pattern("dist", "dist/")
+        assert matches_pattern("web/dist/app.js", "web/dist/")
+        assert not matches_pattern("dist/app.js", "web/dist/")
+
+
+class TestDiffFilter:
+    def test_patterns_replace_diffs_with_stubs(self):
+        result = DiffFilter(["*.lock", "*.min.js"]).filter_repo(make_repo())
+
+        assert result.filtered == [
+            ("uv.lock", "matches *.lock"),
+            ("web/dist/app.min.js", "matches *.min.js"),
+        ]
+        assert "+new" in result.text
+        assert 'version = "1.1"' not in result.text
+        assert "diff --git a/uv.lock b/uv.lock\n" in result.text
+        assert (
+            "[... uv.lock (modified, +2 -1 lines): diff left out, matches *.lock ...]"
+            in result.text
+        )
+        assert "web/dist/app.min.js (added, +1 -0 lines)" in result.text
+
+    def test_unfiltered_diff_is_returned_unchanged(self):
+        repo = make_repo()
+        result = DiffFilter(["*.png"]).filter_repo(repo)
+
+        assert result.filtered == []
+        assert result.text is repo.diff
+        assert result.describe() == ""
+
+    def test_attributes_are_read_in_one_call(self):
+        repo = make_repo()
+        DiffFilter([]).filter_repo(repo)
+
+        repo.check_attr.assert_called_once_with(
+            ["src/app.py", "uv.lock", "web/dist/app.min.js"], FILTER_ATTRIBUTES
+        )
+
+    def test_attributes_disabled(self):
+        repo = make_repo()
+        DiffFilter([], use_attributes=False).filter_repo(repo)
+
+        repo.check_attr.assert_not_called()
+
+    def test_generated_attribute(self):
+        repo = make_repo(
+            attributes={
+                "src/app.py": {"linguist-generated": "set"},
+                "uv.lock": {"linguist-vendored": "true"},
+                "web/dist/app.min.js": {"diff": "unset"},
+            }
+        )
+        result = DiffFilter([]).filter_repo(repo)
+
+        assert [reason for _, reason in result.filtered] == [
+            "marked linguist-generated",
+            "marked linguist-vendored",
+            "marked -diff",
+        ]
+
+    def test_generated_false_overrides_patterns(self):
+        repo = make_repo(attributes={"uv.lock": {"linguist-generated": "false"}})
+        result = DiffFilter(["*.lock"]).filter_repo(repo)
+
+        assert result.filtered == []
+        assert 'version = "1.1"' in result.text
+
+    def test_renamed_and_binary_stubs(self):
+        diff = (
+            "diff --git a/old.lock b/new.lock\n"
+            "similarity index 100%\n"
+            "rename from old.lock\n"
+            "rename to new.lock\n"
+            "diff --git a/logo.png b/logo.png\n"
+            "index 1111111..2222222 100644\n"
+            "Binary files a/logo.png and b/logo.png differ"
+        )
+        result = DiffFilter(["*.lock", "*.png"]).filter_repo(make_repo(diff))
+
+        assert "new.lock (renamed from old.lock, +0 -0 lines)" in result.text
+        assert "logo.png (modified, binary)" in result.text
+
+    def test_prescan_stub_keeps_its_line_counts(self):
+        diff = (
+            "diff --git a/uv.lock b/uv.lock\n"
+            "index 3333333..4444444 100644\n"
+            "[... uv.lock (modified, +2 -1 lines): diff left out, matches *.lock ...]"
+        )
+        result = DiffFilter(["*.lock"]).filter_repo(make_repo(diff))
+
+        assert result.filtered == [("uv.lock", "matches *.lock")]
+        assert result.text == (
+            "diff --git a/uv.lock b/uv.lock\n"
+            "[... uv.lock (modified, +2 -1 lines): diff left out, matches *.lock ...]"
+        )
+
+    def test_left_out_before_reading(self):
+        repo = make_repo(attributes={"gen.py": {"linguist-generated": "set"}})
+
+        reasons = DiffFilter(["*.lock"]).left_out(
+            repo, ["src/app.py", "uv.lock", "gen.py"]
+        )
+
+        assert reasons == {
+            "uv.lock": "matches *.lock",
+            "gen.py": "marked linguist-generated",
+        }
+        repo.check_attr.assert_called_once_with(
+            ["src/app.py", "uv.lock", "gen.py"], FILTER_ATTRIBUTES
+        )
+
+    def test_attributes_of_left_out_are_reused(self):
+        repo = make_repo(attributes={"uv.lock": {"linguist-generated": "set"}})
+        diff_filter = DiffFilter([])
+
+        diff_filter.left_out(repo, ["src/app.py", "uv.lock", "web/dist/app.min.js"])
+        result = diff_filter.filter_repo(repo)
+
+        assert result.filtered == [("uv.lock", "marked linguist-generated")]
+        repo.check_attr.assert_called_once()
+
+    def test_stubs_parse_as_files(self):
+        result = DiffFilter(["*.lock"]).filter_repo(make_repo())
+
+        files = parse_diff(result.text)
+        assert [f.path for f in files] == [
+            "src/app.py",
+            "uv.lock",
+            "web/dist/app.min.js",
+        ]
+
+    def test_describe(self):
+        result = DiffFilter(["*.lock", "*.min.js"]).filter_repo(make_repo())
+
+        assert result.describe() == (
+            "Left out the diffs of 2 generated files: uv.lock, web/dist/app.min.js"
+        )
+        assert result.describe(max_paths=1).endswith("uv.lock and 1 more")
+
+    def test_lockfile_stub_lists_dependency_changes(self):
+        repo = make_repo(
+            blobs={
+                "3333333": ["[[package]]\n", 'name = "x"\n', 'version = "1.0"\n'],
+                "4444444": ["[[package]]\n", 'name = "x"\n', 'version = "1.1"\n'],
+            }
+        )
+        result = DiffFilter(["*.lock"]).filter_repo(repo)
+
+        assert result.summarized == ["uv.lock"]
+        assert "[dependencies: bumped x 1.0→1.1]" in result.text
+        assert result.describe().endswith("Summarized dependency changes in uv.lock")
+
+    def test_unreadable_blobs_are_not_summarized(self):
+        repo = make_repo()
+        repo.blob_lines.side_effect = GitError("bad object")
+
+        result = DiffFilter([]).filter_repo(repo)
+
+        assert result.summarized == []
+        assert result.text is repo.diff
+
+    def test_data_files_are_reduced(self):
+        diff = (
+            "diff --git a/rows.csv b/rows.csv\n"
+            "index 6666666..7777777 100644\n"
+            "--- a/rows.csv\n"
+            "+++ b/rows.csv\n"
+            "@@ -1,2 +1,3 @@\n"
+            " id\n"
+            " 1\n"
+            "+2"
+        )
+        repo = make_repo(
+            diff, blobs={"6666666": ["id\n", "1\n"], "7777777": ["id\n", "1\n", "2\n"]}
+        )
+        result = DiffFilter([]).filter_repo(repo)
+
+        assert result.reduced == ["rows.csv"]
+        assert "[table: columns: id; rows: 1→2 (+1)]" in result.text
+        assert result.describe() == (
+            "Reduced notebooks and data files to their changes in rows.csv"
+        )
+
+    def test_filtered_data_files_are_not_reduced(self):
+        diff = DIFF.replace("web/dist/app.min.js", "web/dist/data.csv")
+        repo = make_repo(diff)
+        result = DiffFilter(["dist/"]).filter_repo(repo)
+
+        assert result.reduced == []
+        assert "5555555" not in [
+            call.args[0] for call in repo.blob_lines.call_args_list
+        ]
@@ -1,7 +1,12 @@
 import pytest
 from unittest.mock import patch, MagicMock
 
-from acmsg.core.generation import CommitMessageGenerator, format_message
+from acmsg.core.cache import ResponseCache
+from acmsg.core.generation import (
+    CommitMessageGenerator,
+    StreamFormatter,
+    format_message,
+)
 from acmsg.exceptions import AcmsgError
 
 
@@ -25,7 +30,7 @@ class TestCommitMessageGenerator:
     def test_generate(self):
         """Test generating a commit message."""
         # Mock the requests module to prevent actual API calls
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             # Setup mock response
             mock_response = MagicMock()
             mock_response.ok = True
@@ -77,6 +82,209 @@ class TestCommitMessageGenerator:
             with pytest.raises(AcmsgError):
                 generator.generate("M file.py", "diff content")
 
+    def test_generate_stream(self):
+        """Test streaming a commit message."""
+        generator = CommitMessageGenerator("test_token", "test_model", 0.7)
+        with patch.object(
+            generator._api_client,
+            "stream_completion",
+            return_value=iter(["feat: ", "stream"]),
+        ) as mock_stream:
+            result = list(generator.generate_stream("M file.py", "diff content"))
+
+        assert result == ["feat: ", "stream"]
+        kwargs = mock_stream.call_args.kwargs
+        assert kwargs["model"] == "test_model"
+        assert "diff content" in kwargs["user_prompt"]
+
+    def test_generate_fits_large_diff_by_hunks(self):
+        """Test that an oversized diff is cut down to whole hunks."""
+        hunks = "\n".join(
+            f"@@ -{i},1 +{i},1 @@\n" + "\n".join(f"+line {i}.{n}" for n in range(50))
+            for i in range(100)
+        )
+        diff = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n" + hunks
+        generator = CommitMessageGenerator(
+            "test_token", "test_model", 0.7, map_reduce=False
+        )
+        client = generator._api_client
+        with (
+            patch.object(client, "_get_model_context_length", return_value=8192),
+            patch.object(
+                client, "generate_completion", return_value="feat: x"
+            ) as mock_generate,
+        ):
+            generator.generate("M a.py", diff)
+
+        user_prompt = mock_generate.call_args.kwargs["user_prompt"]
+        budget = client.plan_budget("test_model", "", user_prompt, 8192)
+        assert not budget.was_trimmed
+        assert "hunks omitted" in user_prompt
+        assert "@@ -0,1 +0,1 @@" in user_prompt
+        assert "Left out" in generator.notes[0]
+
+    def test_generate_map_reduce(self, tmp_path):
+        """Test summarizing an oversized diff part by part."""
+        diff = "\n".join(
+            f"diff --git a/src/m{i}/a.py b/src/m{i}/a.py\n"
+            f"index 000000{i}..111111{i} 100644\n"
+            f"--- a/src/m{i}/a.py\n+++ b/src/m{i}/a.py\n"
+            "@@ -1,1 +1,400 @@\n" + "\n".join(f"+line {n}" for n in range(400))
+            for i in range(3)
+        )
+        summary_cache = ResponseCache(tmp_path)
+        generator = CommitMessageGenerator(
+            "test_token", "test_model", 0.7, summary_cache=summary_cache
+        )
+        client = generator._api_client
+
+        def complete(model, system_prompt, user_prompt, temperature):
+            if "Summaries:" in user_prompt:
+                return "feat: big change"
+            return f"Summary of {user_prompt.count('src/m')} files"
+
+        with (
+            patch.object(client, "_get_model_context_length", return_value=4096),
+            patch.object(
+                client, "generate_completion", side_effect=complete
+            ) as mock_generate,
+        ):
+            assert generator.generate("M a.py", diff) == "feat: big change"
+            assert mock_generate.call_count == 4
+            reduce_prompt = mock_generate.call_args.kwargs["user_prompt"]
+
+            # A rerun only asks for the final message
+            generator.generate("M a.py", diff)
+            assert mock_generate.call_count == 5
+
+        assert "### Part 3: src/m2/a.py" in reduce_prompt
+        assert "Summary of" in reduce_prompt
+        assert "summarizing it in 3 parts (0 cached)" in generator.notes[0]
+
+    def test_generate_symbols_stand_in_for_map_reduce(self):
+        """Test that a cut-down diff is used when symbols describe every file."""
+        diff = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n" + "\n".join(
+            f"@@ -{i},1 +{i},1 @@\n" + "\n".join(f"+line {i}.{n}" for n in range(50))
+            for i in range(100)
+        )
+        generator = CommitMessageGenerator(
+            "test_token",
+            "test_model",
+            0.7,
+            symbols=lambda f: "[symbols: added def main]",
+        )
+        client = generator._api_client
+        with (
+            patch.object(client, "_get_model_context_length", return_value=8192),
+            patch.object(
+                client, "generate_completion", return_value="feat: x"
+            ) as mock_generate,
+        ):
+            generator.generate("M a.py", diff)
+
+        assert mock_generate.call_count == 1
+        user_prompt = mock_generate.call_args.kwargs["user_prompt"]
+        assert "+++ b/a.py\n[symbols: added def main]\n" in user_prompt
+
+    def test_generate_map_reduce_forced(self):
+        """Test that map-reduce can be forced for diffs that fit."""
+        generator = CommitMessageGenerator(
+            "test_token", "test_model", 0.7, map_reduce=True
+        )
+        client = generator._api_client
+        with (
+            patch.object(client, "_get_model_context_length", return_value=4096),
+            patch.object(
+                client, "generate_completion", return_value="feat: x"
+            ) as mock_generate,
+        ):
+            generator.generate("M a.py", "diff --git a/a.py b/a.py\n@@ -1 +1 @@\n+x")
+
+        summary_call, reduce_call = mock_generate.call_args_list
+        assert "part 1 of 1" in summary_call.kwargs["user_prompt"]
+        assert "### Part 1: a.py\nfeat: x" in reduce_call.kwargs["user_prompt"]
+
+    def test_generate_uses_cache(self, tmp_path):
+        """Test that a rerun on the same staged tree skips the API."""
+        cache = ResponseCache(tmp_path)
+        generator = CommitMessageGenerator("test_token", "test_model", 0.7, cache=cache)
+        with patch.object(
+            generator._api_client,
+            "generate_completion",
+            return_value="feat: cached",
+        ) as mock_generate:
+            first = generator.generate("M file.py", "diff content", tree="abc123")
+            second = generator.generate("M file.py", "diff content", tree="abc123")
+            generator.generate("M file.py", "diff content", tree="def456")
+
+        assert first == second == "feat: cached"
+        assert mock_generate.call_count == 2
+
+    def test_generate_without_tree_skips_cache(self, tmp_path):
+        """Test that nothing is cached when the staged tree is unknown."""
+        generator = CommitMessageGenerator(
+            "test_token", "test_model", 0.7, cache=ResponseCache(tmp_path)
+        )
+        with patch.object(
+            generator._api_client, "generate_completion", return_value="feat: x"
+        ) as mock_generate:
+            generator.generate("M file.py", "diff content")
+            generator.generate("M file.py", "diff content")
+
+        assert mock_generate.call_count == 2
+        assert list(tmp_path.iterdir()) == []
+
+    def test_generate_stream_uses_cache(self, tmp_path):
+        """Test that a completed stream is cached and replayed in one chunk."""
+        generator = CommitMessageGenerator(
+            "test_token", "test_model", 0.7, cache=ResponseCache(tmp_path)
+        )
+        with patch.object(
+            generator._api_client,
+            "stream_completion",
+            return_value=iter(["feat: ", "stream"]),
+        ) as mock_stream:
+            first = list(generator.generate_stream("M", "diff", tree="abc123"))
+            second = list(generator.generate_stream("M", "diff", tree="abc123"))
+
+        assert first == ["feat: ", "stream"]
+        assert second == ["feat: stream"]
+        mock_stream.assert_called_once()
+
+
+class TestStreamFormatter:
+    """Tests for the StreamFormatter class."""
+
+    @staticmethod
+    def _feed_in_chunks(msg, size):
+        formatter = StreamFormatter()
+        output = ""
+        for i in range(0, len(msg), size):
+            output += formatter.feed(msg[i : i + size])
+        return output + formatter.flush()
+
+    def test_matches_format_message(self):
+        """Test that streamed output wraps like format_message."""
+        long_line = "This is a very long line that exceeds the 80 character limit and should be wrapped by the formatter as the words stream in."
+        msg = f"feat: add streaming\n\n{long_line}\nShort line"
+
+        for size in (1, 3, 7, len(msg)):
+            assert self._feed_in_chunks(msg, size) == format_message(msg)
+
+    def test_releases_complete_words_only(self):
+        """Test that partial words are held back until they are complete."""
+        formatter = StreamFormatter()
+
+        assert formatter.feed("feat: add str") == "feat: add"
+        assert formatter.feed("eaming ") == " streaming"
+        assert formatter.flush() == ""
+
+    def test_breaks_long_words(self):
+        """Test that words longer than the width are broken."""
+        word = "x" * 100
+
+        assert self._feed_in_chunks(word, 9) == format_message(word)
+
 
 class TestFormatMessage:
     """Tests for the format_message function."""
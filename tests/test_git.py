@@ -1,126 +1,374 @@
 import pytest
 from unittest.mock import patch, MagicMock
+import io
+import os
+import shutil
 import subprocess
+import threading
 
 from acmsg.core.git import GitUtils
 from acmsg.exceptions import GitError
 
+STAGED_OUTPUT = (
+    b":100644 100644 1111111 2222222 M\tfile.py\n"
+    b":100644 100644 3333333 3333333 R100\told.py\tnew.py\n"
+    b":000000 100644 0000000 4444444 A\tdocs/\xc3\xbc.md\n"
+    b"\n"
+    b"diff --git a/file.py b/file.py\n"
+    b"index 1111111..2222222 100644\n"
+    b"--- a/file.py\n"
+    b"+++ b/file.py\n"
+    b"@@ -1 +1 @@\n"
+    b"-old\n"
+    b"+new\n"
+    b"diff --git a/old.py b/new.py\n"
+    b"similarity index 100%\n"
+    b"rename from old.py\n"
+    b"rename to new.py\n"
+    b"diff --git a/docs/\xc3\xbc.md b/docs/\xc3\xbc.md\n"
+    b"new file mode 100644\n"
+)
+
+PRESCAN_OUTPUT = (
+    b":100644 100644 1111111 2222222 M\0file.py\0"
+    b":100644 100644 5555555 6666666 M\0uv.lock\0"
+    b":100644 100644 7777777 8888888 M\0dump.sql\0"
+    b"1\t1\tfile.py\0"
+    b"10\t2\tuv.lock\0"
+    b"50000\t50000\tdump.sql\0"
+)
+FILE_PATCH_OUTPUT = (
+    b":100644 100644 1111111 2222222 M\tfile.py\n"
+    b"\n"
+    b"diff --git a/file.py b/file.py\n"
+    b"index 1111111..2222222 100644\n"
+    b"--- a/file.py\n"
+    b"+++ b/file.py\n"
+    b"@@ -1 +1 @@\n"
+    b"-old\n"
+    b"+new\n"
+)
+
+
+def fake_run(scan_output=b"", sizes=b""):
+    """Build a stand-in for subprocess.run answering the pre-scan commands."""
+
+    def run(args, **kwargs):
+        if "--numstat" in args:
+            return MagicMock(stdout=scan_output)
+        if args[:2] == ["git", "cat-file"]:
+            return MagicMock(stdout=sizes)
+        return MagicMock()
+
+    return MagicMock(side_effect=run)
+
+
+def fake_popen(output=b"", returncode=0, stderr=b""):
+    """Build a stand-in for subprocess.Popen producing the given output."""
+    processes = []
+
+    def popen(args, **kwargs):
+        process = MagicMock()
+        process.stdout = io.BytesIO(output)
+        process.__enter__.return_value = process
+        process.wait.return_value = returncode
+        if hasattr(kwargs.get("stderr"), "write"):
+            kwargs["stderr"].write(stderr)
+        processes.append(process)
+        return process
+
+    mock_popen = MagicMock(side_effect=popen)
+    mock_popen.processes = processes
+    return mock_popen
+
 
 class TestGitUtils:
     """Tests for the GitUtils class."""
 
+    @patch("subprocess.Popen", new_callable=fake_popen)
     @patch("subprocess.run")
-    def test_check_git_repo_success(self, mock_run):
+    def test_check_git_repo_success(self, mock_run, mock_popen):
         """Test successful git repo check."""
-        mock_run.return_value.stdout = "true"
-        mock_run.return_value.returncode = 0
-
         # This should not raise an exception
         GitUtils()
 
-        # Verify that subprocess.run was called at least once
-        assert mock_run.called
-
-        # Check for the specific call to git rev-parse
-        found_rev_parse_call = False
-        for call in mock_run.call_args_list:
-            args, kwargs = call
-            if (
-                args
-                and len(args[0]) >= 3
-                and args[0][0] == "git"
-                and args[0][1] == "rev-parse"
-            ):
-                found_rev_parse_call = True
-                break
-
-        assert found_rev_parse_call, "No call to git rev-parse was made"
+        mock_run.assert_called_once_with(
+            ["git", "rev-parse", "--is-inside-work-tree"],
+            capture_output=True,
+            check=True,
+        )
 
+    @patch("subprocess.Popen", new_callable=fake_popen)
     @patch("subprocess.run")
-    def test_check_git_repo_failure(self, mock_run):
+    def test_check_git_repo_failure(self, mock_run, mock_popen):
         """Test failed git repo check."""
         mock_run.side_effect = subprocess.CalledProcessError(
             returncode=128,
             cmd=["git", "rev-parse", "--is-inside-work-tree"],
-            stderr="fatal: not a git repository",
+            stderr=b"fatal: not a git repository",
         )
 
-        with pytest.raises(GitError):
+        with pytest.raises(GitError) as exc_info:
             GitUtils()
 
-    @patch("subprocess.run")
-    def test_get_git_status(self, mock_run):
-        """Test getting git status."""
-        mock_run.return_value.stdout = "M file.py\nA new.py"
-        mock_run.return_value.returncode = 0
+        assert "Not a git repository" in str(exc_info.value)
 
-        with patch.object(GitUtils, "_check_git_repo"):
+    @patch("subprocess.run")
+    def test_staged_changes_from_one_call(self, mock_run):
+        """Test that status and diff are parsed from a single git diff call."""
+        with patch("subprocess.Popen", fake_popen(STAGED_OUTPUT)) as mock_popen:
             repo = GitUtils()
-            assert repo.files_status == "M file.py\nA new.py"
-
-            # Verify subprocess.run was called with correct arguments
-            mock_run.assert_any_call(
-                ["git", "diff", "--cached", "--name-status"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
 
+            assert repo.files_status == "M file.py\nR100 old.py new.py\nA docs/ü.md"
+            assert repo.diff == STAGED_OUTPUT.partition(b"\n\n")[2].decode().rstrip()
+            assert not repo.staged_changes.truncated
+
+            assert [(f.path, f.status) for f in repo.files] == [
+                ("file.py", "M"),
+                ("new.py", "R"),
+                ("docs/ü.md", "A"),
+            ]
+
+        mock_popen.processes[0].kill.assert_not_called()
+        mock_popen.assert_called_once()
+        assert mock_popen.call_args.args[0] == [
+            "git",
+            "diff",
+            "--cached",
+            "--patch-with-raw",
+        ]
+
+    @patch("subprocess.Popen", new_callable=fake_popen)
     @patch("subprocess.run")
-    def test_get_git_status_error(self, mock_run):
-        """Test error handling when getting git status fails."""
+    def test_pathspecs(self, mock_run, mock_popen):
+        """Test that pathspecs limit the diff git produces."""
+        GitUtils(pathspecs=["src/", "README.md"]).diff
+
+        assert mock_popen.call_args.args[0] == [
+            "git",
+            "diff",
+            "--cached",
+            "--patch-with-raw",
+            "--",
+            "src/",
+            "README.md",
+        ]
+
+    @patch("subprocess.Popen", new_callable=fake_popen)
+    @patch("subprocess.run")
+    def test_diff_options(self, mock_run, mock_popen):
+        """Test that diff options go before the pathspecs."""
+        GitUtils(pathspecs=["src/"], diff_options=["-U1", "--histogram"]).diff
+
+        assert mock_popen.call_args.args[0] == [
+            "git",
+            "diff",
+            "--cached",
+            "--patch-with-raw",
+            "-U1",
+            "--histogram",
+            "--",
+            "src/",
+        ]
+
+    @patch("subprocess.Popen", new_callable=fake_popen)
+    @patch("subprocess.run")
+    def test_check_attr(self, mock_run, mock_popen):
+        """Test that attributes of all paths are read with one git call."""
+        repo = GitUtils()
+        mock_run.reset_mock()
         mock_run.side_effect = [
-            MagicMock(),  # First call for _check_git_repo
-            subprocess.CalledProcessError(  # Second call for _get_git_status
-                returncode=1,
-                cmd=["git", "diff", "--cached", "--name-status"],
-                stderr="error message",
+            MagicMock(stdout="/repo\n"),
+            MagicMock(
+                stdout=b"uv.lock\0linguist-generated\0set\0"
+                b"uv.lock\0diff\0unspecified\0"
+                b"src/a b.py\0linguist-generated\0false\0"
+                b"src/a b.py\0diff\0unspecified\0"
             ),
         ]
 
-        with pytest.raises(GitError):
-            with patch.object(GitUtils, "_check_git_repo"):
-                GitUtils()
+        attributes = repo.check_attr(
+            ["uv.lock", "src/a b.py"], ["linguist-generated", "diff"]
+        )
+
+        assert attributes == {
+            "uv.lock": {"linguist-generated": "set", "diff": "unspecified"},
+            "src/a b.py": {"linguist-generated": "false", "diff": "unspecified"},
+        }
+        args, kwargs = mock_run.call_args
+        assert args[0] == [
+            "git",
+            "check-attr",
+            "-z",
+            "--stdin",
+            "linguist-generated",
+            "diff",
+        ]
+        assert kwargs["input"] == b"uv.lock\0src/a b.py\0"
+        assert kwargs["cwd"] == "/repo"
+
+    def test_blob_lines(self):
+        """Test that a blob is streamed line by line from git."""
+        with patch("subprocess.Popen", fake_popen(b"a\n\xff\nc")) as mock_popen:
+            assert list(GitUtils.blob_lines("abc1234")) == ["a\n", "\ufffd\n", "c"]
+
+        assert mock_popen.call_args.args[0] == ["git", "cat-file", "blob", "abc1234"]
+        mock_popen.processes[0].kill.assert_not_called()
+
+    def test_blob_lines_stopped_early(self):
+        """Test that git is stopped when the caller stops reading."""
+        with patch("subprocess.Popen", fake_popen(b"a\nb\n")) as mock_popen:
+            lines = GitUtils.blob_lines("abc1234")
+            next(lines)
+            lines.close()
+
+        mock_popen.processes[0].kill.assert_called_once()
 
+    def test_blob_lines_error(self):
+        """Test that a missing blob raises GitError."""
+        with patch("subprocess.Popen", fake_popen(returncode=128)):
+            with pytest.raises(GitError):
+                list(GitUtils.blob_lines("abc1234"))
+
+    @patch("subprocess.Popen", new_callable=fake_popen)
     @patch("subprocess.run")
-    def test_get_git_diff(self, mock_run):
-        """Test getting git diff."""
-        mock_run.return_value.stdout = "diff --git a/file.py b/file.py\n..."
-        mock_run.return_value.returncode = 0
+    def test_nothing_staged(self, mock_run, mock_popen):
+        """Test that an empty index yields an empty status and diff."""
+        repo = GitUtils()
+
+        assert repo.files_status == ""
+        assert repo.diff == ""
+
+    @patch("subprocess.run")
+    def test_git_diff_error(self, mock_run):
+        """Test that a failing git diff is reported when the changes are read."""
+        with patch(
+            "subprocess.Popen", fake_popen(returncode=1, stderr=b"error message")
+        ):
+            repo = GitUtils()
+            with pytest.raises(GitError) as exc_info:
+                repo.diff
 
-        with patch.object(GitUtils, "_check_git_repo"):
-            with patch.object(GitUtils, "_get_git_status"):
-                repo = GitUtils()
-                repo._diff = "diff --git a/file.py b/file.py\n..."
-                assert repo.diff == "diff --git a/file.py b/file.py\n..."
-
-                # Verify subprocess.run was called with correct arguments
-                mock_run.assert_any_call(
-                    ["git", "diff", "--cached"],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                )
-
-    def test_get_git_diff_error(self):
-        """Test error handling when getting git diff fails."""
-        # Mock the _check_git_repo method to do nothing
-        with patch.object(GitUtils, "_check_git_repo"):
-            # Mock the _get_git_status method to return a value
-            with patch.object(GitUtils, "_get_git_status", return_value="M file.py"):
-                # Mock the subprocess call for git diff to raise an error
-                with patch("subprocess.run") as mock_run:
-                    mock_run.side_effect = subprocess.CalledProcessError(
-                        returncode=1,
-                        cmd=["git", "diff", "--cached"],
-                        stderr="error message",
-                    )
-
-                    # This should raise a GitError
-                    with pytest.raises(GitError):
-                        git_utils = GitUtils()
-                        # Force calling _get_git_diff
-                        git_utils._get_git_diff()
+        assert "error message" in str(exc_info.value)
+
+    @patch("subprocess.run")
+    def test_size_limit_stops_git(self, mock_run):
+        """Test that git is stopped once the size limit is reached."""
+        with patch("subprocess.Popen", fake_popen(STAGED_OUTPUT, -9)) as mock_popen:
+            repo = GitUtils(max_diff_bytes=50)
+
+            assert repo.diff.startswith("diff --git a/file.py b/file.py")
+            assert "2 more files not read" in repo.diff
+            assert repo.staged_changes.files_read == 1
+
+        mock_popen.processes[0].kill.assert_called_once()
+
+    def test_prescan_fetches_selected_patches(self):
+        """Test that only the patches that fit are fetched, by path."""
+        left_out = MagicMock(return_value={"uv.lock": "matches *.lock"})
+        sizes = b"40\n44\n12\n20\n900000\n900000\n"
+        with (
+            patch("subprocess.run", fake_run(PRESCAN_OUTPUT, sizes)) as mock_run,
+            patch("subprocess.Popen", fake_popen(FILE_PATCH_OUTPUT)) as mock_popen,
+        ):
+            repo = GitUtils(max_diff_bytes=10000, prescan=True, left_out=left_out)
+
+            assert repo.files_status == "M file.py\nM uv.lock\nM dump.sql"
+            assert [(f.path, f.added) for f in repo.files] == [
+                ("file.py", 1),
+                ("uv.lock", 0),
+                ("dump.sql", 0),
+            ]
+            assert repo.files[1].header_lines[-1] == (
+                "[... uv.lock (modified, +10 -2 lines): "
+                "diff left out, matches *.lock ...]"
+            )
+            assert "dump.sql (modified, +50000 -50000 lines): diff left out, " in (
+                repo.diff
+            )
+            assert repo.staged_changes.files_read == 2
+            assert "only 2 of 3 files were read" in repo.staged_changes.describe()
+
+        left_out.assert_called_once_with(repo, ["file.py", "uv.lock", "dump.sql"])
+        mock_popen.assert_called_once()
+        assert mock_popen.call_args.args[0] == [
+            "git",
+            "diff",
+            "--cached",
+            "--patch-with-raw",
+            "--",
+            ":(top,literal)file.py",
+        ]
+        sizes_call = [c for c in mock_run.call_args_list if "cat-file" in c.args[0]]
+        assert sizes_call[0].kwargs["input"] == (
+            b"1111111\n2222222\n5555555\n6666666\n7777777\n8888888\n"
+        )
+
+    @pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+    def test_prescan_reads_everything_in_one_call(self, tmp_path, monkeypatch):
+        """Test the pre-scan against a real repository with context options set."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("GIT_CONFIG_GLOBAL", os.devnull)
+        git = ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com"]
+        subprocess.run([*git, "init", "-q"], check=True)
+        (tmp_path / "app.py").write_text("one\ntwo\nthree\nfour\n")
+        (tmp_path / "old.py").write_text("".join(f"line {i}\n" for i in range(20)))
+        subprocess.run([*git, "add", "."], check=True)
+        subprocess.run([*git, "commit", "-q", "-m", "initial"], check=True)
+        (tmp_path / "app.py").write_text("one\ntwo\nthree\n4\n")
+        subprocess.run([*git, "mv", "old.py", "new.py"], check=True)
+        subprocess.run([*git, "add", "app.py"], check=True)
+
+        repo = GitUtils(
+            diff_options=["-U1", "--find-renames", "--find-copies"], prescan=True
+        )
+
+        assert repo.files_status.splitlines() == ["M app.py", "R100 old.py new.py"]
+        assert repo.staged_changes.files_read == 2
+        # One line of context, as -U1 asked
+        assert "@@ -3,2 +3,2 @@ two\n three\n-four\n+4" in repo.diff
+        assert "rename to new.py" in repo.diff
+
+    def test_prescan_reads_large_files_without_context(self):
+        """Test that files over the limit are fetched with -U0 by themselves."""
+        scan = (
+            b":100644 100644 1111111 2222222 M\0src/a.py\0"
+            b":100644 100644 3333333 4444444 M\0src/b.py\0"
+            b":100644 100644 5555555 6666666 M\0src/big.py\0"
+            b"1\t1\tsrc/a.py\0"
+            b"1\t1\tsrc/b.py\0"
+            b"150\t150\tsrc/big.py\0"
+        )
+        with (
+            patch("subprocess.run", fake_run(scan)),
+            patch("subprocess.Popen", fake_popen()) as mock_popen,
+        ):
+            GitUtils(max_diff_bytes=20000, pathspecs=["src/"], prescan=True).diff
+
+        assert [c.args[0][4:] for c in mock_popen.call_args_list] == [
+            ["--", "src/", ":(top,literal,exclude)src/big.py"],
+            ["-U0", "--", ":(top,literal)src/big.py"],
+        ]
+
+    @patch("subprocess.run")
+    def test_commands_run_concurrently(self, mock_run):
+        """Test that the repository check and the diff overlap."""
+        both_started = threading.Barrier(2, timeout=5)
+        popen = fake_popen()
+
+        def run(args, **kwargs):
+            both_started.wait()
+            return MagicMock(stdout=b"")
+
+        def start_diff(*args, **kwargs):
+            both_started.wait()
+            return popen(*args, **kwargs)
+
+        mock_run.side_effect = run
+
+        with patch("subprocess.Popen", side_effect=start_diff):
+            GitUtils().diff
+        assert not both_started.broken
 
     @patch("subprocess.run")
     def test_git_commit_success(self, mock_run):
@@ -149,3 +397,29 @@ class TestGitUtils:
 
         with pytest.raises(GitError):
             GitUtils.git_commit("feat: add new feature")
+
+    @patch("subprocess.Popen", new_callable=fake_popen)
+    @patch("subprocess.run")
+    def test_staged_tree(self, mock_run, mock_popen):
+        """Test that the staged tree is written once and memoized."""
+        repo = GitUtils()
+        mock_run.reset_mock()
+        mock_run.return_value.stdout = "4b825dc642cb6eb9a060e54bf8d69288fbee4904\n"
+
+        assert repo.staged_tree == "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+        assert repo.staged_tree == "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+        mock_run.assert_called_once_with(
+            ["git", "write-tree"], capture_output=True, text=True, check=True
+        )
+
+    @patch("subprocess.Popen", new_callable=fake_popen)
+    @patch("subprocess.run")
+    def test_staged_tree_unavailable(self, mock_run, mock_popen):
+        """Test that an index that cannot be written yields no tree."""
+        repo = GitUtils()
+
+        mock_run.side_effect = subprocess.CalledProcessError(
+            returncode=128, cmd=["git", "write-tree"], stderr="unmerged entries"
+        )
+        assert repo.staged_tree is None
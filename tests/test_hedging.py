@@ -0,0 +1,108 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from acmsg.api.hedging import Cancellation, HedgePolicy, HedgeStats
+from acmsg.constants import DEFAULT_HEDGE_DELAY
+from acmsg.exceptions import ConfigError
+from acmsg.storage import read_json
+
+
+class TestHedgePolicy:
+    def test_requires_target(self):
+        with pytest.raises(ConfigError):
+            HedgePolicy()
+
+    def test_invalid_values(self):
+        with pytest.raises(ConfigError):
+            HedgePolicy(model="m", delay=-1)
+        with pytest.raises(ConfigError):
+            HedgePolicy(model="m", percentile=1.5)
+
+    def test_from_config(self):
+        assert HedgePolicy.from_config(None) is None
+
+        policy = HedgePolicy.from_config({"provider": "groq", "delay": "2.5"})
+        assert policy.model is None
+        assert policy.provider == "groq"
+        assert policy.delay == 2.5
+
+        with pytest.raises(ConfigError):
+            HedgePolicy.from_config({"model": "m", "after": 1})
+        with pytest.raises(ConfigError):
+            HedgePolicy.from_config("m")
+
+    def test_delay_for(self, tmp_path):
+        stats = HedgeStats(tmp_path / "latency.json")
+        policy = HedgePolicy(model="secondary")
+        assert policy.delay_for("primary", stats) == DEFAULT_HEDGE_DELAY
+
+        for latency in (1.0, 2.0, 3.0, 4.0, 5.0):
+            stats.record([("primary", latency)], hedged=False, hedge_won=False)
+        assert policy.delay_for("primary", stats) == 5.0
+        assert HedgePolicy(model="s", percentile=0.5).delay_for("primary", stats) == 3.0
+        assert HedgePolicy(model="s", delay=0.5).delay_for("primary", stats) == 0.5
+
+
+class TestHedgeStats:
+    def test_record_and_summary(self, tmp_path):
+        cache_file = tmp_path / "latency.json"
+        stats = HedgeStats(cache_file)
+        assert stats.summary()["requests"] == 0
+
+        stats.record([("a", 1.0)], hedged=False, hedge_won=False)
+        stats.record([("b", 0.5), ("a", 2.0)], hedged=True, hedge_won=True)
+        stats.record([("a", 1.5)], hedged=True, hedge_won=False)
+
+        summary = stats.summary()
+        assert summary["requests"] == 3
+        assert summary["hedged"] == 2
+        assert summary["hedge_wins"] == 1
+        assert summary["hedge_rate"] == pytest.approx(2 / 3)
+        assert summary["win_rate"] == 0.5
+        assert stats.models() == ["a", "b"]
+
+        # Persisted and reloaded by a new instance
+        assert read_json(cache_file)["hedged"] == 2
+        assert HedgeStats(cache_file).samples("a") == [1.0, 2.0, 1.5]
+
+    def test_window(self, tmp_path):
+        stats = HedgeStats(tmp_path / "latency.json", window=3)
+        for latency in range(5):
+            stats.record([("a", float(latency))], hedged=False, hedge_won=False)
+
+        assert stats.samples("a") == [2.0, 3.0, 4.0]
+
+    def test_percentile_needs_samples(self, tmp_path):
+        stats = HedgeStats(tmp_path / "latency.json")
+        stats.record([("a", 1.0)], hedged=False, hedge_won=False)
+
+        assert stats.percentile("a", 0.95) is None
+
+
+class TestCancellation:
+    def test_cancel_shuts_down_the_connection(self):
+        cancellation = Cancellation()
+        response = MagicMock()
+
+        assert cancellation.attach(response)
+        cancellation.cancel()
+
+        assert cancellation.cancelled
+        response.raw.shutdown.assert_called_once()
+        response.close.assert_called_once()
+
+    def test_attach_after_cancel_closes_the_response(self):
+        cancellation = Cancellation()
+        cancellation.cancel()
+        response = MagicMock()
+
+        assert not cancellation.attach(response)
+        response.close.assert_called_once()
+
+    def test_cancel_wakes_a_waiting_retry(self):
+        cancellation = Cancellation()
+        threading.Timer(0.01, cancellation.cancel).start()
+
+        assert cancellation.wait(5)
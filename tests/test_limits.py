@@ -0,0 +1,23 @@
+from acmsg.api.limits import ContextLimits
+from acmsg.storage import read_json
+
+
+class TestContextLimits:
+    def test_unknown_model(self, tmp_path):
+        assert ContextLimits(tmp_path / "limits.json").get("model") is None
+
+    def test_record_persists(self, tmp_path):
+        cache_file = tmp_path / "limits.json"
+        ContextLimits(cache_file).record("model", 2048)
+
+        assert read_json(cache_file) == {"model": 2048}
+        assert ContextLimits(cache_file).get("model") == 2048
+
+    def test_ignores_invalid_entries(self, tmp_path):
+        cache_file = tmp_path / "limits.json"
+        cache_file.write_text('{"a": "big", "b": -1, "c": 1024}')
+
+        limits = ContextLimits(cache_file)
+        assert limits.get("a") is None
+        assert limits.get("b") is None
+        assert limits.get("c") == 1024
@@ -1,16 +1,29 @@
 import pytest
 import json
+import threading
+
+import requests
 from unittest.mock import patch, MagicMock
 
 from acmsg.api.openrouter import OpenRouterClient
-from acmsg.exceptions import ApiError
-from acmsg.constants import API_ENDPOINT
+from acmsg.api.circuit import CircuitBreaker
+from acmsg.api.deadline import Deadline
+from acmsg.api.hedging import Cancellation, HedgePolicy, HedgeStats
+from acmsg.api.retry import RetryPolicy
+from acmsg.api.session import get_shared_session
+from acmsg.exceptions import ApiError, ContextLengthError, DeadlineExceeded
+from acmsg.constants import (
+    API_ENDPOINT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_READ_TIMEOUT,
+)
 
 
 class TestOpenRouterClient:
     """Tests for the OpenRouterClient class."""
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_fetch_model_info(self, mock_get):
         """Test fetching model information from API."""
         mock_response = MagicMock()
@@ -35,7 +48,7 @@ class TestOpenRouterClient:
     def test_estimate_tokens(self):
         """Test token estimation."""
         client = OpenRouterClient("test_token")
-        tokens = client._estimate_tokens(
+        tokens = client.estimate_tokens(
             "This is a test string with exactly 48 characters."
         )
         assert (
@@ -54,22 +67,28 @@ class TestOpenRouterClient:
             # Another known model family
             assert client._get_model_context_length("claude-123") == 100000
 
-    def test_should_use_transforms(self):
-        """Test transform decision logic."""
+    def test_plan_budget_resolves_context_once(self):
+        """Test that planning looks up the context length and estimates once."""
         client = OpenRouterClient("test_token")
-        # Patch _get_estimated_token_counts directly to control the values
-        with patch.object(
-            client, "_get_estimated_token_counts", return_value=(1000, 50, 200, 800)
+        with (
+            patch.object(
+                client, "_get_model_context_length", return_value=4096
+            ) as mock_context,
+            patch.object(
+                client, "estimate_tokens", wraps=client.estimate_tokens
+            ) as mock_estimate,
         ):
-            # Small inputs (less than 90% of context length)
-            assert not client._should_use_transforms("test_model", "S" * 100, "U" * 700)
+            payload, budget = client._build_payload(
+                "test_model", "S" * 100, "U" * 40000, 0.7, stream=False
+            )
 
-        # Now test with values that exceed 90% of context length
-        with patch.object(
-            client, "_get_estimated_token_counts", return_value=(1000, 50, 200, 950)
-        ):
-            # Large inputs (more than 90% of context length)
-            assert client._should_use_transforms("test_model", "S" * 200, "U" * 800)
+        mock_context.assert_called_once_with("test_model")
+        assert mock_estimate.call_count == 2
+        assert budget.was_trimmed
+        assert budget.use_transforms
+        assert payload["transforms"] == ["middle-out"]
+        assert payload["messages"][2]["content"] == budget.user_prompt
+        assert budget.prompt_tokens + payload["max_tokens"] <= 4096
 
     def test_trim_content(self):
         """Test content trimming functionality."""
@@ -90,7 +109,7 @@ class TestOpenRouterClient:
         # For the case where we want to test no trimming:
         # We need to mock both the token estimation and check the condition
         # to ensure we have exactly the behavior we want for testing
-        with patch.object(client, "_estimate_tokens") as mock_estimate:
+        with patch.object(client, "estimate_tokens") as mock_estimate:
             # Set up fixed token counts
             mock_estimate.side_effect = [125, 375, 500]  # system, user, total
 
@@ -107,11 +126,9 @@ class TestOpenRouterClient:
         client = OpenRouterClient("test_token")
         assert client._api_token == "test_token"
         assert client._api_endpoint == API_ENDPOINT
-        assert isinstance(client._models_info_cache, dict)
-        assert isinstance(client._cache_expiry, dict)
-        assert client._cache_ttl > 0
+        assert client.catalog.ttl > 0
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_completion_success(self, mock_post):
         """Test successful API call to generate completion."""
         mock_response = MagicMock()
@@ -122,8 +139,8 @@ class TestOpenRouterClient:
         mock_post.return_value = mock_response
 
         client = OpenRouterClient("test_token")
-        # Mock the transform decision to avoid token estimation complexity
-        with patch.object(client, "_should_use_transforms", return_value=False):
+        # Fix the context length so the request is planned without the catalog
+        with patch.object(client, "_get_model_context_length", return_value=4096):
             result = client.generate_completion(
                 model="test_model",
                 system_prompt="System prompt",
@@ -148,8 +165,10 @@ class TestOpenRouterClient:
         assert payload["messages"][0]["role"] == "system"
         assert payload["messages"][1]["content"] == "System prompt"
         assert payload["messages"][2]["content"] == "User prompt"
+        assert payload["max_tokens"] == DEFAULT_MAX_TOKENS
+        assert kwargs["timeout"] == (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_completion_api_error(self, mock_post):
         """Test error handling when API returns an error response."""
         mock_response = MagicMock()
@@ -158,7 +177,7 @@ class TestOpenRouterClient:
         mock_post.return_value = mock_response
 
         client = OpenRouterClient("test_token")
-        with patch.object(client, "_should_use_transforms", return_value=False):
+        with patch.object(client, "_get_model_context_length", return_value=4096):
             with pytest.raises(ApiError) as exc_info:
                 client.generate_completion(
                     model="test_model",
@@ -171,13 +190,13 @@ class TestOpenRouterClient:
         assert "API error message" in str(exc_info.value)
 
     @pytest.mark.xfail(reason="Exact error message varies with ANSI colors")
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_completion_connection_error(self, mock_post):
         """Test error handling when connection to API fails."""
         mock_post.side_effect = Exception("Connection error")
 
         client = OpenRouterClient("test_token")
-        with patch.object(client, "_should_use_transforms", return_value=False):
+        with patch.object(client, "_get_model_context_length", return_value=4096):
             with pytest.raises(ApiError) as exc_info:
                 client.generate_completion(
                     model="test_model",
@@ -190,7 +209,7 @@ class TestOpenRouterClient:
         # ANSI color codes or formatting that's hard to match exactly
         assert isinstance(exc_info.value, ApiError)
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_completion_parse_error(self, mock_post):
         """Test error handling when API response cannot be parsed."""
         mock_response = MagicMock()
@@ -200,7 +219,7 @@ class TestOpenRouterClient:
         mock_post.return_value = mock_response
 
         client = OpenRouterClient("test_token")
-        with patch.object(client, "_should_use_transforms", return_value=False):
+        with patch.object(client, "_get_model_context_length", return_value=4096):
             with pytest.raises(ApiError) as exc_info:
                 client.generate_completion(
                     model="test_model",
@@ -211,7 +230,7 @@ class TestOpenRouterClient:
 
         assert "API returned unexpected response format" in str(exc_info.value)
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_completion_json_decode_error(self, mock_post):
         """Test error handling when API response is not valid JSON."""
         mock_response = MagicMock()
@@ -220,7 +239,7 @@ class TestOpenRouterClient:
         mock_post.return_value = mock_response
 
         client = OpenRouterClient("test_token")
-        with patch.object(client, "_should_use_transforms", return_value=False):
+        with patch.object(client, "_get_model_context_length", return_value=4096):
             with pytest.raises(ApiError) as exc_info:
                 client.generate_completion(
                     model="test_model",
@@ -230,3 +249,610 @@ class TestOpenRouterClient:
                 )
 
         assert "Failed to parse API response" in str(exc_info.value)
+
+    def test_uses_shared_session_by_default(self):
+        """Test that clients share one pooled session unless given their own."""
+        first = OpenRouterClient("test_token")
+        second = OpenRouterClient("test_token")
+
+        assert first.session is second.session
+        assert first.session is get_shared_session()
+
+    def test_dedicated_session_pool_sizes(self):
+        """Test that pool sizes create a dedicated, tunable session."""
+        client = OpenRouterClient("test_token", pool_connections=2, pool_maxsize=16)
+
+        assert client.session is not get_shared_session()
+        adapter = client.session.get_adapter("https://openrouter.ai")
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 16
+
+        with patch.object(client.session, "close") as mock_close:
+            client.close()
+            mock_close.assert_called_once()
+
+    def test_explicit_session_not_closed(self):
+        """Test that a caller-provided session is left open by close()."""
+        session = MagicMock()
+        with OpenRouterClient("test_token", session=session) as client:
+            assert client.session is session
+
+        session.close.assert_not_called()
+
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
+    def test_requests_reuse_session(self, mock_get, mock_post):
+        """Test that catalog and completion requests go through the session."""
+        mock_get.return_value.ok = True
+        mock_get.return_value.json.return_value = {"data": []}
+        mock_post.return_value.ok = True
+        mock_post.return_value.json.return_value = {
+            "choices": [{"message": {"content": "fix: reuse connections"}}]
+        }
+
+        client = OpenRouterClient("test_token")
+        client.generate_completion("test_model", "System", "User", 0.7)
+
+        mock_get.assert_called()
+        mock_post.assert_called_once()
+
+    @staticmethod
+    def _sse_response(events):
+        """Build a mock streamed response from a list of event payloads."""
+        response = MagicMock()
+        response.ok = True
+        response.headers = {"Content-Type": "text/event-stream"}
+        lines = [": OPENROUTER PROCESSING", ""]
+        for event in events:
+            lines.extend([f"data: {json.dumps(event)}", ""])
+        lines.extend(["data: [DONE]", ""])
+        response.iter_lines.return_value = iter(lines)
+        return response
+
+    @patch("requests.Session.post")
+    def test_stream_completion(self, mock_post):
+        """Test that streamed deltas are yielded as they arrive."""
+        mock_post.return_value = self._sse_response(
+            [
+                {"choices": [{"delta": {"role": "assistant"}}]},
+                {"choices": [{"delta": {"content": "feat: "}}]},
+                {"choices": [{"delta": {"content": "stream"}}]},
+                {"choices": []},
+            ]
+        )
+
+        client = OpenRouterClient("test_token")
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            chunks = list(
+                client.stream_completion("test_model", "System", "User", 0.7)
+            )
+
+        assert chunks == ["feat: ", "stream"]
+        _, kwargs = mock_post.call_args
+        assert kwargs["stream"] is True
+        assert json.loads(kwargs["data"])["stream"] is True
+        mock_post.return_value.close.assert_called_once()
+
+    @patch("requests.Session.post")
+    def test_generate_completion_stream_joins_chunks(self, mock_post):
+        """Test that generate_completion(stream=True) returns the joined stream."""
+        mock_post.return_value = self._sse_response(
+            [
+                {"choices": [{"delta": {"content": "fix: "}}]},
+                {"choices": [{"delta": {"content": "join"}}]},
+            ]
+        )
+
+        client = OpenRouterClient("test_token")
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            result = client.generate_completion(
+                "test_model", "System", "User", 0.7, stream=True
+            )
+
+        assert result == "fix: join"
+
+    @patch("requests.Session.post")
+    def test_stream_completion_error_event(self, mock_post):
+        """Test that an error event in the stream raises ApiError."""
+        mock_post.return_value = self._sse_response(
+            [
+                {"choices": [{"delta": {"content": "feat"}}]},
+                {"error": {"message": "Provider disconnected"}},
+            ]
+        )
+
+        client = OpenRouterClient("test_token")
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            stream = client.stream_completion("test_model", "System", "User", 0.7)
+            assert next(stream) == "feat"
+            with pytest.raises(ApiError) as exc_info:
+                next(stream)
+
+        assert "Provider disconnected" in str(exc_info.value)
+
+    @patch("requests.Session.post")
+    def test_stream_completion_http_error(self, mock_post):
+        """Test that a non-streamed error response raises ApiError."""
+        mock_response = MagicMock()
+        mock_response.ok = False
+        mock_response.headers = {"Content-Type": "application/json"}
+        mock_response.json.return_value = {"error": {"message": "Rate limited"}}
+        mock_post.return_value = mock_response
+
+        client = OpenRouterClient("test_token")
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ApiError) as exc_info:
+                list(client.stream_completion("test_model", "System", "User", 0.7))
+
+        assert "Rate limited" in str(exc_info.value)
+        mock_response.close.assert_called_once()
+
+    @staticmethod
+    def _json_response(status_code, body, headers=None):
+        response = MagicMock()
+        response.status_code = status_code
+        response.ok = status_code < 400
+        response.headers = headers or {}
+        response.json.return_value = body
+        return response
+
+    @patch("acmsg.api.openrouter.time.sleep")
+    @patch("requests.Session.post")
+    def test_retries_rate_limited_request(self, mock_post, mock_sleep):
+        """Test that a 429 response is retried, honouring Retry-After."""
+        limited = self._json_response(
+            429, {"error": {"message": "Rate limited"}}, {"Retry-After": "2"}
+        )
+        success = self._json_response(
+            200, {"choices": [{"message": {"content": "feat: retry"}}]}
+        )
+        mock_post.side_effect = [limited, success]
+
+        client = OpenRouterClient("test_token", retry_policy=RetryPolicy(jitter=False))
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            result = client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert result == "feat: retry"
+        assert mock_post.call_count == 2
+        mock_sleep.assert_called_once_with(2.0)
+        limited.close.assert_called_once()
+
+    @patch("acmsg.api.openrouter.time.sleep")
+    @patch("requests.Session.post")
+    def test_retries_connection_errors(self, mock_post, mock_sleep):
+        """Test that connection errors are retried until attempts run out."""
+        mock_post.side_effect = requests.ConnectionError("refused")
+
+        client = OpenRouterClient("test_token", retry_policy=RetryPolicy(jitter=False))
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ApiError) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert mock_post.call_count == 3
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [0.5, 1.0]
+        assert "(after 3 attempts)" in str(exc_info.value)
+
+    @patch("acmsg.api.openrouter.time.sleep")
+    @patch("requests.Session.post")
+    def test_does_not_retry_server_error(self, mock_post, mock_sleep):
+        """Test that a 500 response is not retried."""
+        mock_post.return_value = self._json_response(
+            500, {"error": {"message": "Internal error"}}
+        )
+
+        client = OpenRouterClient("test_token")
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ApiError) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert mock_post.call_count == 1
+        mock_sleep.assert_not_called()
+        assert "attempts" not in str(exc_info.value)
+
+    @patch("acmsg.api.openrouter.time.sleep")
+    @patch("requests.Session.post")
+    def test_does_not_retry_read_timeout(self, mock_post, mock_sleep):
+        """Test that read timeouts are not retried."""
+        mock_post.side_effect = requests.ReadTimeout("timed out")
+
+        client = OpenRouterClient("test_token")
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ApiError):
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert mock_post.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @patch("acmsg.api.openrouter.time.sleep")
+    @patch("requests.Session.post")
+    def test_reports_attempts_when_retries_exhausted(self, mock_post, mock_sleep):
+        """Test the error message after the last retryable response."""
+        mock_post.return_value = self._json_response(
+            503, {"error": {"message": "Unavailable"}}
+        )
+
+        client = OpenRouterClient("test_token", retry_policy=RetryPolicy(jitter=False))
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ApiError) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert mock_post.call_count == 3
+        assert "(after 3 attempts)" in str(exc_info.value)
+        assert "Unavailable" in str(exc_info.value)
+
+    @patch("requests.Session.post")
+    def test_timeouts_clamped_to_deadline(self, mock_post):
+        """Test that request timeouts never exceed the remaining deadline."""
+        mock_post.return_value = self._json_response(
+            200, {"choices": [{"message": {"content": "feat: fast"}}]}
+        )
+
+        client = OpenRouterClient("test_token", deadline=Deadline(2), max_tokens=None)
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            client.generate_completion("test_model", "System", "User", 0.7)
+
+        _, kwargs = mock_post.call_args
+        connect, read = kwargs["timeout"]
+        assert 0 < connect <= 2 and 0 < read <= 2
+        assert "max_tokens" not in json.loads(kwargs["data"])
+
+    @patch("acmsg.api.openrouter.time.sleep")
+    @patch("requests.Session.post")
+    def test_deadline_stops_retries(self, mock_post, mock_sleep):
+        """Test that no retry is attempted if its delay would pass the deadline."""
+        mock_post.return_value = self._json_response(
+            429, {"error": {"message": "Rate limited"}}, {"Retry-After": "120"}
+        )
+
+        client = OpenRouterClient("test_token", deadline=Deadline(10))
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ApiError) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert mock_post.call_count == 1
+        mock_sleep.assert_not_called()
+        assert "Rate limited" in str(exc_info.value)
+
+    @patch("requests.Session.post")
+    def test_deadline_exceeded(self, mock_post):
+        """Test that a timeout caused by the deadline raises DeadlineExceeded."""
+        deadline = Deadline(5)
+
+        def expire(*args, **kwargs):
+            deadline._expires_at = 0
+            raise requests.ReadTimeout("timed out")
+
+        mock_post.side_effect = expire
+
+        client = OpenRouterClient("test_token", deadline=deadline)
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert "Deadline of 5s exceeded" in str(exc_info.value)
+
+
+class TestHedgedRequests:
+    """Tests for hedging slow requests to a secondary model."""
+
+    @staticmethod
+    def _client(tmp_path, stream_payload, **policy):
+        client = OpenRouterClient(
+            "test_token",
+            hedge_policy=HedgePolicy(**policy),
+            hedge_stats=HedgeStats(tmp_path / "latency.json"),
+        )
+        patch.object(client, "_get_model_context_length", return_value=8192).start()
+        patch.object(client, "_stream_payload", side_effect=stream_payload).start()
+        return client
+
+    def teardown_method(self):
+        patch.stopall()
+
+    def test_hedge_wins_when_primary_is_slow(self, tmp_path):
+        """Test that a slow primary is raced and cancelled."""
+        release = threading.Event()
+        closed = threading.Event()
+        seen = []
+
+        def stream_payload(payload, budget, cancellation=None):
+            seen.append(payload)
+            if payload["model"] == "primary":
+                try:
+                    release.wait(5)
+                    yield "slow"
+                finally:
+                    closed.set()
+            else:
+                yield "fast"
+                yield " answer"
+
+        client = self._client(tmp_path, stream_payload, model="secondary", delay=0.01)
+        result = client.generate_completion("primary", "System", "User", 0.7)
+        release.set()
+
+        assert result == "fast answer"
+        assert [payload["model"] for payload in seen] == ["primary", "secondary"]
+        assert all(payload["stream"] for payload in seen)
+        assert closed.wait(5)
+        summary = client.hedge_stats.summary()
+        assert (summary["hedged"], summary["hedge_wins"]) == (1, 1)
+        # Only the winner finished, so the cut-off primary adds no sample
+        assert len(client.hedge_stats.samples("secondary")) == 1
+        assert client.hedge_stats.samples("primary") == []
+
+    def test_no_hedge_when_primary_is_fast(self, tmp_path):
+        """Test that no hedge is sent if the primary answers in time."""
+        seen = []
+
+        def stream_payload(payload, budget, cancellation=None):
+            seen.append(payload["model"])
+            yield "feat: quick"
+
+        client = self._client(tmp_path, stream_payload, model="secondary", delay=5)
+        chunks = list(client.stream_completion("primary", "System", "User", 0.7))
+
+        assert chunks == ["feat: quick"]
+        assert seen == ["primary"]
+        assert client.hedge_stats.summary()["hedged"] == 0
+        assert len(client.hedge_stats.samples("primary")) == 1
+
+    def test_provider_hedge(self, tmp_path):
+        """Test that a provider hedge pins the same model to one provider."""
+        release = threading.Event()
+        seen = []
+
+        def stream_payload(payload, budget, cancellation=None):
+            seen.append(payload)
+            if "provider" not in payload:
+                release.wait(5)
+            yield "feat: hedged" if "provider" in payload else "feat: primary"
+
+        client = self._client(tmp_path, stream_payload, provider="groq", delay=0.01)
+        result = client.generate_completion("primary", "System", "User", 0.7)
+        release.set()
+
+        assert result == "feat: hedged"
+        assert seen[1]["model"] == "primary"
+        assert seen[1]["provider"] == {"order": ["groq"], "allow_fallbacks": False}
+        assert len(client.hedge_stats.samples("primary")) == 1
+
+    def test_loser_is_cancelled_while_waiting_to_retry(self, tmp_path):
+        """Test that a losing request in retry backoff stops without retrying."""
+        client = OpenRouterClient(
+            "test_token", retry_policy=RetryPolicy(max_attempts=5)
+        )
+        cancellation = Cancellation()
+        threading.Timer(0.05, cancellation.cancel).start()
+
+        with (
+            patch.object(
+                client, "_post", side_effect=requests.ConnectionError("down")
+            ) as mock_post,
+            patch.object(client, "_retry_delay", return_value=30),
+        ):
+            with pytest.raises(ApiError, match="cancelled"):
+                client._send({"model": "primary"}, True, cancellation)
+
+        assert mock_post.call_count == 1
+
+    def test_primary_error_before_hedge(self, tmp_path):
+        """Test that an early primary failure is raised without hedging."""
+
+        def stream_payload(payload, budget, cancellation=None):
+            raise ApiError(f"{payload['model']} failed")
+            yield  # pragma: no cover
+
+        client = self._client(tmp_path, stream_payload, model="secondary", delay=5)
+        with pytest.raises(ApiError) as exc_info:
+            client.generate_completion("primary", "System", "User", 0.7)
+
+        assert "primary failed" in str(exc_info.value)
+
+    def test_both_fail(self, tmp_path):
+        """Test that the primary's error is raised if both requests fail."""
+
+        def stream_payload(payload, budget, cancellation=None):
+            raise ApiError(f"{payload['model']} failed")
+            yield  # pragma: no cover
+
+        client = self._client(tmp_path, stream_payload, model="secondary", delay=0)
+        with pytest.raises(ApiError):
+            client.generate_completion("primary", "System", "User", 0.7)
+
+
+class TestModelFailover:
+    """Tests for failing over through an ordered list of models."""
+
+    @staticmethod
+    def _client(tmp_path, complete=None, stream_model=None):
+        client = OpenRouterClient(
+            "test_token", circuit_breaker=CircuitBreaker(tmp_path / "circuits.json")
+        )
+        if complete is not None:
+            patch.object(client, "_complete", side_effect=complete).start()
+        if stream_model is not None:
+            patch.object(client, "_stream_model", side_effect=stream_model).start()
+        return client
+
+    def teardown_method(self):
+        patch.stopall()
+
+    def test_falls_back_to_next_model(self, tmp_path):
+        """Test that a failing model is skipped, now and in later runs."""
+        tried = []
+
+        def complete(model, *args):
+            tried.append(model)
+            if model == "down":
+                raise ApiError("Provider returned error")
+            return f"feat: from {model}"
+
+        client = self._client(tmp_path, complete=complete)
+        result = client.generate_completion(["down", "up"], "System", "User", 0.7)
+
+        assert result == "feat: from up"
+        assert tried == ["down", "up"]
+
+        # The open circuit is persisted, so the next client skips the model
+        client = self._client(tmp_path, complete=complete)
+        client.generate_completion(["down", "up"], "System", "User", 0.7)
+        assert tried == ["down", "up", "up"]
+
+    def test_context_overflow_does_not_open_circuit(self, tmp_path):
+        """Test that context errors fall back without marking the model down."""
+
+        def complete(model, *args):
+            if model == "small":
+                raise ContextLengthError("Context length exceeded")
+            return "feat: fits"
+
+        client = self._client(tmp_path, complete=complete)
+        result = client.generate_completion(["small", "large"], "System", "User", 0.7)
+
+        assert result == "feat: fits"
+        assert client.circuit_breaker.allow("small")
+
+    def test_raises_last_error(self, tmp_path):
+        """Test that the last model's error is raised when every model fails."""
+
+        def complete(model, *args):
+            raise ApiError(f"{model} failed")
+
+        client = self._client(tmp_path, complete=complete)
+        with pytest.raises(ApiError) as exc_info:
+            client.generate_completion(["a", "b"], "System", "User", 0.7)
+
+        assert "b failed" in str(exc_info.value)
+
+    def test_all_circuits_open(self, tmp_path):
+        """Test that models are still tried when every circuit is open."""
+        client = self._client(tmp_path, complete=lambda model, *args: model)
+        client.circuit_breaker.record_failure("a")
+        client.circuit_breaker.record_failure("b")
+
+        assert client.generate_completion(["a", "b"], "System", "User", 0.7) == "a"
+        assert client.circuit_breaker.allow("a")
+
+    def test_deadline_stops_failover(self, tmp_path):
+        """Test that running out of time does not try the next model."""
+        tried = []
+
+        def complete(model, *args):
+            tried.append(model)
+            raise DeadlineExceeded("Deadline of 5s exceeded")
+
+        client = self._client(tmp_path, complete=complete)
+        with pytest.raises(DeadlineExceeded):
+            client.generate_completion(["a", "b"], "System", "User", 0.7)
+
+        assert tried == ["a"]
+        assert client.circuit_breaker.allow("a")
+
+    def test_stream_falls_back_before_first_chunk(self, tmp_path):
+        """Test that streams fail over until a model produces a chunk."""
+
+        def stream_model(model, *args):
+            if model == "down":
+                raise ApiError("Provider returned error")
+            yield "feat: "
+            yield "streamed"
+
+        client = self._client(tmp_path, stream_model=stream_model)
+        chunks = list(client.stream_completion(["down", "up"], "System", "User", 0.7))
+
+        assert chunks == ["feat: ", "streamed"]
+        assert not client.circuit_breaker.allow("down")
+
+
+OVERFLOW_MESSAGE = (
+    "This endpoint's maximum context length is 2048 tokens. Your input "
+    "(3000 tokens) is longer than the model's context length (2048 tokens)."
+)
+
+
+class TestContextRetry:
+    """Tests for retrying after context overflows and learning the limits."""
+
+    @staticmethod
+    def _response(body, ok=True):
+        response = MagicMock()
+        response.ok = ok
+        response.status_code = 200 if ok else 400
+        response.headers = {}
+        response.json.return_value = body
+        return response
+
+    @patch("requests.Session.post")
+    def test_retries_with_reported_limits(self, mock_post):
+        """Test that an overflow is retried once within the reported limits."""
+        mock_post.side_effect = [
+            self._response({"error": {"message": OVERFLOW_MESSAGE}}, ok=False),
+            self._response({"choices": [{"message": {"content": "feat: fits"}}]}),
+        ]
+        client = OpenRouterClient("test_token")
+
+        with patch.object(
+            client, "_fetch_model_info", return_value={"context_length": 4096}
+        ):
+            result = client.generate_completion("test_model", "System", "a" * 8000, 0.7)
+
+        assert result == "feat: fits"
+        assert mock_post.call_count == 2
+        first, second = (json.loads(c.kwargs["data"]) for c in mock_post.call_args_list)
+        assert first["messages"][2]["content"] == "a" * 8000
+        assert "content trimmed" in second["messages"][2]["content"]
+        assert second["max_tokens"] == 512
+
+        # Later clients start from the learned limit and estimates
+        later = OpenRouterClient("test_token")
+        assert later._get_model_context_length("test_model") == 2048
+        assert later.estimate_tokens("a" * 8000, "test_model") > 2900
+
+    @patch("requests.Session.post")
+    def test_unreported_limits_are_not_retried(self, mock_post):
+        """Test that overflows without token counts fail straight away."""
+        mock_post.return_value = self._response(
+            {"error": {"message": "Prompt is longer than the model's context length"}},
+            ok=False,
+        )
+        client = OpenRouterClient("test_token")
+
+        with patch.object(client, "_get_model_context_length", return_value=4096):
+            with pytest.raises(ContextLengthError) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        mock_post.assert_called_once()
+        assert exc_info.value.context_length is None
+        assert client.context_limits.get("test_model") is None
+
+    @patch("requests.Session.post")
+    def test_retried_once(self, mock_post):
+        """Test that a second overflow is raised."""
+        mock_post.return_value = self._response(
+            {"error": {"message": OVERFLOW_MESSAGE}}, ok=False
+        )
+        client = OpenRouterClient("test_token")
+
+        with patch.object(client, "_fetch_model_info", return_value=None):
+            with pytest.raises(ContextLengthError) as exc_info:
+                client.generate_completion("test_model", "System", "User", 0.7)
+
+        assert mock_post.call_count == 2
+        assert exc_info.value.input_tokens == 3000
+        assert exc_info.value.context_length == 2048
+
+    @patch("requests.Session.post")
+    def test_stream_retries_before_first_chunk(self, mock_post):
+        """Test that streamed requests are retried like non-streamed ones."""
+        mock_post.side_effect = [
+            self._response({"error": {"message": OVERFLOW_MESSAGE}}, ok=False),
+            self._response({"choices": [{"message": {"content": "feat: fits"}}]}),
+        ]
+        client = OpenRouterClient("test_token")
+
+        with patch.object(client, "_fetch_model_info", return_value=None):
+            chunks = list(client.stream_completion("test_model", "System", "U", 0.7))
+
+        assert chunks == ["feat: fits"]
+        assert client.context_limits.get("test_model") == 2048
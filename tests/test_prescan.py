@@ -0,0 +1,128 @@
+from acmsg.core.diff import parse_diff
+from acmsg.core.prescan import (
+    FULL,
+    REDUCED,
+    STUB,
+    StagedFile,
+    estimate_patch_bytes,
+    plan_fetch,
+    read_numstat_with_raw,
+    stub_text,
+)
+
+SCAN_OUTPUT = (
+    b":100644 100644 1111111 2222222 M\0src/app.py\0"
+    b":100644 100644 3333333 3333333 R100\0old.py\0new.py\0"
+    b":000000 100644 0000000 4444444 A\0logo.png\0"
+    b":100644 000000 5555555 0000000 D\0docs/\xc3\xbc.md\0"
+    b"3\t1\tsrc/app.py\0"
+    b"0\t0\t\0old.py\0new.py\0"
+    b"-\t-\tlogo.png\0"
+    b"0\t20\tdocs/\xc3\xbc.md\0"
+)
+
+
+def staged(path, added, removed, status="M"):
+    staged_file = StagedFile(path, status, old_blob="1111111", new_blob="2222222")
+    staged_file.added, staged_file.removed = added, removed
+    return staged_file
+
+
+class TestReadNumstatWithRaw:
+    def test_parses_raw_and_counts(self):
+        files = read_numstat_with_raw(SCAN_OUTPUT)
+
+        assert [f.status_line for f in files] == [
+            "M src/app.py",
+            "R100 old.py new.py",
+            "A logo.png",
+            "D docs/ü.md",
+        ]
+        assert [(f.added, f.removed) for f in files] == [
+            (3, 1),
+            (0, 0),
+            (None, None),
+            (0, 20),
+        ]
+        assert files[1].paths == ["old.py", "new.py"]
+        assert files[2].binary
+        assert (files[3].old_blob, files[3].new_blob) == ("5555555", "0000000")
+
+    def test_nothing_staged(self):
+        assert read_numstat_with_raw(b"") == []
+
+
+class TestEstimatePatchBytes:
+    def test_reduced_context_is_smaller(self):
+        staged_file = staged("a.py", 100, 100)
+
+        assert estimate_patch_bytes(staged_file, context=False) < (
+            estimate_patch_bytes(staged_file)
+        )
+
+    def test_capped_by_blob_sizes(self):
+        staged_file = staged("a.py", 1000, 1000)
+        uncapped = estimate_patch_bytes(staged_file)
+        staged_file.old_size = staged_file.new_size = 3000
+
+        assert estimate_patch_bytes(staged_file) < uncapped
+        assert estimate_patch_bytes(staged_file) < 3 * 3000
+
+
+class TestPlanFetch:
+    def test_everything_fits(self):
+        plan = plan_fetch([staged("a.py", 1, 1), staged("b.py", 2, 0)])
+
+        assert plan.actions == {"a.py": FULL, "b.py": FULL}
+        assert not plan.selective
+
+    def test_large_files_are_reduced_then_stubbed(self):
+        files = [
+            staged("huge.sql", 50000, 50000),
+            staged("big.py", 150, 150),
+            staged("small.py", 1, 1),
+        ]
+
+        plan = plan_fetch(files, max_bytes=20000, max_file_bytes=10000)
+
+        assert plan.actions == {"small.py": FULL, "big.py": REDUCED, "huge.sql": STUB}
+        assert plan.reasons == {"huge.sql": "too large for the diff size limit"}
+        assert plan.selective
+
+    def test_left_out_files_are_not_fetched(self):
+        plan = plan_fetch(
+            [staged("uv.lock", 1, 1), staged("a.py", 1, 1)],
+            left_out={"uv.lock": "matches *.lock"},
+        )
+
+        assert plan.actions == {"uv.lock": STUB, "a.py": FULL}
+        assert plan.reasons == {"uv.lock": "matches *.lock"}
+
+
+class TestStubText:
+    def test_stub_parses_as_the_file(self):
+        files = read_numstat_with_raw(SCAN_OUTPUT)
+
+        stubs = parse_diff("\n".join(stub_text(f, "too large") for f in files))
+
+        assert [(f.path, f.status, f.old_path, f.hunks) for f in stubs] == [
+            ("src/app.py", "M", None, []),
+            ("new.py", "R", "old.py", []),
+            ("logo.png", "A", None, []),
+            ("docs/ü.md", "D", None, []),
+        ]
+        assert stubs[0].blobs == ("1111111", "2222222")
+        assert stubs[0].header_lines[-1] == (
+            "[... src/app.py (modified, +3 -1 lines): diff left out, too large ...]"
+        )
+        assert "(added, binary)" in stubs[2].header
+
+    def test_mode_change(self):
+        staged_file = staged("run.sh", 1, 0)
+        staged_file.old_mode, staged_file.new_mode = "100644", "100755"
+
+        assert stub_text(staged_file, "x").split("\n")[1:4] == [
+            "old mode 100644",
+            "new mode 100755",
+            "index 1111111..2222222",
+        ]
@@ -0,0 +1,227 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from acmsg.core.diff import parse_diff
+from acmsg.core.reducers import (
+    find_reducer,
+    json_shape,
+    reduce_files,
+    reduce_json,
+    reduce_json_lines,
+    reduce_notebook,
+    reduce_table,
+    reduce_tsv,
+)
+
+
+def notebook(*sources, image="iVBORw0KGgo="):
+    """Build the lines of a notebook with one code cell per source."""
+    cells = [
+        {
+            "cell_type": "code",
+            "execution_count": i,
+            "metadata": {},
+            "outputs": [{"data": {"image/png": image}, "output_type": "display_data"}],
+            "source": source.splitlines(keepends=True),
+        }
+        for i, source in enumerate(sources)
+    ]
+    text = json.dumps({"cells": cells, "metadata": {}, "nbformat": 4}, indent=1)
+    return text.splitlines(keepends=True)
+
+
+def lines(text):
+    return text.splitlines(keepends=True)
+
+
+def file_diff(path, body="", blobs="1111111..2222222", size=0, header=""):
+    """Parse a one-file diff with the given hunk body."""
+    diff = (
+        f"diff --git a/{path} b/{path}\n{header}"
+        f"index {blobs} 100644\n--- a/{path}\n+++ b/{path}\n{body}"
+    )
+    if size:
+        diff += "\n@@ -1 +1 @@\n+" + "x" * size
+    return parse_diff(diff)[0]
+
+
+class TestReduceNotebook:
+    def test_source_changes_only(self):
+        reduction = reduce_notebook(
+            notebook("import os\nx = 1\nprint(x)", "old()"),
+            notebook("import os\nx = 2\nprint(x)", "new()", "added()", image="AAAA"),
+            [],
+        )
+
+        assert reduction.note == (
+            "[notebook: cells 2 changed, 1 added; "
+            "outputs and execution counts left out]"
+        )
+        assert reduction.hunks == [
+            (
+                "@@ code cell 1 changed @@",
+                [" import os", "-x = 1", "+x = 2", " print(x)"],
+            ),
+            ("@@ code cell 2 changed @@", ["-old()", "+new()"]),
+            ("@@ code cell 3 added @@", ["+added()"]),
+        ]
+
+    def test_removed_cell(self):
+        reduction = reduce_notebook(notebook("a()", "b()"), notebook("a()"), [])
+
+        assert reduction.hunks == [("@@ code cell 2 removed @@", ["-b()"])]
+
+    def test_outputs_only(self):
+        reduction = reduce_notebook(notebook("a()"), notebook("a()", image="AAAA"), [])
+
+        assert reduction.hunks == []
+        assert "only outputs" in reduction.note
+
+    def test_added_notebook(self):
+        reduction = reduce_notebook(iter(()), notebook("a()"), [])
+
+        assert reduction.hunks == [("@@ code cell 1 added @@", ["+a()"])]
+
+
+class TestReduceData:
+    def test_table(self):
+        reduction = reduce_table(
+            lines("id,name\n1,a\n2,b\n"),
+            lines("id,name,score\n1,a,3\n2,b,4\n3,c,5\n\n"),
+            ["-1,a", "+1,a,3"],
+        )
+
+        assert reduction.note == "[table: columns added: score; rows: 2→3 (+1)]"
+        assert reduction.hunks == [
+            ("@@ sample of changed lines @@", ["-1,a", "+1,a,3"])
+        ]
+
+    def test_tsv_columns_unchanged(self):
+        reduction = reduce_tsv(lines("a\tb\n1\t2\n"), lines("a\tb\n"), [])
+
+        assert reduction.note == "[table: columns: a, b; rows: 1→0 (-1)]"
+        assert reduction.hunks == []
+
+    def test_json_lines(self):
+        reduction = reduce_json_lines(
+            lines('{"id": 1}\n'), lines('{"id": 1, "tag": "x"}\n{"id": 2}\n'), []
+        )
+
+        assert reduction.note == "[records: columns added: tag; rows: 1→2 (+1)]"
+
+    def test_json_shape_change(self):
+        reduction = reduce_json(
+            lines('[{"id": 1, "name": "a"}]'),
+            lines('[{"id": 1, "tags": ["x"]}, {"id": 2}]'),
+            [],
+        )
+
+        assert reduction.note == (
+            "[json: shape list[1] of {id: number, name: string} → "
+            "list[2] of {id: number, tags: list[1]}]"
+        )
+
+    def test_json_shape(self):
+        assert json_shape({"a": {"b": {"c": 1}}, "d": None}) == (
+            "{a: {b: object(1 keys)}, d: null}"
+        )
+        assert json_shape([]) == "list[0]"
+        assert json_shape(True) == "boolean"
+
+
+def blob_reader(blobs):
+    def read_blob(blob):
+        return iter(lines(blobs[blob]))
+
+    return read_blob
+
+
+class TestReduceFiles:
+    def test_find_reducer(self):
+        assert find_reducer(file_diff("nb/a.ipynb")) is reduce_notebook
+        assert find_reducer(file_diff("data.CSV")) is reduce_table
+        assert find_reducer(file_diff("app.py")) is None
+        # Small JSON files are usually configuration
+        assert find_reducer(file_diff("tsconfig.json")) is None
+        assert find_reducer(file_diff("fixture.json", size=20000)) is reduce_json
+
+    def test_reduces_in_process(self):
+        diff = file_diff("rows.csv", "@@ -1,2 +1,2 @@\n id\n-1\n+2")
+
+        reductions = reduce_files(
+            [diff, file_diff("app.py")],
+            blob_reader({"1111111": "id\n1\n", "2222222": "id\n2\n"}),
+        )
+
+        assert list(reductions) == ["rows.csv"]
+        assert reductions["rows.csv"].note == "[table: columns: id; rows: 1→1 (+0)]"
+        assert (
+            reductions["rows.csv"]
+            .render(diff)
+            .endswith(
+                "[table: columns: id; rows: 1→1 (+0)]\n"
+                "@@ sample of changed lines @@\n-1\n+2"
+            )
+        )
+
+    def test_unparseable_files_are_kept(self):
+        reductions = reduce_files(
+            [file_diff("a.ipynb")],
+            blob_reader({"1111111": "{not json", "2222222": "{}"}),
+        )
+
+        assert reductions == {}
+
+    def test_malformed_notebooks_are_kept(self):
+        for text in ("[1, 2]", '{"cells": [1]}', '{"cells": [{"source": 1}]}'):
+            reductions = reduce_files(
+                [file_diff("a.ipynb")],
+                blob_reader({"1111111": text, "2222222": text}),
+            )
+
+            assert reductions == {}
+
+    def test_failed_worker_keeps_the_other_files(self):
+        files = [
+            file_diff("a.csv", size=300 * 1024),
+            file_diff("b.csv", blobs="3333333..4444444", size=300 * 1024),
+        ]
+        # Reading the blobs of b.csv fails unexpectedly
+        read_blob = blob_reader({"1111111": "a\n", "2222222": "a\n1\n"})
+
+        with patch(
+            "acmsg.core.reducers.ProcessPoolExecutor",
+            side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+        ):
+            reductions = reduce_files(files, read_blob)
+
+        assert list(reductions) == ["a.csv"]
+
+    def test_several_large_files_use_a_process_pool(self):
+        files = [
+            file_diff("a.csv", size=300 * 1024),
+            file_diff("b.csv", size=300 * 1024),
+        ]
+        pools = []
+
+        def pool(max_workers, mp_context):
+            pools.append(max_workers)
+            return ThreadPoolExecutor(max_workers)
+
+        with patch("acmsg.core.reducers.ProcessPoolExecutor", side_effect=pool):
+            reductions = reduce_files(
+                files, blob_reader({"1111111": "a\n", "2222222": "a\n1\n"})
+            )
+
+        assert pools == [2]
+        assert sorted(reductions) == ["a.csv", "b.csv"]
+
+    def test_single_large_file_is_reduced_in_process(self):
+        with patch("acmsg.core.reducers.ProcessPoolExecutor") as pool:
+            reduce_files(
+                [file_diff("a.csv", size=300 * 1024)],
+                blob_reader({"1111111": "a\n", "2222222": "a\n"}),
+            )
+
+        pool.assert_not_called()
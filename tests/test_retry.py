@@ -0,0 +1,89 @@
+import time
+from email.utils import formatdate
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from acmsg.api.retry import RetryPolicy, describe_attempts, parse_retry_after
+from acmsg.exceptions import ConfigError
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after(" 1.5 ") == 1.5
+
+    def test_http_date(self):
+        value = formatdate(time.time() + 30, usegmt=True)
+        assert 25 <= parse_retry_after(value) <= 30
+
+    def test_missing_or_malformed(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("") is None
+        assert parse_retry_after("soon") is None
+
+    def test_past_values_clamped(self):
+        assert parse_retry_after("-4") == 0.0
+        assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+class TestRetryPolicy:
+    def test_defaults(self):
+        policy = RetryPolicy()
+        assert policy.max_attempts == 3
+        assert policy.jitter is True
+
+    def test_invalid_values(self):
+        with pytest.raises(ConfigError):
+            RetryPolicy(max_attempts=0)
+        with pytest.raises(ConfigError):
+            RetryPolicy(backoff_base=-1)
+
+    def test_from_config(self):
+        policy = RetryPolicy.from_config({"max_attempts": 5, "jitter": False})
+        assert policy.max_attempts == 5
+        assert policy.jitter is False
+        assert RetryPolicy.from_config(None).max_attempts == 3
+
+    def test_from_config_invalid(self):
+        with pytest.raises(ConfigError):
+            RetryPolicy.from_config({"attempts": 2})
+        with pytest.raises(ConfigError):
+            RetryPolicy.from_config({"max_attempts": "many"})
+        with pytest.raises(ConfigError):
+            RetryPolicy.from_config([1, 2])
+
+    def test_retryable_status(self):
+        policy = RetryPolicy()
+        for status in (408, 429, 502, 503, 504):
+            assert policy.is_retryable_status(status)
+        for status in (200, 400, 401, 500):
+            assert not policy.is_retryable_status(status)
+
+    def test_retryable_exception(self):
+        policy = RetryPolicy()
+        assert policy.is_retryable_exception(requests.ConnectionError())
+        assert policy.is_retryable_exception(requests.ConnectTimeout())
+        assert not policy.is_retryable_exception(requests.ReadTimeout())
+        assert not policy.is_retryable_exception(requests.RequestException())
+
+    def test_delay_without_jitter(self):
+        policy = RetryPolicy(backoff_base=0.5, backoff_cap=3.0, jitter=False)
+        assert [policy.delay(n) for n in (1, 2, 3, 4)] == [0.5, 1.0, 2.0, 3.0]
+
+    def test_delay_with_jitter(self):
+        policy = RetryPolicy(backoff_base=1.0, backoff_cap=8.0)
+        with patch("acmsg.api.retry.random.uniform", return_value=0.25) as mock_rand:
+            assert policy.delay(3) == 0.25
+        mock_rand.assert_called_once_with(0, 4.0)
+
+    def test_delay_honours_retry_after(self):
+        policy = RetryPolicy(backoff_base=0.5, backoff_cap=1.0, jitter=False)
+        assert policy.delay(1, retry_after=20.0) == 20.0
+        assert policy.delay(1, retry_after=0.1) == 0.5
+
+
+def test_describe_attempts():
+    assert describe_attempts(1) == ""
+    assert describe_attempts(3) == " (after 3 attempts)"
@@ -0,0 +1,33 @@
+from acmsg.api.streaming import iter_sse_data
+
+
+class TestIterSseData:
+    """Tests for the server-sent event parser."""
+
+    def test_parses_data_events(self):
+        """Test that each event's data payload is yielded."""
+        lines = [b'data: {"a": 1}', b"", b'data: {"b": 2}', b""]
+
+        assert list(iter_sse_data(lines)) == ['{"a": 1}', '{"b": 2}']
+
+    def test_ignores_comments_and_other_fields(self):
+        """Test that keep-alive comments and non-data fields are skipped."""
+        lines = [": OPENROUTER PROCESSING", "", "event: message", "id: 1", "data: x", ""]
+
+        assert list(iter_sse_data(lines)) == ["x"]
+
+    def test_joins_multiline_data(self):
+        """Test that multiple data lines form one payload."""
+        lines = ["data: first", "data:second", "", "data: [DONE]", ""]
+
+        assert list(iter_sse_data(lines)) == ["first\nsecond"]
+
+    def test_stops_at_done(self):
+        """Test that the stream ends at the [DONE] sentinel."""
+        lines = ["data: one", "", "data: [DONE]", "", "data: ignored", ""]
+
+        assert list(iter_sse_data(lines)) == ["one"]
+
+    def test_flushes_unterminated_event(self):
+        """Test that a final event without a blank line is still yielded."""
+        assert list(iter_sse_data(["data: tail\r"])) == ["tail"]
@@ -0,0 +1,187 @@
+from unittest.mock import MagicMock
+
+from acmsg.core.cache import ResponseCache
+from acmsg.core.diff import parse_diff
+from acmsg.core.symbols import (
+    SymbolSummarizer,
+    compare_symbols,
+    find_extractor,
+    fingerprint_spans,
+    pattern_spans,
+    python_spans,
+)
+from acmsg.exceptions import GitError
+
+PY_OLD = """\
+import os
+
+
+@decorator
+def helper(x):
+    return x
+
+
+class Config:
+    name = "a"
+
+    def load(self):
+        return 1
+
+    def save(self):
+        return 2
+
+
+def removed():
+    pass
+"""
+
+PY_NEW = PY_OLD.replace("return 1", "return 10").replace(
+    "def removed():\n    pass\n", "async def added():\n    pass\n"
+)
+
+
+def symbols(source, extractor=python_spans):
+    return fingerprint_spans(source, extractor(source))
+
+
+class TestExtractors:
+    def test_python_spans(self):
+        assert python_spans(PY_OLD) == [
+            ("def helper", 4, 6),
+            ("class Config", 9, 16),
+            ("def Config.load", 12, 13),
+            ("def Config.save", 15, 16),
+            ("def removed", 19, 20),
+        ]
+
+    def test_changed_method_does_not_change_its_class(self):
+        changes = compare_symbols(symbols(PY_OLD), symbols(PY_NEW))
+
+        assert changes.describe() == (
+            "added def added, modified def Config.load, removed def removed"
+        )
+
+    def test_go(self):
+        source = (
+            "package main\n\n"
+            "type Server struct {\n}\n\n"
+            "func (s *Server) Start(port int) error {\n\treturn nil\n}\n\n"
+            "func main() {\n}\n"
+        )
+
+        assert pattern_spans(source, ".go") == [
+            ("type Server", 3, 5),
+            ("func Server.Start", 6, 9),
+            ("func main", 10, 12),
+        ]
+
+    def test_typescript(self):
+        source = (
+            "export interface Options {}\n"
+            "export const parse = async (text: string) => {\n};\n"
+            "export default class Parser {\n"
+            "  private run(input: string): void {\n  }\n"
+            "  if (x) {\n  }\n"
+            "}\n"
+        )
+
+        assert [name for name, _, _ in pattern_spans(source, ".ts")] == [
+            "type Options",
+            "function parse",
+            "class Parser",
+            "method run",
+        ]
+
+    def test_rust_and_c(self):
+        rust = "pub struct A;\nimpl Display for A {\n    pub fn fmt(&self) {}\n}\n"
+        c = "static int count(const char *s) {\n  return 0;\n}\nint x;\n"
+
+        assert [name for name, _, _ in pattern_spans(rust, ".rs")] == [
+            "type A",
+            "impl A",
+            "fn fmt",
+        ]
+        assert [name for name, _, _ in pattern_spans(c, ".c")] == ["function count"]
+
+    def test_find_extractor(self):
+        assert find_extractor("src/app.py") is python_spans
+        assert find_extractor("main.GO") is not None
+        assert find_extractor("README.md") is None
+
+
+class TestSymbolChanges:
+    def test_no_changes(self):
+        assert not compare_symbols({"def a": "1"}, {"def a": "1"})
+
+    def test_describe_is_capped(self):
+        changes = compare_symbols({}, {f"def f{i}": "x" for i in range(4)})
+
+        assert changes.describe(max_items=2) == "added def f0, added def f1 and 2 more"
+
+
+def staged(path="app.py", blobs="1111111..2222222"):
+    return parse_diff(
+        f"diff --git a/{path} b/{path}\nindex {blobs} 100644\n"
+        f"--- a/{path}\n+++ b/{path}\n@@ -1 +1 @@\n-a\n+b"
+    )
+
+
+def summarizer(files, blobs, cache=None):
+    read_blob = MagicMock(
+        side_effect=lambda blob: iter(blobs[blob].splitlines(keepends=True))
+    )
+    return SymbolSummarizer(lambda: files, read_blob, cache=cache), read_blob
+
+
+class TestSymbolSummarizer:
+    def test_describe_by_path(self):
+        files = staged()
+        symbols, _ = summarizer(files, {"1111111": PY_OLD, "2222222": PY_NEW})
+        # Compacted diffs are matched to the staged diff by path
+        compacted = parse_diff("diff --git app.py app.py\n@@ -1 +1 @@\n+b")[0]
+
+        assert symbols.describe(compacted) == (
+            "[symbols: added def added, modified def Config.load, removed def removed]"
+        )
+
+    def test_added_file(self):
+        files = staged(blobs="0000000..2222222")
+        symbols, read_blob = summarizer(files, {"2222222": "def f():\n    pass\n"})
+
+        assert symbols.describe(files[0]) == "[symbols: added def f]"
+        read_blob.assert_called_once_with("2222222")
+
+    def test_symbols_are_cached_by_blob(self, tmp_path):
+        files = staged()
+        blobs = {"1111111": PY_OLD, "2222222": PY_NEW}
+        first, _ = summarizer(files, blobs, ResponseCache(tmp_path))
+        first.describe(files[0])
+
+        second, read_blob = summarizer(files, blobs, ResponseCache(tmp_path))
+
+        assert second.describe(files[0]).startswith("[symbols: added def added")
+        read_blob.assert_not_called()
+
+    def test_unsupported_and_unparseable_files(self):
+        text = staged("notes.md")
+        broken = staged()
+        symbols, _ = summarizer(
+            text + broken, {"1111111": "def (:\n", "2222222": "def f(): pass\n"}
+        )
+
+        assert symbols.describe(text[0]) is None
+        assert symbols.describe(broken[0]) is None
+
+    def test_unreadable_blob(self):
+        files = staged()
+        symbols = SymbolSummarizer(
+            lambda: files, MagicMock(side_effect=GitError("bad object"))
+        )
+
+        assert symbols.describe(files[0]) is None
+
+    def test_unchanged_symbols(self):
+        files = staged()
+        symbols, _ = summarizer(files, {"1111111": PY_OLD, "2222222": PY_OLD + "\n"})
+
+        assert symbols.describe(files[0]) is None
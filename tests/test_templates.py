@@ -57,6 +57,26 @@ class TestTemplateRenderer:
         assert result == "## USER-SPECIFIED TASK\n\nGenerated content..."
         mock_template.render.assert_called_once_with(status=status, diff=diff)
 
+    def test_render_summary_prompts(self):
+        """Test rendering the map-reduce prompt templates."""
+        renderer = TemplateRenderer()
+
+        assert "summarize" in renderer.render_summary_system_prompt()
+        summary = renderer.render_summary_prompt("diff text", 2, 5)
+        assert "part 2 of 5" in summary
+        assert "diff text" in summary
+
+        reduce = renderer.render_reduce_prompt(
+            "M a.py",
+            [
+                {"paths": "a.py", "text": "Adds a"},
+                {"paths": "b.py, c.py", "text": "Fixes b"},
+            ],
+        )
+        assert "M a.py" in reduce
+        assert "### Part 1: a.py\nAdds a" in reduce
+        assert "### Part 2: b.py, c.py\nFixes b" in reduce
+
     def test_render_config_template(self):
         """Test rendering the config template."""
         mock_template = MagicMock()
@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from acmsg.api.budget import TokenBudget
+from acmsg.api.openrouter import OpenRouterClient
+from acmsg.api.tokenizer import (
+    RatioTokenizer,
+    TokenCalibration,
+    Tokenizer,
+    model_family,
+    tokenizer_for,
+)
+from acmsg.storage import read_json
+
+
+class TestRatioTokenizer:
+    def test_plain_text(self):
+        assert RatioTokenizer(4.0).count("a" * 400) == 101
+
+    def test_symbols_and_non_ascii_cost_more(self):
+        tokenizer = RatioTokenizer(4.0)
+        plain = tokenizer.count("a" * 400)
+        assert tokenizer.count("{}" * 200) > plain
+        assert tokenizer.count("ü" * 400) > tokenizer.count("{}" * 200)
+
+    def test_counts_are_memoized(self):
+        tokenizer = RatioTokenizer(4.0, cache_size=2)
+        with patch.object(tokenizer, "_count", return_value=7) as mock_count:
+            assert tokenizer.count("first") == 7
+            assert tokenizer.count("first") == 7
+            mock_count.assert_called_once_with("first")
+
+            tokenizer.count("second")
+            tokenizer.count("third")
+            tokenizer.count("first")
+            # "first" was evicted once the cache held two other texts
+            assert mock_count.call_count == 4
+
+    def test_memo_does_not_trust_hash(self):
+        tokenizer = RatioTokenizer(4.0)
+        with patch("builtins.hash", return_value=0):
+            assert tokenizer.count("a" * 400) != tokenizer.count("{" * 400)
+
+    def test_subclass_must_count(self):
+        class Incomplete(Tokenizer):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestModelFamily:
+    def test_longest_family_wins(self):
+        assert model_family("openai/gpt-4o-mini") == "gpt-4o"
+        assert model_family("meta-llama/llama-3-70b") == "llama-3"
+        assert model_family("anthropic/claude-3.5-sonnet") == "claude"
+        assert model_family("unknown/model") == "default"
+
+    def test_tokenizer_is_shared_per_family(self):
+        assert tokenizer_for("openai/gpt-4o") is tokenizer_for("openai/gpt-4o-mini")
+        assert tokenizer_for(None) is tokenizer_for("unknown/model")
+        assert tokenizer_for("anthropic/claude-3").chars_per_token == 3.5
+
+
+class TestTokenCalibration:
+    def test_defaults_to_no_correction(self, tmp_path):
+        assert TokenCalibration(tmp_path / "tokenizer.json").factor("model") == 1.0
+
+    def test_moves_towards_observed_ratio(self, tmp_path):
+        cache_file = tmp_path / "tokenizer.json"
+        calibration = TokenCalibration(cache_file, smoothing=0.5)
+
+        calibration.record("model", 1000, 1400)
+        assert calibration.factor("model") == 1.2
+        assert read_json(cache_file) == {"model": 1.2}
+        assert TokenCalibration(cache_file).factor("model") == 1.2
+
+    def test_ignores_small_samples(self, tmp_path):
+        calibration = TokenCalibration(tmp_path / "tokenizer.json", min_tokens=200)
+        calibration.record("model", 50, 500)
+        assert calibration.factor("model") == 1.0
+
+    def test_factor_is_bounded(self, tmp_path):
+        calibration = TokenCalibration(tmp_path / "tokenizer.json", smoothing=1.0)
+        calibration.record("model", 1000, 10000)
+        assert calibration.factor("model") == 2.0
+
+
+class TestClientCalibration:
+    def test_estimates_use_the_model_factor(self, tmp_path):
+        calibration = TokenCalibration(tmp_path / "tokenizer.json", smoothing=1.0)
+        calibration.record("test_model", 1000, 1500)
+        client = OpenRouterClient("test_token", token_calibration=calibration)
+
+        assert client.estimate_tokens("a" * 400) == 101
+        assert client.estimate_tokens("a" * 400, "test_model") == 152
+
+    @patch("requests.Session.post")
+    def test_usage_is_recorded(self, mock_post, tmp_path):
+        mock_response = MagicMock()
+        mock_response.ok = True
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "choices": [{"message": {"content": "Message"}}],
+            "usage": {"prompt_tokens": 1500, "completion_tokens": 10},
+        }
+        mock_post.return_value = mock_response
+        calibration = TokenCalibration(tmp_path / "tokenizer.json", smoothing=1.0)
+        client = OpenRouterClient("test_token", token_calibration=calibration)
+
+        with patch.object(client, "_get_model_context_length", return_value=100000):
+            client.generate_completion("test_model", "S" * 40, "a" * 4000, 0.7)
+
+        # 11 + 1001 estimated tokens against 1500 reported
+        assert calibration.factor("test_model") == round(1500 / 1012, 4)
+
+    def test_trimmed_requests_are_not_recorded(self, tmp_path):
+        calibration = TokenCalibration(tmp_path / "tokenizer.json")
+        client = OpenRouterClient("test_token", token_calibration=calibration)
+        budget = TokenBudget("model", 4096, "S", "U", 500, 3000, 96, was_trimmed=True)
+
+        client._record_usage(budget, {"prompt_tokens": 5000})
+        assert calibration.factor("model") == 1.0